@@ -0,0 +1,121 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Benchmark the chisel HTTP/1.1 server against the standard library's wsgiref server
+
+usage: python perf/benchmark_server.py [-n REQUESTS] [-c CONNECTIONS] [-w WORKERS]
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import chisel
+
+
+@chisel.action(spec='''\
+action sum_numbers
+    urls
+        GET
+    query
+        int[] numbers
+    output
+        int sum
+''')
+def sum_numbers(unused_ctx, req):
+    return {'sum': sum(req['numbers'])}
+
+
+application = chisel.Application()
+application.add_request(sum_numbers)
+
+
+# The benchmark request path
+REQUEST_PATH = '/sum_numbers?numbers.0=1&numbers.1=2&numbers.2=3'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the chisel server against wsgiref')
+    parser.add_argument('-n', dest='requests', metavar='N', type=int, default=2000, help='requests per connection')
+    parser.add_argument('-c', dest='connections', metavar='N', type=int, default=8, help='concurrent connections')
+    parser.add_argument('-w', dest='workers', metavar='N', type=int, default=os.cpu_count(),
+                        help='prefork server worker processes')
+    parser.add_argument('--wsgiref', metavar='PORT', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # wsgiref server process?
+    if args.wsgiref is not None:
+        from wsgiref.simple_server import WSGIRequestHandler, make_server # pylint: disable=import-outside-toplevel
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_message(self, *unused_args): # pylint: disable=arguments-differ
+                pass
+
+        make_server('127.0.0.1', args.wsgiref, application, handler_class=QuietHandler).serve_forever()
+        return
+
+    # Benchmark each server
+    perf_dir = os.path.dirname(os.path.abspath(__file__))
+    src_dir = os.path.join(os.path.dirname(perf_dir), 'src')
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join([perf_dir, src_dir])}
+    for server_name, server_args in (
+        ('wsgiref', [os.path.abspath(__file__), '--wsgiref']),
+        ('chisel', ['-m', 'chisel', 'serve', 'benchmark_server:application', '-p']),
+        (f'chisel -w {args.workers}', ['-m', 'chisel', 'serve', 'benchmark_server:application', '-w', str(args.workers), '-p'])
+    ):
+        port = _free_port()
+        with subprocess.Popen([sys.executable, *server_args, str(port)], env=env, stderr=subprocess.DEVNULL) as server:
+            try:
+                _wait_for_port(port)
+                elapsed = _run_clients(port, args.connections, args.requests)
+            finally:
+                server.terminate()
+        total = args.connections * args.requests
+        print(f'{server_name:>12}: {total} requests in {elapsed:.2f} seconds ({total / elapsed:.0f} requests/second)')
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port):
+    for _ in range(100):
+        try:
+            with socket.create_connection(('127.0.0.1', port)):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise OSError(f'Server did not start on port {port}')
+
+
+# Run the client threads - each client reuses its connection, if the server allows it
+def _run_clients(port, connections, requests):
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        for _ in range(requests):
+            connection.request('GET', REQUEST_PATH)
+            response = connection.getresponse()
+            assert response.status == 200 and response.read() == b'{"sum":6}'
+            if response.will_close:
+                connection.close()
+        connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(connections)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Chisel command-line interface - "python -m chisel"
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+
+from .app import Application
+from .prefork import PREFORK_DRAIN_SECONDS, PreforkServer
+from .server import SERVER_BODY_TIMEOUT, SERVER_HEADER_TIMEOUT, SERVER_KEEPALIVE_TIMEOUT, load_application, serve
+
+
+def main(argv=None):
+    """
+    The chisel command-line interface main entry point
+
+    :param list(str) argv: The command-line arguments. If None, the process's command-line arguments are used.
+    """
+
+    parser = argparse.ArgumentParser(prog='python -m chisel', description='Chisel command-line interface')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    # serve command
+    serve_parser = subparsers.add_parser('serve', help='run the chisel HTTP/1.1 server')
+    serve_parser.add_argument('app', metavar='MODULE:APP', help='the application (e.g. "myapp.main:application")')
+    serve_parser.add_argument('-b', '--host', metavar='HOST', default='127.0.0.1',
+                              help='the host name or address (default is "127.0.0.1")')
+    serve_parser.add_argument('-p', '--port', metavar='N', type=int, default=8080,
+                              help='the port number (default is 8080)')
+    serve_parser.add_argument('-u', '--unix', metavar='PATH', help='listen on a unix domain socket')
+    serve_parser.add_argument('-t', '--threads', metavar='N', type=int,
+                              help='the maximum number of request threads')
+    serve_parser.add_argument('-w', '--workers', metavar='N', type=int,
+                              help='run a prefork server with N worker processes')
+    serve_parser.add_argument('--cpu-affinity', action='store_true', help='pin each worker process to a CPU')
+    serve_parser.add_argument('--max-requests', metavar='N', type=int,
+                              help='recycle a worker process after N requests')
+    serve_parser.add_argument('--max-rss', metavar='MB', type=int,
+                              help='recycle a worker process when its resident set size exceeds MB megabytes')
+    serve_parser.add_argument('--drain-timeout', metavar='SECONDS', type=float, default=PREFORK_DRAIN_SECONDS,
+                              help=f'the stopping server request drain timeout (default is {PREFORK_DRAIN_SECONDS})')
+    serve_parser.add_argument('--warmup', metavar='PATH', action='append',
+                              help='make a GET request to warm up each new worker process before it accepts connections')
+    serve_parser.add_argument('--header-timeout', metavar='SECONDS', type=float, default=SERVER_HEADER_TIMEOUT,
+                              help=f'the request line and headers timeout (default is {SERVER_HEADER_TIMEOUT})')
+    serve_parser.add_argument('--body-timeout', metavar='SECONDS', type=float, default=SERVER_BODY_TIMEOUT,
+                              help=f'the request content read timeout (default is {SERVER_BODY_TIMEOUT})')
+    serve_parser.add_argument('--keepalive-timeout', metavar='SECONDS', type=float, default=SERVER_KEEPALIVE_TIMEOUT,
+                              help=f'the idle persistent connection timeout (default is {SERVER_KEEPALIVE_TIMEOUT})')
+    args = parser.parse_args(args=argv)
+
+    # Run the server
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    try:
+        application = load_application(args.app)
+    except (ImportError, AttributeError, ValueError) as exc:
+        parser.exit(status=2, message=f'error: {exc}\n')
+    server_kwargs = {
+        'header_timeout': args.header_timeout,
+        'body_timeout': args.body_timeout,
+        'keepalive_timeout': args.keepalive_timeout
+    }
+    if args.workers is None and args.max_requests is None and args.max_rss is None and not args.cpu_affinity and \
+       args.warmup is None:
+        asyncio.run(serve(
+            application, host=args.host, port=args.port, unix_path=args.unix, threads=args.threads,
+            drain_timeout=args.drain_timeout, **server_kwargs
+        ))
+    else:
+        prefork_server = PreforkServer(
+            application, workers=args.workers, cpu_affinity=args.cpu_affinity, max_requests=args.max_requests,
+            max_rss=args.max_rss * 1024 * 1024 if args.max_rss is not None else None, threads=args.threads,
+            drain_timeout=args.drain_timeout, warmup=_warmup_requests(args.warmup) if args.warmup else None,
+            reload_args=sys.orig_argv[1:], **server_kwargs
+        )
+        prefork_server.bind(args.host, args.port, unix_path=args.unix)
+        prefork_server.run()
+
+
+# Helper to create a prefork worker warm-up function that makes GET requests to a chisel application
+def _warmup_requests(paths):
+    def warmup(application):
+        if isinstance(application, Application):
+            for path in paths:
+                path_info, _, query_string = path.partition('?')
+                application.request('GET', path_info, query_string=query_string)
+    return warmup
+
+
+if __name__ == '__main__':
+    main() # pragma: no cover
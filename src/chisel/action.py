@@ -5,15 +5,52 @@
 Chisel action class
 """
 
+import asyncio
 from functools import partial
+import hashlib
 from http import HTTPStatus
+import inspect
+from io import BytesIO
 from json import loads as json_loads
 import re
+from tempfile import TemporaryFile
+import time
+from urllib.parse import quote
 
-from schema_markdown import ValidationError, decode_query_string, get_referenced_types, parse_schema_markdown, validate_type
+from schema_markdown import ValidationError, decode_query_string, get_referenced_types, get_struct_members, \
+    parse_schema_markdown, validate_type
 
-from .app import Context
+from .app import Context, StartResponse
+from .budget import CONTENT_BUDGET_REJECT, CONTENT_BUDGET_SPOOL, CONTENT_BUDGET_WAIT, CONTENT_BUDGET_WAIT_SECONDS, \
+    CONTENT_SPOOL_CHUNK_SIZE
+from .cbor import CBOR_CONTENT_TYPE, decode_cbor
+from .columnar import encode_columnar
+from .deadline import DeadlineExceeded, wait_deadline
+from .compression import ZSTD_DICTIONARY_HEADER, CompressionMetrics, DecompressionLimitError, ResponseCompression, \
+    ResponseSamples, ZstdDictionary, decompress_stream, get_content_encodings
+from .delta import JSON_PATCH_CONTENT_TYPE, DeltaVersions, json_patch
+from .eventloop import BlockingCall, run_steps
+from .fields import get_fields_type, parse_fields, project_fields
+from .idempotency import IDEMPOTENCY_KEY_MAX_LENGTH, IDEMPOTENCY_MAX_BYTES, IDEMPOTENCY_TTL_SECONDS, IdempotencyCache, \
+    RequestDigestReader
+from .multipart import MULTIPART_CONTENT_TYPE, MULTIPART_MAX_BYTES, MULTIPART_SPOOL_BYTES, MultipartLimitError, \
+    get_multipart_boundary, parse_multipart
 from .request import Request
+from .stream import EVENT_STREAM_CONTENT_TYPE, HEARTBEAT, NDJSON_CONTENT_TYPE, STREAM_CHUNK_SIZE, aiter_heartbeat, is_stream, iter_heartbeat
+from .validate import check_type, validate_type_inplace
+
+
+#: The default maximum total size, in bytes, of an action's retained delta response versions
+DELTA_MAX_BYTES = 16 * 1024 * 1024
+
+#: The default maximum decompressed request content size, in bytes
+DECOMPRESS_MAX_BYTES = 64 * 1024 * 1024
+
+#: The default event stream heartbeat interval, in seconds
+EVENTS_HEARTBEAT_SECONDS = 15
+
+#: The default maximum newline-delimited JSON request content line size, in bytes
+NDJSON_MAX_LINE_BYTES = 1024 * 1024
 
 
 # Regex for parsing the Content-Type header
@@ -59,7 +96,17 @@ def action(action_callback=None, **kwargs):
                 'type "array" (query string)'}
 
     When :attr:`~chisel.Application.validate_output` is True, the response dictionary is also validated against the
-    output schema.
+    output schema. Int and float array output members may be :class:`numpy.ndarray`, :class:`array.array`, or
+    :class:`memoryview` objects.
+
+    Actions accept `CBOR <https://www.rfc-editor.org/rfc/rfc8949>`__ request content ("Content-Type: application/cbor")
+    and respond with CBOR when the "Accept" request header prefers "application/cbor". CBOR content is validated the
+    same as JSON content.
+
+    Clients may select a subset of output members using the "fields" query string parameter - a comma-separated list
+    of dot-separated member paths (e.g. "fields=a,b.c"). Only the selected members are validated and returned. The
+    parsed selection is available to the callback as :attr:`~chisel.Context.fields`. If the action's query string
+    has a "fields" member, output field selection is disabled.
 
     :param ~collections.abc.Callable action_callback: The action callback function
     """
@@ -69,6 +116,47 @@ def action(action_callback=None, **kwargs):
     return Action(action_callback, **kwargs)
 
 
+# Helper to get the set of preference tokens from the Prefer request header (RFC 7240)
+def _get_preferences(environ):
+    prefer = environ.get('HTTP_PREFER')
+    if not prefer:
+        return set()
+    return {re.split(r'[=;]', preference, maxsplit=1)[0].strip().lower() for preference in prefer.split(',')}
+
+
+# Helper to determine if the Accept request header prefers a CBOR response over a JSON response
+def _accepts_cbor(environ):
+    accept = environ.get('HTTP_ACCEPT')
+    if not accept or CBOR_CONTENT_TYPE not in accept:
+        return False
+    cbor_quality = 0
+    json_quality = 0
+    for media_range in accept.split(','):
+        media_type, *params = media_range.split(';')
+        media_type = media_type.strip().lower()
+        quality = 1
+        for param in params:
+            param_name, _, param_value = param.partition('=')
+            if param_name.strip().lower() == 'q':
+                try:
+                    quality = float(param_value)
+                except ValueError:
+                    quality = 0
+        if media_type == CBOR_CONTENT_TYPE:
+            cbor_quality = max(cbor_quality, quality)
+        elif media_type in ('application/json', 'application/*', '*/*'):
+            json_quality = max(json_quality, quality)
+    return cbor_quality > 0 and cbor_quality >= json_quality
+
+
+# Helper to join an asynchronous content iterable's chunks - the iterable is closed
+async def _join_async(content):
+    try:
+        return b''.join([chunk async for chunk in content])
+    finally:
+        await content.aclose()
+
+
 class ActionError(Exception):
     """
     An action error exception. Raise this exception within an action callback function to respond with an error.
@@ -133,6 +221,37 @@ class Action(Request):
     contains the schema-validated, combined path parameters, query string parameters, and JSON request content
     parameters.
 
+    Action callbacks may be async functions. Async callbacks are run on the application's shared event loop thread
+    (see :attr:`~chisel.Application.event_loop`) while the request thread waits. For example:
+
+    >>> import asyncio
+    >>> @chisel.action(spec='''
+    ... action my_async_action
+    ...     urls
+    ...         GET
+    ...     output
+    ...         int value
+    ... ''')
+    ... async def my_async_action(ctx, req):
+    ...    await asyncio.sleep(0)
+    ...    return {'value': 1}
+    ...
+    >>> application = chisel.Application()
+    >>> application.add_request(my_async_action)
+    >>> application.request('GET', '/my_async_action')
+    ('200 OK', [('Content-Type', 'application/json')], b'{"value":1}')
+
+    The value of a top-level array output member may be a generator or a :meth:`~chisel.Context.stream` value. Such
+    members are streamed - the JSON response content is sent in chunks as the values are iterated, and each value is
+    validated individually (array length attributes are not validated). Streamed responses are always JSON. If an error
+    occurs mid-stream, the streamed array is closed and the response object ends with an error trailer - "error" and
+    "message" members, and a "member" member for invalid output values. Any remaining output members are omitted. For
+    example:
+
+    .. code-block:: json
+
+        {"rows":[{"id":1},{"id":2}],"error":"InvalidOutput","message":"...","member":"rows.2.id"}
+
     :param ~collections.abc.Callable action_callback: The action callback function
     :param str name: The action request name
     :param list(tuple) urls: The list of URL method/path tuples. The first value is the HTTP request method (e.g. 'GET')
@@ -143,20 +262,206 @@ class Action(Request):
         If a specification isn't provided it can be provided through the "types" argument.
     :param bool wsgi_response: If True, the callback function's response is a WSGI application function
         response. Default is False.
+    :param bool validate_inplace: If True, the request content is validated in place rather than copied. Only values
+        that are transformed during validation (e.g. date, datetime, and uuid members) are replaced. Use this for
+        bulk-ingest actions with large request content. Default is False.
+    :param bool numpy_arrays: If True and `NumPy <https://numpy.org/>`__ is installed, int and float array request
+        members are passed to the callback as :class:`numpy.ndarray` objects. Request content is validated in place and
+        numeric arrays are validated with vectorized NumPy operations. If NumPy is not installed, numeric arrays are
+        lists. Default is False.
+    :param bool columnar: If True, clients may request columnar (struct-of-arrays) output struct arrays using the
+        "Prefer: columnar" request header. See :func:`~chisel.columnar.encode_columnar`. Default is False.
+    :param int delta_versions: The number of recent JSON response versions to retain for delta responses. If non-zero,
+        successful JSON responses include an "ETag" header. A client that sends a retained version's ETag in the
+        "If-None-Match" request header and accepts "application/json-patch+json" receives a
+        `JSON Patch <https://www.rfc-editor.org/rfc/rfc6902>`__ from its version to the current version, if smaller than
+        the current version. A client that sends the current version's ETag receives a "304 Not Modified" response.
+        Default is 0 (disabled).
+    :param int delta_max_bytes: The maximum total size, in bytes, of the retained delta response versions. Default is
+        :data:`~chisel.action.DELTA_MAX_BYTES`.
+    :param bool decompress: If True, compressed request content ("Content-Encoding: gzip" or "zstd") is decompressed
+        as it is read. See :func:`~chisel.compression.decompress_stream`. Default is False.
+    :param int decompress_max_bytes: The maximum decompressed request content size, in bytes. Default is
+        :data:`~chisel.action.DECOMPRESS_MAX_BYTES`.
+    :param int response_samples: The number of successful JSON response contents to sample for zstd dictionary
+        training. See :func:`~chisel.compression.train_zstd_dictionary`. Default is 0 (no sampling).
+    :param bytes zstd_dictionary: Optional trained zstd dictionary content. Successful JSON responses include the
+        dictionary's ID in the :data:`~chisel.compression.ZSTD_DICTIONARY_HEADER` header. If a client sends the
+        dictionary's ID in the same request header and accepts "zstd", the response is compressed with the dictionary.
+        See :func:`~chisel.compression.decode_response_content`. Requires Python 3.14 or later.
+    :param bool events: If True, the action is an event stream action. See below. Default is False.
+    :param float events_heartbeat: The event stream heartbeat interval, in seconds. If no event is available within the
+        interval, a heartbeat is sent to keep the connection open. If None, heartbeats are disabled. Default is
+        :data:`~chisel.action.EVENTS_HEARTBEAT_SECONDS`.
+    :param str ndjson_input: Optional name of an array input member. If provided, the action accepts
+        newline-delimited JSON ("application/x-ndjson") request content. See below.
+    :param int ndjson_max_line_bytes: The maximum newline-delimited JSON request content line size, in bytes. Default
+        is :data:`~chisel.action.NDJSON_MAX_LINE_BYTES`.
+    :param bool multipart: If True, the action accepts "multipart/form-data" request content. Form fields are decoded
+        like query string parameters and validated against the input type. Files are input members of type "object" -
+        :class:`~chisel.multipart.MultipartFile` objects, spooled to temporary files above "multipart_spool_bytes". The
+        files are closed when the callback returns. See :func:`~chisel.multipart.parse_multipart`. Default is False.
+    :param int multipart_max_bytes: The maximum multipart request content size, in bytes. Default is
+        :data:`~chisel.multipart.MULTIPART_MAX_BYTES`.
+    :param int multipart_spool_bytes: The file size, in bytes, above which a multipart file is spooled to a temporary
+        file. Default is :data:`~chisel.multipart.MULTIPART_SPOOL_BYTES`.
+    :param str content_budget_policy: The policy for request content that doesn't fit in the application's
+        :attr:`~chisel.Application.content_budget` - :data:`~chisel.budget.CONTENT_BUDGET_WAIT` to wait for the budget
+        and then respond with 503, :data:`~chisel.budget.CONTENT_BUDGET_SPOOL` to receive the content to a temporary
+        file and then wait for the budget to read it, so slow uploads don't hold the budget, or
+        :data:`~chisel.budget.CONTENT_BUDGET_REJECT` to respond with 503 immediately. Content larger than the entire
+        budget is rejected with 413.
+        Newline-delimited JSON and multipart content are read incrementally and are not charged to the budget, nor is
+        content without a "Content-Length". Default is :data:`~chisel.budget.CONTENT_BUDGET_WAIT`.
+    :param float content_budget_wait: The maximum time, in seconds, to wait for the content budget. Default is
+        :data:`~chisel.budget.CONTENT_BUDGET_WAIT_SECONDS`.
+    :param int idempotency_responses: The number of completed responses to retain for requests with an
+        "Idempotency-Key" header. If non-zero, the first completed response for a client's idempotency key is replayed
+        for the client's subsequent requests with the same key, without calling the callback, and concurrent requests
+        with the same key wait for the first request to complete. Responses are retained uncompressed and compressed
+        per each request's "Accept-Encoding" header. A request that reuses a key with a different query string or
+        content is rejected with 422. Server error (5xx) responses are not retained. See
+        :class:`~chisel.idempotency.IdempotencyCache`. Default is 0 (disabled).
+    :param float idempotency_ttl: The time, in seconds, that an idempotent response is retained. Default is
+        :data:`~chisel.idempotency.IDEMPOTENCY_TTL_SECONDS`.
+    :param int idempotency_max_bytes: The maximum total size, in bytes, of the retained idempotent responses. Default
+        is :data:`~chisel.idempotency.IDEMPOTENCY_MAX_BYTES`.
+    :param ~collections.abc.Callable idempotency_client: Optional function that returns a request's client identifier
+        string given the :class:`~chisel.Context`. The default client identifier is the "REMOTE_USER" or, if not set,
+        the "REMOTE_ADDR" environ value.
+    :param ~chisel.bulkhead.Bulkhead bulkhead: Optional action concurrency limit. Requests over the limit wait in the
+        bulkhead's queue and are rejected with 503 if the queue is full or they time out. See
+        :class:`~chisel.bulkhead.Bulkhead`.
+    :param float timeout: Optional action timeout, in seconds. See below.
+
+    An action with an "ndjson_input" member accepts request content of type "application/x-ndjson" - one JSON record
+    per line. The member's value is an iterator of the records, each validated against the member's array value type
+    as it is read from the request content. The other input members are not provided. If a record is invalid, an
+    "InvalidInput" error is raised from the iterator with the record's line number in its message. If the callback
+    doesn't handle the error, the error response is returned, as usual. Under :meth:`~chisel.Application.asgi`, an
+    async callback's request content is read before the callback is called, since reading the records from the
+    request content would block the event loop. For example:
+
+    >>> @chisel.action(ndjson_input='records', spec='''
+    ... action my_ingest
+    ...     input
+    ...         int[] records
+    ...     output
+    ...         int sum
+    ... ''')
+    ... def my_ingest(ctx, req):
+    ...    return {'sum': sum(req['records'])}
+    ...
+    >>> application = chisel.Application()
+    >>> application.add_request(my_ingest)
+    >>> application.request('POST', '/my_ingest', wsgi_input=b'1\\n2\\n3\\n', environ={'CONTENT_TYPE': 'application/x-ndjson'})
+    ('200 OK', [('Content-Type', 'application/json')], b'{"sum":6}')
+    >>> application.request('POST', '/my_ingest', wsgi_input=b'1\\n2\\nx\\n', environ={'CONTENT_TYPE': 'application/x-ndjson'})
+    ...
+    ('400 Bad Request', [('Content-Type', 'application/json')], b'{"error":"InvalidInput","message":"Invalid request JSON: ... (line 3)"}')
+
+    An event stream action's callback returns an iterable (e.g. a generator) or an asynchronous iterable (e.g. an async
+    generator) of events. Each event is validated against the action's output type and sent as soon as it is available.
+    If the client accepts "application/x-ndjson" (and not "text/event-stream"), events are sent as newline-delimited
+    JSON. Otherwise, events are sent as
+    `Server-Sent Events <https://html.spec.whatwg.org/multipage/server-sent-events.html>`__. For example:
+
+    >>> @chisel.action(events=True, spec='''
+    ... action my_events
+    ...     urls
+    ...         GET
+    ...     query
+    ...         int count
+    ...     output
+    ...         int value
+    ... ''')
+    ... def my_events(ctx, req):
+    ...    return ({'value': value} for value in range(req['count']))
+    ...
+    >>> application = chisel.Application()
+    >>> application.add_request(my_events)
+    >>> status, headers, content = application.request('GET', '/my_events', query_string='count=2')
+    >>> content
+    b'data: {"value":0}\\n\\ndata: {"value":1}\\n\\n'
+
+    Errors raised by the callback before it returns are error responses, as usual. If an error occurs while iterating
+    the events, an error event is sent and the stream ends - a Server-Sent Event named "error" or, for newline-delimited
+    JSON, an error response object line (e.g. ``{"error":"InvalidOutput","message":"..."}``). Heartbeats are
+    Server-Sent Event comments or, for newline-delimited JSON, empty lines. If heartbeats are enabled, the events are
+    iterated on a separate thread with at most :data:`~chisel.stream.HEARTBEAT_QUEUE_SIZE` events buffered. When the
+    client disconnects, the events iterable is closed.
+
+    When the application is served by :meth:`~chisel.Application.asgi`, an asynchronous events iterable is iterated on
+    the request's event loop (and heartbeats are awaited there, too), so it may use the loop-bound objects (e.g.
+    queues, locks, and client sessions) of an async callback. Otherwise, an asynchronous events iterable is iterated on
+    the application's :attr:`~chisel.Application.event_loop`.
+
+    An action request's :attr:`~chisel.Context.deadline` is the earlier of the action's timeout and the client's
+    deadline (see :data:`~chisel.deadline.DEADLINE_HEADER`). If the request has a deadline, the action's callback is
+    awaited only until the deadline - a synchronous callback is run on the application's
+    :attr:`~chisel.Application.executor` (or the event loop's default executor) and an async callback is cancelled. If
+    the deadline passes, or if the callback raises :class:`~chisel.deadline.DeadlineExceeded`, the response is
+    "504 Gateway Timeout" with the "Timeout" error. A synchronous callback can't be interrupted - it should check its
+    remaining time using :meth:`~chisel.Context.remaining_time` or :meth:`~chisel.Context.check_deadline`. For example:
+
+    >>> import time
+    >>> @chisel.action(timeout=0.01, spec='''
+    ... action my_slow_action
+    ...     urls
+    ...         GET
+    ... ''')
+    ... def my_slow_action(ctx, req):
+    ...    time.sleep(0.1)
+    ...    ctx.check_deadline()
+    ...    return {}
+    ...
+    >>> application = chisel.Application()
+    >>> application.add_request(my_slow_action)
+    >>> application.request('GET', '/my_slow_action')
+    ('504 Gateway Timeout', [('Content-Type', 'application/json')], b'{"error":"Timeout"}')
     """
 
     __slots__ = (
         'action_callback',
         'types',
         'wsgi_response',
+        'validate_inplace',
+        'numpy_arrays',
+        'columnar',
+        'delta_versions',
+        'decompress_max_bytes',
+        'decompress_metrics',
+        'response_samples',
+        'zstd_dictionary',
+        'events',
+        'events_heartbeat',
+        'ndjson_input',
+        'ndjson_max_line_bytes',
+        'multipart',
+        'multipart_max_bytes',
+        'multipart_spool_bytes',
+        'content_budget_policy',
+        'content_budget_wait',
+        'idempotency',
+        'idempotency_client',
         '_input_type',
         '_query_type',
         '_path_type',
         '_output_type',
-        '_error_type'
+        '_ndjson_types',
+        '_error_type',
+        '_fields_query'
     )
 
-    def __init__(self, action_callback, name=None, urls=(('POST', None),), types=None, spec=None, wsgi_response=False):
+    def __init__(self, action_callback, name=None, urls=(('POST', None),), types=None, spec=None, wsgi_response=False,
+                 validate_inplace=False, numpy_arrays=False, columnar=False, delta_versions=0,
+                 delta_max_bytes=DELTA_MAX_BYTES, decompress=False, decompress_max_bytes=DECOMPRESS_MAX_BYTES, response_samples=0,
+                 zstd_dictionary=None, events=False, events_heartbeat=EVENTS_HEARTBEAT_SECONDS,
+                 ndjson_input=None, ndjson_max_line_bytes=NDJSON_MAX_LINE_BYTES, multipart=False,
+                 multipart_max_bytes=MULTIPART_MAX_BYTES, multipart_spool_bytes=MULTIPART_SPOOL_BYTES,
+                 content_budget_policy=CONTENT_BUDGET_WAIT, content_budget_wait=CONTENT_BUDGET_WAIT_SECONDS, idempotency_responses=0,
+                 idempotency_ttl=IDEMPOTENCY_TTL_SECONDS, idempotency_max_bytes=IDEMPOTENCY_MAX_BYTES, idempotency_client=None,
+                 bulkhead=None, timeout=None):
 
         # Use the action callback name if no name is provided
         if name is None:
@@ -178,7 +483,8 @@ class Action(Request):
             urls = [(url.get('method'), url.get('path')) for url in model['urls']]
 
         # Initialize Request
-        super().__init__(name=name, urls=urls, doc=model.get('doc'), doc_group=model.get('docGroup'))
+        super().__init__(name=name, urls=urls, doc=model.get('doc'), doc_group=model.get('docGroup'), bulkhead=bulkhead,
+                         timeout=timeout)
 
         #: The action callback function
         self.action_callback = action_callback
@@ -189,6 +495,67 @@ class Action(Request):
         #: If True, the callback function's response is a WSGI application function response.
         self.wsgi_response = wsgi_response
 
+        #: If True, the request content is validated in place rather than copied.
+        self.validate_inplace = validate_inplace
+
+        #: If True, int and float array request members are passed to the callback as NumPy ndarrays
+        self.numpy_arrays = numpy_arrays
+
+        #: If True, clients may request columnar output struct arrays using the "Prefer: columnar" request header
+        self.columnar = columnar
+
+        #: The retained delta response versions or None if delta responses are disabled
+        self.delta_versions = DeltaVersions(delta_versions, delta_max_bytes) if delta_versions else None
+
+        #: The maximum decompressed request content size, in bytes
+        self.decompress_max_bytes = decompress_max_bytes
+
+        #: The request content decompression metrics or None if request content decompression is disabled
+        self.decompress_metrics = CompressionMetrics() if decompress else None
+
+        #: The sampled response contents for zstd dictionary training or None if response sampling is disabled
+        self.response_samples = ResponseSamples(response_samples) if response_samples else None
+
+        #: The :class:`~chisel.compression.ZstdDictionary` or None
+        self.zstd_dictionary = ZstdDictionary(zstd_dictionary) if zstd_dictionary is not None else None
+
+        #: If True, the action is an event stream action
+        self.events = events
+
+        #: The event stream heartbeat interval, in seconds, or None if heartbeats are disabled
+        self.events_heartbeat = events_heartbeat
+
+        #: The newline-delimited JSON records input member name or None
+        self.ndjson_input = ndjson_input
+
+        #: The maximum newline-delimited JSON request content line size, in bytes
+        self.ndjson_max_line_bytes = ndjson_max_line_bytes
+
+        #: If True, the action accepts multipart/form-data request content
+        self.multipart = multipart
+
+        #: The maximum multipart request content size, in bytes
+        self.multipart_max_bytes = multipart_max_bytes
+
+        #: The file size, in bytes, above which a multipart file is spooled to a temporary file
+        self.multipart_spool_bytes = multipart_spool_bytes
+
+        #: The policy for request content that doesn't fit in the application's content budget
+        assert content_budget_policy in (CONTENT_BUDGET_WAIT, CONTENT_BUDGET_SPOOL, CONTENT_BUDGET_REJECT), \
+            f'Invalid content_budget_policy "{content_budget_policy}"'
+        self.content_budget_policy = content_budget_policy
+
+        #: The maximum time, in seconds, to wait for the content budget
+        self.content_budget_wait = content_budget_wait
+
+        #: The retained idempotent responses or None if idempotency-key handling is disabled
+        self.idempotency = None
+        if idempotency_responses:
+            self.idempotency = IdempotencyCache(idempotency_responses, idempotency_ttl, idempotency_max_bytes)
+
+        #: The idempotency client identifier function or None
+        self.idempotency_client = idempotency_client
+
         # Pre-compute the section types and the error response type
         self._input_type = self._get_section_type('input')
         self._query_type = self._get_section_type('query')
@@ -196,6 +563,20 @@ class Action(Request):
         self._output_type = self._get_section_type('output')
         self._error_type = self._get_error_type()
 
+        # Output field selection is disabled if the query string has a "fields" member
+        query_types, query_type = self._query_type
+        query_members = get_struct_members(query_types, query_types[query_type]['struct'])
+        self._fields_query = not any(member['name'] == 'fields' for member in query_members)
+
+        # Compute the newline-delimited JSON input types - the input type without the records member and the records
+        # member's value type
+        self._ndjson_types = None
+        if ndjson_input is not None:
+            try:
+                self._ndjson_types = self._get_stream_types(*self._input_type, (ndjson_input,))
+            except ValidationError:
+                assert False, f'Invalid ndjson_input member "{ndjson_input}"'
+
     @property
     def model(self):
         """Get the action model"""
@@ -241,37 +622,166 @@ class Action(Request):
         return output_types, output_type_name
 
     def __call__(self, environ, unused_start_response):
+        return run_steps(self.call_steps(environ), environ[Context.ENVIRON_CTX].app.event_loop.run)
+
+    def call_steps(self, environ):
+        """
+        Handle the action request as a steps generator (see :func:`~chisel.eventloop.run_steps`). An async callback's
+        awaitable and the request content reads are yielded as awaitables, if possible. Blocking steps, such as a
+        synchronous callback, are yielded as :class:`~chisel.eventloop.BlockingCall` objects. The generator's result is
+        the WSGI response content iterable.
+
+        :param dict environ: The :pep:`WSGI <3333>` environ dictionary
+        :returns: The steps generator
+        """
+
         ctx = environ[Context.ENVIRON_CTX]
 
+        # Idempotent request?
+        if self.idempotency is not None and environ['REQUEST_METHOD'] != 'GET':
+            idempotency_key = environ.get('HTTP_IDEMPOTENCY_KEY')
+            if idempotency_key:
+                return (yield from self._call_idempotent(ctx, environ, idempotency_key))
+
+        return (yield from self._call_action(ctx, environ))
+
+    def _call_idempotent(self, ctx, environ, idempotency_key):
+        if len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            ctx.log.warning('Invalid Idempotency-Key for action "%s"', self.name)
+            return ctx.response_json(
+                HTTPStatus.BAD_REQUEST,
+                {'error': 'InvalidInput', 'message': f'Idempotency-Key exceeds {IDEMPOTENCY_KEY_MAX_LENGTH} characters'}
+            )
+
+        # Get the retained response or become the key's owner
+        if self.idempotency_client is not None:
+            client = self.idempotency_client(ctx)
+        else:
+            client = environ.get('REMOTE_USER') or environ.get('REMOTE_ADDR')
+        key = (self.name, client, idempotency_key)
+        entry = yield BlockingCall(self.idempotency.begin, key)
+        if entry is None:
+            # Handle the action with a context that captures its uncompressed response and an environ that computes the
+            # request's digest
+            start_response = StartResponse()
+            action_environ = {name: value for name, value in environ.items() if name != 'HTTP_ACCEPT_ENCODING'}
+            digest_reader = action_environ['wsgi.input'] = RequestDigestReader(environ)
+            action_ctx = action_environ[Context.ENVIRON_CTX] = Context(ctx.app, action_environ, start_response, ctx.url_args)
+            action_ctx.headers.update(ctx.headers)
+            action_ctx.deadline = ctx.deadline
+            response = None
+            digest = None
+            try:
+                content = yield from self._call_action(action_ctx, action_environ)
+                if hasattr(content, '__aiter__'):
+                    response = (start_response.status, start_response.headers, (yield _join_async(content)))
+                else:
+                    try:
+                        response = (start_response.status, start_response.headers, b''.join(content))
+                    finally:
+                        close = getattr(content, 'close', None)
+                        if close is not None:
+                            close()
+                try:
+                    digest = yield BlockingCall(digest_reader.digest)
+                except Exception:
+                    pass
+            finally:
+                # Retain the response, unless it's a server error
+                is_retained = response is not None and digest is not None and int(response[0][:3]) < 500
+                self.idempotency.complete(key, response if is_retained else None, digest)
+        else:
+            # The request must match the retained response's request
+            response, digest = entry
+            try:
+                request_digest = yield BlockingCall(RequestDigestReader(environ).digest)
+            except Exception:
+                return ctx.response_json(HTTPStatus.REQUEST_TIMEOUT, {'error': 'IOError', 'message': 'Error reading request content'})
+            if request_digest != digest:
+                ctx.log.warning('Idempotency-Key reused with different request content for action "%s"', self.name)
+                return ctx.response_json(
+                    HTTPStatus.UNPROCESSABLE_ENTITY,
+                    {'error': 'InvalidInput', 'message': 'Idempotency-Key reused with different request content'}
+                )
+
+        # Send the response - compress it per the request's "Accept-Encoding" header
+        status, headers, content = response
+        header_map = dict(headers)
+        content_type = header_map.pop('Content-Type', None)
+        if content_type is not None:
+            return ctx.response(status, content_type, [content], headers=list(header_map.items()))
+        ctx.start_response(status, headers)
+        return [content]
+
+    def _call_action(self, ctx, environ):
         # Handle the action
         is_get = (environ['REQUEST_METHOD'] == 'GET')
         app_validate_output = ctx.app.validate_output
         validate_output = True
+        multipart_files = None
+        budget_size = 0
+        spool_file = None
         try:
+            # Newline-delimited JSON or multipart request content?
+            content_type = environ.get('CONTENT_TYPE')
+            content_type_base = None if content_type is None else content_type.split(';', 1)[0].strip().lower()
+            is_ndjson = not is_get and self._ndjson_types is not None and content_type_base == NDJSON_CONTENT_TYPE
+            is_multipart = not is_get and self.multipart and content_type_base == MULTIPART_CONTENT_TYPE
+
+            # An async callback's records can't be read from an event loop request content stream (ASGI) without
+            # blocking the event loop - the request content is read before the callback is called
+            is_ndjson_stream = is_ndjson and not (
+                (inspect.iscoroutinefunction(self.action_callback) or inspect.isasyncgenfunction(self.action_callback)) and
+                getattr(environ.get('wsgi.input'), 'read_async', None) is not None
+            )
+
+            # Admit the request content to the application's content budget
+            content_budget = ctx.app.content_budget
+            if not is_get and content_budget is not None and not is_ndjson_stream and not is_multipart:
+                budget_size, spool_file = yield BlockingCall(self._admit_content, ctx, environ, content_budget)
+            input_stream = spool_file if spool_file is not None else environ.get('wsgi.input')
+
             # Read the request content
-            try:
-                content = None if is_get else environ['wsgi.input'].read()
-            except Exception:
-                raise _ActionErrorInternal(HTTPStatus.REQUEST_TIMEOUT, 'IOError', message='Error reading request content')
+            content_encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+            if not is_get and self.decompress_metrics is not None and content_encoding not in ('', 'identity'):
+                content = yield BlockingCall(self._read_compressed_content, ctx, input_stream, content_encoding)
+            elif is_ndjson_stream or is_multipart:
+                content = None
+            else:
+                try:
+                    content = None if is_get else (yield from self._read_steps(input_stream))
+                except Exception:
+                    raise _ActionErrorInternal(HTTPStatus.REQUEST_TIMEOUT, 'IOError', message='Error reading request content')
 
-            # De-serialize the JSON content
-            try:
-                if content:
-                    content_type = environ.get('CONTENT_TYPE')
+            # De-serialize the multipart, CBOR, or JSON content
+            if is_multipart:
+                multipart_stream = input_stream if content is None else BytesIO(content)
+                request, multipart_files = yield BlockingCall(self._read_multipart, ctx, multipart_stream, content_type)
+            elif is_ndjson or not content:
+                request = {}
+            elif content_type_base == CBOR_CONTENT_TYPE:
+                try:
+                    request = decode_cbor(content)
+                except Exception as exc:
+                    ctx.log.warning('Error decoding CBOR content for action "%s"', self.name)
+                    raise _ActionErrorInternal(HTTPStatus.BAD_REQUEST, 'InvalidInput', message=f'Invalid request CBOR: {exc}')
+            else:
+                try:
                     match_charset = None if content_type is None else RE_CONTENT_TYPE_HEADER.search(content_type)
                     content_charset = 'utf-8' if match_charset is None else match_charset.group('charset')
                     content_json = content.decode(content_charset)
                     request = json_loads(content_json)
-                else:
-                    request = {}
-            except Exception as exc:
-                ctx.log.warning('Error decoding JSON content for action "%s"', self.name)
-                raise _ActionErrorInternal(HTTPStatus.BAD_REQUEST, 'InvalidInput', message=f'Invalid request JSON: {exc}')
+                except Exception as exc:
+                    ctx.log.warning('Error decoding JSON content for action "%s"', self.name)
+                    raise _ActionErrorInternal(HTTPStatus.BAD_REQUEST, 'InvalidInput', message=f'Invalid request JSON: {exc}')
 
             # Validate the content
-            input_types, input_type = self._input_type
+            input_types, input_type = self._input_type if not is_ndjson else self._ndjson_types[:2]
             try:
-                request = validate_type(input_types, input_type, request)
+                if self.validate_inplace or self.numpy_arrays:
+                    request = validate_type_inplace(input_types, input_type, request, self.numpy_arrays)
+                else:
+                    request = validate_type(input_types, input_type, request)
             except ValidationError as exc:
                 ctx.log.warning('Invalid content for action "%s": %s', self.name, f'{exc}')
                 raise _ActionErrorInternal(
@@ -281,6 +791,11 @@ class Action(Request):
                     member=exc.member_fqn
                 )
 
+            # Newline-delimited JSON records iterator
+            if is_ndjson:
+                ndjson_stream = input_stream if content is None else BytesIO(content)
+                request[self.ndjson_input] = self._iter_ndjson_records(ctx, ndjson_stream)
+
             # Decode the query string
             query_string = environ.get('QUERY_STRING', '')
             try:
@@ -289,10 +804,27 @@ class Action(Request):
                 ctx.log.warning('Error decoding query string for action "%s": %.1000r', self.name, query_string)
                 raise _ActionErrorInternal(HTTPStatus.BAD_REQUEST, 'InvalidInput', message=f'{exc}')
 
+            # Output field selection?
+            fields = None
+            if self._fields_query and 'fields' in request_query:
+                fields_value = request_query.pop('fields')
+                try:
+                    if not isinstance(fields_value, str):
+                        raise ValueError('Invalid fields value')
+                    fields = parse_fields(fields_value)
+                    fields_types = get_fields_type(*self._output_type, fields)
+                except ValueError as exc:
+                    ctx.log.warning('Invalid fields for action "%s": %s', self.name, f'{exc}')
+                    raise _ActionErrorInternal(HTTPStatus.BAD_REQUEST, 'InvalidInput', message=f'{exc} (query string)', member='fields')
+                ctx.fields = fields
+
             # Validate the query string
             query_types, query_type = self._query_type
             try:
-                request_query = validate_type(query_types, query_type, request_query)
+                if self.numpy_arrays:
+                    request_query = validate_type_inplace(query_types, query_type, request_query, True)
+                else:
+                    request_query = validate_type(query_types, query_type, request_query)
             except ValidationError as exc:
                 ctx.log.warning('Invalid query string for action "%s": %s', self.name, f'{exc}')
                 raise _ActionErrorInternal(
@@ -323,14 +855,36 @@ class Action(Request):
                 request[request_key] = request_value
 
             # Call the action callback
+            stream_names = ()
             try:
                 status = HTTPStatus.OK
-                response = self.action_callback(ctx, request)
+                if ctx.deadline is not None:
+                    if ctx.deadline <= time.monotonic():
+                        raise DeadlineExceeded()
+                    response = yield self._call_deadline(ctx, request)
+                elif inspect.iscoroutinefunction(self.action_callback):
+                    response = yield self.action_callback(ctx, request)
+                else:
+                    response = yield BlockingCall(self.action_callback, ctx, request)
+                    if inspect.isawaitable(response):
+                        response = yield response
                 if self.wsgi_response:
                     return response
+                if self.events:
+                    return self._response_events(ctx, environ, response)
                 if response is None:
                     response = {}
+                if isinstance(response, dict):
+                    stream_names = [name for name, value in response.items() if is_stream(value)]
                 output_types, output_type = self._output_type
+                if fields is not None:
+                    response = project_fields(output_types, output_type, fields, response)
+                    output_types, output_type = fields_types
+            except _ActionErrorInternal:
+                raise
+            except DeadlineExceeded:
+                ctx.log.warning('Deadline exceeded for action "%s"', self.name)
+                raise _ActionErrorInternal(HTTPStatus.GATEWAY_TIMEOUT, 'Timeout')
             except ActionError as exc:
                 status = exc.status or HTTPStatus.BAD_REQUEST
                 response = {'error': exc.error}
@@ -346,14 +900,27 @@ class Action(Request):
                 raise _ActionErrorInternal(HTTPStatus.INTERNAL_SERVER_ERROR, 'UnexpectedError')
 
             # Validate the response
+            value_types = None
             if not self.wsgi_response and validate_output and app_validate_output:
                 try:
-                    validate_type(output_types, output_type, response)
+                    if stream_names:
+                        stream_types, stream_type, value_types = self._get_stream_types(output_types, output_type, stream_names)
+                        check_type(stream_types, stream_type, {name: value for name, value in response.items() if name not in stream_names})
+                    else:
+                        check_type(output_types, output_type, response)
                 except ValidationError as exc:
                     ctx.log.error('Invalid output returned from action "%s": %s', self.name, f'{exc}')
                     raise _ActionErrorInternal(HTTPStatus.INTERNAL_SERVER_ERROR, 'InvalidOutput', message=f'{exc}', member=exc.member_fqn)
 
+            # Columnar output requested?
+            if self.columnar and not stream_names:
+                ctx.add_vary_header('Prefer')
+                if status == HTTPStatus.OK and 'columnar' in _get_preferences(environ):
+                    response = encode_columnar(output_types, output_type, response)
+                    ctx.add_header('Preference-Applied', 'columnar')
+
         except _ActionErrorInternal as exc:
+            stream_names = ()
             status = exc.status
             response = {'error': exc.error}
             if exc.message is not None:
@@ -361,5 +928,436 @@ class Action(Request):
             if exc.member is not None:
                 response['member'] = exc.member
 
-        # Serialize the response as JSON
+        finally:
+            # Close the multipart files
+            if multipart_files is not None:
+                for multipart_file in multipart_files.values():
+                    multipart_file.close()
+
+            # Release the request content budget
+            if budget_size:
+                ctx.app.content_budget.release(budget_size)
+            if spool_file is not None:
+                spool_file.close()
+
+        # Stream the response?
+        if stream_names:
+            content = self._iter_json_stream(ctx, output_type, response, stream_names, value_types)
+            return ctx.response(status, 'application/json', content)
+
+        # Serialize the response as CBOR or JSON
+        if _accepts_cbor(environ):
+            ctx.add_vary_header('Accept')
+            return ctx.response_cbor(status, response)
+        if status == HTTPStatus.OK and \
+           (self.delta_versions is not None or self.response_samples is not None or self.zstd_dictionary is not None):
+            return self._response_json_content(ctx, environ, response)
         return ctx.response_json(status, response)
+
+    # Helper to call the action callback until the request's deadline - a synchronous callback is run on the
+    # application's executor
+    async def _call_deadline(self, ctx, request):
+        if inspect.iscoroutinefunction(self.action_callback):
+            awaitable = self.action_callback(ctx, request)
+        else:
+            awaitable = asyncio.get_running_loop().run_in_executor(ctx.app.executor, self.action_callback, ctx, request)
+        response = await wait_deadline(awaitable, ctx.deadline)
+        if inspect.isawaitable(response):
+            response = await wait_deadline(response, ctx.deadline)
+        return response
+
+    # Helper to get the type model for an output's non-streamed members and the type model for its streamed members'
+    # array values (named "<output_type>_<member_name>_value")
+    @staticmethod
+    def _get_stream_types(output_types, output_type, stream_names):
+        output_struct = output_types[output_type]['struct']
+        members = get_struct_members(output_types, output_struct)
+        stream_type = f'{output_type}_stream'
+        stream_types = {
+            **output_types,
+            stream_type: {'struct': {
+                'name': stream_type,
+                'members': [member for member in members if member['name'] not in stream_names]
+            }}
+        }
+
+        # Create the streamed members' array value typedefs
+        value_types = dict(output_types)
+        member_types = {member['name']: member['type'] for member in members}
+        for stream_name in stream_names:
+            member_type = member_types.get(stream_name)
+            while member_type is not None and 'user' in member_type and 'typedef' in output_types[member_type['user']]:
+                member_type = output_types[member_type['user']]['typedef']['type']
+            if member_type is None or 'array' not in member_type:
+                raise ValidationError(f'Invalid streamed value for member "{stream_name}", expected an array', stream_name)
+            array_type = member_type['array']
+            value_typedef = {'name': f'{output_type}_{stream_name}_value', 'type': array_type['type']}
+            if 'attr' in array_type:
+                value_typedef['attr'] = array_type['attr']
+            value_types[value_typedef['name']] = {'typedef': value_typedef}
+
+        return stream_types, stream_type, value_types
+
+    def _iter_json_stream(self, ctx, output_type, response, stream_names, value_types):
+        encoder = ctx.create_json_encoder()
+        if encoder.indent is None:
+            newline, newline_member, newline_value, key_separator = '', '', '', ':'
+        else:
+            indent = ' ' * encoder.indent
+            newline, newline_member, newline_value, key_separator = '\n', f'\n{indent}', f'\n{indent}{indent}', ': '
+
+        # Encode a value at member or array value indentation
+        def encode_value(value, value_newline):
+            value_json = encoder.encode(value)
+            return value_json.replace('\n', value_newline) if value_newline else value_json
+
+        parts = ['{']
+        parts_size = 1
+        try:
+            for ix_member, member_name in enumerate(sorted(response)):
+                member_json = f'{"," if ix_member else ""}{newline_member}{encoder.encode(member_name)}{key_separator}'
+                parts.append(member_json)
+                parts_size += len(member_json)
+                member_value = response[member_name]
+
+                # Non-streamed member?
+                if member_name not in stream_names:
+                    member_json = encode_value(member_value, newline_member)
+                    parts.append(member_json)
+                    parts_size += len(member_json)
+                    continue
+
+                # Stream the member's array values
+                parts.append('[')
+                ix_value = -1
+                error = None
+                try:
+                    for ix_value, value in enumerate(member_value):
+                        if value_types is not None:
+                            check_type(value_types, f'{output_type}_{member_name}_value', value, f'{member_name}.{ix_value}')
+                        value_json = f'{"," if ix_value else ""}{newline_value}{encode_value(value, newline_value)}'
+                        parts.append(value_json)
+                        parts_size += len(value_json)
+                        if parts_size >= STREAM_CHUNK_SIZE:
+                            yield ''.join(parts).encode('utf-8')
+                            parts = []
+                            parts_size = 0
+                except Exception as exc:
+                    error = self._get_stream_error(ctx, exc)
+                parts.append(f'{newline_member}]' if ix_value >= 0 else ']')
+
+                # Error trailer
+                if error is not None:
+                    for error_key, error_value in error.items():
+                        parts.append(f',{newline_member}{encoder.encode(error_key)}{key_separator}{encoder.encode(error_value)}')
+                    break
+
+            parts.append(f'{newline}}}')
+            yield ''.join(parts).encode('utf-8')
+
+        finally:
+            # Close the streamed members' iterables (e.g. on client disconnect)
+            for stream_name in stream_names:
+                close = getattr(response[stream_name], 'close', None)
+                if close is not None:
+                    close()
+
+    # Helper to get the error response object for an error raised while streaming
+    def _get_stream_error(self, ctx, exc):
+        if isinstance(exc, _ActionErrorInternal):
+            error = {'error': exc.error}
+            if exc.message is not None:
+                error['message'] = exc.message
+            if exc.member is not None:
+                error['member'] = exc.member
+        elif isinstance(exc, ValidationError):
+            ctx.log.error('Invalid output returned from action "%s": %s', self.name, f'{exc}')
+            error = {'error': 'InvalidOutput', 'message': f'{exc}'}
+            if exc.member_fqn is not None:
+                error['member'] = exc.member_fqn
+        elif isinstance(exc, ActionError):
+            error = {'error': exc.error}
+            if exc.message is not None:
+                error['message'] = exc.message
+        else:
+            ctx.log.exception('Unexpected error in action "%s"', self.name, exc_info=exc)
+            error = {'error': 'UnexpectedError'}
+        return error
+
+    def _response_events(self, ctx, environ, events):
+        accept = environ.get('HTTP_ACCEPT', '')
+        is_ndjson = NDJSON_CONTENT_TYPE in accept and EVENT_STREAM_CONTENT_TYPE not in accept
+        ctx.add_vary_header('Accept')
+        ctx.add_header('Cache-Control', 'no-cache')
+        content_type = NDJSON_CONTENT_TYPE if is_ndjson else EVENT_STREAM_CONTENT_TYPE
+
+        # Asynchronous events iterable? Under ASGI, iterate it on the request's event loop.
+        if hasattr(events, '__aiter__'):
+            if 'asgi.scope' in environ:
+                return ctx.response(HTTPStatus.OK, content_type, self._aiter_events(ctx, events, is_ndjson))
+            events = ctx.app.event_loop.iterate(events)
+
+        return ctx.response(HTTPStatus.OK, content_type, self._iter_events(ctx, events, is_ndjson))
+
+    def _iter_events(self, ctx, events, is_ndjson):
+        encode_event = self._create_event_encoder(ctx, is_ndjson)
+        iterator = None
+        try:
+            iterator = iter(events) if self.events_heartbeat is None else iter_heartbeat(events, self.events_heartbeat)
+            for event in iterator:
+                yield encode_event(event)
+        except Exception as exc:
+            yield self._encode_error_event(ctx, exc, is_ndjson)
+        finally:
+            # Close the events iterable (e.g. on client disconnect)
+            close = getattr(iterator if iterator is not None else events, 'close', None)
+            if close is not None:
+                close()
+
+    async def _aiter_events(self, ctx, events, is_ndjson):
+        encode_event = self._create_event_encoder(ctx, is_ndjson)
+        iterator = None
+        try:
+            iterator = aiter(events) if self.events_heartbeat is None else aiter_heartbeat(events, self.events_heartbeat)
+            async for event in iterator:
+                yield encode_event(event)
+        except Exception as exc:
+            yield self._encode_error_event(ctx, exc, is_ndjson)
+        finally:
+            # Close the events iterable (e.g. on client disconnect)
+            aclose = getattr(iterator if iterator is not None else events, 'aclose', None)
+            if aclose is not None:
+                await aclose()
+
+    # Helper to create an event encoder function - validates and encodes an event (or a heartbeat) as a content chunk
+    def _create_event_encoder(self, ctx, is_ndjson):
+        encoder = ctx.create_json_encoder(pretty=False)
+        output_types, output_type = self._output_type
+        validate = ctx.app.validate_output
+        heartbeat = b'\n' if is_ndjson else b': heartbeat\n\n'
+
+        def encode_event(event):
+            if event is HEARTBEAT:
+                return heartbeat
+            if validate:
+                check_type(output_types, output_type, event)
+            if is_ndjson:
+                return f'{encoder.encode(event)}\n'.encode('utf-8')
+            return f'data: {encoder.encode(event)}\n\n'.encode('utf-8')
+
+        return encode_event
+
+    # Helper to encode an events iteration error as an error event content chunk
+    def _encode_error_event(self, ctx, exc, is_ndjson):
+        error_json = ctx.create_json_encoder(pretty=False).encode(self._get_stream_error(ctx, exc))
+        return f'{error_json}\n'.encode('utf-8') if is_ndjson else f'event: error\ndata: {error_json}\n\n'.encode('utf-8')
+
+    def _read_multipart(self, ctx, stream, content_type):
+        boundary = get_multipart_boundary(content_type)
+        if boundary is None:
+            raise _ActionErrorInternal(HTTPStatus.BAD_REQUEST, 'InvalidInput', message='Missing multipart boundary')
+        try:
+            fields, files = parse_multipart(stream, boundary, self.multipart_max_bytes, self.multipart_spool_bytes)
+        except MultipartLimitError as exc:
+            ctx.log.warning('Multipart content too large for action "%s": %s', self.name, f'{exc}')
+            raise _ActionErrorInternal(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, 'InvalidInput', message=f'{exc}')
+        except ValueError as exc:
+            ctx.log.warning('Error parsing multipart content for action "%s": %s', self.name, f'{exc}')
+            raise _ActionErrorInternal(HTTPStatus.BAD_REQUEST, 'InvalidInput', message=f'{exc}')
+        except Exception:
+            raise _ActionErrorInternal(HTTPStatus.REQUEST_TIMEOUT, 'IOError', message='Error reading request content')
+
+        # Decode the form fields as query string parameters and add the files
+        try:
+            request = decode_query_string('&'.join(f'{quote(name, safe=".")}={quote(value)}' for name, value in fields))
+            for name, file in files.items():
+                if name in request:
+                    raise ValueError(f'Duplicate key {name!r:.100s}')
+                request[name] = file
+        except ValueError as exc:
+            for file in files.values():
+                file.close()
+            ctx.log.warning('Invalid multipart fields for action "%s": %s', self.name, f'{exc}')
+            raise _ActionErrorInternal(HTTPStatus.BAD_REQUEST, 'InvalidInput', message=f'{exc} (content)')
+
+        return request, files
+
+    def _iter_ndjson_records(self, ctx, stream):
+        _, _, record_types = self._ndjson_types
+        record_type = f'{self._input_type[1]}_{self.ndjson_input}_value'
+        line_number = 0
+        while True:
+            # Read the next line
+            try:
+                line = stream.readline(self.ndjson_max_line_bytes + 1)
+            except Exception:
+                raise _ActionErrorInternal(HTTPStatus.REQUEST_TIMEOUT, 'IOError', message='Error reading request content')
+            if not line:
+                break
+            line_number += 1
+            if len(line) > self.ndjson_max_line_bytes and not line.endswith(b'\n'):
+                ctx.log.warning('Request content line too large for action "%s"', self.name)
+                raise _ActionErrorInternal(
+                    HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                    'InvalidInput',
+                    message=f'Request content line exceeds {self.ndjson_max_line_bytes} bytes (line {line_number})'
+                )
+            if not line.strip():
+                continue
+
+            # Decode and validate the record
+            try:
+                record = json_loads(line)
+            except Exception as exc:
+                ctx.log.warning('Error decoding JSON content for action "%s" (line %d)', self.name, line_number)
+                raise _ActionErrorInternal(
+                    HTTPStatus.BAD_REQUEST,
+                    'InvalidInput',
+                    message=f'Invalid request JSON: {exc} (line {line_number})'
+                )
+            try:
+                record = validate_type_inplace(record_types, record_type, record, self.numpy_arrays)
+            except ValidationError as exc:
+                ctx.log.warning('Invalid content for action "%s" (line %d): %s', self.name, line_number, f'{exc}')
+                raise _ActionErrorInternal(
+                    HTTPStatus.BAD_REQUEST,
+                    'InvalidInput',
+                    message=f'{exc} (line {line_number})',
+                    member=exc.member_fqn
+                )
+            yield record
+
+    def _admit_content(self, ctx, environ, content_budget):
+        try:
+            content_length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+        if content_length <= 0:
+            return 0, None
+
+        # Admit the content, waiting for the budget, if necessary
+        timeout = self.content_budget_wait if self.content_budget_policy == CONTENT_BUDGET_WAIT else None
+        if content_budget.acquire(content_length, timeout):
+            return content_length, None
+
+        # Spool the content to a temporary file while it is received - the spooled content is read into memory, so
+        # wait for the budget to charge it
+        if self.content_budget_policy == CONTENT_BUDGET_SPOOL and content_length <= content_budget.max_bytes:
+            content_budget.add_spooled()
+            spool_file = TemporaryFile() # pylint: disable=consider-using-with
+            try:
+                stream = environ['wsgi.input']
+                remaining = content_length
+                while remaining:
+                    chunk = stream.read(min(remaining, CONTENT_SPOOL_CHUNK_SIZE))
+                    if not chunk:
+                        break
+                    spool_file.write(chunk)
+                    remaining -= len(chunk)
+                spool_file.seek(0)
+            except Exception:
+                spool_file.close()
+                raise _ActionErrorInternal(HTTPStatus.REQUEST_TIMEOUT, 'IOError', message='Error reading request content')
+            spool_size = content_length - remaining
+            if content_budget.acquire(spool_size, self.content_budget_wait):
+                return spool_size, spool_file
+            spool_file.close()
+
+        # Reject the content
+        content_budget.add_rejected()
+        if content_length > content_budget.max_bytes:
+            ctx.log.warning('Request content exceeds the content budget for action "%s"', self.name)
+            raise _ActionErrorInternal(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                'InvalidInput',
+                message=f'Request content exceeds {content_budget.max_bytes} bytes'
+            )
+        ctx.log.warning('Request content budget exhausted for action "%s"', self.name)
+        ctx.add_header('Retry-After', str(content_budget.retry_after))
+        raise _ActionErrorInternal(HTTPStatus.SERVICE_UNAVAILABLE, 'ServiceUnavailable', message='Request content budget exhausted')
+
+    # Helper steps generator to read request content - the content is received on the event loop, if possible
+    @staticmethod
+    def _read_steps(stream, size=-1):
+        read_async = getattr(stream, 'read_async', None)
+        if read_async is not None:
+            return (yield read_async(size))
+        return (yield BlockingCall(stream.read, size))
+
+    def _read_compressed_content(self, ctx, stream, content_encoding):
+        if content_encoding not in get_content_encodings():
+            ctx.log.warning('Unsupported content encoding for action "%s": %.100r', self.name, content_encoding)
+            raise _ActionErrorInternal(
+                HTTPStatus.UNSUPPORTED_MEDIA_TYPE,
+                'InvalidInput',
+                message=f'Unsupported Content-Encoding {content_encoding!r:.100s}'
+            )
+        try:
+            content, compressed_size = decompress_stream(stream, content_encoding, self.decompress_max_bytes)
+        except DecompressionLimitError as exc:
+            ctx.log.warning('Decompressed content too large for action "%s"', self.name)
+            raise _ActionErrorInternal(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, 'InvalidInput', message=f'{exc}')
+        except ValueError as exc:
+            ctx.log.warning('Error decompressing content for action "%s": %s', self.name, f'{exc}')
+            raise _ActionErrorInternal(HTTPStatus.BAD_REQUEST, 'InvalidInput', message=f'{exc}')
+        except Exception:
+            raise _ActionErrorInternal(HTTPStatus.REQUEST_TIMEOUT, 'IOError', message='Error reading request content')
+        self.decompress_metrics.add(compressed_size, len(content))
+        return content
+
+    def _response_json_content(self, ctx, environ, response):
+        content = ctx.encode_json(response)
+
+        # Sample the response content
+        if self.response_samples is not None:
+            self.response_samples.add(content)
+
+        # Delta response?
+        if self.delta_versions is not None:
+            delta_response = self._response_delta(ctx, environ, content)
+            if delta_response is not None:
+                return delta_response
+
+        # Compress with the zstd dictionary, if the client has it
+        if self.zstd_dictionary is not None:
+            dict_id = self.zstd_dictionary.dict_id
+            ctx.add_header(ZSTD_DICTIONARY_HEADER, dict_id)
+            ctx.add_vary_header('Accept-Encoding')
+            ctx.add_vary_header(ZSTD_DICTIONARY_HEADER)
+            if environ.get('HTTP_' + ZSTD_DICTIONARY_HEADER.upper().replace('-', '_')) == dict_id and \
+               ResponseCompression.negotiate(environ.get('HTTP_ACCEPT_ENCODING')) == 'zstd':
+                zstd_level = ctx.app.compression.zstd_level if ctx.app.compression is not None else 3
+                content_zstd = self.zstd_dictionary.compress(content, zstd_level)
+                return ctx.response(HTTPStatus.OK, 'application/json', [content_zstd], headers=[('Content-Encoding', 'zstd')])
+
+        return ctx.response(HTTPStatus.OK, 'application/json', [content])
+
+    def _response_delta(self, ctx, environ, content):
+        # The ETag is the content hash
+        etag = f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+        ctx.add_header('ETag', etag)
+        ctx.add_vary_header('Accept')
+        ctx.add_vary_header('If-None-Match')
+        self.delta_versions.add(etag, content)
+
+        # Client has the current version?
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        client_etags = []
+        if if_none_match:
+            client_etags = [client_etag.strip().removeprefix('W/') for client_etag in if_none_match.split(',')]
+        if etag in client_etags:
+            ctx.start_response(HTTPStatus.NOT_MODIFIED, [])
+            return []
+
+        # Client has a retained version and accepts a patch?
+        if client_etags and JSON_PATCH_CONTENT_TYPE in environ.get('HTTP_ACCEPT', ''):
+            for client_etag in client_etags:
+                client_content = self.delta_versions.get(client_etag)
+                if client_content is not None:
+                    patch = json_patch(json_loads(client_content), json_loads(content))
+                    patch_content = ctx.encode_json(patch)
+                    if len(patch_content) < len(content):
+                        return ctx.response(HTTPStatus.OK, JSON_PATCH_CONTENT_TYPE, [patch_content])
+                    break
+
+        return None
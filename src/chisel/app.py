@@ -5,20 +5,36 @@
 Chisel WSGI application base class and utilities
 """
 
+import asyncio
 from datetime import datetime, timedelta, timezone
 from email.utils import format_datetime
+from functools import partial
 from http import HTTPStatus
 from io import BytesIO
 import logging
 import re
+import time
 from urllib.parse import quote, unquote
 
 from schema_markdown import encode_query_string, JSONEncoder
 
+from .asgi import ASGIInput, asgi_lifespan, create_asgi_environ, send_asgi_response
+from .cbor import CBOR_CONTENT_TYPE, encode_cbor
+from .compression import get_encoded_etag
+from .deadline import DEADLINE_ENVIRON, DEADLINE_HEADER, DeadlineExceeded, get_deadline
+from .eventloop import EventLoopThread, run_steps_async
+from .stream import StreamArray
+from .validate import BUFFER_TYPES
+
 
 # Regular expression for matching a URL argument path segment (e.g. "{id}")
 RE_URL_ARG = re.compile(r'\{([A-Za-z][A-Za-z0-9_]*)\}')
 
+# The canned load shedding response
+_STATUS_SERVICE_UNAVAILABLE = f'{HTTPStatus.SERVICE_UNAVAILABLE.value} {HTTPStatus.SERVICE_UNAVAILABLE.phrase}'
+_HEADER_TEXT_PLAIN = ('Content-Type', 'text/plain; charset=utf-8')
+_CONTENT_SERVICE_UNAVAILABLE = HTTPStatus.SERVICE_UNAVAILABLE.phrase.encode('utf-8')
+
 
 class Application:
     """
@@ -33,6 +49,14 @@ class Application:
         'log_format',
         'pretty_output',
         'validate_output',
+        'compression',
+        'content_budget',
+        'gc_manager',
+        'request_bulkheads',
+        'doc_group_bulkheads',
+        'load_shedder',
+        'event_loop',
+        'executor',
         'requests',
         '__request_urls',
         '__request_paths',
@@ -58,6 +82,40 @@ class Application:
         #: Default is True.
         self.validate_output = True
 
+        #: Set to a :class:`~chisel.compression.ResponseCompression` object to compress responses using the client's
+        #: "Accept-Encoding" request header. Default is None (no response compression).
+        self.compression = None
+
+        #: Set to a :class:`~chisel.budget.ContentBudget` object to limit the total size of the request content that
+        #: :class:`~chisel.Action` requests buffer in memory. Default is None (no content budget).
+        self.content_budget = None
+
+        #: Set to a :class:`~chisel.gcmanager.GCManager` object to freeze the application's long-lived objects and run
+        #: garbage collections between requests. Default is None (Python's default garbage collection).
+        self.gc_manager = None
+
+        #: The map of request name to :class:`~chisel.bulkhead.Bulkhead` concurrency limit. A request's application
+        #: bulkhead takes the place of the request's own :attr:`~chisel.Request.bulkhead`.
+        self.request_bulkheads = {}
+
+        #: The map of documentation group to the :class:`~chisel.bulkhead.Bulkhead` concurrency limit shared by the
+        #: group's requests. A request must be admitted by both its request bulkhead and its group bulkhead.
+        self.doc_group_bulkheads = {}
+
+        #: Set to a :class:`~chisel.shedding.LoadShedder` object to reject requests quickly, based on their queueing
+        #: delay, when the application is overloaded. Under WSGI, the load shedder must trust an upstream proxy's
+        #: request start header - WSGI servers provide no arrival time. Default is None (no load shedding).
+        self.load_shedder = None
+
+        #: The application's shared :class:`~chisel.eventloop.EventLoopThread`. Async :class:`~chisel.Action` callbacks
+        #: are run on its event loop. The event loop thread is started on first use.
+        self.event_loop = EventLoopThread()
+
+        #: The :class:`~concurrent.futures.Executor` on which :meth:`~chisel.Application.asgi` runs blocking request
+        #: handling (e.g. synchronous action callbacks). Default is None (the event loop's default, bounded thread pool
+        #: executor).
+        self.executor = None
+
         #: The chisel application's map of request name to :class:`~chisel.Request` object map.
         self.requests = {}
 
@@ -179,13 +237,141 @@ class Application:
         The chisel application WSGI callback. When the application receives an HTTP request, this method matches the
         appropriate :class:`~chisel.Request` object and then calls its :func:`~chisel.Request.__call__` method. The
         application and URL path arguments (e.g. ``'/documents/{id}'``) are made available to the request through the
-        request's :class:`~chisel.Context` object.
+        request's :class:`~chisel.Context` object. If the application's :attr:`~chisel.Application.load_shedder`
+        rejects the request, or if the request has :class:`~chisel.bulkhead.Bulkhead` concurrency limits that don't
+        admit it, the response is "503 Service Unavailable" and the request is not called.
 
         :param dict environ: The :pep:`WSGI <3333>` environ dictionary
         :param ~collections.abc.Callable start_response: The :pep:`WSGI <3333>` start-response callable
         :returns: The WSGI content iterable
         """
 
+        gc_manager = self.gc_manager
+        if gc_manager is None:
+            return self._call(environ, start_response)
+
+        # Collect after the response is sent - when the server closes the response content
+        gc_manager.request_started()
+        try:
+            response = self._call(environ, start_response)
+        except BaseException:
+            gc_manager.request_finished()
+            raise
+        return _closing_response(environ, response, (gc_manager.request_finished,))
+
+    # The WSGI callback implementation
+    def _call(self, environ, start_response):
+        ctx, request, is_head, response = self._start_request(environ, start_response)
+        if request is not None:
+            response = self._shed_request(ctx, request)
+            bulkheads = ()
+            if response is None:
+                bulkheads, response = self._acquire_bulkheads(ctx, request)
+            if response is None:
+                # Handle the request
+                try:
+                    response = request(ctx.environ, ctx.start_response)
+                except Exception:
+                    response = self._request_exception(ctx, request)
+                except BaseException:
+                    self._release_bulkheads(bulkheads)
+                    raise
+
+                # Release the bulkheads when the response is sent
+                if bulkheads:
+                    if isinstance(response, (list, tuple)):
+                        self._release_bulkheads(bulkheads)
+                    else:
+                        response = _closing_response(ctx.environ, response, (partial(self._release_bulkheads, bulkheads),))
+
+        if is_head:
+            self._close_response(response)
+            return []
+        return response
+
+    async def asgi(self, scope, receive, send):
+        """
+        The chisel application `ASGI <https://asgi.readthedocs.io/en/latest/specs/main.html>`__ callable. Requests are
+        matched and handled as with the WSGI callback, :meth:`~chisel.Application.__call__`, using a WSGI environ
+        created from the ASGI connection scope (see :func:`~chisel.asgi.create_asgi_environ`). :class:`~chisel.Action`
+        requests run natively on the server's event loop - the request content is received, and the request is
+        validated, on the event loop, and async callbacks are awaited natively. Only an action's blocking steps, such
+        as a synchronous callback (see :class:`~chisel.eventloop.BlockingCall`), are run on the application's
+        :attr:`~chisel.Application.executor`. All other requests are run on the executor. Response content lists are
+        sent as a single body message, asynchronous response content iterables (e.g. an event stream action's async
+        events) are iterated on the event loop, and other response content iterables are iterated on the executor.
+
+        :param dict scope: The ASGI connection scope
+        :param ~collections.abc.Callable receive: The ASGI receive awaitable callable
+        :param ~collections.abc.Callable send: The ASGI send awaitable callable
+        :raises ValueError: If the scope type is not "http" or "lifespan"
+        """
+
+        scope_type = scope['type']
+        if scope_type == 'lifespan':
+            await asgi_lifespan(receive, send)
+            return
+        if scope_type != 'http':
+            raise ValueError(f'Unsupported ASGI scope type {scope_type!r:.100s}')
+
+        gc_manager = self.gc_manager
+        if gc_manager is None:
+            await self._asgi_http(scope, receive, send)
+            return
+
+        # Collect after the response is sent - scheduled on the executor, so the request completes first (the
+        # collection holds the GIL, so it still pauses the event loop)
+        gc_manager.request_started()
+        try:
+            await self._asgi_http(scope, receive, send)
+        finally:
+            if gc_manager.request_finished(collect=False):
+                asyncio.get_running_loop().run_in_executor(self.executor, gc_manager.collect_due)
+
+    # The ASGI "http" scope implementation
+    async def _asgi_http(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        environ = create_asgi_environ(scope, ASGIInput(receive, loop))
+        start_response = StartResponse()
+        ctx, request, is_head, response = self._start_request(environ, start_response)
+        bulkheads = ()
+        try:
+            if request is not None:
+                response = self._shed_request(ctx, request)
+                if response is None:
+                    bulkheads, response = await self._acquire_bulkheads_async(ctx, request)
+                if response is None:
+                    # Handle the request - the load shedder counts the executor's queue in the queueing delay
+                    run_in_executor = self.load_shedder.run_in_executor if self.load_shedder is not None else loop.run_in_executor
+                    try:
+                        call_steps = getattr(request, 'call_steps', None)
+                        if call_steps is not None:
+                            response = await run_steps_async(call_steps(ctx.environ), self.executor, run_in_executor)
+                        else:
+                            response = await run_in_executor(self.executor, request, ctx.environ, ctx.start_response)
+                    except Exception:
+                        response = self._request_exception(ctx, request)
+
+                    # Content lists are complete - other response content holds the bulkheads until it's sent
+                    if isinstance(response, (list, tuple)):
+                        self._release_bulkheads(bulkheads)
+                        bulkheads = ()
+
+            if is_head:
+                if hasattr(response, 'aclose'):
+                    await response.aclose()
+                else:
+                    await loop.run_in_executor(self.executor, self._close_response, response)
+                response = []
+            zerocopysend = 'http.response.zerocopysend' in (scope.get('extensions') or {})
+            await send_asgi_response(send, start_response, response, self.executor, zerocopysend)
+        finally:
+            self._release_bulkheads(bulkheads)
+
+    # Helper to match a request and create its context. If there is no matching request, the request is None and the
+    # not found response is returned.
+    def _start_request(self, environ, start_response):
+
         # HEAD request?
         request_method = environ['REQUEST_METHOD'].upper()
         is_head = (request_method == 'HEAD')
@@ -198,9 +384,11 @@ class Application:
 
         # Create the request context
         ctx = environ[Context.ENVIRON_CTX] = Context(self, environ, start_response, url_args)
+        ctx.deadline = get_deadline(environ, request.timeout if request is not None else None)
 
         # Request not found? The request path exists if it matches an exact URL under any method or a URL regular
         # expression under another method - match_request already tried this method's and any-method's regexes.
+        response = None
         if request is None:
             if path_info in self.__request_paths or \
                any(regex.fullmatch(path_info)
@@ -208,32 +396,84 @@ class Application:
                 response = ctx.response_text(HTTPStatus.METHOD_NOT_ALLOWED)
             else:
                 response = ctx.response_text(HTTPStatus.NOT_FOUND)
-        else:
-            # Handle the request
+
+        return ctx, request, is_head, response
+
+    # Helper to reject a request if the application is overloaded - returns the canned error response, if rejected
+    def _shed_request(self, ctx, request):
+        load_shedder = self.load_shedder
+        if load_shedder is None or load_shedder.admit_request(ctx.environ, request):
+            return None
+        ctx.start_response(_STATUS_SERVICE_UNAVAILABLE, [_HEADER_TEXT_PLAIN, ('Retry-After', str(load_shedder.retry_after))])
+        return [_CONTENT_SERVICE_UNAVAILABLE]
+
+    # Helper to get a request's bulkheads - the request bulkhead first, then the documentation group bulkhead
+    def _request_bulkheads(self, request):
+        request_bulkhead = self.request_bulkheads.get(request.name, request.bulkhead) if self.request_bulkheads else request.bulkhead
+        group_bulkhead = self.doc_group_bulkheads.get(request.doc_group) if self.doc_group_bulkheads else None
+        if group_bulkhead is None:
+            return () if request_bulkhead is None else (request_bulkhead,)
+        return (group_bulkhead,) if request_bulkhead is None else (request_bulkhead, group_bulkhead)
+
+    # Helper to admit a request to its bulkheads - returns the admitted bulkheads and, if rejected, the error response
+    def _acquire_bulkheads(self, ctx, request):
+        bulkheads = self._request_bulkheads(request)
+        for ix_bulkhead, bulkhead in enumerate(bulkheads):
+            if not bulkhead.acquire(request.name):
+                return (), self._reject_bulkhead(ctx, bulkheads[:ix_bulkhead], bulkhead)
+        return bulkheads, None
+
+    # Helper to admit a request to its bulkheads without blocking the event loop
+    async def _acquire_bulkheads_async(self, ctx, request):
+        bulkheads = self._request_bulkheads(request)
+        for ix_bulkhead, bulkhead in enumerate(bulkheads):
             try:
-                response = request(ctx.environ, ctx.start_response)
-            except Exception:
-                # A logging failure (e.g. invalid log_format) must not suppress the error response
-                try:
-                    ctx.log.exception('exception raised by request "%s"', request.name)
-                except Exception:
-                    pass
-                response = ctx.response_text(HTTPStatus.INTERNAL_SERVER_ERROR)
+                admitted = await bulkhead.acquire_async(request.name)
+            except BaseException:
+                for acquired_bulkhead in bulkheads[:ix_bulkhead]:
+                    acquired_bulkhead.release()
+                raise
+            if not admitted:
+                return (), self._reject_bulkhead(ctx, bulkheads[:ix_bulkhead], bulkhead)
+        return bulkheads, None
+
+    # Helper to release a request's bulkheads
+    @staticmethod
+    def _release_bulkheads(bulkheads):
+        for bulkhead in bulkheads:
+            bulkhead.release()
 
-        if is_head:
-            # PEP 3333 - the discarded response content must be closed. A close failure must not
-            # suppress the HEAD response.
-            if hasattr(response, 'close'):
-                try:
-                    response.close()
-                except Exception:
-                    pass
-            return []
-        return response
+    # Helper to release a rejected request's admitted bulkheads and return the error response
+    @staticmethod
+    def _reject_bulkhead(ctx, acquired_bulkheads, bulkhead):
+        for acquired_bulkhead in acquired_bulkheads:
+            acquired_bulkhead.release()
+        return ctx.response_text(HTTPStatus.SERVICE_UNAVAILABLE, headers=[('Retry-After', str(bulkhead.retry_after))])
+
+    # Helper to log a request's exception and return the error response
+    @staticmethod
+    def _request_exception(ctx, request):
+        # A logging failure (e.g. invalid log_format) must not suppress the error response
+        try:
+            ctx.log.exception('exception raised by request "%s"', request.name)
+        except Exception:
+            pass
+        return ctx.response_text(HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    # Helper to close response content (e.g. a HEAD request's discarded response content)
+    @staticmethod
+    def _close_response(response):
+        # PEP 3333 - the response content must be closed. A close failure must not suppress the
+        # response.
+        if hasattr(response, 'close'):
+            try:
+                response.close()
+            except Exception:
+                pass
 
     def request(self, request_method, path_info, query_string='', wsgi_input=b'', environ=None):
         """
-        Execute an application request
+        Execute an application request. As with a WSGI server, the response content is closed after it is read.
 
         :param str request_method: The HTTP request method string (e.g. ``'GET'``)
         :param str path_info: The request URL path (e.g. ``'/doc/'``)
@@ -246,7 +486,57 @@ class Application:
         request_environ = Context.create_environ(request_method, path_info, query_string, wsgi_input, environ=environ)
         start_response = StartResponse()
         response = self(request_environ, start_response)
-        return start_response.status, start_response.headers, b''.join(response)
+        try:
+            return start_response.status, start_response.headers, b''.join(response)
+        finally:
+            self._close_response(response)
+
+
+# A response content iterable that calls functions when the response content is closed (i.e., after the WSGI server
+# sends the response)
+# Helper to call callbacks when the server closes the response content. A "wsgi.file_wrapper" response keeps its type
+# (so the server can send it with its platform-specific file handling, e.g. sendfile) - its file is wrapped instead.
+def _closing_response(environ, response, callbacks):
+    file_wrapper = environ.get('wsgi.file_wrapper')
+    filelike = getattr(response, 'filelike', None)
+    if filelike is None or not isinstance(file_wrapper, type) or not isinstance(response, file_wrapper):
+        return _ClosingResponse(response, callbacks)
+
+    closing_file = _ClosingFile(filelike, callbacks)
+    response.filelike = closing_file
+
+    # File wrappers like wsgiref's bind the file's close method when created
+    if 'close' in getattr(response, '__dict__', ()) or not hasattr(response, 'close'):
+        response.close = closing_file.close
+    return response
+
+
+class _ClosingResponse:
+    __slots__ = ('response', 'callbacks')
+
+    def __init__(self, response, callbacks):
+        self.response = response
+        self.callbacks = callbacks
+
+    def __iter__(self):
+        return iter(self.response)
+
+    def close(self):
+        callbacks = self.callbacks
+        self.callbacks = ()
+        try:
+            if hasattr(self.response, 'close'):
+                self.response.close()
+        finally:
+            for callback in callbacks:
+                callback()
+
+
+class _ClosingFile(_ClosingResponse):
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
 
 
 class Context:
@@ -260,7 +550,7 @@ class Context:
     :param dict url_args: The parsed URL arguments dictionary
     """
 
-    __slots__ = ('app', 'environ', '_start_response', 'url_args', '_log', 'headers')
+    __slots__ = ('app', 'environ', '_start_response', 'url_args', '_log', 'headers', 'fields', 'deadline')
 
     #: The context WSGI environ key
     ENVIRON_CTX = 'chisel.ctx'
@@ -281,6 +571,15 @@ class Context:
         #: The request's header map. These headers are added to the response.
         self.headers = {}
 
+        #: The action's output field selection dictionary, if any (see :func:`~chisel.fields.parse_fields`). Action
+        #: callbacks may use this to skip computing unselected output members.
+        self.fields = None
+
+        #: The request's :func:`~time.monotonic` deadline or None. The deadline is the earliest of the request's
+        #: timeout, the client's :data:`~chisel.deadline.DEADLINE_HEADER` request header, and, for an in-process
+        #: request (see :meth:`~chisel.Context.request`), the calling request's deadline.
+        self.deadline = None
+
         self._log = None
 
     @property
@@ -315,6 +614,70 @@ class Context:
     def log(self):
         self._log = None
 
+    def remaining_time(self):
+        """
+        Get the time remaining until the request's deadline
+
+        :returns: The remaining time, in seconds, or None if the request has no deadline. If the deadline has passed,
+            the remaining time is zero.
+        :rtype: float or None
+        """
+
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check_deadline(self):
+        """
+        Raise :class:`~chisel.deadline.DeadlineExceeded` if the request's deadline has passed. An action callback
+        that raises it responds with "504 Gateway Timeout" and the "Timeout" error.
+
+        :raises ~chisel.deadline.DeadlineExceeded: If the deadline has passed
+        """
+
+        if self.deadline is not None and self.deadline <= time.monotonic():
+            raise DeadlineExceeded()
+
+    def deadline_headers(self):
+        """
+        Get the request headers that propagate the request's remaining time to an outgoing HTTP request
+
+        >>> import time
+        >>> ctx = chisel.Context(chisel.Application())
+        >>> ctx.deadline_headers()
+        {}
+        >>> ctx.deadline = time.monotonic() + 2
+        >>> 1 < float(ctx.deadline_headers()['X-Request-Timeout']) <= 2
+        True
+
+        :returns: The :data:`~chisel.deadline.DEADLINE_HEADER` header dictionary or an empty dictionary if the request
+            has no deadline
+        :rtype: dict
+        """
+
+        remaining_time = self.remaining_time()
+        if remaining_time is None:
+            return {}
+        return {DEADLINE_HEADER: f'{remaining_time:.3f}'}
+
+    def request(self, request_method, path_info, query_string='', wsgi_input=b'', environ=None):
+        """
+        Execute an in-process application request (see :meth:`~chisel.Application.request`) that inherits the
+        request's deadline
+
+        :param str request_method: The HTTP request method string (e.g. ``'GET'``)
+        :param str path_info: The request URL path (e.g. ``'/doc/'``)
+        :param str query_string: Optional query string
+        :param bytes wsgi_input: Optional request content
+        :param dict environ: Optional environ dict. If not provided, a minimal default environ is created.
+        :returns: Response status, headers, and content bytes
+        """
+
+        if self.deadline is not None:
+            environ = dict(environ) if environ is not None else {}
+            environ[DEADLINE_ENVIRON] = self.deadline
+        return self.app.request(request_method, path_info, query_string, wsgi_input, environ)
+
     @staticmethod
     def create_environ(request_method, path_info, query_string='', wsgi_input=b'', environ=None):
         """
@@ -384,6 +747,19 @@ class Context:
         assert isinstance(value, str), 'header value must be of type str'
         self.headers[key] = value
 
+    def add_vary_header(self, key):
+        """
+        Add a request header key to the response's "Vary" header, if not already present
+
+        :param str key: The request header key (e.g. "Accept")
+        """
+
+        vary = self.headers.get('Vary')
+        if vary is None:
+            self.add_header('Vary', key)
+        elif key.lower() not in (vary_key.strip().lower() for vary_key in vary.split(',')):
+            self.add_header('Vary', f'{vary}, {key}')
+
     def add_cache_headers(self, control, ttl_seconds=None, utcnow=None):
         """
         Add a cache header to the response. You can specify a public or private cache with a time-to-live. You can specify
@@ -462,9 +838,49 @@ class Context:
         response_headers = [('Content-Type', content_type)]
         if headers:
             response_headers.extend(headers)
+        if self.app.compression is not None and isinstance(content, (list, tuple)):
+            content = self._compress_content(content, response_headers)
         self.start_response(status, response_headers)
         return content
 
+    def negotiate_content_encoding(self, content_type, content_length):
+        """
+        Negotiate a response's content encoding per the application's response
+        :attr:`~chisel.Application.compression` settings and the request's "Accept-Encoding" header. If the response
+        is compressible, "Accept-Encoding" is added to the response's "Vary" header.
+
+        :param str content_type: The response content type
+        :param int content_length: The uncompressed response content length, in bytes
+        :returns: The content encoding (e.g. "gzip") or None if the response isn't compressed
+        """
+
+        compression = self.app.compression
+        if compression is None or not compression.is_compressible(content_type) or content_length < compression.min_bytes:
+            return None
+        self.add_vary_header('Accept-Encoding')
+        return compression.negotiate(self.environ.get('HTTP_ACCEPT_ENCODING'))
+
+    # Helper to compress response content per the application's response compression settings
+    def _compress_content(self, content, response_headers):
+        compression = self.app.compression
+        response_header_map = {**self.headers, **dict(response_headers)}
+        if 'Content-Encoding' in response_header_map:
+            return content
+
+        # Negotiate the content encoding
+        content_bytes = b''.join(content)
+        content_encoding = self.negotiate_content_encoding(response_header_map['Content-Type'], len(content_bytes))
+        if content_encoding is None:
+            return [content_bytes]
+
+        # The compressed representation has its own ETag
+        response_headers.append(('Content-Encoding', content_encoding))
+        etag = response_header_map.get('ETag')
+        if etag is not None:
+            response_headers[:] = [(key, value) for key, value in response_headers if key != 'ETag']
+            response_headers.append(('ETag', get_encoded_etag(etag, content_encoding)))
+        return [compression.compress(content_bytes, content_encoding, etag)]
+
     def response_text(self, status, text=None, content_type=None, encoding='utf-8', headers=None):
         """
         A plain-text WSGI response
@@ -521,6 +937,8 @@ class Context:
         >>> application.request('GET', '/my_action')
         ('200 OK', [('Content-Type', 'application/json')], b'{"a":5,"b":7}')
 
+        Array values may be :class:`numpy.ndarray`, :class:`array.array`, or :class:`memoryview` objects.
+
         :param status: The HTTP response status
         :type status: ~http.HTTPStatus or str
         :param dict response: The response dictionary
@@ -529,15 +947,84 @@ class Context:
         :param list(tuple) headers: Optional list of key/value header tuples to add to the response
         """
 
-        encoder = JSONEncoder(
+        content = self.encode_json(response, encoding)
+        return self.response(status, content_type, [content], headers=headers)
+
+    def encode_json(self, response, encoding='utf-8'):
+        """
+        Encode a response as JSON content bytes, as for :meth:`~chisel.Context.response_json`
+
+        :param dict response: The response dictionary
+        :param str encoding: The content encoding. The default is "utf-8".
+        :returns: The JSON content bytes
+        :rtype: bytes
+        """
+
+        return self.create_json_encoder().encode(response).encode(encoding)
+
+    def create_json_encoder(self, pretty=None):
+        """
+        Create a JSON encoder per the application's output settings, as for :meth:`~chisel.Context.encode_json`
+
+        :param bool pretty: If True, the encoder indents its output. If None, the application's
+            :attr:`~chisel.Application.pretty_output` setting is used.
+        :rtype: ~json.JSONEncoder
+        """
+
+        if pretty is None:
+            pretty = self.app.pretty_output
+        return _JSONEncoder(
             check_circular=self.app.validate_output,
             allow_nan=False,
             sort_keys=True,
-            indent=2 if self.app.pretty_output else None,
-            separators=(',', ': ') if self.app.pretty_output else (',', ':')
+            indent=2 if pretty else None,
+            separators=(',', ': ') if pretty else (',', ':')
         )
-        content = encoder.encode(response)
-        return self.response(status, content_type, [content.encode(encoding)], headers=headers)
+
+    @staticmethod
+    def stream(iterable):
+        """
+        Stream an array output member's values. The response content is sent as the values are iterated, and each value
+        is validated individually. Generator member values are streamed without calling this method.
+
+        >>> @chisel.action(spec='''
+        ... action my_action
+        ...     urls
+        ...         GET
+        ...     output
+        ...         int[] values
+        ... ''')
+        ... def my_action(ctx, req):
+        ...    return {'values': ctx.stream(range(3))}
+        ...
+        >>> application = chisel.Application()
+        >>> application.add_request(my_action)
+        >>> application.request('GET', '/my_action')
+        ('200 OK', [('Content-Type', 'application/json')], b'{"values":[0,1,2]}')
+
+        If an error occurs while streaming a member's values, the member's array is closed and the response object ends
+        with "error" and "message" members (and "member", for invalid output values) - the response status has already
+        been sent. Any remaining output members are omitted. See :class:`~chisel.Action`.
+
+        :param ~collections.abc.Iterable iterable: The array values iterable
+        :returns: The streamed array value
+        :rtype: ~chisel.stream.StreamArray
+        """
+
+        return StreamArray(iterable)
+
+    def response_cbor(self, status, response, content_type=CBOR_CONTENT_TYPE, headers=None):
+        """
+        A `CBOR <https://www.rfc-editor.org/rfc/rfc8949>`__ response. See :func:`~chisel.cbor.encode_cbor`.
+
+        :param status: The HTTP response status
+        :type status: ~http.HTTPStatus or str
+        :param dict response: The response dictionary
+        :param str content_type: The response content type. The default is "application/cbor".
+        :param list(tuple) headers: Optional list of key/value header tuples to add to the response
+        """
+
+        return self.response(status, content_type, [encode_cbor(response)], headers=headers)
 
     def reconstruct_url(self, path_info=None, query_string=None, relative=False):
         """
@@ -588,6 +1075,18 @@ class Context:
         return url
 
 
+class _JSONEncoder(JSONEncoder):
+    # JSON encoder with support for buffer array values (e.g. ndarray). Buffer values are converted to a list in bulk and
+    # encoded by the C encoder - non-finite floats raise ValueError as with list values.
+
+    __slots__ = ()
+
+    def default(self, o):
+        if isinstance(o, BUFFER_TYPES):
+            return o.tolist()
+        return super().default(o)
+
+
 class StartResponse:
     """
     A WSGI start_response callable object that records its status and headers arguments
@@ -0,0 +1,323 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Chisel ASGI interface utilities
+"""
+
+import asyncio
+import io
+import sys
+
+
+def create_asgi_environ(scope, wsgi_input):
+    """
+    Create a :pep:`WSGI <3333>` environ dict from an ASGI HTTP connection scope
+
+    >>> from io import BytesIO
+    >>> from chisel.asgi import create_asgi_environ
+    >>> environ = create_asgi_environ({
+    ...     'type': 'http',
+    ...     'method': 'POST',
+    ...     'path': '/my_action',
+    ...     'query_string': b'a=1',
+    ...     'headers': [(b'content-type', b'application/json'), (b'accept', b'*/*')]
+    ... }, BytesIO(b'{}'))
+    >>> environ['REQUEST_METHOD'], environ['PATH_INFO'], environ['QUERY_STRING']
+    ('POST', '/my_action', 'a=1')
+    >>> environ['CONTENT_TYPE'], environ['HTTP_ACCEPT']
+    ('application/json', '*/*')
+
+    :param dict scope: The ASGI HTTP connection scope
+    :param wsgi_input: The request content file-like object (e.g. :class:`~chisel.asgi.ASGIInput`)
+    :returns: The environ dict. The scope is the environ's "asgi.scope" value.
+    """
+
+    url_scheme = scope.get('scheme', 'http')
+    server = scope.get('server')
+    server_name, server_port = server if server is not None else ('localhost', None)
+    if server_port is None:
+        server_port = 443 if url_scheme == 'https' else 80
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': url_scheme,
+        'wsgi.input': wsgi_input,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'wsgi.file_wrapper': FileWrapper,
+        'asgi.scope': scope
+    }
+    client = scope.get('client')
+    if client is not None:
+        environ['REMOTE_ADDR'] = client[0]
+        environ['REMOTE_PORT'] = str(client[1])
+
+    # Add the request headers - repeated headers are combined
+    for header_name, header_value in scope.get('headers', ()):
+        header_name = header_name.decode('latin-1').upper().replace('-', '_')
+        header_value = header_value.decode('latin-1')
+        if header_name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            header_name = f'HTTP_{header_name}'
+        if header_name in environ:
+            header_value = f'{environ[header_name]}{"; " if header_name == "HTTP_COOKIE" else ","}{header_value}'
+        environ[header_name] = header_value
+
+    return environ
+
+
+class ASGIInput:
+    """
+    A file-like "wsgi.input" object that receives the ASGI request content as it is read. The blocking
+    :meth:`~chisel.asgi.ASGIInput.read` and :meth:`~chisel.asgi.ASGIInput.readline` methods must be called from an
+    executor thread - never from the event loop's thread. On the event loop, use
+    :meth:`~chisel.asgi.ASGIInput.read_async`.
+
+    :param ~collections.abc.Callable receive: The ASGI receive awaitable callable
+    :param ~asyncio.AbstractEventLoop loop: The event loop
+    """
+
+    __slots__ = ('_receive', '_loop', '_buffer', '_more_body')
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._buffer = bytearray()
+        self._more_body = True
+
+    # Helper to receive a request content message - returns False if there is no more request content
+    def _receive_body(self):
+        if not self._more_body:
+            return False
+        self._add_message(asyncio.run_coroutine_threadsafe(_receive(self._receive), self._loop).result())
+        return True
+
+    # Helper to receive a request content message on the event loop - returns False if there is no more request content
+    async def _receive_body_async(self):
+        if not self._more_body:
+            return False
+        self._add_message(await self._receive())
+        return True
+
+    def _add_message(self, message):
+        if message['type'] == 'http.disconnect':
+            self._more_body = False
+            raise OSError('Client disconnected')
+        self._buffer.extend(message.get('body', b''))
+        self._more_body = message.get('more_body', False)
+
+    def _pop(self, size):
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def read(self, size=-1):
+        """
+        Read request content
+
+        :param int size: The maximum number of bytes to read. If negative or None, the remaining content is read.
+        :rtype: bytes
+        """
+
+        if size is None or size < 0:
+            while self._receive_body():
+                pass
+            return self._pop(len(self._buffer))
+        while len(self._buffer) < size and self._receive_body():
+            pass
+        return self._pop(size)
+
+    async def read_async(self, size=-1):
+        """
+        Read request content on the event loop
+
+        :param int size: The maximum number of bytes to read. If negative or None, the remaining content is read.
+        :rtype: bytes
+        """
+
+        if size is None or size < 0:
+            while await self._receive_body_async():
+                pass
+            return self._pop(len(self._buffer))
+        while len(self._buffer) < size and await self._receive_body_async():
+            pass
+        return self._pop(size)
+
+    def readline(self, size=-1):
+        """
+        Read a request content line
+
+        :param int size: The maximum number of bytes to read. If negative or None, the line is not limited.
+        :rtype: bytes
+        """
+
+        ix_search = 0
+        while True:
+            ix_newline = self._buffer.find(b'\n', ix_search)
+            if ix_newline >= 0:
+                line_size = ix_newline + 1
+                break
+            ix_search = len(self._buffer)
+            if (size is not None and 0 <= size <= len(self._buffer)) or not self._receive_body():
+                line_size = len(self._buffer)
+                break
+        if size is not None and size >= 0:
+            line_size = min(line_size, size)
+        return self._pop(line_size)
+
+
+# Helper to wrap the receive awaitable in a coroutine for run_coroutine_threadsafe
+async def _receive(receive):
+    return await receive()
+
+
+class FileWrapper:
+    """
+    The :pep:`WSGI <3333#optional-platform-specific-file-handling>` "wsgi.file_wrapper" - a response content iterable
+    of a file's blocks. A file wrapper response of a file with a file descriptor is sent using the ASGI
+    "http.response.zerocopysend" extension (e.g. :func:`os.sendfile`), if the server supports it.
+
+    >>> from io import BytesIO
+    >>> from chisel.asgi import FileWrapper
+    >>> list(FileWrapper(BytesIO(b'Hello, World'), 5))
+    [b'Hello', b', Wor', b'ld']
+
+    :param filelike: The binary file-like object
+    :param int block_size: The read block size, in bytes
+    """
+
+    __slots__ = ('filelike', 'block_size')
+
+    def __init__(self, filelike, block_size=64 * 1024):
+
+        #: The binary file-like object
+        self.filelike = filelike
+
+        #: The read block size, in bytes
+        self.block_size = block_size
+
+    def __iter__(self):
+        while True:
+            data = self.filelike.read(self.block_size)
+            if not data:
+                break
+            yield data
+
+    def close(self):
+        """
+        Close the file, if it has a "close" method
+        """
+
+        close = getattr(self.filelike, 'close', None)
+        if close is not None:
+            close()
+
+    def fileno(self):
+        """
+        Get the file's file descriptor
+
+        :returns: The file descriptor or None if the file doesn't have one
+        """
+
+        try:
+            return self.filelike.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            return None
+
+
+async def send_asgi_response(send, start_response, content, executor=None, zerocopysend=False):
+    """
+    Send a WSGI response using ASGI "http.response.start" and "http.response.body" messages. Response content lists
+    and tuples are sent as a single body message. Asynchronous content iterables (e.g. async generators) are iterated on
+    the running event loop, other content iterables are iterated on the executor, and each non-empty content chunk is
+    sent as it is available. The content is closed, if it has an "aclose" or "close" method.
+
+    :param ~collections.abc.Callable send: The ASGI send awaitable callable
+    :param ~chisel.app.StartResponse start_response: The start_response object that recorded the response status and
+        headers. The response is started when the first content chunk is available, so start_response may be called
+        during content iteration.
+    :param content: The WSGI response content iterable or an asynchronous content iterable
+    :type content: ~collections.abc.Iterable(bytes) or ~collections.abc.AsyncIterable(bytes)
+    :param ~concurrent.futures.Executor executor: The executor or None for the event loop's default executor
+    :param bool zerocopysend: If True, the server supports the ASGI "http.response.zerocopysend" extension and
+        :class:`~chisel.asgi.FileWrapper` content with a file descriptor is sent using a single
+        "http.response.zerocopysend" message
+    """
+
+    loop = asyncio.get_running_loop()
+    try:
+        # Content list?
+        if isinstance(content, (list, tuple)):
+            await _send_start(send, start_response)
+            await send({'type': 'http.response.body', 'body': b''.join(content), 'more_body': False})
+            return
+
+        # File content the server can send directly?
+        if zerocopysend and isinstance(content, FileWrapper) and content.fileno() is not None:
+            await _send_start(send, start_response)
+            await send({'type': 'http.response.zerocopysend', 'file': content.filelike, 'more_body': False})
+            return
+
+        # Send the content chunks as they are available
+        is_started = False
+        chunks = content if hasattr(content, '__aiter__') else _iter_executor(loop, executor, content)
+        async for chunk in chunks:
+            if chunk:
+                if not is_started:
+                    await _send_start(send, start_response)
+                    is_started = True
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        if not is_started:
+            await _send_start(send, start_response)
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        aclose = getattr(content, 'aclose', None)
+        if aclose is not None:
+            await aclose()
+        else:
+            close = getattr(content, 'close', None)
+            if close is not None:
+                await loop.run_in_executor(executor, close)
+
+
+# Helper to iterate a content iterable on an executor
+async def _iter_executor(loop, executor, content):
+    iterator = await loop.run_in_executor(executor, iter, content)
+    while True:
+        chunk = await loop.run_in_executor(executor, next, iterator, None)
+        if chunk is None:
+            break
+        yield chunk
+
+
+async def _send_start(send, start_response):
+    await send({
+        'type': 'http.response.start',
+        'status': int(start_response.status.split(' ', 1)[0]),
+        'headers': [(key.lower().encode('latin-1'), value.encode('latin-1')) for key, value in start_response.headers]
+    })
+
+
+async def asgi_lifespan(receive, send):
+    """
+    Handle an ASGI lifespan connection - startup and shutdown are acknowledged
+
+    :param ~collections.abc.Callable receive: The ASGI receive awaitable callable
+    :param ~collections.abc.Callable send: The ASGI send awaitable callable
+    """
+
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            break
@@ -0,0 +1,134 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Chisel application-wide request content memory budget
+"""
+
+import threading
+
+
+#: Content budget policy - wait for the budget, up to the action's wait interval, then respond with 503
+CONTENT_BUDGET_WAIT = 'wait'
+
+#: Content budget policy - receive the request content to a temporary file, then wait for the budget to read it
+CONTENT_BUDGET_SPOOL = 'spool'
+
+#: Content budget policy - respond with 503 immediately
+CONTENT_BUDGET_REJECT = 'reject'
+
+#: The default content budget wait interval, in seconds
+CONTENT_BUDGET_WAIT_SECONDS = 1
+
+#: The request content read size, in bytes, when spooling request content to a temporary file
+CONTENT_SPOOL_CHUNK_SIZE = 64 * 1024
+
+
+class ContentBudget:
+    """
+    A thread-safe, application-wide budget of in-flight request content bytes. Set the
+    :attr:`~chisel.Application.content_budget` attribute to limit the total size of the request content that
+    :class:`~chisel.Action` requests buffer in memory. An action request's "Content-Length" is charged to the budget
+    from the time its content is read until its callback returns. If the content doesn't fit, the action's content
+    budget policy determines whether the request waits for the budget, spools its content to a temporary file while it
+    is received and then waits for the budget, or is rejected with a "503 Service Unavailable" response and a
+    "Retry-After" header.
+
+    >>> from chisel.budget import ContentBudget
+    >>> budget = ContentBudget(1000)
+    >>> budget.acquire(600)
+    True
+    >>> budget.acquire(600)
+    False
+    >>> budget.used_bytes, budget.peak_bytes
+    (600, 600)
+    >>> budget.release(600)
+    >>> budget.used_bytes
+    0
+
+    :param int max_bytes: The maximum total size, in bytes, of the in-flight request content
+    :param int retry_after: The "Retry-After" response header value, in seconds, for rejected requests
+    """
+
+    __slots__ = ('max_bytes', 'retry_after', 'used_bytes', 'peak_bytes', 'admitted', 'waited', 'spooled', 'rejected', '_condition')
+
+    def __init__(self, max_bytes, retry_after=1):
+
+        #: The maximum total size, in bytes, of the in-flight request content
+        self.max_bytes = max_bytes
+
+        #: The "Retry-After" response header value, in seconds, for rejected requests
+        self.retry_after = retry_after
+
+        #: The current total size, in bytes, of the in-flight request content
+        self.used_bytes = 0
+
+        #: The maximum total size, in bytes, of the in-flight request content
+        self.peak_bytes = 0
+
+        #: The count of admitted request contents
+        self.admitted = 0
+
+        #: The count of admitted request contents that waited for the budget
+        self.waited = 0
+
+        #: The count of request contents spooled to a temporary file
+        self.spooled = 0
+
+        #: The count of rejected request contents
+        self.rejected = 0
+
+        self._condition = threading.Condition()
+
+    def acquire(self, size, timeout=None):
+        """
+        Charge request content to the budget. Content larger than the budget is never admitted.
+
+        :param int size: The request content size, in bytes
+        :param float timeout: The maximum time, in seconds, to wait for the budget. If None, don't wait.
+        :returns: True if the content is admitted, False otherwise
+        :rtype: bool
+        """
+
+        with self._condition:
+            is_waited = False
+            if size > self.max_bytes - self.used_bytes:
+                if timeout is None or size > self.max_bytes:
+                    return False
+                is_waited = True
+                if not self._condition.wait_for(lambda: size <= self.max_bytes - self.used_bytes, timeout):
+                    return False
+
+            self.used_bytes += size
+            self.peak_bytes = max(self.peak_bytes, self.used_bytes)
+            self.admitted += 1
+            if is_waited:
+                self.waited += 1
+            return True
+
+    def release(self, size):
+        """
+        Release request content charged to the budget
+
+        :param int size: The request content size, in bytes
+        """
+
+        with self._condition:
+            self.used_bytes -= size
+            self._condition.notify_all()
+
+    def add_spooled(self):
+        """
+        Count a request content spooled to a temporary file
+        """
+
+        with self._condition:
+            self.spooled += 1
+
+    def add_rejected(self):
+        """
+        Count a rejected request content
+        """
+
+        with self._condition:
+            self.rejected += 1
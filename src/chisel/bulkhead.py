@@ -0,0 +1,254 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Chisel request concurrency limits (bulkheads)
+"""
+
+import asyncio
+from collections import deque
+import threading
+import time
+
+
+#: The default maximum time, in seconds, that a request waits in a bulkhead's queue
+BULKHEAD_QUEUE_SECONDS = 1
+
+
+class BulkheadMetrics:
+    """
+    Bulkhead admission metrics - the current queue depth, wait times, and rejection counts. Metrics are updated while
+    holding the bulkhead's lock.
+    """
+
+    __slots__ = ('queued', 'peak_queued', 'admitted', 'waited', 'wait_seconds', 'max_wait_seconds', 'rejected', 'timed_out')
+
+    def __init__(self):
+
+        #: The current count of queued requests
+        self.queued = 0
+
+        #: The maximum count of queued requests
+        self.peak_queued = 0
+
+        #: The count of admitted requests
+        self.admitted = 0
+
+        #: The count of admitted requests that waited in the queue
+        self.waited = 0
+
+        #: The total time, in seconds, that admitted requests waited in the queue
+        self.wait_seconds = 0.0
+
+        #: The longest time, in seconds, that an admitted request waited in the queue
+        self.max_wait_seconds = 0.0
+
+        #: The count of requests rejected because the queue was full
+        self.rejected = 0
+
+        #: The count of requests rejected because they waited in the queue until its timeout
+        self.timed_out = 0
+
+
+class Bulkhead:
+    """
+    A thread-safe request concurrency limit with a bounded first-in, first-out wait queue. A request that arrives when
+    the maximum number of requests are in progress waits in the queue for up to the queue timeout. A request that
+    arrives when the queue is full, or that times out in the queue, is rejected with a "503 Service Unavailable"
+    response and a "Retry-After" header.
+
+    Limit an action's concurrency with the :class:`~chisel.Action` "bulkhead" argument or the application's
+    :attr:`~chisel.Application.request_bulkheads`. Limit the combined concurrency of a documentation group's requests
+    with the application's :attr:`~chisel.Application.doc_group_bulkheads`. A request is admitted when it is matched
+    and released when its response is complete - when its request returns a response content list, and otherwise
+    (e.g. a streamed response) when the response content is closed after it's sent.
+
+    >>> from chisel.bulkhead import Bulkhead
+    >>> bulkhead = Bulkhead(1, max_queue=0)
+    >>> bulkhead.acquire('my_action')
+    True
+    >>> bulkhead.acquire('my_action')
+    False
+    >>> bulkhead.release()
+    >>> bulkhead.active, bulkhead.metrics.admitted, bulkhead.request_metrics['my_action'].rejected
+    (0, 1, 1)
+
+    :param int max_concurrent: The maximum number of in-progress requests
+    :param int max_queue: The maximum number of queued requests
+    :param float queue_timeout: The maximum time, in seconds, that a request waits in the queue
+    :param int retry_after: The "Retry-After" response header value, in seconds, for rejected requests
+    """
+
+    __slots__ = (
+        'max_concurrent',
+        'max_queue',
+        'queue_timeout',
+        'retry_after',
+        'active',
+        'peak_active',
+        'metrics',
+        'request_metrics',
+        '_lock',
+        '_waiters'
+    )
+
+    def __init__(self, max_concurrent, max_queue=None, queue_timeout=BULKHEAD_QUEUE_SECONDS, retry_after=1):
+
+        #: The maximum number of in-progress requests
+        self.max_concurrent = max_concurrent
+
+        #: The maximum number of queued requests. The default is "max_concurrent".
+        self.max_queue = max_queue if max_queue is not None else max_concurrent
+
+        #: The maximum time, in seconds, that a request waits in the queue
+        self.queue_timeout = queue_timeout
+
+        #: The "Retry-After" response header value, in seconds, for rejected requests
+        self.retry_after = retry_after
+
+        #: The current count of in-progress requests
+        self.active = 0
+
+        #: The maximum count of in-progress requests
+        self.peak_active = 0
+
+        #: The bulkhead's :class:`~chisel.bulkhead.BulkheadMetrics`
+        self.metrics = BulkheadMetrics()
+
+        #: The map of request name to :class:`~chisel.bulkhead.BulkheadMetrics`
+        self.request_metrics = {}
+
+        self._lock = threading.Lock()
+        self._waiters = deque()
+
+    def acquire(self, name=None):
+        """
+        Admit a request, waiting in the queue, if necessary. An admitted request must call
+        :meth:`~chisel.bulkhead.Bulkhead.release` when it completes.
+
+        :param str name: The request name, for the per-request metrics
+        :returns: True if the request is admitted, False if it is rejected
+        :rtype: bool
+        """
+
+        admitted, waiter = self._enter(name, _ThreadWaiter)
+        if waiter is None:
+            return admitted
+        waiter.event.wait(self.queue_timeout)
+        return self._leave(name, waiter)
+
+    async def acquire_async(self, name=None):
+        """
+        Admit a request, waiting in the queue without blocking the event loop, if necessary. An admitted request must
+        call :meth:`~chisel.bulkhead.Bulkhead.release` when it completes.
+
+        :param str name: The request name, for the per-request metrics
+        :returns: True if the request is admitted, False if it is rejected
+        :rtype: bool
+        """
+
+        admitted, waiter = self._enter(name, _AsyncWaiter)
+        if waiter is None:
+            return admitted
+        try:
+            await asyncio.wait_for(waiter.future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            if self._leave(name, waiter):
+                self.release()
+            raise
+        return self._leave(name, waiter)
+
+    def release(self):
+        """
+        Release an admitted request - its place is given to the first queued request, if any
+        """
+
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().grant()
+            else:
+                self.active -= 1
+
+    # Helper to admit a request or queue its waiter - returns the admitted flag and the waiter, if queued
+    def _enter(self, name, waiter_factory):
+        with self._lock:
+            metrics = self._metrics(name)
+            if self.active < self.max_concurrent:
+                self.active += 1
+                self.peak_active = max(self.peak_active, self.active)
+                for metric in metrics:
+                    metric.admitted += 1
+                return True, None
+            if len(self._waiters) >= self.max_queue:
+                for metric in metrics:
+                    metric.rejected += 1
+                return False, None
+            waiter = waiter_factory()
+            self._waiters.append(waiter)
+            for metric in metrics:
+                metric.queued += 1
+                metric.peak_queued = max(metric.peak_queued, metric.queued)
+            return None, waiter
+
+    # Helper to dequeue a waiter - returns True if the waiter was granted the release of an admitted request
+    def _leave(self, name, waiter):
+        wait_seconds = time.monotonic() - waiter.start_time
+        with self._lock:
+            metrics = self._metrics(name)
+            for metric in metrics:
+                metric.queued -= 1
+            if not waiter.granted:
+                self._waiters.remove(waiter)
+                for metric in metrics:
+                    metric.timed_out += 1
+                return False
+            for metric in metrics:
+                metric.admitted += 1
+                metric.waited += 1
+                metric.wait_seconds += wait_seconds
+                metric.max_wait_seconds = max(metric.max_wait_seconds, wait_seconds)
+            return True
+
+    # Helper to get the bulkhead and request metrics - the lock must be held
+    def _metrics(self, name):
+        request_metrics = self.request_metrics.get(name)
+        if request_metrics is None:
+            request_metrics = self.request_metrics[name] = BulkheadMetrics()
+        return (self.metrics, request_metrics)
+
+
+# A queued thread request
+class _ThreadWaiter:
+    __slots__ = ('start_time', 'granted', 'event')
+
+    def __init__(self):
+        self.start_time = time.monotonic()
+        self.granted = False
+        self.event = threading.Event()
+
+    def grant(self):
+        self.granted = True
+        self.event.set()
+
+
+# A queued event loop request
+class _AsyncWaiter:
+    __slots__ = ('start_time', 'granted', 'future', 'loop')
+
+    def __init__(self):
+        self.start_time = time.monotonic()
+        self.granted = False
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+
+    def grant(self):
+        self.granted = True
+        self.loop.call_soon_threadsafe(_set_future_result, self.future)
+
+
+# Helper to complete a waiter's future, if it's not cancelled
+def _set_future_result(future):
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,350 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Chisel CBOR (RFC 8949) encoding and decoding
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+import struct
+from uuid import UUID
+
+from .validate import BUFFER_TYPES
+
+
+#: The CBOR content type
+CBOR_CONTENT_TYPE = 'application/cbor'
+
+
+# CBOR major types
+_MAJOR_UINT = 0
+_MAJOR_NEGINT = 1
+_MAJOR_BYTES = 2
+_MAJOR_TEXT = 3
+_MAJOR_ARRAY = 4
+_MAJOR_MAP = 5
+_MAJOR_TAG = 6
+_MAJOR_SIMPLE = 7
+
+# CBOR tags
+_TAG_DATETIME = 0
+_TAG_EPOCH = 1
+_TAG_BIGNUM = 2
+_TAG_NEGBIGNUM = 3
+_TAG_UUID = 37
+_TAG_EPOCH_DATE = 100
+_TAG_DATE = 1004
+
+# Pre-encoded simple values and struct formats
+_FALSE = b'\xf4'
+_TRUE = b'\xf5'
+_NULL = b'\xf6'
+_STRUCT_HALF = struct.Struct('>e')
+_STRUCT_SINGLE = struct.Struct('>f')
+_STRUCT_DOUBLE = struct.Struct('>d')
+_STRUCT_UINT16 = struct.Struct('>H')
+_STRUCT_UINT32 = struct.Struct('>I')
+_STRUCT_UINT64 = struct.Struct('>Q')
+
+# The Unix epoch
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_DATE = date(1970, 1, 1)
+
+
+def encode_cbor(value):
+    """
+    Encode a value as CBOR. Datetime values are encoded as tag 0 (RFC 3339 string) - naive datetime values are
+    assumed to be UTC. Date values are encoded as tag 1004 (RFC 3339 full-date string) and UUID values are encoded as
+    tag 37. Float values are encoded with the shortest lossless width.
+
+    >>> from chisel.cbor import decode_cbor, encode_cbor
+    >>> encode_cbor({'a': [1, 2.5, 'x']}).hex()
+    'a161618301f941006178'
+    >>> decode_cbor(bytes.fromhex('a161618301f941006178'))
+    {'a': [1, 2.5, 'x']}
+
+    :param object value: The value to encode
+    :returns: The CBOR-encoded bytes
+    :rtype: bytes
+    :raises ValueError: The value contains an unsupported type or a circular reference
+    """
+
+    parts = []
+    _encode(parts, value, set())
+    return b''.join(parts)
+
+
+def decode_cbor(data):
+    """
+    Decode CBOR-encoded bytes. Tagged datetime, date, UUID, and bignum values are decoded as
+    :class:`~datetime.datetime`, :class:`~datetime.date`, :class:`~uuid.UUID`, and int objects. Other tags are ignored.
+
+    :param bytes data: The CBOR-encoded bytes
+    :returns: The decoded value
+    :raises ValueError: The data is not valid CBOR
+    """
+
+    decoder = _Decoder(bytes(data))
+    try:
+        value = decoder.decode()
+    except (IndexError, struct.error):
+        raise ValueError('Unexpected end of CBOR data') from None
+    except RecursionError:
+        raise ValueError('CBOR data nested too deeply') from None
+    if decoder.offset != len(decoder.data):
+        raise ValueError('Extra data after CBOR value')
+    return value
+
+
+# Helper to encode a major type header
+def _encode_head(parts, major, length):
+    major <<= 5
+    if length < 24:
+        parts.append(bytes((major | length,)))
+    elif length < 0x100:
+        parts.append(bytes((major | 24, length)))
+    elif length < 0x10000:
+        parts.append(bytes((major | 25,)) + _STRUCT_UINT16.pack(length))
+    elif length < 0x100000000:
+        parts.append(bytes((major | 26,)) + _STRUCT_UINT32.pack(length))
+    else:
+        parts.append(bytes((major | 27,)) + _STRUCT_UINT64.pack(length))
+
+
+def _encode_int(parts, value):
+    if value >= 0:
+        if value < 0x10000000000000000:
+            _encode_head(parts, _MAJOR_UINT, value)
+        else:
+            _encode_head(parts, _MAJOR_TAG, _TAG_BIGNUM)
+            _encode_bytes(parts, value.to_bytes((value.bit_length() + 7) // 8, 'big'))
+    else:
+        value = -1 - value
+        if value < 0x10000000000000000:
+            _encode_head(parts, _MAJOR_NEGINT, value)
+        else:
+            _encode_head(parts, _MAJOR_TAG, _TAG_NEGBIGNUM)
+            _encode_bytes(parts, value.to_bytes((value.bit_length() + 7) // 8, 'big'))
+
+
+def _encode_float(parts, value):
+    # Use the shortest lossless float width (NaN and infinity are always half-precision)
+    if value != value: # pylint: disable=comparison-with-itself
+        parts.append(b'\xf9\x7e\x00')
+        return
+    try:
+        half = _STRUCT_HALF.pack(value)
+        if _STRUCT_HALF.unpack(half)[0] == value:
+            parts.append(b'\xf9' + half)
+            return
+    except OverflowError:
+        pass
+    try:
+        single = _STRUCT_SINGLE.pack(value)
+        if _STRUCT_SINGLE.unpack(single)[0] == value:
+            parts.append(b'\xfa' + single)
+            return
+    except OverflowError:
+        pass
+    parts.append(b'\xfb' + _STRUCT_DOUBLE.pack(value))
+
+
+def _encode_bytes(parts, value):
+    _encode_head(parts, _MAJOR_BYTES, len(value))
+    parts.append(value)
+
+
+def _encode_text(parts, value):
+    value_bytes = value.encode('utf-8')
+    _encode_head(parts, _MAJOR_TEXT, len(value_bytes))
+    parts.append(value_bytes)
+
+
+def _encode(parts, value, containers):
+    # Note: bool is checked before int, and datetime before date, since they are sub-classes
+    if value is None:
+        parts.append(_NULL)
+    elif value is True:
+        parts.append(_TRUE)
+    elif value is False:
+        parts.append(_FALSE)
+    elif isinstance(value, str):
+        _encode_text(parts, value)
+    elif isinstance(value, int):
+        _encode_int(parts, value)
+    elif isinstance(value, float):
+        _encode_float(parts, value)
+    elif isinstance(value, (list, tuple, dict)):
+        value_id = id(value)
+        if value_id in containers:
+            raise ValueError('Circular reference detected')
+        containers.add(value_id)
+        if isinstance(value, dict):
+            _encode_head(parts, _MAJOR_MAP, len(value))
+            for member_name, member_value in value.items():
+                _encode(parts, member_name, containers)
+                _encode(parts, member_value, containers)
+        else:
+            _encode_head(parts, _MAJOR_ARRAY, len(value))
+            for array_value in value:
+                _encode(parts, array_value, containers)
+        containers.remove(value_id)
+    elif isinstance(value, (bytes, bytearray)):
+        _encode_bytes(parts, bytes(value))
+    elif isinstance(value, datetime):
+        _encode_head(parts, _MAJOR_TAG, _TAG_DATETIME)
+        _encode_text(parts, (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).isoformat())
+    elif isinstance(value, date):
+        _encode_head(parts, _MAJOR_TAG, _TAG_DATE)
+        _encode_text(parts, value.isoformat())
+    elif isinstance(value, UUID):
+        _encode_head(parts, _MAJOR_TAG, _TAG_UUID)
+        _encode_bytes(parts, value.bytes)
+    elif isinstance(value, Decimal):
+        _encode_float(parts, float(value))
+    elif isinstance(value, BUFFER_TYPES):
+        _encode(parts, value.tolist(), containers)
+    else:
+        raise ValueError(f'Object of type {type(value).__name__} is not CBOR serializable')
+
+
+class _Decoder:
+    __slots__ = ('data', 'offset')
+
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+
+    def read(self, length):
+        offset = self.offset
+        end = offset + length
+        if end > len(self.data):
+            raise ValueError('Unexpected end of CBOR data')
+        self.offset = end
+        return self.data[offset:end]
+
+    def decode_head(self):
+        initial = self.data[self.offset]
+        self.offset += 1
+        major = initial >> 5
+        info = initial & 0x1f
+        if info < 24:
+            return major, info
+        if info == 24:
+            return major, self.read(1)[0]
+        if info == 25:
+            return major, _STRUCT_UINT16.unpack(self.read(2))[0]
+        if info == 26:
+            return major, _STRUCT_UINT32.unpack(self.read(4))[0]
+        if info == 27:
+            return major, _STRUCT_UINT64.unpack(self.read(8))[0]
+        if info == 31 and major in (_MAJOR_BYTES, _MAJOR_TEXT, _MAJOR_ARRAY, _MAJOR_MAP, _MAJOR_SIMPLE):
+            return major, None
+        raise ValueError(f'Invalid CBOR additional information {info}')
+
+    def decode_string(self, major, length):
+        if length is not None:
+            value = self.read(length)
+        else:
+            # Indefinite-length string - concatenate definite-length chunks of the same major type
+            chunks = []
+            while self.data[self.offset] != 0xff:
+                chunk_major, chunk_length = self.decode_head()
+                if chunk_major != major or chunk_length is None:
+                    raise ValueError('Invalid CBOR indefinite-length string chunk')
+                chunks.append(self.read(chunk_length))
+            self.offset += 1
+            value = b''.join(chunks)
+        if major == _MAJOR_TEXT:
+            try:
+                return value.decode('utf-8')
+            except UnicodeDecodeError:
+                raise ValueError('Invalid CBOR text string') from None
+        return value
+
+    def decode(self):
+        # Float?
+        initial = self.data[self.offset]
+        if initial == 0xfb:
+            self.offset += 1
+            return _STRUCT_DOUBLE.unpack(self.read(8))[0]
+        if initial == 0xfa:
+            self.offset += 1
+            return _STRUCT_SINGLE.unpack(self.read(4))[0]
+        if initial == 0xf9:
+            self.offset += 1
+            return _STRUCT_HALF.unpack(self.read(2))[0]
+
+        major, length = self.decode_head()
+
+        # Integer?
+        if major == _MAJOR_UINT:
+            return length
+        if major == _MAJOR_NEGINT:
+            return -1 - length
+
+        # String?
+        if major in (_MAJOR_BYTES, _MAJOR_TEXT):
+            return self.decode_string(major, length)
+
+        # Array?
+        if major == _MAJOR_ARRAY:
+            if length is not None:
+                return [self.decode() for _ in range(length)]
+            value = []
+            while self.data[self.offset] != 0xff:
+                value.append(self.decode())
+            self.offset += 1
+            return value
+
+        # Map?
+        if major == _MAJOR_MAP:
+            value = {}
+            ix_member = 0
+            while (ix_member < length) if length is not None else (self.data[self.offset] != 0xff):
+                member_name = self.decode()
+                try:
+                    value[member_name] = self.decode()
+                except TypeError:
+                    raise ValueError('Invalid CBOR map key') from None
+                ix_member += 1
+            if length is None:
+                self.offset += 1
+            return value
+
+        # Tag?
+        if major == _MAJOR_TAG:
+            return self.decode_tag(length, self.decode())
+
+        # Simple value
+        if length == 20:
+            return False
+        if length == 21:
+            return True
+        if length in (22, 23):
+            return None
+        if length is None:
+            raise ValueError('Unexpected CBOR break')
+        raise ValueError(f'Unsupported CBOR simple value {length}')
+
+    @staticmethod
+    def decode_tag(tag, value):
+        try:
+            if tag == _TAG_DATETIME and isinstance(value, str):
+                value_datetime = datetime.fromisoformat(value)
+                return value_datetime if value_datetime.tzinfo else value_datetime.replace(tzinfo=timezone.utc)
+            if tag == _TAG_EPOCH and isinstance(value, (int, float)) and not isinstance(value, bool):
+                return _EPOCH + timedelta(seconds=value)
+            if tag in (_TAG_BIGNUM, _TAG_NEGBIGNUM) and isinstance(value, bytes):
+                value_int = int.from_bytes(value, 'big')
+                return value_int if tag == _TAG_BIGNUM else -1 - value_int
+            if tag == _TAG_UUID and isinstance(value, bytes):
+                return UUID(bytes=value)
+            if tag == _TAG_DATE and isinstance(value, str):
+                return date.fromisoformat(value)
+            if tag == _TAG_EPOCH_DATE and isinstance(value, int) and not isinstance(value, bool):
+                return _EPOCH_DATE + timedelta(days=value)
+        except (ValueError, OverflowError):
+            raise ValueError(f'Invalid CBOR tag {tag} value') from None
+        return value
@@ -0,0 +1,197 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Chisel columnar JSON encoding
+"""
+
+from schema_markdown import get_struct_members
+
+
+def encode_columnar(types, type_name, value):
+    """
+    Encode a value's struct arrays as columnar (struct-of-arrays) objects using the schema-markdown user type model.
+    For example, the struct array:
+
+    >>> from chisel.columnar import decode_columnar, encode_columnar
+    >>> from schema_markdown import parse_schema_markdown
+    >>> types = parse_schema_markdown('''
+    ... struct Row
+    ...     int a
+    ...     optional string b
+    ...
+    ... struct Rows
+    ...     Row[] rows
+    ... ''')
+    >>> encode_columnar(types, 'Rows', {'rows': [{'a': 1, 'b': 'x'}, {'a': 2}]})
+    {'rows': {'columns': ['a', 'b'], 'data': {'a': [1, 2], 'b': ['x', None]}, 'absent': {'b': [1]}}}
+
+    The columns are the struct's members. Each column's data array has a value for each row - missing optional member
+    values are null and their row indexes are listed in the optional "absent" object. Arrays of union structs,
+    member-less structs, and nullable structs are not encoded. The value should be type-validated.
+
+    :param dict types: The type model
+    :param str type_name: The type name
+    :param object value: The value object to encode
+    :returns: The columnar-encoded value. Container values are copied.
+    """
+
+    return _encode_columnar(types, {'user': type_name}, value)
+
+
+def decode_columnar(types, type_name, value):
+    """
+    Decode a value encoded with :func:`~chisel.columnar.encode_columnar` using the same type model. Absent row member
+    values are omitted from the decoded structs.
+
+    :param dict types: The type model
+    :param str type_name: The type name
+    :param object value: The columnar-encoded value object
+    :returns: The decoded value
+    :raises ValueError: The columnar-encoded value is invalid
+    """
+
+    return _decode_columnar(types, {'user': type_name}, value)
+
+
+# Helper to get an array's columnar row struct - returns None if the array is not columnar-encoded
+def _get_columnar_struct(types, array):
+    array_attr = array.get('attr')
+    if array_attr is not None and array_attr.get('nullable'):
+        return None
+    type_ = array['type']
+    while 'user' in type_:
+        user_type = types.get(type_['user'])
+        if user_type is None:
+            return None
+        if 'struct' in user_type:
+            struct = user_type['struct']
+            if struct.get('union') or not get_struct_members(types, struct):
+                return None
+            return struct
+        if 'typedef' not in user_type:
+            return None
+        typedef = user_type['typedef']
+        typedef_attr = typedef.get('attr')
+        if typedef_attr is not None and typedef_attr.get('nullable'):
+            return None
+        type_ = typedef['type']
+    return None
+
+
+def _encode_columnar(types, type_, value):
+    if value is None:
+        return value
+
+    # array?
+    if 'array' in type_:
+        array = type_['array']
+        if not isinstance(value, (list, tuple)):
+            return value
+
+        # Struct array? Encode as columns.
+        struct = _get_columnar_struct(types, array)
+        if struct is not None and all(isinstance(row, dict) for row in value):
+            columns = []
+            data = {}
+            absent = {}
+            for member in get_struct_members(types, struct):
+                member_name = member['name']
+                member_type = member['type']
+                columns.append(member_name)
+                column_absent = [ix_row for ix_row, row in enumerate(value) if member_name not in row]
+                if column_absent:
+                    absent[member_name] = column_absent
+                data[member_name] = [_encode_columnar(types, member_type, row.get(member_name)) for row in value]
+            value_columnar = {'columns': columns, 'data': data}
+            if absent:
+                value_columnar['absent'] = absent
+            return value_columnar
+
+        return [_encode_columnar(types, array['type'], array_value) for array_value in value]
+
+    # dict?
+    if 'dict' in type_:
+        if not isinstance(value, dict):
+            return value
+        dict_type = type_['dict']['type']
+        return {dict_key: _encode_columnar(types, dict_type, dict_value) for dict_key, dict_value in value.items()}
+
+    # User type?
+    if 'user' in type_:
+        user_type = types.get(type_['user'])
+        if user_type is None:
+            return value
+        if 'typedef' in user_type:
+            return _encode_columnar(types, user_type['typedef']['type'], value)
+        if 'struct' in user_type and isinstance(value, dict):
+            members = get_struct_members(types, user_type['struct'])
+            member_types = {member['name']: member['type'] for member in members}
+            return {
+                member_name: _encode_columnar(types, member_types[member_name], member_value)
+                if member_name in member_types else member_value
+                for member_name, member_value in value.items()
+            }
+
+    return value
+
+
+def _decode_columnar(types, type_, value):
+    if value is None:
+        return value
+
+    # array?
+    if 'array' in type_:
+        array = type_['array']
+
+        # Struct array? Decode from columns.
+        struct = _get_columnar_struct(types, array)
+        if struct is not None:
+            if not isinstance(value, dict) or not isinstance(value.get('columns'), list) or \
+               not isinstance(value.get('data'), dict):
+                raise ValueError('Invalid columnar value')
+            columns = value['columns']
+            data = value['data']
+            absent = value.get('absent', {})
+            member_types = {member['name']: member['type'] for member in get_struct_members(types, struct)}
+            row_count = len(data[columns[0]]) if columns and columns[0] in data else 0
+            rows = [{} for _ in range(row_count)]
+            for column in columns:
+                column_data = data.get(column)
+                if column not in member_types or not isinstance(column_data, list) or len(column_data) != row_count:
+                    raise ValueError(f'Invalid columnar column {column!r:.100s}')
+                column_absent = set(absent.get(column, ()))
+                column_type = member_types[column]
+                for ix_row, column_value in enumerate(column_data):
+                    if ix_row not in column_absent:
+                        rows[ix_row][column] = _decode_columnar(types, column_type, column_value)
+            return rows
+
+        if not isinstance(value, list):
+            return value
+        return [_decode_columnar(types, array['type'], array_value) for array_value in value]
+
+    # dict?
+    if 'dict' in type_:
+        if not isinstance(value, dict):
+            return value
+        dict_type = type_['dict']['type']
+        return {dict_key: _decode_columnar(types, dict_type, dict_value) for dict_key, dict_value in value.items()}
+
+    # User type?
+    if 'user' in type_:
+        user_type = types.get(type_['user'])
+        if user_type is None:
+            return value
+        if 'typedef' in user_type:
+            return _decode_columnar(types, user_type['typedef']['type'], value)
+        if 'struct' in user_type and isinstance(value, dict):
+            members = get_struct_members(types, user_type['struct'])
+            member_types = {member['name']: member['type'] for member in members}
+            return {
+                member_name: _decode_columnar(types, member_types[member_name], member_value)
+                if member_name in member_types else member_value
+                for member_name, member_value in value.items()
+            }
+
+    return value
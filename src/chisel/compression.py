@@ -0,0 +1,549 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Chisel request and response content compression
+"""
+
+from collections import OrderedDict
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+
+from schema_markdown import get_enum_values, get_struct_members
+
+try:
+    from compression import zstd
+except ImportError: # pragma: no cover
+    zstd = None
+
+
+#: The request content read size, in bytes
+DECOMPRESS_CHUNK_SIZE = 64 * 1024
+
+
+# The decompression error exception types
+_DECOMPRESS_ERRORS = (zlib.error, EOFError) if zstd is None else (zlib.error, EOFError, zstd.ZstdError)
+
+
+def get_content_encodings():
+    """
+    Get the supported content encodings. The "zstd" encoding requires Python 3.14 or later.
+
+    :returns: The tuple of supported content encoding names
+    :rtype: tuple
+    """
+
+    return ('gzip', 'x-gzip', 'zstd') if zstd is not None else ('gzip', 'x-gzip')
+
+
+def get_encoded_etag(etag, content_encoding):
+    """
+    Get the entity-tag of a content-encoded representation - the content encoding is appended to the opaque tag, so a
+    compressed representation's ETag differs from the uncompressed representation's ETag.
+
+    >>> from chisel.compression import get_encoded_etag
+    >>> get_encoded_etag('"abc"', 'gzip')
+    '"abc-gzip"'
+    >>> get_encoded_etag('W/"abc"', 'zstd')
+    'W/"abc-zstd"'
+
+    :param str etag: The uncompressed representation's entity-tag
+    :param str content_encoding: The content encoding
+    :returns: The content-encoded representation's entity-tag
+    :rtype: str
+    """
+
+    if etag.endswith('"'):
+        return f'{etag[:-1]}-{content_encoding}"'
+    return f'{etag}-{content_encoding}'
+
+
+class DecompressionLimitError(ValueError):
+    """
+    Raised when decompressed content exceeds its size limit
+    """
+
+
+def decompress_stream(stream, content_encoding, max_bytes, chunk_size=DECOMPRESS_CHUNK_SIZE):
+    """
+    Read and decompress a compressed content stream. The decompressed-size limit is enforced as the content is
+    decompressed, so the content is rejected as soon as the limit is exceeded.
+
+    >>> import gzip
+    >>> from io import BytesIO
+    >>> from chisel.compression import decompress_stream
+    >>> decompress_stream(BytesIO(gzip.compress(b'Hello')), 'gzip', 1024)
+    (b'Hello', 25)
+
+    :param stream: The compressed content file-like object (e.g. "wsgi.input")
+    :param str content_encoding: The content encoding (e.g. "gzip"). See :func:`~chisel.compression.get_content_encodings`.
+    :param int max_bytes: The maximum decompressed content size, in bytes
+    :param int chunk_size: The stream read size, in bytes
+    :returns: The decompressed content bytes and the compressed content size tuple
+    :raises DecompressionLimitError: The decompressed content exceeds the size limit
+    :raises ValueError: The content encoding is unsupported or the compressed content is invalid
+    """
+
+    create_decompressor = _get_decompressor_factory(content_encoding)
+    decompressor = create_decompressor()
+    parts = []
+    size = 0
+    compressed_size = 0
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            compressed_size += len(chunk)
+
+            # Decompress the chunk - concatenated members (frames) are decompressed in sequence
+            while chunk:
+                if decompressor.eof:
+                    decompressor = create_decompressor()
+                part = decompressor.decompress(chunk, max_bytes - size + 1)
+                size += len(part)
+                if size > max_bytes:
+                    raise DecompressionLimitError(f'Decompressed content exceeds {max_bytes} bytes')
+                parts.append(part)
+                chunk = decompressor.unused_data if decompressor.eof else b''
+    except _DECOMPRESS_ERRORS as exc:
+        raise ValueError(f'Invalid {content_encoding} content: {exc}') from None
+    if compressed_size and not decompressor.eof:
+        raise ValueError(f'Invalid {content_encoding} content: truncated')
+    return b''.join(parts), compressed_size
+
+
+def _get_decompressor_factory(content_encoding):
+    if content_encoding in ('gzip', 'x-gzip'):
+        return lambda: zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if content_encoding == 'zstd' and zstd is not None: # pragma: no cover
+        return zstd.ZstdDecompressor
+    raise ValueError(f'Unsupported content encoding {content_encoding!r:.100s}')
+
+
+class CompressionMetrics:
+    """
+    Thread-safe compression metrics - the count of compressed contents and their compressed and uncompressed sizes
+    """
+
+    __slots__ = ('count', 'compressed_bytes', 'uncompressed_bytes', '_lock')
+
+    def __init__(self):
+
+        #: The count of compressed contents
+        self.count = 0
+
+        #: The total compressed size, in bytes
+        self.compressed_bytes = 0
+
+        #: The total uncompressed size, in bytes
+        self.uncompressed_bytes = 0
+
+        self._lock = threading.Lock()
+
+    @property
+    def ratio(self):
+        """The compression ratio (uncompressed size / compressed size) or None if there is no compressed content"""
+        with self._lock:
+            return self.uncompressed_bytes / self.compressed_bytes if self.compressed_bytes else None
+
+    def add(self, compressed_bytes, uncompressed_bytes):
+        """
+        Add a compressed content's sizes
+
+        :param int compressed_bytes: The compressed size, in bytes
+        :param int uncompressed_bytes: The uncompressed size, in bytes
+        """
+
+        with self._lock:
+            self.count += 1
+            self.compressed_bytes += compressed_bytes
+            self.uncompressed_bytes += uncompressed_bytes
+
+
+# Regex for matching compressible content types
+_RE_COMPRESSIBLE_CONTENT_TYPE = re.compile(r'^\s*(?:text/|[^;]*(?:json|javascript|xml|cbor))', re.IGNORECASE)
+
+
+class ResponseCompression:
+    """
+    Response compression settings and state. Set the :attr:`~chisel.Application.compression` attribute to enable
+    response compression. Responses at least "min_bytes" in size are compressed using the client's preferred
+    "Accept-Encoding" content encoding - "zstd" (Python 3.14 or later) or "gzip". Compressed content for responses
+    with an "ETag" header (e.g. static resources) is cached by ETag, content digest, and content encoding, so it is
+    compressed only once. A compressed response's ETag is made specific to its content encoding (see
+    :func:`~chisel.compression.get_encoded_etag`). Only text, JSON, JavaScript, XML, and CBOR content types are
+    compressed.
+
+    :param int min_bytes: The minimum response content size, in bytes, to compress
+    :param int gzip_level: The gzip compression level (1-9)
+    :param int zstd_level: The zstd compression level
+    :param float backoff_load: If not None, the 1-minute load average per CPU at or above which the fastest compression
+        level is used. The load average is sampled at most once per second.
+    :param int cache_bytes: The maximum total size, in bytes, of the cached compressed content
+    """
+
+    __slots__ = (
+        'min_bytes',
+        'gzip_level',
+        'zstd_level',
+        'backoff_load',
+        'cache',
+        'metrics',
+        '_backoff',
+        '_backoff_time'
+    )
+
+    def __init__(self, min_bytes=1024, gzip_level=6, zstd_level=3, backoff_load=None, cache_bytes=16 * 1024 * 1024):
+
+        #: The minimum response content size, in bytes, to compress
+        self.min_bytes = min_bytes
+
+        #: The gzip compression level
+        self.gzip_level = gzip_level
+
+        #: The zstd compression level
+        self.zstd_level = zstd_level
+
+        #: The 1-minute load average per CPU at or above which the fastest compression level is used, or None
+        self.backoff_load = backoff_load
+
+        #: The compressed content cache
+        self.cache = CompressionCache(cache_bytes)
+
+        #: The response compression metrics
+        self.metrics = CompressionMetrics()
+
+        self._backoff = False
+        self._backoff_time = None
+
+    @staticmethod
+    def is_compressible(content_type):
+        """
+        Determine if a content type is compressible
+
+        :param str content_type: The content type
+        :rtype: bool
+        """
+
+        return _RE_COMPRESSIBLE_CONTENT_TYPE.match(content_type) is not None
+
+    @staticmethod
+    def negotiate(accept_encoding):
+        """
+        Get the preferred supported content encoding for an "Accept-Encoding" request header value. If the client
+        prefers "zstd" and "gzip" equally, "zstd" is preferred.
+
+        :param str accept_encoding: The "Accept-Encoding" request header value or None
+        :returns: The content encoding or None if the response should not be compressed
+        :rtype: str
+        """
+
+        if not accept_encoding:
+            return None
+        qualities = {}
+        for coding in accept_encoding.split(','):
+            coding_name, *params = coding.split(';')
+            quality = 1
+            for param in params:
+                param_name, _, param_value = param.partition('=')
+                if param_name.strip().lower() == 'q':
+                    try:
+                        quality = float(param_value)
+                    except ValueError:
+                        quality = 0
+            qualities[coding_name.strip().lower()] = quality
+        wildcard_quality = qualities.get('*', 0)
+        best_encoding = None
+        best_quality = 0
+        for content_encoding in ('zstd', 'gzip') if zstd is not None else ('gzip',):
+            quality = qualities.get(content_encoding, wildcard_quality)
+            if quality > best_quality:
+                best_encoding = content_encoding
+                best_quality = quality
+        return best_encoding
+
+    def compress(self, content, content_encoding, etag=None):
+        """
+        Compress response content
+
+        :param bytes content: The response content
+        :param str content_encoding: The content encoding - "gzip" or "zstd"
+        :param str etag: The response's ETag, if any. Compressed content with an ETag is cached. Since different
+            resources may have the same ETag, the cache key includes a digest of the content.
+        :returns: The compressed content
+        :rtype: bytes
+        """
+
+        # Cached?
+        if etag is not None:
+            cache_key = (etag, hashlib.blake2b(content, digest_size=16).digest(), content_encoding)
+            content_compressed = self.cache.get(cache_key)
+            if content_compressed is not None:
+                return content_compressed
+
+        # Compress the content - use the fastest compression level if the CPU is saturated
+        backoff = self._is_cpu_saturated()
+        if content_encoding == 'zstd' and zstd is not None: # pragma: no cover
+            content_compressed = zstd.compress(content, level=1 if backoff else self.zstd_level)
+        else:
+            content_compressed = gzip.compress(content, compresslevel=1 if backoff else self.gzip_level, mtime=0)
+        self.metrics.add(len(content_compressed), len(content))
+
+        if etag is not None:
+            self.cache.add(cache_key, content_compressed)
+        return content_compressed
+
+    def _is_cpu_saturated(self):
+        if self.backoff_load is None or not hasattr(os, 'getloadavg'):
+            return False
+        now = time.monotonic()
+        if self._backoff_time is None or now - self._backoff_time >= 1:
+            self._backoff_time = now
+            self._backoff = os.getloadavg()[0] / (os.cpu_count() or 1) >= self.backoff_load
+        return self._backoff
+
+
+class CompressionCache:
+    """
+    A thread-safe, bounded cache of compressed content. The least recently used content is evicted when the total
+    content size limit is exceeded.
+
+    :param int max_bytes: The maximum total size, in bytes, of the cached content
+    """
+
+    __slots__ = ('max_bytes', '_content', '_bytes', '_lock')
+
+    def __init__(self, max_bytes):
+
+        #: The maximum total size, in bytes, of the cached content
+        self.max_bytes = max_bytes
+
+        self._content = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._content)
+
+    @property
+    def size(self):
+        """The total size, in bytes, of the cached content"""
+        return self._bytes
+
+    def add(self, key, content):
+        """
+        Add content to the cache. Content larger than the total size limit is not cached.
+
+        :param key: The content's cache key
+        :param bytes content: The content
+        """
+
+        with self._lock:
+            if key in self._content or len(content) > self.max_bytes:
+                return
+            self._content[key] = content
+            self._bytes += len(content)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._content.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def get(self, key):
+        """
+        Get cached content
+
+        :param key: The content's cache key
+        :returns: The content or None if the content is not cached
+        :rtype: bytes
+        """
+
+        with self._lock:
+            content = self._content.get(key)
+            if content is not None:
+                self._content.move_to_end(key)
+            return content
+
+
+#: The zstd dictionary ID request and response header. Responses from actions with a zstd dictionary advertise the
+#: dictionary's ID with this header. Clients that have the dictionary send its ID with this header.
+ZSTD_DICTIONARY_HEADER = 'Chisel-Zstd-Dictionary'
+
+
+class ZstdDictionary:
+    """
+    A trained zstd compression dictionary. Requires Python 3.14 or later. See
+    :func:`~chisel.compression.train_zstd_dictionary`.
+
+    :param bytes content: The dictionary content
+    """
+
+    __slots__ = ('content', 'dict_id', '_zstd_dict')
+
+    def __init__(self, content):
+        assert zstd is not None, 'zstd dictionaries require Python 3.14 or later'
+
+        #: The dictionary content
+        self.content = content
+
+        self._zstd_dict = zstd.ZstdDict(content)
+
+        #: The dictionary ID string
+        self.dict_id = str(self._zstd_dict.dict_id)
+
+    def compress(self, content, level=3):
+        """
+        Compress content with the dictionary
+
+        :param bytes content: The content
+        :param int level: The zstd compression level
+        :returns: The compressed content
+        :rtype: bytes
+        """
+
+        return zstd.compress(content, level=level, zstd_dict=self._zstd_dict)
+
+    def decompress(self, content):
+        """
+        Decompress content compressed with the dictionary
+
+        :param bytes content: The compressed content
+        :returns: The decompressed content
+        :rtype: bytes
+        """
+
+        return zstd.decompress(content, zstd_dict=self._zstd_dict)
+
+
+def train_zstd_dictionary(samples, dict_size=16 * 1024, types=None, type_name=None):
+    """
+    Train a zstd compression dictionary from response content samples (see :class:`~chisel.compression.ResponseSamples`).
+    Requires Python 3.14 or later.
+
+    :param list(bytes) samples: The response content samples
+    :param int dict_size: The maximum dictionary size, in bytes
+    :param dict types: Optional type model. If provided, a synthetic sample with all of the type's member names is
+        included in the training samples.
+    :param str type_name: The response type name
+    :returns: The dictionary content
+    :rtype: bytes
+    """
+
+    assert zstd is not None, 'zstd dictionaries require Python 3.14 or later'
+    samples = list(samples)
+    if types is not None:
+        sample = json.dumps(_type_model_sample(types, {'user': type_name}, set()), sort_keys=True, separators=(',', ':'))
+        samples.append(sample.encode('utf-8'))
+    return zstd.train_dict(samples, dict_size).dict_content
+
+
+# Helper to create a synthetic JSON value with a type model's member names
+def _type_model_sample(types, type_, user_types):
+    if 'array' in type_:
+        return [_type_model_sample(types, type_['array']['type'], user_types)]
+    if 'dict' in type_:
+        return {'': _type_model_sample(types, type_['dict']['type'], user_types)}
+    if 'builtin' in type_:
+        return _BUILTIN_SAMPLES.get(type_['builtin'])
+
+    # Recursive user type?
+    type_name = type_['user']
+    user_type = types.get(type_name)
+    if user_type is None or type_name in user_types:
+        return None
+    user_types = user_types | {type_name}
+    if 'typedef' in user_type:
+        return _type_model_sample(types, user_type['typedef']['type'], user_types)
+    if 'enum' in user_type:
+        enum_values = get_enum_values(types, user_type['enum'])
+        return enum_values[0]['name'] if enum_values else None
+    if 'struct' in user_type:
+        members = get_struct_members(types, user_type['struct'])
+        return {member['name']: _type_model_sample(types, member['type'], user_types) for member in members}
+    return None
+
+
+_BUILTIN_SAMPLES = {
+    'string': '',
+    'int': 0,
+    'float': 0.5,
+    'bool': False,
+    'date': '2000-01-01',
+    'datetime': '2000-01-01T00:00:00+00:00',
+    'uuid': '00000000-0000-0000-0000-000000000000'
+}
+
+
+class ResponseSamples:
+    """
+    A thread-safe, fixed-size uniform random sample of response contents (reservoir sampling)
+
+    :param int max_samples: The maximum number of samples
+    """
+
+    __slots__ = ('max_samples', 'count', '_samples', '_lock')
+
+    def __init__(self, max_samples):
+
+        #: The maximum number of samples
+        self.max_samples = max_samples
+
+        #: The count of sampled response contents
+        self.count = 0
+
+        self._samples = []
+        self._lock = threading.Lock()
+
+    @property
+    def samples(self):
+        """The list of sampled response contents"""
+        with self._lock:
+            return list(self._samples)
+
+    def add(self, content):
+        """
+        Add a response content to the sample
+
+        :param bytes content: The response content
+        """
+
+        with self._lock:
+            self.count += 1
+            if len(self._samples) < self.max_samples:
+                self._samples.append(content)
+            else:
+                ix_sample = random.randrange(self.count)
+                if ix_sample < self.max_samples:
+                    self._samples[ix_sample] = content
+
+
+def decode_response_content(headers, content, zstd_dictionaries=None):
+    """
+    Decode response content per its "Content-Encoding" response header - a client helper. Content compressed with a
+    zstd dictionary is decompressed using the dictionary named by the response's
+    :data:`~chisel.compression.ZSTD_DICTIONARY_HEADER` header.
+
+    :param list(tuple) headers: The response header key/value tuples
+    :param bytes content: The response content
+    :param dict zstd_dictionaries: Optional map of dictionary ID to :class:`~chisel.compression.ZstdDictionary`
+    :returns: The decoded content
+    :rtype: bytes
+    :raises ValueError: The content encoding is unsupported
+    """
+
+    header_map = {key.lower(): value for key, value in headers}
+    content_encoding = header_map.get('content-encoding', 'identity').strip().lower()
+    if content_encoding == 'identity':
+        return content
+    if content_encoding in ('gzip', 'x-gzip'):
+        return gzip.decompress(content)
+    if content_encoding == 'zstd' and zstd is not None: # pragma: no cover
+        dictionary = (zstd_dictionaries or {}).get(header_map.get(ZSTD_DICTIONARY_HEADER.lower()))
+        return dictionary.decompress(content) if dictionary is not None else zstd.decompress(content)
+    raise ValueError(f'Unsupported content encoding {content_encoding!r:.100s}')
@@ -0,0 +1,86 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Chisel request deadlines
+"""
+
+import asyncio
+import math
+import time
+
+
+#: The request timeout request header - the time, in seconds, remaining for the request (e.g. "2.5")
+DEADLINE_HEADER = 'X-Request-Timeout'
+
+#: The WSGI environ key of an in-process request's inherited deadline (see :meth:`~chisel.Context.request`)
+DEADLINE_ENVIRON = 'chisel.deadline'
+
+
+class DeadlineExceeded(Exception):
+    """
+    The request's deadline has passed. An action callback that raises this exception (e.g. from
+    :meth:`~chisel.Context.check_deadline`) responds with "504 Gateway Timeout" and the "Timeout" error.
+    """
+
+    __slots__ = ()
+
+
+def get_deadline(environ, timeout=None, now=None):
+    """
+    Get a request's deadline - the earliest of its inherited in-process deadline, its
+    :data:`~chisel.deadline.DEADLINE_HEADER` request header, and its request timeout
+
+    >>> from chisel.deadline import get_deadline
+    >>> get_deadline({'HTTP_X_REQUEST_TIMEOUT': '2.5'}, timeout=5, now=100)
+    102.5
+    >>> get_deadline({}, timeout=5, now=100)
+    105
+    >>> get_deadline({}) is None
+    True
+
+    :param dict environ: The :pep:`WSGI <3333>` environ dictionary
+    :param float timeout: The request's timeout, in seconds, or None
+    :param float now: The current :func:`~time.monotonic` time. If None, the current time is used.
+    :returns: The :func:`~time.monotonic` deadline or None if the request has no deadline. An invalid or non-finite
+        request header is ignored.
+    :rtype: float or None
+    """
+
+    deadline = environ.get(DEADLINE_ENVIRON)
+    header_timeout = environ.get('HTTP_X_REQUEST_TIMEOUT')
+    if header_timeout is not None or timeout is not None:
+        if now is None:
+            now = time.monotonic()
+        if header_timeout is not None:
+            try:
+                header_timeout = float(header_timeout)
+            except ValueError:
+                header_timeout = math.nan
+            if math.isfinite(header_timeout) and (deadline is None or now + header_timeout < deadline):
+                deadline = now + max(0.0, header_timeout)
+        if timeout is not None and (deadline is None or now + timeout < deadline):
+            deadline = now + timeout
+    return deadline
+
+
+async def wait_deadline(awaitable, deadline):
+    """
+    Await an awaitable until a deadline. If the deadline passes, the awaitable is cancelled.
+
+    :param ~collections.abc.Awaitable awaitable: The awaitable
+    :param float deadline: The :func:`~time.monotonic` deadline
+    :returns: The awaitable's result
+    :raises DeadlineExceeded: If the deadline passes before the awaitable completes
+    """
+
+    future = asyncio.ensure_future(awaitable)
+    try:
+        done, _ = await asyncio.wait((future,), timeout=max(0.0, deadline - time.monotonic()))
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    if not done:
+        future.cancel()
+        raise DeadlineExceeded()
+    return future.result()
@@ -0,0 +1,226 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Chisel delta responses - JSON Patch (RFC 6902) generation and retained response versions
+"""
+
+from collections import OrderedDict
+import copy
+import threading
+
+
+#: The JSON Patch content type
+JSON_PATCH_CONTENT_TYPE = 'application/json-patch+json'
+
+
+def json_patch(source, target):
+    """
+    Compute a `JSON Patch <https://www.rfc-editor.org/rfc/rfc6902>`__ that transforms a source JSON value to a target
+    JSON value.
+
+    >>> from chisel.delta import apply_json_patch, json_patch
+    >>> patch = json_patch({'a': [1, 2], 'b': 'x'}, {'a': [1, 3]})
+    >>> patch
+    [{'op': 'remove', 'path': '/b'}, {'op': 'replace', 'path': '/a/1', 'value': 3}]
+    >>> apply_json_patch({'a': [1, 2], 'b': 'x'}, patch)
+    {'a': [1, 3]}
+
+    :param object source: The source JSON value
+    :param object target: The target JSON value
+    :returns: The list of JSON Patch operation objects
+    :rtype: list
+    """
+
+    operations = []
+    _json_patch(source, target, '', operations)
+    return operations
+
+
+def _json_patch(source, target, path, operations):
+    if isinstance(source, dict) and isinstance(target, dict):
+        for key in source:
+            if key not in target:
+                operations.append({'op': 'remove', 'path': f'{path}/{_escape_pointer(key)}'})
+        for key, target_value in target.items():
+            if key in source:
+                _json_patch(source[key], target_value, f'{path}/{_escape_pointer(key)}', operations)
+        for key, target_value in target.items():
+            if key not in source:
+                operations.append({'op': 'add', 'path': f'{path}/{_escape_pointer(key)}', 'value': target_value})
+    elif isinstance(source, list) and isinstance(target, list):
+        for ix_value in range(min(len(source), len(target))):
+            _json_patch(source[ix_value], target[ix_value], f'{path}/{ix_value}', operations)
+        for ix_value in range(len(source) - 1, len(target) - 1, -1):
+            operations.append({'op': 'remove', 'path': f'{path}/{ix_value}'})
+        for target_value in target[len(source):]:
+            operations.append({'op': 'add', 'path': f'{path}/-', 'value': target_value})
+    elif type(source) is not type(target) or source != target:
+        operations.append({'op': 'replace', 'path': path, 'value': target})
+
+
+def _escape_pointer(key):
+    return key.replace('~', '~0').replace('/', '~1')
+
+
+def apply_json_patch(document, patch):
+    """
+    Apply a `JSON Patch <https://www.rfc-editor.org/rfc/rfc6902>`__ to a JSON value. The "add", "remove", "replace",
+    "move", "copy", and "test" operations are supported.
+
+    :param object document: The JSON value. The value is not modified.
+    :param list patch: The list of JSON Patch operation objects
+    :returns: The patched JSON value
+    :raises ValueError: The patch is invalid or cannot be applied
+    """
+
+    document = copy.deepcopy(document)
+    for operation in patch:
+        try:
+            op_name = operation['op']
+            path = operation['path']
+            if op_name == 'add':
+                document = _pointer_add(document, path, copy.deepcopy(operation['value']))
+            elif op_name == 'remove':
+                document, _ = _pointer_remove(document, path)
+            elif op_name == 'replace':
+                document, _ = _pointer_remove(document, path)
+                document = _pointer_add(document, path, copy.deepcopy(operation['value']))
+            elif op_name == 'move':
+                document, value = _pointer_remove(document, operation['from'])
+                document = _pointer_add(document, path, value)
+            elif op_name == 'copy':
+                document = _pointer_add(document, path, copy.deepcopy(_pointer_get(document, operation['from'])))
+            elif op_name == 'test':
+                if _pointer_get(document, path) != operation['value']:
+                    raise ValueError(f'JSON Patch test failed for path {path!r:.100s}')
+            else:
+                raise ValueError(f'Unknown JSON Patch operation {op_name!r:.100s}')
+        except (KeyError, IndexError, TypeError):
+            raise ValueError(f'Invalid JSON Patch operation {operation!r:.200s}') from None
+    return document
+
+
+# Helper to split a JSON Pointer into its parent pointer tokens and its final token
+def _pointer_split(pointer):
+    if not pointer.startswith('/'):
+        raise ValueError(f'Invalid JSON Pointer {pointer!r:.100s}')
+    tokens = [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+    return tokens[:-1], tokens[-1]
+
+
+def _pointer_index(container, token, allow_end=False):
+    if isinstance(container, list):
+        if allow_end and token == '-':
+            return len(container)
+        if not token.isdigit() or (len(token) > 1 and token.startswith('0')):
+            raise ValueError(f'Invalid JSON Pointer array index {token!r:.100s}')
+        index = int(token)
+        if index > len(container) or (index == len(container) and not allow_end):
+            raise ValueError(f'JSON Pointer array index {index} out of range')
+        return index
+    if isinstance(container, dict):
+        return token
+    raise ValueError(f'Invalid JSON Pointer token {token!r:.100s}')
+
+
+def _pointer_get(document, pointer):
+    if pointer == '':
+        return document
+    parent_tokens, token = _pointer_split(pointer)
+    value = document
+    for parent_token in parent_tokens + [token]:
+        value = value[_pointer_index(value, parent_token)]
+    return value
+
+
+def _pointer_add(document, pointer, value):
+    if pointer == '':
+        return value
+    parent_tokens, token = _pointer_split(pointer)
+    parent = document
+    for parent_token in parent_tokens:
+        parent = parent[_pointer_index(parent, parent_token)]
+    index = _pointer_index(parent, token, allow_end=True)
+    if isinstance(parent, list):
+        parent.insert(index, value)
+    else:
+        parent[index] = value
+    return document
+
+
+def _pointer_remove(document, pointer):
+    if pointer == '':
+        return None, document
+    parent_tokens, token = _pointer_split(pointer)
+    parent = document
+    for parent_token in parent_tokens:
+        parent = parent[_pointer_index(parent, parent_token)]
+    return document, parent.pop(_pointer_index(parent, token))
+
+
+class DeltaVersions:
+    """
+    A thread-safe, bounded store of an action's recently-serialized response versions, keyed by ETag. The least
+    recently used versions are evicted when either the version count or the total content size limit is exceeded.
+
+    :param int max_versions: The maximum number of retained versions
+    :param int max_bytes: The maximum total size, in bytes, of the retained versions
+    """
+
+    __slots__ = ('max_versions', 'max_bytes', '_versions', '_bytes', '_lock')
+
+    def __init__(self, max_versions, max_bytes):
+
+        #: The maximum number of retained versions
+        self.max_versions = max_versions
+
+        #: The maximum total size, in bytes, of the retained versions
+        self.max_bytes = max_bytes
+
+        self._versions = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._versions)
+
+    @property
+    def size(self):
+        """The total size, in bytes, of the retained versions"""
+        return self._bytes
+
+    def add(self, etag, content):
+        """
+        Add a response version. Content larger than the total size limit is not retained.
+
+        :param str etag: The version's ETag
+        :param bytes content: The version's serialized content
+        """
+
+        with self._lock:
+            if etag in self._versions:
+                self._versions.move_to_end(etag)
+                return
+            if len(content) > self.max_bytes:
+                return
+            self._versions[etag] = content
+            self._bytes += len(content)
+            while len(self._versions) > self.max_versions or self._bytes > self.max_bytes:
+                _, evicted = self._versions.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def get(self, etag):
+        """
+        Get a response version's serialized content
+
+        :param str etag: The version's ETag
+        :returns: The version's serialized content or None if the version is not retained
+        :rtype: bytes
+        """
+
+        with self._lock:
+            content = self._versions.get(etag)
+            if content is not None:
+                self._versions.move_to_end(etag)
+            return content
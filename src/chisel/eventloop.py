@@ -0,0 +1,205 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Chisel event loop utilities for async callbacks
+"""
+
+import asyncio
+import threading
+
+
+class EventLoopThread:
+    """
+    A shared :mod:`asyncio` event loop running on a daemon thread. Synchronous code (e.g. a WSGI request thread) uses
+    it to run awaitables, such as async action callbacks, to completion. The thread is started on first use.
+
+    >>> import asyncio
+    >>> from chisel.eventloop import EventLoopThread
+    >>> async def add(a, b):
+    ...     await asyncio.sleep(0)
+    ...     return a + b
+    ...
+    >>> event_loop = EventLoopThread()
+    >>> event_loop.run(add(1, 2))
+    3
+    >>> event_loop.close()
+
+    Don't call :meth:`~chisel.eventloop.EventLoopThread.run` from a coroutine running on the event loop - it waits
+    for the event loop and so never completes.
+    """
+
+    __slots__ = ('_loop', '_thread', '_lock')
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        """The event loop. The event loop thread is started, if necessary."""
+
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name='chisel-event-loop', daemon=True)
+                thread.start()
+                self._loop = loop
+                self._thread = thread
+            return self._loop
+
+    def run(self, awaitable):
+        """
+        Run an awaitable on the event loop and wait for its result
+
+        :param ~collections.abc.Awaitable awaitable: The awaitable (e.g. a coroutine)
+        :returns: The awaitable's result
+        :raises Exception: The awaitable's exception
+        """
+
+        return asyncio.run_coroutine_threadsafe(_await(awaitable), self.loop).result()
+
+    def iterate(self, async_iterable):
+        """
+        Iterate an asynchronous iterable on the event loop. When the returned generator is closed, the asynchronous
+        iterator is closed, if it has an "aclose" method (e.g. an async generator).
+
+        :param ~collections.abc.AsyncIterable async_iterable: The asynchronous iterable
+        :returns: A generator of the asynchronous iterable's values
+        """
+
+        iterator = aiter(async_iterable)
+        try:
+            while True:
+                try:
+                    value = self.run(anext(iterator))
+                except StopAsyncIteration:
+                    break
+                yield value
+        finally:
+            aclose = getattr(iterator, 'aclose', None)
+            if aclose is not None:
+                self.run(aclose())
+
+    def close(self):
+        """
+        Stop the event loop and its thread. The event loop thread is restarted on next use.
+        """
+
+        with self._lock:
+            loop = self._loop
+            thread = self._thread
+            self._loop = None
+            self._thread = None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+
+# Helper to wrap an awaitable in a coroutine for run_coroutine_threadsafe
+async def _await(awaitable):
+    return await awaitable
+
+
+class BlockingCall:
+    """
+    A blocking function call step (e.g. a synchronous action callback or a blocking request content read) yielded by
+    a steps generator (see :func:`~chisel.eventloop.run_steps`). The function is called inline by
+    :func:`~chisel.eventloop.run_steps` and on the executor by :func:`~chisel.eventloop.run_steps_async`, so it never
+    blocks the event loop.
+
+    :param ~collections.abc.Callable func: The function
+    :param args: The function's positional arguments
+    """
+
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func, *args):
+
+        #: The function
+        self.func = func
+
+        #: The function's positional arguments tuple
+        self.args = args
+
+
+def run_steps(steps, run_awaitable):
+    """
+    Run a steps generator synchronously. A steps generator yields awaitables or
+    :class:`~chisel.eventloop.BlockingCall` objects, receives their results (or has their exceptions thrown into it),
+    and returns its result. This allows the same request handling code to await natively under ASGI (see
+    :func:`~chisel.eventloop.run_steps_async`) and to run awaitables on an event loop thread under WSGI. Blocking
+    calls are called inline.
+
+    >>> import asyncio
+    >>> from chisel.eventloop import BlockingCall, EventLoopThread, run_steps
+    >>> async def add(a, b):
+    ...     return a + b
+    ...
+    >>> def steps():
+    ...     value = yield add(1, 2)
+    ...     value2 = yield BlockingCall(max, value, 4)
+    ...     return value2 * 2
+    ...
+    >>> event_loop = EventLoopThread()
+    >>> run_steps(steps(), event_loop.run)
+    8
+    >>> event_loop.close()
+
+    :param ~collections.abc.Generator steps: The steps generator
+    :param ~collections.abc.Callable run_awaitable: The function that runs an awaitable and returns its result
+    :returns: The steps generator's result
+    """
+
+    value, exc = None, None
+    while True:
+        is_done, result = _step(steps, value, exc)
+        if is_done:
+            return result
+        try:
+            if isinstance(result, BlockingCall):
+                value, exc = result.func(*result.args), None
+            else:
+                value, exc = run_awaitable(result), None
+        except Exception as await_exc:
+            value, exc = None, await_exc
+
+
+async def run_steps_async(steps, executor=None, run_in_executor=None):
+    """
+    Run a steps generator from a coroutine (see :func:`~chisel.eventloop.run_steps`). The generator's steps are run on
+    the running event loop, so they must not block. The yielded awaitables are awaited on the event loop and the
+    yielded :class:`~chisel.eventloop.BlockingCall` functions are called on the executor.
+
+    :param ~collections.abc.Generator steps: The steps generator
+    :param ~concurrent.futures.Executor executor: The executor or None for the event loop's default executor
+    :param ~collections.abc.Callable run_in_executor: The function, called with the executor, a blocking call's
+        function, and its arguments, that returns the awaitable of the function's result (e.g.
+        :meth:`~chisel.shedding.LoadShedder.run_in_executor`). If None, :meth:`asyncio.loop.run_in_executor` is used.
+    :returns: The steps generator's result
+    """
+
+    if run_in_executor is None:
+        run_in_executor = asyncio.get_running_loop().run_in_executor
+    value, exc = None, None
+    while True:
+        is_done, result = _step(steps, value, exc)
+        if is_done:
+            return result
+        try:
+            if isinstance(result, BlockingCall):
+                value, exc = await run_in_executor(executor, result.func, *result.args), None
+            else:
+                value, exc = await result, None
+        except Exception as await_exc:
+            value, exc = None, await_exc
+
+
+# Helper to run a steps generator's next step
+def _step(steps, value, exc):
+    try:
+        return False, (steps.send(value) if exc is None else steps.throw(exc))
+    except StopIteration as stop:
+        return True, stop.value
@@ -0,0 +1,173 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Chisel output field selection
+"""
+
+from schema_markdown import get_struct_members
+
+from .stream import is_stream
+
+
+def parse_fields(fields):
+    """
+    Parse a field selection string - a comma-separated list of dot-separated member paths. For example:
+
+    >>> from chisel.fields import parse_fields
+    >>> parse_fields('a,b.c,b.d')
+    {'a': None, 'b': {'c': None, 'd': None}}
+
+    A member selected by name (a value of None) selects the entire member value. Member paths select through arrays
+    and dictionaries to their element values.
+
+    :param str fields: The field selection string
+    :returns: The field selection dictionary
+    :rtype: dict
+    :raises ValueError: The field selection string is invalid
+    """
+
+    selection = {}
+    for path in fields.split(','):
+        names = path.strip().split('.')
+        if not all(names):
+            raise ValueError(f'Invalid fields path {path.strip()!r:.100s}')
+        path_selection = selection
+        for ix_name, name in enumerate(names):
+            if name in path_selection and path_selection[name] is None:
+                break
+            if ix_name == len(names) - 1:
+                path_selection[name] = None
+            else:
+                path_selection = path_selection.setdefault(name, {})
+    return selection
+
+
+def get_fields_type(types, type_name, selection):
+    """
+    Get the type model for a user type's field selection. The selection's struct types contain only the selected members.
+
+    :param dict types: The type model
+    :param str type_name: The type name
+    :param dict selection: The field selection dictionary. See :func:`~chisel.fields.parse_fields`.
+    :returns: The field selection's type model and type name tuple
+    :raises ValueError: The field selection contains an unknown member
+    """
+
+    fields_types = dict(types)
+    fields_type = _get_fields_type(types, {'user': type_name}, selection, fields_types, '')
+    return fields_types, fields_type['user']
+
+
+def _get_fields_type(types, type_, selection, fields_types, path):
+    if 'array' in type_:
+        array = type_['array']
+        return {'array': {**array, 'type': _get_fields_type(types, array['type'], selection, fields_types, path)}}
+
+    if 'dict' in type_:
+        dict_ = type_['dict']
+        return {'dict': {**dict_, 'type': _get_fields_type(types, dict_['type'], selection, fields_types, path)}}
+
+    user_type = types.get(type_['user']) if 'user' in type_ else None
+    if user_type is not None and 'typedef' in user_type:
+        typedef = user_type['typedef']
+        fields_name = f'{typedef["name"]}__fields{len(fields_types)}'
+        fields_types[fields_name] = {'typedef': {
+            **typedef,
+            'name': fields_name,
+            'type': _get_fields_type(types, typedef['type'], selection, fields_types, path)
+        }}
+        return {'user': fields_name}
+
+    if user_type is not None and 'struct' in user_type:
+        struct = user_type['struct']
+        members = {member['name']: member for member in get_struct_members(types, struct)}
+        fields_members = []
+        for member_name, member_selection in selection.items():
+            member_path = f'{path}.{member_name}' if path else member_name
+            member = members.get(member_name)
+            if member is None:
+                raise ValueError(f'Unknown fields member {member_path!r:.100s}')
+            if member_selection is not None:
+                member = {**member, 'type': _get_fields_type(types, member['type'], member_selection, fields_types, member_path)}
+            fields_members.append(member)
+        fields_name = f'{struct["name"]}__fields{len(fields_types)}'
+        fields_struct = {'name': fields_name, 'members': fields_members}
+        if struct.get('union'):
+            fields_struct['union'] = True
+        fields_types[fields_name] = {'struct': fields_struct}
+        return {'user': fields_name}
+
+    raise ValueError(f'Invalid fields member {path!r:.100s}, expected a struct')
+
+
+def project_fields(types, type_name, selection, value):
+    """
+    Project a value to a field selection. Unselected struct members are omitted.
+
+    >>> from chisel.fields import parse_fields, project_fields
+    >>> from schema_markdown import parse_schema_markdown
+    >>> types = parse_schema_markdown('''
+    ... struct Row
+    ...     int a
+    ...     int b
+    ...
+    ... struct Rows
+    ...     Row[] rows
+    ...     int count
+    ... ''')
+    >>> project_fields(types, 'Rows', parse_fields('rows.b'), {'rows': [{'a': 1, 'b': 2}, {'a': 3, 'b': 4}], 'count': 2})
+    {'rows': [{'b': 2}, {'b': 4}]}
+
+    :param dict types: The type model
+    :param str type_name: The type name
+    :param dict selection: The field selection dictionary. See :func:`~chisel.fields.parse_fields`.
+    :param object value: The value to project
+    :returns: The projected value. Selected member values are not copied.
+    """
+
+    return _project_fields(types, {'user': type_name}, selection, value)
+
+
+def _project_fields(types, type_, selection, value):
+    if selection is None:
+        return value
+
+    if 'array' in type_:
+        array_type = type_['array']['type']
+        if is_stream(value):
+            return _project_stream(types, array_type, selection, value)
+        if not isinstance(value, (list, tuple)):
+            return value
+        return [_project_fields(types, array_type, selection, array_value) for array_value in value]
+
+    if 'dict' in type_:
+        if not isinstance(value, dict):
+            return value
+        dict_type = type_['dict']['type']
+        return {dict_key: _project_fields(types, dict_type, selection, dict_value) for dict_key, dict_value in value.items()}
+
+    user_type = types.get(type_['user']) if 'user' in type_ else None
+    if user_type is not None and 'typedef' in user_type:
+        return _project_fields(types, user_type['typedef']['type'], selection, value)
+
+    if user_type is not None and 'struct' in user_type and isinstance(value, dict):
+        members = {member['name']: member for member in get_struct_members(types, user_type['struct'])}
+        return {
+            member_name: _project_fields(types, members[member_name]['type'], member_selection, value[member_name])
+            for member_name, member_selection in selection.items()
+            if member_name in value and member_name in members
+        }
+
+    return value
+
+
+# Helper to project a streamed array value's values as they are iterated
+def _project_stream(types, array_type, selection, value):
+    try:
+        for array_value in value:
+            yield _project_fields(types, array_type, selection, array_value)
+    finally:
+        close = getattr(value, 'close', None)
+        if close is not None:
+            close()
@@ -0,0 +1,216 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Chisel application garbage collector policy
+"""
+
+import gc
+import threading
+import time
+
+
+#: The default automatic collection generation thresholds while the GC manager is started. The generation 0 threshold
+#: is raised well above the Python default so that automatic collections rarely interrupt a request.
+GC_THRESHOLDS = (50000, 20, 100)
+
+#: The default generation thresholds for collections run between requests - the Python default thresholds
+GC_COLLECT_THRESHOLDS = (700, 10, 10)
+
+#: The default idle collection interval, in seconds
+GC_IDLE_SECONDS = 1
+
+
+class GCManager:
+    """
+    A garbage collector policy for low tail latency. Set the :attr:`~chisel.Application.gc_manager` attribute to
+    move generational collections out of requests.
+
+    When started, the GC manager collects and then :func:`freezes <gc.freeze>` all objects that exist (the application's
+    requests, type models, static content, and URL tables) so that collections no longer traverse them. In a
+    :class:`~chisel.prefork.PreforkServer`, the GC manager is started in the master process before the workers are
+    forked, which also keeps the frozen objects' memory pages shared by the workers. It then raises the automatic
+    collection thresholds and instead collects, using the Python default thresholds, when the application's last
+    in-progress request completes or when the server is idle (see :meth:`~chisel.gcmanager.GCManager.collect_idle`).
+    A WSGI request's collection runs when its response content is closed, after the response is sent. An ASGI
+    request's collection is scheduled on the application's :attr:`~chisel.Application.executor` after the response is
+    sent, so it doesn't delay the request's completion. Note that a collection holds the GIL, so the event loop is
+    still paused while it runs.
+
+    >>> from chisel.gcmanager import GCManager
+    >>> gc_manager = GCManager()
+    >>> gc_manager.start()
+    >>> gc_manager.started, gc_manager.frozen_objects > 0
+    (True, True)
+    >>> gc_manager.request_started()
+    >>> gc_manager.request_finished()
+    True
+    >>> gc_manager.stop()
+
+    :param tuple(int) thresholds: The automatic collection generation thresholds while started
+    :param tuple(int) collect_thresholds: The generation thresholds for collections run between requests
+    :param float idle_seconds: The interval, in seconds, at which the server runs idle collections
+    :param bool freeze: If True, freeze the existing objects when started
+    """
+
+    __slots__ = (
+        'thresholds',
+        'collect_thresholds',
+        'idle_seconds',
+        'freeze',
+        'started',
+        'frozen_objects',
+        'collections',
+        'pause_seconds',
+        'max_pause_seconds',
+        'request_collections',
+        'deferred_collections',
+        '_lock',
+        '_in_flight',
+        '_previous_thresholds',
+        '_pause_start'
+    )
+
+    def __init__(self, thresholds=GC_THRESHOLDS, collect_thresholds=GC_COLLECT_THRESHOLDS, idle_seconds=GC_IDLE_SECONDS,
+                 freeze=True):
+
+        #: The automatic collection generation thresholds while started
+        self.thresholds = thresholds
+
+        #: The generation thresholds for collections run between requests
+        self.collect_thresholds = collect_thresholds
+
+        #: The interval, in seconds, at which the server runs idle collections
+        self.idle_seconds = idle_seconds
+
+        #: If True, freeze the existing objects when started
+        self.freeze = freeze
+
+        #: True if the GC manager is started
+        self.started = False
+
+        #: The count of objects frozen when started
+        self.frozen_objects = 0
+
+        #: The count of collections, by generation
+        self.collections = [0, 0, 0]
+
+        #: The total collection pause time, in seconds, by generation
+        self.pause_seconds = [0.0, 0.0, 0.0]
+
+        #: The longest collection pause, in seconds
+        self.max_pause_seconds = 0.0
+
+        #: The count of collections that ran while a request was in progress
+        self.request_collections = 0
+
+        #: The count of collections run between requests or while idle
+        self.deferred_collections = 0
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._previous_thresholds = None
+        self._pause_start = None
+
+    def start(self):
+        """
+        Start the GC manager - collect and freeze the existing objects and raise the automatic collection thresholds.
+        Starting a started GC manager does nothing.
+        """
+
+        with self._lock:
+            if self.started:
+                return
+            self.started = True
+            if self.freeze:
+                gc.collect()
+                gc.freeze()
+                self.frozen_objects = gc.get_freeze_count()
+            self._previous_thresholds = gc.get_threshold()
+            gc.set_threshold(*self.thresholds)
+            gc.callbacks.append(self._gc_callback)
+
+    def stop(self):
+        """
+        Stop the GC manager - restore the automatic collection thresholds and unfreeze the frozen objects
+        """
+
+        with self._lock:
+            if not self.started:
+                return
+            self.started = False
+            gc.callbacks.remove(self._gc_callback)
+            gc.set_threshold(*self._previous_thresholds)
+            if self.freeze:
+                gc.unfreeze()
+
+    def request_started(self):
+        """
+        Count an in-progress request. The GC manager is started, if necessary.
+        """
+
+        if not self.started:
+            self.start()
+        with self._lock:
+            self._in_flight += 1
+
+    def request_finished(self, collect=True):
+        """
+        Count a completed request. If it was the last in-progress request, run any collections that are due.
+
+        :param bool collect: If False, the due collections aren't run - the caller runs them later using
+            :meth:`~chisel.gcmanager.GCManager.collect_due` (e.g. after the ASGI response is complete)
+        :returns: True if it was the last in-progress request
+        """
+
+        with self._lock:
+            self._in_flight -= 1
+            in_flight = self._in_flight
+        if in_flight == 0 and collect:
+            self._collect(self.collect_thresholds[0])
+        return in_flight == 0
+
+    def collect_due(self):
+        """
+        Run any collections that are due, if no requests are in progress. The generation collected is the oldest whose
+        count exceeds its between-requests threshold.
+        """
+
+        if self._in_flight == 0:
+            self._collect(self.collect_thresholds[0])
+
+    def collect_idle(self):
+        """
+        Run a collection, if there are uncollected objects and no requests are in progress. The generation collected
+        is the oldest whose count exceeds its between-requests threshold.
+        """
+
+        if self._in_flight == 0:
+            self._collect(0)
+
+    # Helper to collect the oldest generation that is due
+    def _collect(self, threshold0):
+        counts = gc.get_count()
+        if counts[0] <= threshold0:
+            return
+        generation = 0
+        for gen in (2, 1):
+            if counts[gen] > self.collect_thresholds[gen]:
+                generation = gen
+                break
+        gc.collect(generation)
+        self.deferred_collections += 1
+
+    # The gc.callbacks callback - collection metrics
+    def _gc_callback(self, phase, info):
+        if phase == 'start':
+            self._pause_start = time.perf_counter()
+        elif self._pause_start is not None:
+            pause = time.perf_counter() - self._pause_start
+            self._pause_start = None
+            generation = info['generation']
+            self.collections[generation] += 1
+            self.pause_seconds[generation] += pause
+            self.max_pause_seconds = max(self.max_pause_seconds, pause)
+            if self._in_flight:
+                self.request_collections += 1
@@ -0,0 +1,240 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Chisel idempotency-key response cache
+"""
+
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+
+
+#: The idempotency key request header
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+
+#: The default time, in seconds, that an idempotent response is retained
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+
+#: The default maximum total size, in bytes, of the retained idempotent responses
+IDEMPOTENCY_MAX_BYTES = 16 * 1024 * 1024
+
+#: The maximum idempotency key length
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+#: The request content read size, in bytes, when reading the remainder of a request's content for its digest
+IDEMPOTENCY_DIGEST_CHUNK_SIZE = 64 * 1024
+
+
+class IdempotencyCache:
+    """
+    A thread-safe, bounded cache of completed responses keyed by action, client, and idempotency key. Each response is
+    retained with its request's digest (see :class:`~chisel.idempotency.RequestDigestReader`), so a key reused with
+    different request content can be detected. Responses expire after the time-to-live. The least recently used
+    responses are evicted when either the response count or the total content size limit is exceeded.
+
+    A request calls :meth:`~chisel.idempotency.IdempotencyCache.begin` with its key. If no response is retained and no
+    request with the same key is in flight, the request becomes the key's owner - it executes and then calls
+    :meth:`~chisel.idempotency.IdempotencyCache.complete`. Concurrent requests with the same key wait for the owner to
+    complete.
+
+    >>> from chisel.idempotency import IdempotencyCache
+    >>> cache = IdempotencyCache(100, 60)
+    >>> cache.begin(('my_action', 'client', 'key1')) is None
+    True
+    >>> cache.complete(('my_action', 'client', 'key1'), ('200 OK', [('Content-Type', 'application/json')], b'{}'), 'abc123')
+    >>> cache.begin(('my_action', 'client', 'key1'))
+    (('200 OK', [('Content-Type', 'application/json')], b'{}'), 'abc123')
+
+    :param int max_responses: The maximum number of retained responses
+    :param float ttl_seconds: The time, in seconds, that a response is retained
+    :param int max_bytes: The maximum total size, in bytes, of the retained response contents
+    """
+
+    __slots__ = ('max_responses', 'ttl_seconds', 'max_bytes', 'replayed', '_responses', '_bytes', '_inflight', '_lock')
+
+    def __init__(self, max_responses, ttl_seconds=IDEMPOTENCY_TTL_SECONDS, max_bytes=IDEMPOTENCY_MAX_BYTES):
+
+        #: The maximum number of retained responses
+        self.max_responses = max_responses
+
+        #: The time, in seconds, that a response is retained
+        self.ttl_seconds = ttl_seconds
+
+        #: The maximum total size, in bytes, of the retained response contents
+        self.max_bytes = max_bytes
+
+        #: The count of replayed responses
+        self.replayed = 0
+
+        self._responses = OrderedDict()
+        self._bytes = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._responses)
+
+    @property
+    def size(self):
+        """The total size, in bytes, of the retained response contents"""
+        return self._bytes
+
+    def begin(self, key):
+        """
+        Get a key's retained response or, if there is none, become the key's owner. If another request with the same
+        key is in flight, wait for it to complete.
+
+        :param tuple key: The (action, client, idempotency key) tuple
+        :returns: The retained ((status, headers, content) response tuple, request digest) tuple, or None if the caller
+            is the key's owner and must call :meth:`~chisel.idempotency.IdempotencyCache.complete`
+        :rtype: tuple
+        """
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._evict_expired(now)
+
+                # Retained response?
+                entry = self._responses.get(key)
+                if entry is not None and entry[0] <= now:
+                    self._remove(key)
+                    entry = None
+                if entry is not None:
+                    self._responses.move_to_end(key)
+                    self.replayed += 1
+                    return entry[1:]
+
+                # Become the key's owner?
+                inflight = self._inflight.get(key)
+                if inflight is None:
+                    self._inflight[key] = threading.Event()
+                    return None
+
+            # Wait for the owner to complete
+            inflight.wait()
+
+    def complete(self, key, response, digest=None):
+        """
+        Complete a key's execution, retain its response, and wake any waiting requests
+
+        :param tuple key: The (action, client, idempotency key) tuple
+        :param tuple response: The (status, headers, content) response tuple, or None to not retain a response (e.g.
+            for an error response). If None, a waiting request becomes the key's owner.
+        :param str digest: The request's digest
+        """
+
+        with self._lock:
+            if response is not None and len(response[2]) <= self.max_bytes:
+                self._responses[key] = (time.monotonic() + self.ttl_seconds, response, digest)
+                self._bytes += len(response[2])
+                while len(self._responses) > self.max_responses or self._bytes > self.max_bytes:
+                    self._remove(next(iter(self._responses)))
+            self._inflight.pop(key).set()
+
+    # Helper to evict expired least recently used responses. Expired responses that were used more recently are
+    # evicted when they are looked up or become least recently used.
+    def _evict_expired(self, now):
+        while self._responses:
+            key, (expires, _, _) = next(iter(self._responses.items()))
+            if expires > now:
+                break
+            self._remove(key)
+
+    def _remove(self, key):
+        _, response, _ = self._responses.pop(key)
+        self._bytes -= len(response[2])
+
+
+class RequestDigestReader:
+    """
+    A request content stream wrapper that computes the digest of a request's query string and content as its content
+    is read
+
+    >>> from io import BytesIO
+    >>> from chisel.idempotency import RequestDigestReader
+    >>> reader = RequestDigestReader({'QUERY_STRING': 'a=1', 'CONTENT_LENGTH': '7', 'wsgi.input': BytesIO(b'{"b":2}')})
+    >>> reader.read(4)
+    b'{"b"'
+    >>> reader.digest() == RequestDigestReader({'QUERY_STRING': 'a=1', 'wsgi.input': BytesIO(b'{"b":2}')}).digest()
+    True
+
+    :param dict environ: The :pep:`WSGI <3333>` environ dictionary
+    """
+
+    __slots__ = ('stream', 'content_length', '_read_bytes', '_hash')
+
+    def __init__(self, environ):
+
+        #: The request content file-like object (e.g. "wsgi.input") or None
+        self.stream = environ.get('wsgi.input')
+
+        #: The request content length, in bytes, or None if unknown
+        self.content_length = None
+        try:
+            self.content_length = int(environ['CONTENT_LENGTH'])
+        except (KeyError, ValueError):
+            pass
+
+        self._read_bytes = 0
+        self._hash = hashlib.blake2b(digest_size=16)
+        self._hash.update(environ.get('QUERY_STRING', '').encode('latin-1'))
+        self._hash.update(b'\0')
+
+    def read(self, size=-1):
+        """
+        Read request content
+
+        :param int size: The maximum number of bytes to read or -1 to read all of the content
+        :rtype: bytes
+        """
+
+        return self._update(self.stream.read(size))
+
+    def readline(self, size=-1):
+        """
+        Read a request content line
+
+        :param int size: The maximum number of bytes to read or -1 to read the entire line
+        :rtype: bytes
+        """
+
+        return self._update(self.stream.readline(size))
+
+    @property
+    def read_async(self):
+        """
+        The coroutine function that reads request content on the event loop, or None if the wrapped stream doesn't
+        have a "read_async" method (see :meth:`~chisel.asgi.ASGIInput.read_async`)
+        """
+
+        if getattr(self.stream, 'read_async', None) is None:
+            return None
+        return self._read_async
+
+    async def _read_async(self, size=-1):
+        return self._update(await self.stream.read_async(size))
+
+    def _update(self, chunk):
+        self._read_bytes += len(chunk)
+        self._hash.update(chunk)
+        return chunk
+
+    def digest(self):
+        """
+        Read the remainder of the request content and get the request's digest
+
+        :returns: The request digest hex string
+        :rtype: str
+        """
+
+        if self.stream is not None:
+            while self.content_length is None or self._read_bytes < self.content_length:
+                size = IDEMPOTENCY_DIGEST_CHUNK_SIZE
+                if self.content_length is not None:
+                    size = min(size, self.content_length - self._read_bytes)
+                if not self.read(size):
+                    break
+        return self._hash.hexdigest()
@@ -0,0 +1,263 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Chisel streaming multipart/form-data request content parsing
+"""
+
+from email.parser import BytesHeaderParser
+from email.policy import HTTP
+import re
+from tempfile import SpooledTemporaryFile
+
+
+#: The multipart form data content type
+MULTIPART_CONTENT_TYPE = 'multipart/form-data'
+
+#: The request content read size, in bytes
+MULTIPART_CHUNK_SIZE = 64 * 1024
+
+#: The default maximum multipart content size, in bytes
+MULTIPART_MAX_BYTES = 1024 * 1024 * 1024
+
+#: The default file part size, in bytes, above which a file part is spooled to a temporary file
+MULTIPART_SPOOL_BYTES = 1024 * 1024
+
+#: The default maximum form field part size, in bytes
+MULTIPART_MAX_FIELD_BYTES = 64 * 1024
+
+# The maximum part headers size, in bytes
+_MAX_HEADERS_BYTES = 16 * 1024
+
+
+# Regex for parsing the Content-Type header's boundary parameter
+RE_BOUNDARY = re.compile(r'(?:^|[;\s])boundary\s*=\s*(?:"(?P<quoted>[^"]{1,70})"|(?P<token>[^";\s]{1,70}))', re.IGNORECASE)
+
+
+def get_multipart_boundary(content_type):
+    """
+    Get a multipart content type's boundary parameter
+
+    >>> from chisel.multipart import get_multipart_boundary
+    >>> get_multipart_boundary('multipart/form-data; boundary="abc123"')
+    b'abc123'
+
+    :param str content_type: The Content-Type header value
+    :returns: The boundary bytes or None if the content type has no boundary parameter
+    :rtype: bytes
+    """
+
+    match_boundary = RE_BOUNDARY.search(content_type)
+    if match_boundary is None:
+        return None
+    return (match_boundary.group('quoted') or match_boundary.group('token')).encode('latin-1')
+
+
+class MultipartLimitError(ValueError):
+    """
+    Raised when multipart content exceeds a size limit
+    """
+
+
+class MultipartFile:
+    """
+    A multipart file part. The file content is held in memory or, above the spool size, in a temporary file.
+
+    :param str name: The form field name
+    :param str filename: The client's file name
+    :param str content_type: The file part's content type
+    :param int spool_bytes: The file size, in bytes, above which the file is spooled to a temporary file
+    """
+
+    __slots__ = ('name', 'filename', 'content_type', 'size', 'file')
+
+    def __init__(self, name, filename, content_type, spool_bytes=MULTIPART_SPOOL_BYTES):
+
+        #: The form field name
+        self.name = name
+
+        #: The client's file name
+        self.filename = filename
+
+        #: The file part's content type
+        self.content_type = content_type
+
+        #: The file size, in bytes
+        self.size = 0
+
+        #: The file object - a :class:`~tempfile.SpooledTemporaryFile`
+        self.file = SpooledTemporaryFile(max_size=spool_bytes) # pylint: disable=consider-using-with
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def read(self, size=-1):
+        """
+        Read file content
+
+        :param int size: The maximum number of bytes to read. If negative, the remaining content is read.
+        :rtype: bytes
+        """
+
+        return self.file.read(size)
+
+    def seek(self, offset, whence=0):
+        """
+        Set the file position
+
+        :param int offset: The position offset
+        :param int whence: The offset's reference point
+        :returns: The new file position
+        :rtype: int
+        """
+
+        return self.file.seek(offset, whence)
+
+    def write(self, data):
+        """
+        Write file content
+
+        :param bytes data: The content
+        """
+
+        self.size += len(data)
+        self.file.write(data)
+
+    def close(self):
+        """
+        Close the file, deleting its temporary file, if any
+        """
+
+        self.file.close()
+
+
+def parse_multipart(stream, boundary, max_bytes, spool_bytes=MULTIPART_SPOOL_BYTES, max_field_bytes=MULTIPART_MAX_FIELD_BYTES,
+                    chunk_size=MULTIPART_CHUNK_SIZE):
+    """
+    Read and parse a `multipart/form-data <https://www.rfc-editor.org/rfc/rfc7578>`__ content stream. The content is
+    parsed as it is read - form field values are held in memory and file parts (parts with a "filename") are written
+    to :class:`~chisel.multipart.MultipartFile` objects, so memory use is constant regardless of file size.
+
+    >>> from io import BytesIO
+    >>> from chisel.multipart import parse_multipart
+    >>> content = (
+    ...     b'--XYZ\\r\\nContent-Disposition: form-data; name="title"\\r\\n\\r\\nHello\\r\\n'
+    ...     b'--XYZ\\r\\nContent-Disposition: form-data; name="doc"; filename="doc.txt"\\r\\n\\r\\nWorld!\\r\\n'
+    ...     b'--XYZ--\\r\\n'
+    ... )
+    >>> fields, files = parse_multipart(BytesIO(content), b'XYZ', 1024)
+    >>> fields
+    [('title', 'Hello')]
+    >>> files['doc'].filename, files['doc'].read()
+    ('doc.txt', b'World!')
+
+    :param stream: The content file-like object (e.g. "wsgi.input")
+    :param bytes boundary: The multipart boundary. See :func:`~chisel.multipart.get_multipart_boundary`.
+    :param int max_bytes: The maximum content size, in bytes
+    :param int spool_bytes: The file size, in bytes, above which a file part is spooled to a temporary file
+    :param int max_field_bytes: The maximum form field value size, in bytes
+    :param int chunk_size: The stream read size, in bytes
+    :returns: The list of form field name/value tuples and the map of form field name to
+        :class:`~chisel.multipart.MultipartFile` tuple. Files are positioned at their start. The caller must close
+        the files.
+    :raises MultipartLimitError: The content exceeds a size limit
+    :raises ValueError: The content is invalid
+    """
+
+    reader = _MultipartReader(stream, max_bytes, chunk_size)
+    delimiter = b'--' + boundary
+    part_delimiter = b'\r\n' + delimiter
+    fields = []
+    files = {}
+    try:
+        # Skip the preamble
+        reader.read_until(delimiter, None)
+        while True:
+            # Final delimiter?
+            delimiter_suffix = reader.read_bytes(2)
+            if delimiter_suffix == b'--':
+                break
+            if delimiter_suffix != b'\r\n':
+                raise ValueError('Invalid multipart delimiter')
+
+            # Parse the part headers
+            headers_parts = []
+            reader.read_until(b'\r\n\r\n', headers_parts.append, _MAX_HEADERS_BYTES, 'Multipart part headers')
+            headers = BytesHeaderParser(policy=HTTP).parsebytes(b''.join(headers_parts) + b'\r\n\r\n')
+            name = headers.get_param('name', header='content-disposition')
+            if headers.get_content_disposition() != 'form-data' or not name:
+                raise ValueError('Invalid multipart part Content-Disposition')
+            filename = headers.get_filename()
+
+            # Form field part?
+            if filename is None:
+                value_parts = []
+                reader.read_until(part_delimiter, value_parts.append, max_field_bytes, f'Multipart field {name!r:.100s}')
+                charset = headers.get_content_charset('utf-8')
+                try:
+                    fields.append((name, b''.join(value_parts).decode(charset)))
+                except (LookupError, UnicodeDecodeError) as exc:
+                    raise ValueError(f'Invalid multipart field {name!r:.100s}: {exc}') from None
+                continue
+
+            # File part
+            if name in files:
+                raise ValueError(f'Duplicate multipart file {name!r:.100s}')
+            file = files[name] = MultipartFile(name, filename, headers.get_content_type(), spool_bytes)
+            reader.read_until(part_delimiter, file.write)
+            file.seek(0)
+
+    except Exception:
+        for file in files.values():
+            file.close()
+        raise
+
+    return fields, files
+
+
+class _MultipartReader:
+    __slots__ = ('stream', 'max_bytes', 'chunk_size', 'size', 'buffer')
+
+    def __init__(self, stream, max_bytes, chunk_size):
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.size = 0
+        self.buffer = bytearray()
+
+    def _read_chunk(self):
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            raise ValueError('Unexpected end of multipart content')
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise MultipartLimitError(f'Multipart content exceeds {self.max_bytes} bytes')
+        self.buffer.extend(chunk)
+
+    def read_bytes(self, size):
+        while len(self.buffer) < size:
+            self._read_chunk()
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    # Read up to the delimiter, passing the data to the sink function, and consume the delimiter
+    def read_until(self, delimiter, sink, max_size=None, max_size_name=None):
+        data_size = 0
+        while True:
+            ix_delimiter = self.buffer.find(delimiter)
+            ix_data = ix_delimiter if ix_delimiter >= 0 else max(0, len(self.buffer) - len(delimiter) + 1)
+            if ix_data:
+                data_size += ix_data
+                if max_size is not None and data_size > max_size:
+                    raise MultipartLimitError(f'{max_size_name} exceeds {max_size} bytes')
+                if sink is not None:
+                    sink(bytes(self.buffer[:ix_data]))
+                del self.buffer[:ix_data]
+            if ix_delimiter >= 0:
+                del self.buffer[:len(delimiter)]
+                return
+            self._read_chunk()
@@ -0,0 +1,542 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Chisel prefork multi-process server
+"""
+
+import asyncio
+import logging
+import math
+import os
+import random
+import select
+import signal
+import socket
+import sys
+import time
+import traceback
+
+from .server import serve
+
+try:
+    import resource
+except ImportError: # pragma: no cover
+    resource = None
+
+
+#: The number of seconds between a worker's recycle checks
+PREFORK_CHECK_SECONDS = 1
+
+#: The fraction of a worker's maximum requests added, at random, to stagger worker recycling
+PREFORK_MAX_REQUESTS_JITTER = 0.1
+
+#: The minimum number of seconds between a worker's start and its restart - a worker that exits sooner (e.g. an
+#: application startup error) is restarted after this delay
+PREFORK_RESTART_SECONDS = 1
+
+#: The default maximum number of seconds a stopping worker waits for its in-flight requests to complete
+PREFORK_DRAIN_SECONDS = 30
+
+#: The number of seconds, after the drain timeout, that a stopping worker is killed
+PREFORK_KILL_SECONDS = 5
+
+#: The listening socket backlog
+PREFORK_BACKLOG = 1024
+
+#: The environment variable of the listening socket file descriptors inherited by a reloaded master
+PREFORK_ENV_LISTEN_FDS = 'CHISEL_PREFORK_LISTEN_FDS'
+
+#: The environment variable of the previous master's message pipe file descriptor inherited by a reloaded master
+PREFORK_ENV_MASTER_FD = 'CHISEL_PREFORK_MASTER_FD'
+
+
+# The prefork server logger
+_LOG = logging.getLogger(__name__)
+
+
+class PreforkServer:
+    """
+    A prefork, multi-process :mod:`chisel.server` server. The application is constructed once, in the master process,
+    and shared copy-on-write with the forked worker processes. Each worker runs a :class:`~chisel.server.Server` on
+    its own event loop and thread pool, so CPU-bound request handling scales across cores. TCP workers each accept on
+    their own listening socket bound to the same address with ``SO_REUSEPORT`` - the operating system balances
+    connections across them. Unix domain socket workers (or TCP workers where ``SO_REUSEPORT`` isn't available)
+    share a single listening socket.
+
+    Workers are recycled - they stop accepting connections, complete their in-flight requests, and exit - after
+    handling a maximum number of requests or exceeding a maximum resident set size. A recycling worker notifies the
+    master, which starts its replacement immediately on the same listening socket, so the socket's connections are
+    accepted while the recycling worker completes its requests. The master restarts workers that exit for any other
+    reason until the master receives SIGINT or SIGTERM, when it stops its workers gracefully.
+
+    On SIGHUP, the master reloads gracefully. If reload arguments are provided, the master starts a new master
+    process by running Python with them (e.g. ``python -m chisel serve ...``), so the new workers run freshly imported
+    code. The new master inherits the listening sockets and notifies the previous master when all of its workers are
+    warmed up and accepting connections. The previous master then stops its workers gracefully and exits. If the new
+    master exits first (e.g. an application import error), the reload fails and the previous master continues with its
+    workers. Otherwise, the new workers are forked with the current application, and the previous workers are stopped
+    gracefully when all new workers are warmed up and accepting. In both cases, the previous workers continue to accept
+    connections until they're stopped, so capacity never drops to zero.
+
+    Prefork servers require :func:`os.fork` (i.e., POSIX).
+
+    :param application: The chisel application or ASGI application callable
+    :param int workers: The number of worker processes. If None, the number of CPUs is used.
+    :param bool cpu_affinity: If True, pin each worker to a CPU, where supported
+    :param int max_requests: The number of requests after which a worker is recycled. A random jitter of up to 10% is
+        added to each worker's maximum to stagger recycling. If None, workers aren't recycled by request count.
+    :param int max_rss: The resident set size, in bytes, above which a worker is recycled. If None, workers aren't
+        recycled by memory.
+    :param int threads: The maximum number of request threads per worker
+    :param float drain_timeout: The maximum number of seconds a stopping worker waits for its in-flight requests to
+        complete. If None, stopping workers wait until their requests complete.
+    :param ~collections.abc.Callable warmup: The function, called with the application, that warms up each new
+        worker before it accepts connections (e.g. by making warm-up requests)
+    :param list(str) reload_args: The Python command-line arguments with which the new master is started on reload
+        (e.g. ``sys.orig_argv[1:]``). If None, the master reloads by forking new workers with the current application.
+    :param kwargs: The :class:`~chisel.server.Server` keyword arguments
+    """
+
+    __slots__ = (
+        'application', 'workers', 'cpu_affinity', 'max_requests', 'max_rss', 'threads', 'drain_timeout', 'warmup',
+        'reload_args', 'server_kwargs', 'sockets', '_workers', '_ready', '_previous', '_recycling', '_stopping', '_restarts',
+        '_pipes', '_reloading', '_master_fd'
+    )
+
+    def __init__(self, application, workers=None, cpu_affinity=False, max_requests=None, max_rss=None, threads=None,
+                 drain_timeout=PREFORK_DRAIN_SECONDS, warmup=None, reload_args=None, **kwargs):
+
+        #: The chisel application or ASGI application callable
+        self.application = application
+
+        #: The number of worker processes
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+
+        #: If True, pin each worker to a CPU
+        self.cpu_affinity = cpu_affinity
+
+        #: The number of requests after which a worker is recycled
+        self.max_requests = max_requests
+
+        #: The resident set size, in bytes, above which a worker is recycled
+        self.max_rss = max_rss
+
+        #: The maximum number of request threads per worker
+        self.threads = threads
+
+        #: The maximum number of seconds a stopping worker waits for its in-flight requests to complete
+        self.drain_timeout = drain_timeout
+
+        #: The function, called with the application, that warms up each new worker before it accepts connections
+        self.warmup = warmup
+
+        #: The Python command-line arguments with which the new master is started on reload
+        self.reload_args = reload_args
+
+        #: The :class:`~chisel.server.Server` keyword arguments
+        self.server_kwargs = kwargs
+
+        #: The listening sockets
+        self.sockets = []
+
+        # Worker index and start time by process ID
+        self._workers = {}
+
+        # The process IDs of the workers that are accepting connections
+        self._ready = set()
+
+        # The process IDs of the previous workers that are stopped when the new workers are ready
+        self._previous = set()
+
+        # Worker index by process ID of the recycling workers - their replacements are already started
+        self._recycling = {}
+
+        # Kill time by process ID of the stopping workers
+        self._stopping = {}
+
+        # Restart time by worker index of the exited workers
+        self._restarts = {}
+
+        # The signal wakeup socket pair and the worker message pipe file descriptors
+        self._pipes = None
+
+        # The process ID of the new master started on reload
+        self._reloading = None
+
+        # The previous master's message pipe file descriptor, if started on reload
+        self._master_fd = None
+
+    def bind(self, host=None, port=8080, unix_path=None):
+        """
+        Create the listening sockets. If the master was started on reload, the listening sockets are inherited from
+        the previous master and the arguments are ignored.
+
+        :param str host: The host name or address. If None, the server listens on all interfaces.
+        :param int port: The port number. If zero, an available port is chosen.
+        :param str unix_path: The unix domain socket path. If not None, the host and port are ignored.
+        :returns: The listening sockets
+        """
+
+        # Inherited listening sockets?
+        listen_fds = os.environ.pop(PREFORK_ENV_LISTEN_FDS, None)
+        if listen_fds:
+            self.sockets = [socket.socket(fileno=int(fd)) for fd in listen_fds.split(',')]
+            for sock in self.sockets:
+                sock.set_inheritable(False)
+            return self.sockets
+
+        # Unix domain socket?
+        if unix_path is not None:
+            if os.path.exists(unix_path):
+                os.unlink(unix_path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.bind(unix_path)
+            sock.listen(PREFORK_BACKLOG)
+            self.sockets = [sock]
+            return self.sockets
+
+        # Create a listening socket per worker, if possible - the remaining sockets bind to the first socket's port
+        family, _, _, _, address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM, flags=socket.AI_PASSIVE)[0]
+        reuse_port = hasattr(socket, 'SO_REUSEPORT')
+        self.sockets = []
+        for _ in range(self.workers if reuse_port else 1):
+            sock = socket.create_server(address, family=family, backlog=PREFORK_BACKLOG, reuse_port=reuse_port)
+            address = sock.getsockname()
+            self.sockets.append(sock)
+        return self.sockets
+
+    def run(self):
+        """
+        Run the master process until SIGINT or SIGTERM. The listening sockets are created with
+        :meth:`~chisel.prefork.PreforkServer.bind`, if necessary.
+        """
+
+        if not self.sockets:
+            self.bind()
+        _LOG.info('chisel prefork server listening on %r with %d workers', self.sockets[0].getsockname(), self.workers)
+
+        # The previous master's message pipe, if started on reload
+        master_fd = os.environ.pop(PREFORK_ENV_MASTER_FD, None)
+        if master_fd:
+            self._master_fd = int(master_fd)
+            os.set_inheritable(self._master_fd, False)
+
+        # Signals are received from the wakeup socket and worker ready and recycle messages from the message pipe
+        wakeup_read, wakeup_write = socket.socketpair()
+        wakeup_read.setblocking(False)
+        wakeup_write.setblocking(False)
+        ready_read, ready_write = os.pipe()
+        self._pipes = (wakeup_read, wakeup_write, ready_read, ready_write)
+        master_signals = (signal.SIGINT, signal.SIGTERM, signal.SIGHUP, signal.SIGCHLD)
+        signal_handlers = {signum: signal.signal(signum, _no_signal_handler) for signum in master_signals}
+        wakeup_fd = signal.set_wakeup_fd(wakeup_write.fileno())
+        try:
+            # Freeze the application's objects before forking the workers
+            gc_manager = getattr(self.application, 'gc_manager', None)
+            if gc_manager is not None:
+                gc_manager.start()
+
+            # Start the workers
+            for index in range(self.workers):
+                self._spawn(index)
+
+            # Restart workers as they exit until stopped
+            stopping = False
+            messages = b''
+            while self._workers or self._previous or self._stopping or (self._restarts and not stopping):
+                deadlines = [*self._restarts.values(), *self._stopping.values()]
+                timeout = max(0, min(deadlines) - time.monotonic()) if deadlines else None
+                readable, _, _ = select.select([wakeup_read, ready_read], [], [], timeout)
+
+                # Worker messages
+                if ready_read in readable:
+                    *lines, messages = (messages + os.read(ready_read, 4096)).split(b'\n')
+                    for line in lines:
+                        message, pid = line.split()
+                        if int(pid) in self._workers:
+                            if message == b'ready':
+                                self._ready.add(int(pid))
+                            elif message == b'recycle':
+                                self._recycle(int(pid))
+
+                        # The new master's workers are accepting connections - stop this master's workers and exit
+                        elif message == b'master' and int(pid) == self._reloading and not stopping:
+                            _LOG.info('chisel prefork server reloaded - new master (pid %d) is accepting connections', self._reloading)
+                            self._reloading = None
+                            stopping = True
+                            self._restarts.clear()
+                            self._stop_workers([*self._workers, *self._previous])
+                            self._previous.clear()
+
+                # Signals
+                signums = b''
+                if wakeup_read in readable:
+                    try:
+                        signums = wakeup_read.recv(1024)
+                    except BlockingIOError: # pragma: no cover
+                        pass
+                if not stopping and (signal.SIGINT in signums or signal.SIGTERM in signums):
+                    stopping = True
+                    _LOG.info('chisel prefork server stopping')
+                    if self._reloading is not None:
+                        self._stop_workers([self._reloading])
+                    self._restarts.clear()
+                    self._stop_workers([*self._workers, *self._previous])
+                    self._previous.clear()
+                elif not stopping and signal.SIGHUP in signums:
+                    self._reload()
+
+                # Reap the exited workers
+                for pid, status in _reap():
+                    self._ready.discard(pid)
+                    self._previous.discard(pid)
+                    self._stopping.pop(pid, None)
+                    index, start_time = self._workers.pop(pid, (None, None))
+                    recycled_index = self._recycling.pop(pid, None)
+                    if pid == self._reloading:
+                        self._reloading = None
+                        if stopping:
+                            _LOG.info('chisel new master (pid %d) exited with status %d', pid, status)
+                        else:
+                            _LOG.error('chisel prefork server reload failed - new master (pid %d) exited with status %d', pid, status)
+                    elif index is not None:
+                        _LOG.info('chisel worker %d (pid %d) exited with status %d', index, pid, status)
+                        if not stopping:
+                            self._restarts[index] = start_time + PREFORK_RESTART_SECONDS
+                    elif recycled_index is not None:
+                        _LOG.info('chisel worker %d (pid %d) exited with status %d', recycled_index, pid, status)
+                    else:
+                        _LOG.info('chisel previous worker (pid %d) exited with status %d', pid, status)
+
+                # Stop the previous workers when all new workers are accepting connections
+                if self._previous and len(self._ready) == self.workers:
+                    _LOG.info('chisel prefork server stopping %d previous workers', len(self._previous))
+                    self._stop_workers(self._previous)
+                    self._previous.clear()
+
+                # Notify the previous master when all workers are accepting connections
+                if self._master_fd is not None and len(self._ready) == self.workers:
+                    _notify(self._master_fd, b'master')
+                    os.close(self._master_fd)
+                    self._master_fd = None
+
+                # Kill the stopping workers that didn't stop in time
+                now = time.monotonic()
+                for pid, kill_time in self._stopping.items():
+                    if kill_time <= now:
+                        _LOG.warning('chisel worker (pid %d) killed', pid)
+                        _kill(pid, signal.SIGKILL)
+                        self._stopping[pid] = math.inf
+
+                # Restart the exited workers
+                for index, restart_time in list(self._restarts.items()):
+                    if restart_time <= now:
+                        del self._restarts[index]
+                        self._spawn(index)
+        finally:
+            signal.set_wakeup_fd(wakeup_fd)
+            for signum, handler in signal_handlers.items():
+                signal.signal(signum, handler)
+            wakeup_read.close()
+            wakeup_write.close()
+            os.close(ready_read)
+            os.close(ready_write)
+            self._pipes = None
+            if self._master_fd is not None:
+                os.close(self._master_fd)
+                self._master_fd = None
+            for sock in self.sockets:
+                sock.close()
+            self.sockets = []
+
+    # Stop workers gracefully - workers that don't stop by the drain timeout are killed
+    def _stop_workers(self, pids):
+        kill_time = self._kill_time()
+        for pid in pids:
+            _kill(pid, signal.SIGTERM)
+            self._stopping[pid] = kill_time
+
+    # Helper to compute a stopping worker's kill time
+    def _kill_time(self):
+        return time.monotonic() + self.drain_timeout + PREFORK_KILL_SECONDS if self.drain_timeout is not None else math.inf
+
+    # Start a recycling worker's replacement - the recycling worker is already stopping, and is killed if it doesn't
+    # stop by the drain timeout
+    def _recycle(self, pid):
+        index, _ = self._workers.pop(pid)
+        self._ready.discard(pid)
+        self._recycling[pid] = index
+        self._stopping[pid] = self._kill_time()
+        self._spawn(index)
+
+    # Reload gracefully
+    def _reload(self):
+        if self._reloading is not None:
+            _LOG.warning('chisel prefork server already reloading - new master (pid %d)', self._reloading)
+            return
+        _LOG.info('chisel prefork server reloading')
+
+        # Start a new master, passing the listening sockets and the message pipe - this master's workers are stopped
+        # when the new master's workers are accepting connections
+        if self.reload_args is not None:
+            ready_write = self._pipes[3]
+            for sock in self.sockets:
+                sock.set_inheritable(True)
+            os.set_inheritable(ready_write, True)
+            env = {
+                **os.environ,
+                PREFORK_ENV_LISTEN_FDS: ','.join(str(sock.fileno()) for sock in self.sockets),
+                PREFORK_ENV_MASTER_FD: str(ready_write)
+            }
+            try:
+                self._reloading = os.posix_spawn(sys.executable, [sys.executable, *self.reload_args], env)
+            except OSError:
+                _LOG.exception('chisel prefork server reload failed')
+            finally:
+                for sock in self.sockets:
+                    sock.set_inheritable(False)
+                os.set_inheritable(ready_write, False)
+            return
+
+        # Fork new workers with the current application - the current workers become the previous workers
+        self._previous.update(self._workers)
+        self._workers.clear()
+        self._ready.clear()
+        self._restarts.clear()
+        for index in range(self.workers):
+            self._spawn(index)
+
+    # Fork a worker process
+    def _spawn(self, index):
+        pid = os.fork()
+        if pid != 0:
+            self._workers[pid] = (index, time.monotonic())
+            return
+
+        # Worker process - it never returns
+        status = 1
+        try:
+            self._run_worker(index)
+            status = 0
+        except BaseException: # pylint: disable=broad-exception-caught
+            traceback.print_exc()
+        finally:
+            sys.stderr.flush()
+            os._exit(status) # pylint: disable=protected-access
+
+    # The worker process main
+    def _run_worker(self, index):
+        master_pid = os.getppid()
+
+        # Restore the master's signal handling - SIGINT (e.g. a terminal Ctrl-C) is handled by the master
+        signal.set_wakeup_fd(-1)
+        for signum in (signal.SIGTERM, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(signum, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        wakeup_read, wakeup_write, ready_read, ready_write = self._pipes
+        wakeup_read.close()
+        wakeup_write.close()
+        os.close(ready_read)
+        if self._master_fd is not None:
+            os.close(self._master_fd)
+
+        # Close the other workers' listening sockets
+        sock = self.sockets[index % len(self.sockets)]
+        for other_sock in self.sockets:
+            if other_sock is not sock:
+                other_sock.close()
+
+        # Pin the worker to a CPU
+        if self.cpu_affinity and hasattr(os, 'sched_setaffinity'):
+            cpus = sorted(os.sched_getaffinity(0))
+            os.sched_setaffinity(0, {cpus[index % len(cpus)]})
+
+        # Warm up the worker before it accepts connections
+        if self.warmup is not None:
+            self.warmup(self.application)
+
+        # Run the worker's server until it's stopped or recycled
+        max_requests = self.max_requests
+        if max_requests is not None:
+            max_requests += random.randint(0, int(max_requests * PREFORK_MAX_REQUESTS_JITTER))
+
+        async def stop(server):
+            # Notify the master that the worker is accepting connections
+            _notify(ready_write, b'ready')
+
+            stop_event = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            loop.add_signal_handler(signal.SIGTERM, stop_event.set)
+            try:
+                while True:
+                    try:
+                        await asyncio.wait_for(stop_event.wait(), PREFORK_CHECK_SECONDS)
+                        break
+                    except asyncio.TimeoutError:
+                        pass
+                    if max_requests is not None and server.requests >= max_requests:
+                        _LOG.info('chisel worker %d (pid %d) recycled after %d requests', index, os.getpid(), server.requests)
+                        _notify(ready_write, b'recycle')
+                        break
+                    if self.max_rss is not None and get_rss() > self.max_rss:
+                        _LOG.info('chisel worker %d (pid %d) recycled at %d bytes RSS', index, os.getpid(), get_rss())
+                        _notify(ready_write, b'recycle')
+                        break
+                    if os.getppid() != master_pid:
+                        _LOG.warning('chisel worker %d (pid %d) stopping - the master exited', index, os.getpid())
+                        break
+            finally:
+                loop.remove_signal_handler(signal.SIGTERM)
+
+        asyncio.run(serve(
+            self.application, sock=sock, threads=self.threads, stop=stop, drain_timeout=self.drain_timeout, **self.server_kwargs
+        ))
+
+
+# Do-nothing signal handler - the master receives signal numbers from its wakeup socket
+def _no_signal_handler(unused_signum, unused_frame):
+    pass
+
+
+# Helper to send a message to the master's message pipe
+def _notify(fd, message):
+    try:
+        os.write(fd, b'%s %d\n' % (message, os.getpid()))
+    except OSError: # pragma: no cover
+        pass
+
+
+# Helper to send a signal to a process that may have exited
+def _kill(pid, signum):
+    try:
+        os.kill(pid, signum)
+    except ProcessLookupError: # pragma: no cover
+        pass
+
+
+# Helper to reap exited child processes - yields process ID and exit status tuples
+def _reap():
+    while True:
+        try:
+            pid, wait_status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            break
+        yield pid, os.waitstatus_to_exitcode(wait_status)
+
+
+def get_rss():
+    """
+    Get the current process's resident set size
+
+    :returns: The resident set size, in bytes. If the current size isn't available, the peak size is returned.
+    """
+
+    try:
+        with open('/proc/self/statm', 'rb') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError): # pragma: no cover
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == 'darwin' else max_rss * 1024
@@ -11,6 +11,9 @@ from http import HTTPStatus
 import posixpath
 import re
 
+from .app import Context
+from .compression import get_encoded_etag
+
 
 def request(wsgi_callback=None, **kwargs):
     """
@@ -64,11 +67,14 @@ class Request:
     :param doc: The documentation markdown text lines
     :type doc: str or list(str)
     :param str doc_group: The documentation group
+    :param ~chisel.bulkhead.Bulkhead bulkhead: Optional request concurrency limit
+    :param float timeout: Optional request timeout, in seconds. The request's :attr:`~chisel.Context.deadline` is the
+        earlier of the timeout and the client's deadline.
     """
 
-    __slots__ = ('wsgi_callback', 'name', 'urls', 'doc', 'doc_group')
+    __slots__ = ('wsgi_callback', 'name', 'urls', 'doc', 'doc_group', 'bulkhead', 'timeout')
 
-    def __init__(self, wsgi_callback=None, name=None, urls=None, doc=None, doc_group=None):
+    def __init__(self, wsgi_callback=None, name=None, urls=None, doc=None, doc_group=None, bulkhead=None, timeout=None):
         assert wsgi_callback is not None or name is not None, 'must specify either wsgi_callback and/or name'
 
         #: The WSGI application function
@@ -83,6 +89,12 @@ class Request:
         #: The documentation group
         self.doc_group = doc_group
 
+        #: The request's :class:`~chisel.bulkhead.Bulkhead` concurrency limit or None
+        self.bulkhead = bulkhead
+
+        #: The request timeout, in seconds, or None
+        self.timeout = timeout
+
         # Normalize urls into list of uppercase-method/path tuple pairs
         if urls is None:
             #: The list of URL method/path tuples
@@ -202,10 +214,22 @@ class StaticRequest(Request):
 
     def __call__(self, environ, start_response):
 
+        # The compressed representation, if any, has its own ETag
+        ctx = environ.get(Context.ENVIRON_CTX)
+        etag = self.etag
+        if ctx is not None:
+            content_encoding = ctx.negotiate_content_encoding(self.content_type, len(self.content))
+            if content_encoding is not None:
+                etag = get_encoded_etag(self.etag, content_encoding)
+
         # Check the etag - is the resource modified?
-        if self.etag == environ.get('HTTP_IF_NONE_MATCH'):
-            start_response(self.STATUS_NOT_MODIFIED, [('ETag', self.etag)])
+        if etag == environ.get('HTTP_IF_NONE_MATCH'):
+            (ctx.start_response if ctx is not None else start_response)(self.STATUS_NOT_MODIFIED, [('ETag', etag)])
             return []
 
+        # Respond using the request context, if any, for response compression
+        if ctx is not None:
+            return ctx.response(self.STATUS_OK, self.content_type, [self.content], headers=[('ETag', self.etag)])
+
         start_response(self.STATUS_OK, [('Content-Type', self.content_type), ('ETag', self.etag)])
         return [self.content]
@@ -0,0 +1,670 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Chisel asyncio HTTP/1.1 server
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from http import HTTPStatus
+import importlib
+import logging
+import os
+import re
+import signal
+import socket
+import time
+from urllib.parse import unquote, urlsplit
+
+from .app import Application
+from .shedding import REQUEST_START_EXTENSION
+
+
+#: The default maximum size, in bytes, of a request's line and headers
+SERVER_MAX_HEADER_BYTES = 64 * 1024
+
+#: The default number of seconds in which a request's line and headers must be received
+SERVER_HEADER_TIMEOUT = 10
+
+#: The default number of seconds in which each request content read must complete
+SERVER_BODY_TIMEOUT = 30
+
+#: The default number of seconds a persistent connection may be idle between requests
+SERVER_KEEPALIVE_TIMEOUT = 5
+
+#: The default maximum size, in bytes, of unread request content that is discarded to reuse a connection
+SERVER_MAX_DRAIN_BYTES = 1024 * 1024
+
+#: The request content read size, in bytes
+SERVER_READ_SIZE = 64 * 1024
+
+
+# The server logger
+_LOG = logging.getLogger(__name__)
+
+# Request-line regular expression
+_RE_REQUEST_LINE = re.compile(r'^([!#$%&\'*+\-.^_`|~0-9A-Za-z]+) (\S+) HTTP/(\d)\.(\d)$')
+
+# Header field-name regular expression
+_RE_HEADER_NAME = re.compile(rb'^[!#$%&\'*+\-.^_`|~0-9A-Za-z]+$')
+
+# Response statuses that have no content
+_NO_CONTENT_STATUSES = (HTTPStatus.NO_CONTENT, HTTPStatus.NOT_MODIFIED)
+
+
+class Server:
+    """
+    A lightweight :mod:`asyncio` HTTP/1.1 server for an `ASGI <https://asgi.readthedocs.io/en/latest/specs/main.html>`__
+    application, such as :meth:`~chisel.Application.asgi`. Connections are persistent, pipelined requests are
+    handled in order, and request and response content may use chunked transfer coding. Requests whose line and headers
+    aren't received within the header timeout, or whose content reads stall beyond the body timeout, are closed.
+    Responses sent with the ASGI "http.response.zerocopysend" extension (e.g. :class:`~chisel.asgi.FileWrapper`
+    responses) are sent using :func:`os.sendfile`, where available.
+
+    >>> import asyncio
+    >>> import chisel
+    >>> from chisel.server import Server
+    >>> @chisel.action(spec='''\\
+    ... action hello
+    ...     output
+    ...         string message
+    ... ''')
+    ... def hello(ctx, req):
+    ...     return {'message': 'Hello'}
+    ...
+    >>> application = chisel.Application()
+    >>> application.add_request(hello)
+    >>> async def main():
+    ...     server = Server(application.asgi)
+    ...     asyncio_server = await server.start('127.0.0.1', 0)
+    ...     reader, writer = await asyncio.open_connection(*asyncio_server.sockets[0].getsockname())
+    ...     writer.write(b'POST /hello HTTP/1.1\\r\\nHost: localhost\\r\\nContent-Length: 2\\r\\nConnection: close\\r\\n\\r\\n{}')
+    ...     response = await reader.read()
+    ...     writer.close()
+    ...     server.close()
+    ...     await server.wait_closed()
+    ...     return response.split(b'\\r\\n')[0], response.split(b'\\r\\n\\r\\n')[1]
+    ...
+    >>> asyncio.run(main())
+    (b'HTTP/1.1 200 OK', b'{"message":"Hello"}')
+
+    :param ~collections.abc.Callable app: The ASGI application callable
+    :param float header_timeout: The number of seconds in which a request's line and headers must be received
+    :param float body_timeout: The number of seconds in which each request content read must complete
+    :param float keepalive_timeout: The number of seconds a persistent connection may be idle between requests
+    :param int max_header_bytes: The maximum size, in bytes, of a request's line and headers
+    :param int max_drain_bytes: The maximum size, in bytes, of unread request content that is discarded to reuse a
+        connection
+    """
+
+    __slots__ = (
+        'app', 'header_timeout', 'body_timeout', 'keepalive_timeout', 'max_header_bytes', 'max_drain_bytes', 'requests',
+        '_servers', '_connections', '_idle', '_closing'
+    )
+
+    def __init__(
+            self, app, header_timeout=SERVER_HEADER_TIMEOUT, body_timeout=SERVER_BODY_TIMEOUT,
+            keepalive_timeout=SERVER_KEEPALIVE_TIMEOUT, max_header_bytes=SERVER_MAX_HEADER_BYTES,
+            max_drain_bytes=SERVER_MAX_DRAIN_BYTES
+    ):
+
+        #: The ASGI application callable
+        self.app = app
+
+        #: The number of seconds in which a request's line and headers must be received
+        self.header_timeout = header_timeout
+
+        #: The number of seconds in which each request content read must complete
+        self.body_timeout = body_timeout
+
+        #: The number of seconds a persistent connection may be idle between requests
+        self.keepalive_timeout = keepalive_timeout
+
+        #: The maximum size, in bytes, of a request's line and headers
+        self.max_header_bytes = max_header_bytes
+
+        #: The maximum size, in bytes, of unread request content that is discarded to reuse a connection
+        self.max_drain_bytes = max_drain_bytes
+
+        #: The number of requests handled
+        self.requests = 0
+
+        self._servers = []
+        self._connections = {}
+        self._idle = set()
+        self._closing = False
+
+    async def start(self, host=None, port=8080, unix_path=None, sock=None):
+        """
+        Start accepting connections. The server may listen on more than one address.
+
+        :param str host: The host name or address. If None, the server listens on all interfaces.
+        :param int port: The port number
+        :param str unix_path: The unix domain socket path. If not None, the host and port are ignored.
+        :param ~socket.socket sock: An already-listening socket. If not None, the host, port, and unix domain socket
+            path are ignored.
+        :returns: The :class:`asyncio.Server` object
+        """
+
+        if sock is not None:
+            if sock.family == getattr(socket, 'AF_UNIX', None):
+                server = await asyncio.start_unix_server(self._connection, sock=sock, limit=self.max_header_bytes)
+            else:
+                server = await asyncio.start_server(self._connection, sock=sock, limit=self.max_header_bytes)
+        elif unix_path is not None:
+            server = await asyncio.start_unix_server(self._connection, path=unix_path, limit=self.max_header_bytes)
+        else:
+            server = await asyncio.start_server(self._connection, host, port, limit=self.max_header_bytes)
+        self._servers.append(server)
+        return server
+
+    def close(self):
+        """
+        Stop accepting connections and close idle connections. Connections with a request in progress are closed when
+        their response is complete.
+        """
+
+        self._closing = True
+        for server in self._servers:
+            server.close()
+        for task in self._idle:
+            self._connections[task].close()
+
+    async def wait_closed(self):
+        """
+        Wait until the server's listening sockets and connections are closed
+        """
+
+        for server in self._servers:
+            await server.wait_closed()
+        tasks = list(self._connections)
+        if tasks:
+            await asyncio.wait(tasks)
+
+    # The connection handler - requests are read and responded to in order
+    async def _connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            client, server = _connection_addresses(writer)
+
+            # Disable Nagle's algorithm - asyncio doesn't for TCP sockets created without an explicit protocol
+            sock = writer.get_extra_info('socket')
+            if sock is not None and sock.family in (socket.AF_INET, socket.AF_INET6):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            timeout = self.header_timeout
+            while not self._closing:
+                # Wait for the next request
+                self._idle.add(task)
+                try:
+                    first_byte = await asyncio.wait_for(reader.readexactly(1), timeout)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    break
+                finally:
+                    self._idle.discard(task)
+                timeout = self.keepalive_timeout
+
+                # Read the request's line and headers
+                try:
+                    head = first_byte + await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.header_timeout)
+                except asyncio.TimeoutError:
+                    await _write_error(writer, HTTPStatus.REQUEST_TIMEOUT)
+                    break
+                except asyncio.LimitOverrunError:
+                    await _write_error(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+                    break
+                except asyncio.IncompleteReadError:
+                    break
+
+                # Handle the request - its arrival time is when its head is read
+                start_time = time.time()
+                if not await self._request(reader, writer, head, client, server, start_time):
+                    break
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            del self._connections[task]
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    # Handle a request - returns True if the connection may be reused
+    async def _request(self, reader, writer, head, client, server, start_time):
+
+        # Parse the request's line and headers
+        try:
+            method, target, http_version, headers, exchange = _parse_request(head, reader, writer, self.body_timeout)
+        except _HTTPError as exc:
+            await _write_error(writer, exc.status)
+            return False
+        path, _, query_string = target.partition('?')
+
+        # Call the application
+        self.requests += 1
+        exchange.is_head = method == 'HEAD'
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0', 'spec_version': '2.3'},
+            'http_version': http_version,
+            'method': method,
+            'scheme': 'http',
+            'path': unquote(path, errors='replace'),
+            'raw_path': path.encode('latin-1'),
+            'query_string': query_string.encode('latin-1'),
+            'root_path': '',
+            'headers': headers,
+            'client': client,
+            'server': server,
+            'extensions': {'http.response.zerocopysend': {}, REQUEST_START_EXTENSION: {'time': start_time}}
+        }
+        try:
+            await self.app(scope, exchange.receive, exchange.send)
+        except Exception:
+            _LOG.exception('exception raised by ASGI application')
+        finally:
+            exchange.response_done.set()
+
+        # Incomplete response?
+        if not exchange.response_complete:
+            if not exchange.response_started:
+                await _write_error(writer, HTTPStatus.INTERNAL_SERVER_ERROR)
+            return False
+
+        # Discard any unread request content so the connection can be reused
+        drained = 0
+        while exchange.keep_alive and not exchange.body_complete:
+            message = await exchange.receive()
+            drained += len(message.get('body', b''))
+            if drained > self.max_drain_bytes:
+                exchange.keep_alive = False
+
+        return exchange.keep_alive and not self._closing
+
+
+# Helper to get a connection's ASGI client and server addresses
+def _connection_addresses(writer):
+    peername = writer.get_extra_info('peername')
+    sockname = writer.get_extra_info('sockname')
+    client = (peername[0], peername[1]) if isinstance(peername, tuple) else None
+    server = (sockname[0], sockname[1]) if isinstance(sockname, tuple) else (sockname or '', None)
+    return client, server
+
+
+# Request parsing error
+class _HTTPError(Exception):
+    __slots__ = ('status',)
+
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+# Helper to parse a request's line and headers
+def _parse_request(head, reader, writer, body_timeout):
+    lines = head[:-4].split(b'\r\n')
+
+    # Parse the request line
+    mrequest = _RE_REQUEST_LINE.match(lines[0].decode('latin-1'))
+    if mrequest is None:
+        raise _HTTPError(HTTPStatus.BAD_REQUEST)
+    method, target, major, minor = mrequest.groups()
+    if major != '1':
+        raise _HTTPError(HTTPStatus.HTTP_VERSION_NOT_SUPPORTED)
+    http_version = '1.1' if minor != '0' else '1.0'
+    if target.startswith('http://') or target.startswith('https://'):
+        target_parts = urlsplit(target)
+        target = f'{target_parts.path or "/"}{"?" if target_parts.query else ""}{target_parts.query}'
+    elif not target.startswith('/') and not (target == '*' and method == 'OPTIONS'):
+        raise _HTTPError(HTTPStatus.BAD_REQUEST)
+
+    # Parse the headers
+    headers = []
+    content_lengths = set()
+    transfer_encoding = None
+    connection = set()
+    expect_continue = False
+    for line in lines[1:]:
+        name, sep, value = line.partition(b':')
+        if not sep or _RE_HEADER_NAME.match(name) is None:
+            raise _HTTPError(HTTPStatus.BAD_REQUEST)
+        name = name.lower()
+        value = value.strip(b' \t')
+        headers.append((name, value))
+        if name == b'content-length':
+            content_lengths.update(length.strip() for length in value.split(b','))
+        elif name == b'transfer-encoding':
+            transfer_encoding = value.lower() if transfer_encoding is None else transfer_encoding + b',' + value.lower()
+        elif name == b'connection':
+            connection.update(token.strip() for token in value.lower().split(b','))
+        elif name == b'expect':
+            expect_continue = value.lower() == b'100-continue'
+
+    # Determine the request content framing - both content length and transfer encoding is a smuggling risk
+    exchange = _Exchange(reader, writer, body_timeout, http_version)
+    if transfer_encoding is not None:
+        if content_lengths or http_version == '1.0':
+            raise _HTTPError(HTTPStatus.BAD_REQUEST)
+        if transfer_encoding != b'chunked':
+            raise _HTTPError(HTTPStatus.NOT_IMPLEMENTED)
+        exchange.body_chunked = True
+    elif content_lengths:
+        content_length = content_lengths.pop()
+        if content_lengths or not content_length.isdigit():
+            raise _HTTPError(HTTPStatus.BAD_REQUEST)
+        exchange.body_remaining = int(content_length)
+
+    # Persistent connection?
+    if http_version == '1.1':
+        exchange.keep_alive = b'close' not in connection
+    else:
+        exchange.keep_alive = b'keep-alive' in connection
+    exchange.expect_continue = expect_continue and http_version == '1.1'
+
+    return method, target, http_version, headers, exchange
+
+
+# A request/response exchange - the ASGI receive and send callables
+class _Exchange:
+    __slots__ = (
+        'reader', 'writer', 'body_timeout', 'http_version', 'is_head', 'keep_alive', 'expect_continue',
+        'body_chunked', 'body_remaining', 'body_complete', 'response_start', 'response_started', 'response_chunked',
+        'response_complete', 'response_done'
+    )
+
+    def __init__(self, reader, writer, body_timeout, http_version):
+        self.reader = reader
+        self.writer = writer
+        self.body_timeout = body_timeout
+        self.http_version = http_version
+        self.is_head = False
+        self.keep_alive = False
+        self.expect_continue = False
+        self.body_chunked = False
+        self.body_remaining = 0
+        self.body_complete = False
+        self.response_start = None
+        self.response_started = False
+        self.response_chunked = False
+        self.response_complete = False
+        self.response_done = asyncio.Event()
+
+    async def receive(self):
+        # Request content complete? Wait for the response to complete or the application to return.
+        if self.body_complete:
+            await self.response_done.wait()
+            return {'type': 'http.disconnect'}
+
+        # Interim response for "Expect: 100-continue"
+        if self.expect_continue:
+            self.expect_continue = False
+            if not self.response_started:
+                self.writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+
+        # Read request content - a stalled or invalid request is disconnected
+        try:
+            body = await asyncio.wait_for(self._read_body(), self.body_timeout)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            self.body_complete = True
+            self.keep_alive = False
+            return {'type': 'http.disconnect'}
+        return {'type': 'http.request', 'body': body, 'more_body': not self.body_complete}
+
+    async def _read_body(self):
+        reader = self.reader
+
+        # Content-Length content
+        if not self.body_chunked:
+            if self.body_remaining == 0:
+                self.body_complete = True
+                return b''
+            body = await reader.read(min(self.body_remaining, SERVER_READ_SIZE))
+            if not body:
+                raise asyncio.IncompleteReadError(b'', self.body_remaining)
+            self.body_remaining -= len(body)
+            self.body_complete = self.body_remaining == 0
+            return body
+
+        # Read the chunk size line
+        if self.body_remaining == 0:
+            chunk_size = (await reader.readuntil(b'\r\n')).split(b';', 1)[0].strip()
+            if not chunk_size or chunk_size.lstrip(b'0123456789abcdefABCDEF'):
+                raise ValueError('Invalid chunk size')
+            self.body_remaining = int(chunk_size, 16)
+
+            # Last chunk? Discard the trailer fields.
+            if self.body_remaining == 0:
+                while await reader.readuntil(b'\r\n') != b'\r\n':
+                    pass
+                self.body_complete = True
+                return b''
+
+        # Read the chunk data
+        body = await reader.read(min(self.body_remaining, SERVER_READ_SIZE))
+        if not body:
+            raise asyncio.IncompleteReadError(b'', self.body_remaining)
+        self.body_remaining -= len(body)
+        if self.body_remaining == 0 and await reader.readexactly(2) != b'\r\n':
+            raise ValueError('Invalid chunk')
+        return body
+
+    async def send(self, message):
+        message_type = message['type']
+        if self.response_complete:
+            raise RuntimeError(f'Unexpected ASGI message {message_type!r:.100s} after response completed')
+
+        # Response start - the status line and headers are written with the first content
+        if message_type == 'http.response.start':
+            if self.response_start is not None:
+                raise RuntimeError('Response already started')
+            self.response_start = (message['status'], list(message.get('headers', ())))
+            return
+
+        if self.response_start is None:
+            raise RuntimeError('Response not started')
+        more_body = message.get('more_body', False)
+        writer = self.writer
+
+        # Response content - the data is written at once to avoid small, delayed TCP segments
+        data = []
+        if message_type == 'http.response.body':
+            body = message.get('body', b'')
+            if not self.response_started:
+                data.append(self._response_head(None if more_body else len(body)))
+            if body and not self.is_head:
+                if self.response_chunked:
+                    data.extend((b'%x\r\n' % len(body), body, b'\r\n'))
+                else:
+                    data.append(body)
+
+        # Response file content
+        elif message_type == 'http.response.zerocopysend':
+            file = message['file']
+            offset = message.get('offset')
+            if offset is None:
+                offset = file.tell()
+            count = message.get('count')
+            if count is None:
+                count = os.fstat(file.fileno()).st_size - offset
+            if not self.response_started:
+                data.append(self._response_head(None if more_body else count))
+            if count > 0 and not self.is_head:
+                if self.response_chunked:
+                    data.append(b'%x\r\n' % count)
+                writer.writelines(data)
+                await asyncio.get_running_loop().sendfile(writer.transport, file, offset, count)
+                data = [b'\r\n'] if self.response_chunked else []
+
+        else:
+            raise RuntimeError(f'Unexpected ASGI message {message_type!r:.100s}')
+
+        # Response complete?
+        if not more_body:
+            if self.response_chunked:
+                data.append(b'0\r\n\r\n')
+            self.response_complete = True
+            self.response_done.set()
+        if data:
+            writer.writelines(data)
+        await writer.drain()
+
+    # Helper to create the response's status line and headers
+    def _response_head(self, content_length):
+        status, headers = self.response_start
+        self.response_started = True
+
+        # Determine the response content framing
+        header_names = {name.lower() for name, _ in headers}
+        if any(name.lower() == b'connection' and b'close' in value.lower() for name, value in headers):
+            self.keep_alive = False
+        if b'content-length' not in header_names and status >= 200 and status not in _NO_CONTENT_STATUSES and \
+           not self.is_head:
+            if content_length is not None:
+                headers.append((b'content-length', str(content_length).encode('latin-1')))
+            elif self.http_version == '1.1':
+                headers.append((b'transfer-encoding', b'chunked'))
+                self.response_chunked = True
+            else:
+                self.keep_alive = False
+        if b'connection' not in header_names:
+            if not self.keep_alive:
+                headers.append((b'connection', b'close'))
+            elif self.http_version == '1.0':
+                headers.append((b'connection', b'keep-alive'))
+        if b'date' not in header_names:
+            headers.append((b'date', formatdate(usegmt=True).encode('latin-1')))
+
+        # Create the status line and headers
+        head = [b'HTTP/1.1 %d %s\r\n' % (status, _status_phrase(status))]
+        for name, value in headers:
+            head.append(b'%s: %s\r\n' % (name, value))
+        head.append(b'\r\n')
+        return b''.join(head)
+
+
+# Helper to get a status code's reason phrase
+def _status_phrase(status):
+    try:
+        return HTTPStatus(status).phrase.encode('latin-1')
+    except ValueError:
+        return b''
+
+
+# Helper to write a server error response and close the connection
+async def _write_error(writer, status):
+    phrase = _status_phrase(status)
+    writer.write(
+        b'HTTP/1.1 %d %s\r\ncontent-type: text/plain; charset=utf-8\r\ncontent-length: %d\r\nconnection: close\r\ndate: %s\r\n\r\n%s' %
+        (status, phrase, len(phrase), formatdate(usegmt=True).encode('latin-1'), phrase)
+    )
+    await writer.drain()
+
+
+def load_application(app_spec):
+    """
+    Import an application from its "module:attribute" specification (e.g. "myapp.main:application")
+
+    >>> from chisel.server import load_application
+    >>> load_application('chisel:Application')
+    <class 'chisel.app.Application'>
+
+    :param str app_spec: The application specification. The attribute may be dotted (e.g. "module:object.app").
+    :returns: The application object
+    :raises ValueError: If the application specification is invalid
+    """
+
+    module_name, sep, attr_name = app_spec.partition(':')
+    if not sep or not module_name or not attr_name:
+        raise ValueError(f'Invalid application {app_spec!r:.100s} - expected "module:attribute"')
+    application = importlib.import_module(module_name)
+    for name in attr_name.split('.'):
+        application = getattr(application, name)
+    return application
+
+
+async def serve(application, host=None, port=8080, unix_path=None, sock=None, threads=None, stop=None, drain_timeout=None,
+                **kwargs):
+    """
+    Run an application's :class:`~chisel.server.Server` until it is stopped. A chisel :class:`~chisel.Application`
+    is served using its :meth:`~chisel.Application.asgi` callable - if it has no
+    :attr:`~chisel.Application.executor`, its synchronous request handling runs on a bounded thread pool for the
+    duration of the server. Any other application must be an ASGI callable. If the chisel application has a
+    :attr:`~chisel.Application.gc_manager`, it is started and the server runs its idle collections.
+
+    :param application: The chisel application or ASGI application callable
+    :param str host: The host name or address. If None, the server listens on all interfaces.
+    :param int port: The port number
+    :param str unix_path: The unix domain socket path
+    :param ~socket.socket sock: An already-listening socket
+    :param int threads: The maximum number of request threads. If None, the :class:`~concurrent.futures.ThreadPoolExecutor`
+        default is used.
+    :param ~collections.abc.Callable stop: The function, called with the :class:`~chisel.server.Server`, that returns
+        the awaitable that stops the server when it completes. If None, the server is stopped by the SIGINT or SIGTERM
+        signal.
+    :param float drain_timeout: The maximum number of seconds to wait for in-progress requests to complete when the
+        server is stopped. If None, the server waits until they complete.
+    :param kwargs: The :class:`~chisel.server.Server` keyword arguments
+    """
+
+    # Create the request thread pool, if necessary
+    executor = None
+    gc_manager = None
+    if isinstance(application, Application):
+        if application.executor is None:
+            executor = application.executor = ThreadPoolExecutor(threads, thread_name_prefix='chisel-request')
+        gc_manager = application.gc_manager
+        app = application.asgi
+    else:
+        app = application
+
+    server = Server(app, **kwargs)
+    loop = asyncio.get_running_loop()
+    stop_signals = ()
+    gc_task = None
+    try:
+        # Start the garbage collector policy
+        if gc_manager is not None:
+            gc_manager.start()
+            gc_task = loop.create_task(_collect_idle(gc_manager))
+
+        asyncio_server = await server.start(host, port, unix_path=unix_path, sock=sock)
+        for server_sock in asyncio_server.sockets:
+            _LOG.info('chisel server listening on %r', server_sock.getsockname())
+
+        # Wait for the stop awaitable or signal
+        if stop is None:
+            stop_event = asyncio.Event()
+            stop_signals = (signal.SIGINT, signal.SIGTERM)
+            for stop_signal in stop_signals:
+                loop.add_signal_handler(stop_signal, stop_event.set)
+            await stop_event.wait()
+        else:
+            await stop(server)
+    finally:
+        if gc_task is not None:
+            gc_task.cancel()
+        for stop_signal in stop_signals:
+            loop.remove_signal_handler(stop_signal)
+        server.close()
+        drained = True
+        try:
+            await asyncio.wait_for(server.wait_closed(), drain_timeout)
+        except asyncio.TimeoutError:
+            drained = False
+            _LOG.warning('chisel server stopped with requests in progress after %r seconds', drain_timeout)
+        if executor is not None:
+            application.executor = None
+            if drained:
+                await loop.run_in_executor(None, executor.shutdown)
+            else:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Helper task to run a GC manager's idle collections
+async def _collect_idle(gc_manager):
+    while True:
+        await asyncio.sleep(gc_manager.idle_seconds)
+        gc_manager.collect_idle()
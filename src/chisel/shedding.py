@@ -0,0 +1,288 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Chisel adaptive load shedding based on request queueing delay
+"""
+
+import asyncio
+import itertools
+import math
+import threading
+import time
+
+
+#: The upstream request start time request header (e.g. "t=1700000000.123" or "1700000000123")
+REQUEST_START_HEADER = 'X-Request-Start'
+
+#: The ASGI connection scope extension in which the chisel server provides the request's arrival time - the time the
+#: request's line and headers were read
+REQUEST_START_EXTENSION = 'chisel.request_start'
+
+#: The default queueing delay target, in seconds
+LOAD_SHED_TARGET_SECONDS = 0.05
+
+#: The default queueing delay interval, in seconds
+LOAD_SHED_INTERVAL_SECONDS = 0.5
+
+
+class LoadShedder:
+    """
+    A thread-safe, `CoDel <https://queue.acm.org/detail.cfm?id=2209336>`__-style request admission policy. Set the
+    :attr:`~chisel.Application.load_shedder` attribute to reject requests quickly when the application is overloaded
+    rather than serving every request slowly.
+
+    A request's queueing delay is the time from its arrival until the application matches it. The arrival time is the
+    time the chisel server read the request (see :data:`~chisel.shedding.REQUEST_START_EXTENSION`) or, if the load
+    shedder trusts it, the upstream :data:`~chisel.shedding.REQUEST_START_HEADER` request header. Trust the header only
+    behind a proxy that sets it - otherwise clients control their own requests' queueing delays. Under
+    :meth:`~chisel.Application.asgi`, a request's blocking steps (e.g. synchronous action callbacks) wait in the
+    application's :attr:`~chisel.Application.executor` queue, so the queueing delay also includes the time the oldest
+    queued blocking step has waited to start (see :meth:`~chisel.shedding.LoadShedder.run_in_executor`). A WSGI
+    server provides no arrival time - under WSGI, the load shedder does nothing unless it trusts a
+    :data:`~chisel.shedding.REQUEST_START_HEADER` set by an upstream proxy. Requests without an arrival time, while
+    the executor has no queue, are always admitted. When the minimum queueing delay over an interval exceeds the
+    target, there is a standing queue and the application is overloaded until the minimum delay of a later interval
+    doesn't. While the application is overloaded, requests whose queueing delay exceeds the target are rejected with a
+    canned "503 Service Unavailable" response and a "Retry-After" header. Exempt requests (e.g. health checks) are
+    never rejected.
+
+    >>> from chisel.shedding import LoadShedder
+    >>> load_shedder = LoadShedder(target=0.05, interval=0.5)
+    >>> load_shedder.admit(0.2, now=1.0), load_shedder.admit(0.1, now=1.6), load_shedder.overloaded
+    (True, False, True)
+    >>> load_shedder.admit(0.01, now=1.7), load_shedder.admit(0.02, now=2.2), load_shedder.overloaded
+    (True, True, False)
+
+    :param float target: The queueing delay target, in seconds
+    :param float interval: The queueing delay interval, in seconds
+    :param exempt: The names of the requests that are never rejected
+    :type exempt: ~collections.abc.Iterable(str)
+    :param exempt_doc_groups: The documentation groups of the requests that are never rejected
+    :type exempt_doc_groups: ~collections.abc.Iterable(str)
+    :param int retry_after: The "Retry-After" response header value, in seconds, for rejected requests
+    :param bool trust_request_start: If True, the :data:`~chisel.shedding.REQUEST_START_HEADER` request header is the
+        request's arrival time
+    """
+
+    __slots__ = (
+        'target',
+        'interval',
+        'exempt',
+        'exempt_doc_groups',
+        'retry_after',
+        'trust_request_start',
+        'overloaded',
+        'min_delay',
+        'max_delay',
+        'admitted',
+        'rejected',
+        'overloaded_intervals',
+        '_lock',
+        '_interval_end',
+        '_interval_min',
+        '_queued',
+        '_queued_keys'
+    )
+
+    def __init__(self, target=LOAD_SHED_TARGET_SECONDS, interval=LOAD_SHED_INTERVAL_SECONDS, exempt=(), exempt_doc_groups=(),
+                 retry_after=1, trust_request_start=False):
+
+        #: The queueing delay target, in seconds
+        self.target = target
+
+        #: The queueing delay interval, in seconds
+        self.interval = interval
+
+        #: The set of the names of the requests that are never rejected
+        self.exempt = set(exempt)
+
+        #: The set of the documentation groups of the requests that are never rejected
+        self.exempt_doc_groups = set(exempt_doc_groups)
+
+        #: The "Retry-After" response header value, in seconds, for rejected requests
+        self.retry_after = retry_after
+
+        #: If True, the :data:`~chisel.shedding.REQUEST_START_HEADER` request header is the request's arrival time
+        self.trust_request_start = trust_request_start
+
+        #: True if the application is overloaded
+        self.overloaded = False
+
+        #: The minimum queueing delay, in seconds, of the last complete interval or None
+        self.min_delay = None
+
+        #: The maximum queueing delay, in seconds
+        self.max_delay = 0.0
+
+        #: The count of admitted requests
+        self.admitted = 0
+
+        #: The count of rejected requests
+        self.rejected = 0
+
+        #: The count of intervals in which the application was overloaded
+        self.overloaded_intervals = 0
+
+        self._lock = threading.Lock()
+        self._interval_end = None
+        self._interval_min = math.inf
+        self._queued = {}
+        self._queued_keys = itertools.count()
+
+    def is_exempt(self, request):
+        """
+        Determine if a request is never rejected
+
+        :param ~chisel.Request request: The request
+        :rtype: bool
+        """
+
+        return request.name in self.exempt or (request.doc_group is not None and request.doc_group in self.exempt_doc_groups)
+
+    def admit(self, delay, exempt=False, now=None):
+        """
+        Record a request's queueing delay and determine if the request is admitted
+
+        :param float delay: The request's queueing delay, in seconds
+        :param bool exempt: If True, the request is always admitted
+        :param float now: The current :func:`~time.monotonic` time. If None, the current time is used.
+        :returns: True if the request is admitted, False if it is rejected
+        :rtype: bool
+        """
+
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            # Update the interval's minimum delay - if the interval is complete, update the overloaded state
+            self._interval_min = min(self._interval_min, delay)
+            self.max_delay = max(self.max_delay, delay)
+            if self._interval_end is None:
+                self._interval_end = now + self.interval
+            elif now >= self._interval_end:
+                self.min_delay = self._interval_min
+                self.overloaded = self.min_delay > self.target
+                if self.overloaded:
+                    self.overloaded_intervals += 1
+                self._interval_min = math.inf
+                self._interval_end = now + self.interval
+
+            # Reject the request?
+            if not exempt and self.overloaded and delay > self.target:
+                self.rejected += 1
+                return False
+            self.admitted += 1
+            return True
+
+    def admit_request(self, environ, request):
+        """
+        Determine if an application request is admitted
+
+        :param dict environ: The :pep:`WSGI <3333>` environ dictionary
+        :param ~chisel.Request request: The matched request
+        :returns: True if the request is admitted, False if it is rejected
+        :rtype: bool
+        """
+
+        now = time.monotonic()
+        delay = get_queue_delay(environ, trust_request_start=self.trust_request_start)
+        executor_delay = self.executor_delay(now)
+        if delay is None and not executor_delay:
+            return True
+        return self.admit((delay or 0.0) + executor_delay, self.is_exempt(request), now)
+
+    def run_in_executor(self, executor, func, *args):
+        """
+        Run a request's blocking function on an executor from the running event loop. Until it starts, the function's
+        wait in the executor's queue counts toward the queueing delay of the requests that follow it.
+
+        :param ~concurrent.futures.Executor executor: The executor or None for the event loop's default executor
+        :param ~collections.abc.Callable func: The function
+        :param args: The function's arguments
+        :returns: The function's :class:`asyncio.Future`
+        """
+
+        with self._lock:
+            key = next(self._queued_keys)
+            self._queued[key] = time.monotonic()
+
+        def started():
+            self._dequeue(key)
+            return func(*args)
+
+        future = asyncio.get_running_loop().run_in_executor(executor, started)
+        future.add_done_callback(lambda unused_future: self._dequeue(key))
+        return future
+
+    def executor_delay(self, now=None):
+        """
+        Get the time the oldest queued blocking function (see :meth:`~chisel.shedding.LoadShedder.run_in_executor`)
+        has waited to start
+
+        :param float now: The current :func:`~time.monotonic` time. If None, the current time is used.
+        :returns: The wait, in seconds, or zero if no function is queued
+        :rtype: float
+        """
+
+        with self._lock:
+            queued_time = next(iter(self._queued.values()), None)
+        if queued_time is None:
+            return 0.0
+        if now is None:
+            now = time.monotonic()
+        return max(0.0, now - queued_time)
+
+    # Helper to remove a started (or cancelled) function from the executor queue
+    def _dequeue(self, key):
+        with self._lock:
+            self._queued.pop(key, None)
+
+
+def get_queue_delay(environ, now=None, trust_request_start=False):
+    """
+    Get a request's queueing delay - the time since its arrival
+
+    >>> from chisel.shedding import get_queue_delay
+    >>> get_queue_delay({'HTTP_X_REQUEST_START': 't=1700000000.000'}, now=1700000000.25, trust_request_start=True)
+    0.25
+    >>> get_queue_delay({'HTTP_X_REQUEST_START': '1700000000000'}, now=1700000000.25, trust_request_start=True)
+    0.25
+    >>> get_queue_delay({'HTTP_X_REQUEST_START': '1700000000000'}) is None
+    True
+
+    :param dict environ: The :pep:`WSGI <3333>` environ dictionary
+    :param float now: The current :func:`~time.time`. If None, the current time is used.
+    :param bool trust_request_start: If True, the :data:`~chisel.shedding.REQUEST_START_HEADER` request header is the
+        request's arrival time. Otherwise, the header is ignored and the arrival time is the time the chisel server
+        read the request.
+    :returns: The queueing delay, in seconds, or None if the request's arrival time is unknown. A negative delay (e.g.
+        clock skew) is zero.
+    :rtype: float or None
+    """
+
+    start_time = None
+
+    # Trusted upstream request start time header - seconds, milliseconds, or microseconds since the epoch
+    request_start = environ.get('HTTP_X_REQUEST_START') if trust_request_start else None
+    if request_start is not None:
+        try:
+            start_time = float(request_start.strip().removeprefix('t='))
+        except ValueError:
+            pass
+        else:
+            if start_time > 1e14:
+                start_time /= 1e6
+            elif start_time > 1e11:
+                start_time /= 1e3
+
+    # Server arrival time
+    if start_time is None:
+        scope = environ.get('asgi.scope')
+        extension = scope.get('extensions', {}).get(REQUEST_START_EXTENSION) if scope is not None else None
+        if extension is None:
+            return None
+        start_time = extension['time']
+
+    if now is None:
+        now = time.time()
+    return max(0.0, now - start_time)
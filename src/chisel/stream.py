@@ -0,0 +1,176 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Chisel streamed action responses
+"""
+
+import asyncio
+import queue
+import threading
+from types import GeneratorType
+
+
+#: The streamed response content chunk size, in bytes. Encoded content is buffered to at least this size before it is
+#: passed to the WSGI server.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class StreamArray:
+    """
+    A streamed array value. An action callback may return a StreamArray (see :meth:`~chisel.Context.stream`) or a
+    generator as the value of a top-level array output member. The member's values are encoded and validated one at a
+    time as the response content is sent.
+
+    :param ~collections.abc.Iterable iterable: The array values iterable
+    """
+
+    __slots__ = ('iterable',)
+
+    def __init__(self, iterable):
+
+        #: The array values iterable
+        self.iterable = iterable
+
+    def __iter__(self):
+        return iter(self.iterable)
+
+    def close(self):
+        """
+        Close the array values iterable, if it has a "close" method (e.g. a generator)
+        """
+
+        close = getattr(self.iterable, 'close', None)
+        if close is not None:
+            close()
+
+
+def is_stream(value):
+    """
+    Determine if a value is a streamed array value - a :class:`~chisel.stream.StreamArray` or a generator
+
+    :param object value: The value
+    :rtype: bool
+    """
+
+    return isinstance(value, (StreamArray, GeneratorType))
+
+
+#: The Server-Sent Events content type
+EVENT_STREAM_CONTENT_TYPE = 'text/event-stream'
+
+#: The newline-delimited JSON content type
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+#: The maximum number of values buffered by :func:`~chisel.stream.iter_heartbeat`
+HEARTBEAT_QUEUE_SIZE = 16
+
+#: The value yielded by :func:`~chisel.stream.iter_heartbeat` when no value is available within the heartbeat interval
+HEARTBEAT = object()
+
+# The producer thread's wait interval, in seconds, when the values queue is full
+_HEARTBEAT_PUT_SECONDS = 0.1
+
+
+def iter_heartbeat(iterable, heartbeat_seconds, queue_size=HEARTBEAT_QUEUE_SIZE):
+    """
+    Iterate an iterable on a separate thread, yielding :data:`~chisel.stream.HEARTBEAT` whenever no value is available
+    within the heartbeat interval. At most "queue_size" values are iterated ahead of the consumer, so a slow consumer
+    (e.g. a slow client) pauses the iteration.
+
+    Exceptions raised by the iterable are re-raised by the consumer. When the returned generator is closed (e.g. on
+    client disconnect), the iterable is closed on its thread once its current value is produced.
+
+    :param ~collections.abc.Iterable iterable: The values iterable
+    :param float heartbeat_seconds: The heartbeat interval, in seconds
+    :param int queue_size: The maximum number of buffered values
+    :returns: A generator of the iterable's values and heartbeats
+    """
+
+    values = queue.Queue(queue_size)
+    stop = threading.Event()
+    thread = threading.Thread(target=_heartbeat_producer, args=(iterable, values, stop), name='chisel-heartbeat', daemon=True)
+    thread.start()
+    try:
+        while True:
+            try:
+                is_value, value = values.get(timeout=heartbeat_seconds)
+            except queue.Empty:
+                yield HEARTBEAT
+                continue
+            if is_value is None:
+                break
+            if not is_value:
+                raise value
+            yield value
+    finally:
+        stop.set()
+
+
+async def aiter_heartbeat(iterable, heartbeat_seconds):
+    """
+    Iterate an asynchronous iterable on the running event loop, yielding :data:`~chisel.stream.HEARTBEAT` whenever no
+    value is available within the heartbeat interval. The iterable's pending value is awaited across heartbeats, so no
+    value is lost.
+
+    Exceptions raised by the iterable are re-raised by the consumer. When the returned asynchronous generator is closed
+    (e.g. on client disconnect), the pending value is cancelled and the iterable is closed.
+
+    :param ~collections.abc.AsyncIterable iterable: The values asynchronous iterable
+    :param float heartbeat_seconds: The heartbeat interval, in seconds
+    :returns: An asynchronous generator of the iterable's values and heartbeats
+    """
+
+    iterator = aiter(iterable)
+    task = None
+    try:
+        while True:
+            if task is None:
+                task = asyncio.ensure_future(anext(iterator))
+            done, _ = await asyncio.wait((task,), timeout=heartbeat_seconds)
+            if not done:
+                yield HEARTBEAT
+                continue
+            try:
+                value = task.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                task = None
+            yield value
+    finally:
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+        aclose = getattr(iterator, 'aclose', None)
+        if aclose is not None:
+            await aclose()
+
+
+def _heartbeat_producer(iterable, values, stop):
+    iterator = None
+    try:
+        iterator = iter(iterable)
+        for value in iterator:
+            if not _heartbeat_put(values, stop, (True, value)):
+                return
+        _heartbeat_put(values, stop, (None, None))
+    except Exception as exc:
+        _heartbeat_put(values, stop, (False, exc))
+    finally:
+        close = getattr(iterator if iterator is not None else iterable, 'close', None)
+        if close is not None:
+            close()
+
+
+def _heartbeat_put(values, stop, item):
+    while not stop.is_set():
+        try:
+            values.put(item, timeout=_HEARTBEAT_PUT_SECONDS)
+            return True
+        except queue.Full:
+            pass
+    return False
@@ -0,0 +1,496 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+"""
+Chisel in-place and output schema validation
+"""
+
+import array
+
+from schema_markdown import get_enum_values, get_struct_members, validate_type
+
+try:
+    import numpy
+except ImportError: # pragma: no cover
+    numpy = None
+
+
+#: The minimum length of a numeric array validated with vectorized NumPy operations
+NUMPY_MIN_LENGTH = 64
+
+
+def validate_type_inplace(types, type_name, value, ndarray=False):
+    """
+    Type-validate a value using the schema-markdown user type model without duplicating container values. Unlike
+    :func:`schema_markdown.validate_type`, dict and list values are validated in place - only values that are
+    transformed during validation (e.g. date and datetime strings) are replaced.
+
+    If NumPy is installed, homogeneous int and float arrays of at least :data:`NUMPY_MIN_LENGTH` values are validated
+    with vectorized NumPy operations.
+
+    Validation results are identical to :func:`schema_markdown.validate_type`. On failure, the (partially transformed)
+    value is re-validated with :func:`schema_markdown.validate_type` to raise its validation error.
+
+    :param dict types: The type model
+    :param str type_name: The type name
+    :param object value: The value object to validate
+    :param bool ndarray: If True and NumPy is installed, validated int and float arrays are returned as
+        :class:`numpy.ndarray` objects
+    :returns: The validated, transformed value object
+    :raises ~schema_markdown.ValidationError: A validation error occurred
+    """
+
+    ndarray = ndarray and numpy is not None
+    try:
+        return _validate(types, {'user': type_name}, value, ndarray, True)
+    except _ValidationFailed:
+        pass
+
+    # Re-validate to raise the schema-markdown validation error
+    if ndarray:
+        value = _ndarray_to_list(value)
+    return validate_type(types, type_name, value)
+
+
+def check_type(types, type_name, value, member_fqn=None):
+    """
+    Type-validate a value using the schema-markdown user type model without transforming or copying it. Use this
+    function to validate output values.
+
+    In addition to lists and tuples, int and float array values may be :class:`numpy.ndarray`,
+    :class:`array.array`, or :class:`memoryview` objects. If NumPy is installed, these values are validated with
+    vectorized NumPy operations. Otherwise, validation results are identical to :func:`schema_markdown.validate_type`.
+
+    :param dict types: The type model
+    :param str type_name: The type name
+    :param object value: The value object to validate
+    :param str member_fqn: Optional fully-qualified member name of the value, for validation error messages
+    :raises ~schema_markdown.ValidationError: A validation error occurred
+    """
+
+    try:
+        _validate(types, {'user': type_name}, value, False, False)
+        return
+    except _ValidationFailed:
+        pass
+
+    # Re-validate a list-converted copy to raise the schema-markdown validation error
+    validate_type(types, type_name, _buffer_to_list(value), member_fqn)
+
+
+# Helper to replace ndarray values with lists for schema-markdown re-validation
+def _ndarray_to_list(value):
+    if isinstance(value, dict):
+        for key, member_value in value.items():
+            value[key] = _ndarray_to_list(member_value)
+    elif isinstance(value, list):
+        for ix_array_value, array_value in enumerate(value):
+            value[ix_array_value] = _ndarray_to_list(array_value)
+    elif isinstance(value, numpy.ndarray):
+        return value.tolist()
+    return value
+
+
+# Helper to copy a value with buffer values converted to lists for schema-markdown re-validation
+def _buffer_to_list(value):
+    if isinstance(value, dict):
+        return {key: _buffer_to_list(member_value) for key, member_value in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_buffer_to_list(array_value) for array_value in value]
+    if isinstance(value, BUFFER_TYPES):
+        try:
+            return value.tolist()
+        except (NotImplementedError, TypeError, ValueError):
+            pass
+    return value
+
+
+#: The buffer value types (e.g. :class:`numpy.ndarray`) accepted for output array values
+BUFFER_TYPES = (array.array, memoryview) if numpy is None else (array.array, memoryview, numpy.ndarray)
+
+
+# Internal validation failure exception - the error message comes from schema-markdown re-validation
+class _ValidationFailed(Exception):
+    __slots__ = ()
+
+
+# Single-type models used to delegate non-trivial built-in type validation (e.g. date strings) to schema-markdown
+_BUILTIN_TYPES = {
+    builtin: {'typedef': {'name': builtin, 'type': {'builtin': builtin}}}
+    for builtin in ('int', 'float', 'bool', 'date', 'datetime', 'uuid')
+}
+
+
+# Default dict key type
+_DEFAULT_DICT_KEY_TYPE = {'builtin': 'string'}
+
+
+# Validate a value in place. If "transform" is False, the value is not modified (output validation). If "ndarray" is
+# True, validated numeric arrays are returned as ndarrays.
+def _validate(types, type_, value, ndarray, transform):
+
+    # Built-in type?
+    if 'builtin' in type_:
+        builtin = type_['builtin']
+
+        # Fast checks for JSON-native values
+        if builtin == 'string':
+            if isinstance(value, str):
+                return value
+            raise _ValidationFailed()
+        if builtin == 'int':
+            if isinstance(value, int) and not isinstance(value, bool):
+                return value
+        elif builtin == 'float':
+            if isinstance(value, float):
+                return value
+        elif builtin == 'bool':
+            if isinstance(value, bool):
+                return value
+        elif builtin not in _BUILTIN_TYPES:
+            return value
+
+        # Everything else is validated (and transformed) by schema-markdown
+        try:
+            return validate_type(_BUILTIN_TYPES, builtin, value)
+        except Exception:
+            raise _ValidationFailed() from None
+
+    # User type?
+    if 'user' in type_:
+        user_type = types.get(type_['user'])
+        if user_type is None or 'action' in user_type:
+            raise _ValidationFailed()
+
+        # typedef?
+        if 'typedef' in user_type:
+            typedef = user_type['typedef']
+            typedef_attr = typedef.get('attr')
+            if typedef_attr is not None and typedef_attr.get('nullable') and _is_null(value):
+                return None
+            value = _validate(types, typedef['type'], value, ndarray, transform)
+            if typedef_attr is not None:
+                _validate_attr(typedef_attr, value)
+            return value
+
+        # enum?
+        if 'enum' in user_type:
+            if not any(value == enum_value['name'] for enum_value in get_enum_values(types, user_type['enum'])):
+                raise _ValidationFailed()
+            return value
+
+        # struct?
+        struct = user_type['struct']
+        if isinstance(value, str) and value == '':
+            value = {}
+        elif not isinstance(value, dict):
+            raise _ValidationFailed()
+
+        # Valid union?
+        is_union = struct.get('union', False)
+        if is_union and len(value) != 1:
+            raise _ValidationFailed()
+
+        # Validate the struct members in place
+        member_count = 0
+        for member in get_struct_members(types, struct):
+            member_name = member['name']
+            if member_name not in value:
+                if not member.get('optional', False) and not is_union:
+                    raise _ValidationFailed()
+                continue
+
+            member_count += 1
+            member_value = value[member_name]
+            member_attr = member.get('attr')
+            if member_attr is None:
+                member_value_new = _validate(types, member['type'], member_value, ndarray, transform)
+            elif member_attr.get('nullable') and _is_null(member_value):
+                member_value_new = None
+            else:
+                member_value_new = _validate(types, member['type'], member_value, ndarray, transform)
+                _validate_attr(member_attr, member_value_new)
+
+            # Replace transformed values only
+            if transform and member_value_new is not member_value:
+                value[member_name] = member_value_new
+
+        # Any unknown members?
+        if member_count != len(value):
+            raise _ValidationFailed()
+
+        return value
+
+    # array?
+    if 'array' in type_:
+        array = type_['array']
+        array_type = array['type']
+        array_attr = array.get('attr')
+        if isinstance(value, str) and value == '':
+            value = []
+        elif not isinstance(value, (list, tuple)):
+            # Numeric buffer output value?
+            if transform or not isinstance(value, BUFFER_TYPES):
+                raise _ValidationFailed()
+            if numpy is not None:
+                numeric_type = _get_numeric_array_type(types, array)
+                if numeric_type is not None and _check_numeric_buffer(numeric_type, value):
+                    return value
+            try:
+                value = value.tolist()
+            except (NotImplementedError, TypeError, ValueError):
+                raise _ValidationFailed() from None
+
+        # Numeric array? Validate with vectorized NumPy operations, if possible.
+        numeric_type = None
+        if numpy is not None and (ndarray or len(value) >= NUMPY_MIN_LENGTH):
+            numeric_type = _get_numeric_array_type(types, array)
+            if numeric_type is not None:
+                value_array, value_transformed = _validate_numeric_array(numeric_type, value)
+                if value_array is not None:
+                    if ndarray:
+                        return value_array
+                    if transform and value_transformed:
+                        if isinstance(value, tuple):
+                            return value_array.tolist()
+                        value[:] = value_array.tolist()
+                    return value
+
+        # Validate the array values in place
+        array_value_nullable = array_attr is not None and array_attr.get('nullable')
+        for ix_array_value, array_value in enumerate(value):
+            if array_value_nullable and _is_null(array_value):
+                array_value_new = None
+            else:
+                array_value_new = _validate(types, array_type, array_value, ndarray, transform)
+                if array_attr is not None:
+                    _validate_attr(array_attr, array_value_new)
+
+            # Replace transformed values only - tuples are copied to a list on first transform
+            if transform and array_value_new is not array_value:
+                if isinstance(value, tuple):
+                    value = list(value)
+                value[ix_array_value] = array_value_new
+
+        # Return numeric arrays as ndarray?
+        if numeric_type is not None and ndarray:
+            try:
+                return numpy.array(value, dtype=_NUMERIC_TYPE_DTYPES[numeric_type[0]])
+            except OverflowError:
+                pass
+
+        return value
+
+    # dict
+    dict_ = type_['dict']
+    dict_type = dict_['type']
+    dict_attr = dict_.get('attr')
+    dict_key_type = dict_['keyType'] if 'keyType' in dict_ else _DEFAULT_DICT_KEY_TYPE
+    dict_key_attr = dict_.get('keyAttr')
+    if isinstance(value, str) and value == '':
+        return {}
+    if not isinstance(value, dict):
+        raise _ValidationFailed()
+
+    # Validate the dict key/value pairs in place
+    dict_key_nullable = dict_key_attr is not None and dict_key_attr.get('nullable')
+    dict_value_nullable = dict_attr is not None and dict_attr.get('nullable')
+    dict_keys_new = None
+    for dict_key, dict_value in value.items():
+
+        # Validate the key
+        if dict_key_nullable and _is_null(dict_key):
+            dict_key_new = None
+        else:
+            dict_key_new = _validate(types, dict_key_type, dict_key, False, transform)
+            if dict_key_attr is not None:
+                _validate_attr(dict_key_attr, dict_key_new)
+        if dict_key_new is not dict_key:
+            if dict_keys_new is None:
+                dict_keys_new = {}
+            dict_keys_new[dict_key] = dict_key_new
+
+        # Validate the value - replacing a key's value does not change the dict's size, so iteration is safe
+        if dict_value_nullable and _is_null(dict_value):
+            dict_value_new = None
+        else:
+            dict_value_new = _validate(types, dict_type, dict_value, ndarray, transform)
+            if dict_attr is not None:
+                _validate_attr(dict_attr, dict_value_new)
+        if transform and dict_value_new is not dict_value:
+            value[dict_key] = dict_value_new
+
+    # Any transformed keys? Re-key the dict (rare).
+    if transform and dict_keys_new is not None:
+        return {dict_keys_new.get(dict_key, dict_key): dict_value for dict_key, dict_value in value.items()}
+
+    return value
+
+
+# Map of numeric built-in type to ndarray dtype
+_NUMERIC_TYPE_DTYPES = {'int': 'int64', 'float': 'float64'}
+
+
+# The maximum magnitude of an integer exactly represented by a float64 and of a float64 convertible to int64
+_FLOAT_INT_EXACT = 2 ** 53
+_FLOAT_INT64_MAX = 2 ** 63
+
+
+# Helper to get a numeric array's element built-in type name and attribute list - returns None if the array's values
+# are not non-nullable int or float values with numeric attributes only
+def _get_numeric_array_type(types, array):
+    attrs = []
+    array_attr = array.get('attr')
+    if array_attr is not None:
+        attrs.append(array_attr)
+    type_ = array['type']
+    while 'user' in type_:
+        user_type = types.get(type_['user'])
+        if user_type is None or 'typedef' not in user_type:
+            return None
+        typedef = user_type['typedef']
+        if 'attr' in typedef:
+            attrs.append(typedef['attr'])
+        type_ = typedef['type']
+    builtin = type_.get('builtin')
+    if builtin not in _NUMERIC_TYPE_DTYPES or any(not _NUMERIC_ATTRS.issuperset(attr) or attr.get('nullable') for attr in attrs):
+        return None
+    return builtin, attrs
+
+
+# The numeric array attributes supported by vectorized validation
+_NUMERIC_ATTRS = frozenset(('eq', 'lt', 'lte', 'gt', 'gte', 'nullable'))
+
+
+# Helper to validate a numeric array with vectorized NumPy operations. Returns the validated ndarray (or None if
+# vectorized validation is not possible) and True if any array value is transformed by validation.
+def _validate_numeric_array(numeric_type, value):
+    builtin, attrs = numeric_type
+    try:
+        # Homogeneous array values? Booleans are never valid numbers.
+        value_types = set(map(type, value))
+        invalid = None
+        if builtin == 'float':
+            if not value_types.issubset(_FLOAT_VALUE_TYPES):
+                return None, False
+            value_array = numpy.array(value, dtype=numpy.float64)
+            value_transformed = int in value_types
+        elif not value_types or value_types == _INT_VALUE_TYPES:
+            value_array = numpy.array(value, dtype=numpy.int64)
+            value_transformed = False
+        elif value_types == _FLOAT_VALUE_TYPE:
+            # Integer-valued floats are valid ints
+            value_float = numpy.array(value, dtype=numpy.float64)
+            with numpy.errstate(invalid='ignore'):
+                invalid = ~numpy.isfinite(value_float) | (numpy.trunc(value_float) != value_float)
+                if numpy.any(numpy.abs(value_float[~invalid]) >= _FLOAT_INT64_MAX):
+                    return None, False
+            value_array = numpy.where(invalid, 0, value_float).astype(numpy.int64)
+            value_transformed = True
+        else:
+            return None, False
+
+        # Check the attributes
+        if attrs:
+            invalid = _check_numeric_attrs(builtin, attrs, value_array, invalid)
+            if invalid is False:
+                return None, False
+    except OverflowError:
+        return None, False
+
+    # Any invalid values?
+    if invalid is not None and invalid.any():
+        raise _ValidationFailed()
+
+    return value_array, value_transformed
+
+
+# Helper to check a numeric buffer value (e.g. ndarray) with vectorized NumPy operations. Returns False if vectorized
+# validation is not possible (the buffer is validated element-by-element instead).
+def _check_numeric_buffer(numeric_type, value):
+    builtin, attrs = numeric_type
+    try:
+        value_array = numpy.asarray(value)
+    except (TypeError, ValueError):
+        return False
+    if value_array.ndim != 1:
+        return False
+
+    # Check the value type - ints are valid floats and integer-valued floats are valid ints. Other value types (e.g.
+    # object arrays) are validated element-by-element.
+    value_kind = value_array.dtype.kind
+    invalid = None
+    if value_kind not in 'iuf':
+        return False
+    if builtin == 'float':
+        if value_kind != 'f':
+            value_array = value_array.astype(numpy.float64)
+    elif value_kind == 'f':
+        with numpy.errstate(invalid='ignore'):
+            invalid = ~numpy.isfinite(value_array) | (numpy.trunc(value_array) != value_array)
+
+    # Check the attributes
+    if attrs:
+        try:
+            invalid = _check_numeric_attrs(builtin, attrs, value_array, invalid)
+        except OverflowError:
+            return False
+        if invalid is False:
+            return False
+
+    # Any invalid values?
+    if invalid is not None and invalid.any():
+        raise _ValidationFailed()
+
+    return True
+
+
+# Helper to compute a numeric array's invalid attribute mask. Comparisons with NaN are false, as with Python floats.
+# Integer comparisons with float attributes are exact only up to 2^53 - returns False if the comparison is not exact.
+def _check_numeric_attrs(builtin, attrs, value_array, invalid):
+    if builtin == 'int' and len(value_array) and \
+       any(isinstance(attr_value, float) for attr in attrs for attr_value in attr.values()) and \
+       numpy.abs(value_array).max() > _FLOAT_INT_EXACT:
+        return False
+    with numpy.errstate(invalid='ignore'):
+        for attr in attrs:
+            if 'eq' in attr:
+                invalid = _invalid_or(invalid, value_array != attr['eq'])
+            if 'lt' in attr:
+                invalid = _invalid_or(invalid, ~(value_array < attr['lt']))
+            if 'lte' in attr:
+                invalid = _invalid_or(invalid, ~(value_array <= attr['lte']))
+            if 'gt' in attr:
+                invalid = _invalid_or(invalid, ~(value_array > attr['gt']))
+            if 'gte' in attr:
+                invalid = _invalid_or(invalid, ~(value_array >= attr['gte']))
+    return invalid
+
+
+# The valid value type sets for vectorized numeric array validation
+_FLOAT_VALUE_TYPES = frozenset((float, int))
+_FLOAT_VALUE_TYPE = frozenset((float,))
+_INT_VALUE_TYPES = frozenset((int,))
+
+
+def _invalid_or(invalid, invalid_attr):
+    return invalid_attr if invalid is None else (invalid | invalid_attr)
+
+
+# Helper to test for a nullable null value - "null" strings are null (e.g. query string values)
+def _is_null(value):
+    return value is None or (isinstance(value, str) and value == 'null')
+
+
+def _validate_attr(attr, value):
+    if ('eq' in attr and not value == attr['eq']) or \
+       ('lt' in attr and not value < attr['lt']) or \
+       ('lte' in attr and not value <= attr['lte']) or \
+       ('gt' in attr and not value > attr['gt']) or \
+       ('gte' in attr and not value >= attr['gte']) or \
+       ('lenEq' in attr and not len(value) == attr['lenEq']) or \
+       ('lenLT' in attr and not len(value) < attr['lenLT']) or \
+       ('lenLTE' in attr and not len(value) <= attr['lenLTE']) or \
+       ('lenGT' in attr and not len(value) > attr['lenGT']) or \
+       ('lenGTE' in attr and not len(value) >= attr['lenGTE']):
+        raise _ValidationFailed()
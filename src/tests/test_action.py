@@ -3,17 +3,32 @@
 
 # pylint: disable=missing-class-docstring, missing-function-docstring, missing-module-docstring
 
+from array import array
+import asyncio
 from collections import OrderedDict
+import concurrent.futures
 from datetime import date, datetime, timezone
 from decimal import Decimal
+import gzip
 from http import HTTPStatus
 from io import StringIO
-from unittest import TestCase
+import json
+import threading
+import time
+from unittest import TestCase, skipIf
 from uuid import UUID
 
 from schema_markdown import SchemaMarkdownParserError, parse_schema_markdown
 
-from chisel import action, Action, ActionError, Application, Request
+from chisel import action, Action, ActionError, Application, Context, Request
+from chisel.app import StartResponse
+from chisel.budget import ContentBudget
+from chisel.bulkhead import Bulkhead
+from chisel.cbor import decode_cbor, encode_cbor
+from chisel.compression import ResponseCompression, decode_response_content, train_zstd_dictionary, zstd
+from chisel.delta import apply_json_patch
+from chisel.stream import STREAM_CHUNK_SIZE
+from chisel.validate import numpy
 
 
 class TestAction(TestCase):
@@ -303,6 +318,97 @@ action my_action
         self.assertEqual(response.decode('utf-8'), '{"error":"InvalidInput","message":"Required member \\"b\\" missing (query string)"}')
 
 
+    # Test action in-place input validation
+    def test_validate_inplace(self):
+
+        request_content = {}
+
+        @action(validate_inplace=True, spec='''\
+action my_action
+    urls
+        POST /my_action/{a}
+    path
+        int a
+    query
+        int b
+    input
+        date[len > 0] dates
+        int[] values
+    output
+        int count
+        date first
+''')
+        def my_action(unused_app, req):
+            request_content['req'] = req
+            return {'count': req['a'] + req['b'] + len(req['values']), 'first': req['dates'][0]}
+
+        app = Application()
+        app.add_request(my_action)
+        self.assertTrue(my_action.validate_inplace)
+
+        status, headers, response = app.request(
+            'POST', '/my_action/1', query_string='b=2', wsgi_input=b'{"dates": ["2020-06-01"], "values": [1, 2, 3]}'
+        )
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/json')])
+        self.assertEqual(response.decode('utf-8'), '{"count":6,"first":"2020-06-01"}')
+        self.assertEqual(request_content['req'], {'a': 1, 'b': 2, 'dates': [date(2020, 6, 1)], 'values': [1, 2, 3]})
+
+        # Validation errors are the same as copy validation
+        status, headers, response = app.request(
+            'POST', '/my_action/1', query_string='b=2', wsgi_input=b'{"dates": ["2020-06-01"], "values": [1, "x"]}'
+        )
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/json')])
+        self.assertEqual(
+            response.decode('utf-8'),
+            '{"error":"InvalidInput","member":"values.1","message":"Invalid value \\"x\\" (type \\"str\\") '
+            'for member \\"values.1\\", expected type \\"int\\" (content)"}'
+        )
+
+
+    # Test action numeric array input as NumPy ndarrays
+    @skipIf(numpy is None, 'NumPy is not installed')
+    def test_numpy_arrays(self):
+
+        @action(numpy_arrays=True, spec='''\
+action my_action
+    query
+        int[] scale
+    input
+        float(> 0, <= 100)[] values
+    output
+        float sum
+        string type
+''')
+        def my_action(unused_app, req):
+            return {
+                'sum': float((req['values'] * req['scale'][0]).sum()),
+                'type': f'{type(req["values"]).__name__},{type(req["scale"]).__name__}'
+            }
+
+        app = Application()
+        app.add_request(my_action)
+        self.assertTrue(my_action.numpy_arrays)
+
+        status, headers, response = app.request('POST', '/my_action', query_string='scale.0=2', wsgi_input=b'{"values": [1, 2.5, 100]}')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/json')])
+        self.assertEqual(response.decode('utf-8'), '{"sum":207.0,"type":"ndarray,ndarray"}')
+
+        # The first invalid value's index is the error member
+        status, headers, response = app.request(
+            'POST', '/my_action', query_string='scale.0=2', wsgi_input=b'{"values": [1, 2.5, 100, 0, 101]}'
+        )
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/json')])
+        self.assertEqual(
+            response.decode('utf-8'),
+            '{"error":"InvalidInput","member":"values.3","message":"Invalid value 0.0 (type \\"float\\") '
+            'for member \\"values.3\\", expected type \\"float\\" [> 0.0] (content)"}'
+        )
+
+
     # Test action content type charset handling
     def test_content_charset(self):
 
@@ -469,7 +575,2471 @@ action my_action
         self.assertEqual(response.decode('utf-8'), '{"a":[1,2,3]}')
 
 
+    # Test action output validation with array.array and memoryview values for numeric array members
+    def test_output_array_array(self):
+
+        @action(spec='''\
+action my_action
+    output
+        float(>= 0)[] a
+        int[] b
+        int[] c
+''')
+        def my_action(unused_app, unused_req):
+            return {'a': array('d', [1.5, 2]), 'b': memoryview(array('q', [1, 2])), 'c': array('d', [3, 4])}
+
+        app = Application()
+        app.add_request(my_action)
+
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=b'{}')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/json')])
+        self.assertEqual(response.decode('utf-8'), '{"a":[1.5,2.0],"b":[1,2],"c":[3.0,4.0]}')
+
+
+    # Test action output validation with ndarray values for numeric array members
+    @skipIf(numpy is None, 'NumPy is not installed')
+    def test_output_ndarray(self):
+
+        @action(spec='''\
+action my_action
+    query
+        float value
+    output
+        float(>= 0)[] a
+        int[] b
+''')
+        def my_action(unused_app, req):
+            return {'a': numpy.full(3, req['value']), 'b': numpy.arange(3)}
+
+        app = Application()
+        app.add_request(my_action)
+
+        status, headers, response = app.request('POST', '/my_action', query_string='value=1.5')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/json')])
+        self.assertEqual(response.decode('utf-8'), '{"a":[1.5,1.5,1.5],"b":[0,1,2]}')
+
+        # Invalid output
+        status, headers, response = app.request('POST', '/my_action', query_string='value=-1')
+        self.assertEqual(status, '500 Internal Server Error')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/json')])
+        self.assertEqual(
+            response.decode('utf-8'),
+            '{"error":"InvalidOutput","member":"a.0","message":"Invalid value -1.0 (type \\"float\\") '
+            'for member \\"a.0\\", expected type \\"float\\" [>= 0.0]"}'
+        )
+
+        # NaN values are not JSON compliant, as with list values
+        @action(spec='''\
+action my_action_nan
+    query
+        bool ndarray
+    output
+        float[] a
+''')
+        def my_action_nan(unused_app, req):
+            return {'a': numpy.array([1.5, numpy.nan]) if req['ndarray'] else [1.5, float('nan')]}
+
+        app.add_request(my_action_nan)
+        status, headers, response = app.request('POST', '/my_action_nan', query_string='ndarray=false')
+        self.assertEqual(status, '500 Internal Server Error')
+        self.assertEqual(sorted(headers), [('Content-Type', 'text/plain; charset=utf-8')])
+        self.assertEqual(response, b'Internal Server Error')
+        status, headers, response = app.request('POST', '/my_action_nan', query_string='ndarray=true')
+        self.assertEqual(status, '500 Internal Server Error')
+        self.assertEqual(sorted(headers), [('Content-Type', 'text/plain; charset=utf-8')])
+        self.assertEqual(response, b'Internal Server Error')
+
+
     # Test action output validation with a dict subclass value
+    def test_columnar(self):
+
+        @action(columnar=True, spec='''\
+action my_action
+    urls
+        GET
+    query
+        bool error
+    output
+        Row[] rows
+    errors
+        MyError
+
+struct Row
+    int a
+    optional string b
+''')
+        def my_action(unused_app, req):
+            if req['error']:
+                raise ActionError('MyError')
+            return {'rows': [{'a': 1, 'b': 'x'}, {'a': 2}]}
+
+        app = Application()
+        app.add_request(my_action)
+
+        # Default row output
+        status, headers, response = app.request('GET', '/my_action', query_string='error=false')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/json'), ('Vary', 'Prefer')])
+        self.assertEqual(response.decode('utf-8'), '{"rows":[{"a":1,"b":"x"},{"a":2}]}')
+
+        # Columnar output
+        environ = {'HTTP_PREFER': 'return=minimal, columnar'}
+        status, headers, response = app.request('GET', '/my_action', query_string='error=false', environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(
+            sorted(headers),
+            [('Content-Type', 'application/json'), ('Preference-Applied', 'columnar'), ('Vary', 'Prefer')]
+        )
+        self.assertEqual(
+            response.decode('utf-8'),
+            '{"rows":{"absent":{"b":[1]},"columns":["a","b"],"data":{"a":[1,2],"b":["x",null]}}}'
+        )
+
+        # Error responses are not columnar
+        status, headers, response = app.request('GET', '/my_action', query_string='error=true', environ=dict(environ))
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/json'), ('Vary', 'Prefer')])
+        self.assertEqual(response.decode('utf-8'), '{"error":"MyError"}')
+
+        # Columnar CBOR output
+        environ = {'HTTP_PREFER': 'columnar', 'HTTP_ACCEPT': 'application/cbor'}
+        status, headers, response = app.request('GET', '/my_action', query_string='error=false', environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(
+            sorted(headers),
+            [('Content-Type', 'application/cbor'), ('Preference-Applied', 'columnar'), ('Vary', 'Prefer, Accept')]
+        )
+        self.assertEqual(
+            decode_cbor(response),
+            {'rows': {'columns': ['a', 'b'], 'data': {'a': [1, 2], 'b': ['x', None]}, 'absent': {'b': [1]}}}
+        )
+
+    def test_columnar_disabled(self):
+
+        @action(spec='''\
+action my_action
+    urls
+        GET
+    output
+        Row[] rows
+
+struct Row
+    int a
+''')
+        def my_action(unused_app, unused_req):
+            return {'rows': [{'a': 1}]}
+
+        app = Application()
+        app.add_request(my_action)
+        status, headers, response = app.request('GET', '/my_action', environ={'HTTP_PREFER': 'columnar'})
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/json')])
+        self.assertEqual(response.decode('utf-8'), '{"rows":[{"a":1}]}')
+
+    def test_cbor(self):
+
+        @action(spec='''\
+action my_action
+    input
+        date d
+        datetime e
+        uuid u
+        int(> 0) i
+    output
+        date d
+        datetime e
+        uuid u
+        float f
+''')
+        def my_action(unused_app, req):
+            return {'d': req['d'], 'e': req['e'], 'u': req['u'], 'f': req['i'] + 0.5}
+
+        app = Application()
+        app.add_request(my_action)
+        request = {
+            'd': date(2020, 6, 1),
+            'e': datetime(2020, 6, 1, 12, tzinfo=timezone.utc),
+            'u': UUID('f2b2a2e1-6a56-4bbf-9b1b-b4c6a9d0b0a3'),
+            'i': 1
+        }
+
+        # CBOR request and response
+        environ = {'CONTENT_TYPE': 'application/cbor', 'HTTP_ACCEPT': 'application/cbor'}
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=encode_cbor(request), environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/cbor'), ('Vary', 'Accept')])
+        self.assertEqual(decode_cbor(response), {
+            'd': date(2020, 6, 1),
+            'e': datetime(2020, 6, 1, 12, tzinfo=timezone.utc),
+            'u': UUID('f2b2a2e1-6a56-4bbf-9b1b-b4c6a9d0b0a3'),
+            'f': 1.5
+        })
+
+        # CBOR request, JSON response
+        environ = {'CONTENT_TYPE': 'application/cbor', 'HTTP_ACCEPT': 'application/cbor;q=0.5, application/json'}
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=encode_cbor(request), environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/json')])
+        self.assertEqual(
+            response.decode('utf-8'),
+            '{"d":"2020-06-01","e":"2020-06-01T12:00:00+00:00","f":1.5,"u":"f2b2a2e1-6a56-4bbf-9b1b-b4c6a9d0b0a3"}'
+        )
+
+        # JSON request, CBOR response - string values are validated the same as for JSON
+        environ = {'HTTP_ACCEPT': 'application/cbor, */*;q=0.1'}
+        wsgi_input = b'{"d":"2020-06-01","e":"2020-06-01T12:00:00Z","u":"f2b2a2e1-6a56-4bbf-9b1b-b4c6a9d0b0a3","i":1}'
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=wsgi_input, environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/cbor'), ('Vary', 'Accept')])
+        self.assertEqual(decode_cbor(response)['e'], datetime(2020, 6, 1, 12, tzinfo=timezone.utc))
+
+        # Invalid CBOR input, CBOR error response
+        environ = {'CONTENT_TYPE': 'application/cbor', 'HTTP_ACCEPT': 'application/cbor'}
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=encode_cbor({**request, 'i': 0}), environ=environ)
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/cbor'), ('Vary', 'Accept')])
+        self.assertEqual(decode_cbor(response), {
+            'error': 'InvalidInput',
+            'member': 'i',
+            'message': 'Invalid value 0 (type "int") for member "i", expected type "int" [> 0.0] (content)'
+        })
+
+    def test_cbor_invalid(self):
+
+        @action(spec='''\
+action my_action
+''')
+        def my_action(unused_app, unused_req):
+            pass # pragma: no cover
+
+        app = Application()
+        app.add_request(my_action)
+        environ = {'CONTENT_TYPE': 'application/cbor; foo=bar'}
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=b'\xa1', environ=environ)
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/json')])
+        self.assertEqual(
+            response.decode('utf-8'),
+            '{"error":"InvalidInput","message":"Invalid request CBOR: Unexpected end of CBOR data"}'
+        )
+
+        # Zero-quality CBOR is not accepted
+        environ = {'HTTP_ACCEPT': 'application/cbor;q=0'}
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=b'{}', environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/json')])
+        self.assertEqual(response.decode('utf-8'), '{}')
+
+        # Invalid quality is zero
+        environ = {'HTTP_ACCEPT': 'application/cbor;q=x'}
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=b'{}', environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/json')])
+
+    def test_fields(self):
+
+        @action(spec='''\
+action my_action
+    urls
+        GET
+    query
+        int count
+    output
+        Row[] rows
+        int count
+
+struct Row
+    int id
+    string name
+    optional Point point
+
+struct Point
+    float x
+    float y
+''')
+        def my_action(ctx, req):
+            fields.append(ctx.fields)
+            return {
+                'rows': [{'id': ix, 'name': f'row {ix}', 'point': {'x': ix, 'y': -ix}} for ix in range(req['count'])],
+                'count': req['count']
+            }
+
+        app = Application()
+        app.add_request(my_action)
+
+        fields = []
+        status, headers, response = app.request('GET', '/my_action', query_string='count=2&fields=rows.name,rows.point.x')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/json')])
+        self.assertEqual(response.decode('utf-8'), '{"rows":[{"name":"row 0","point":{"x":0}},{"name":"row 1","point":{"x":1}}]}')
+        self.assertEqual(fields, [{'rows': {'name': None, 'point': {'x': None}}}])
+
+        # No field selection
+        fields.clear()
+        status, _, response = app.request('GET', '/my_action', query_string='count=1')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"count":1,"rows":[{"id":0,"name":"row 0","point":{"x":0,"y":0}}]}')
+        self.assertEqual(fields, [None])
+
+        # Unknown field
+        fields.clear()
+        status, _, response = app.request('GET', '/my_action', query_string='count=1&fields=rows.point.z')
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(
+            response.decode('utf-8'),
+            '{"error":"InvalidInput","member":"fields","message":"Unknown fields member \'rows.point.z\' (query string)"}'
+        )
+        self.assertEqual(fields, [])
+
+        # Invalid fields
+        status, _, response = app.request('GET', '/my_action', query_string='count=1&fields.0=count')
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(
+            response.decode('utf-8'),
+            '{"error":"InvalidInput","member":"fields","message":"Invalid fields value (query string)"}'
+        )
+
+    def test_fields_output_validation(self):
+
+        @action(spec='''\
+action my_action
+    urls
+        GET
+    output
+        int a
+        int(> 0) b
+''')
+        def my_action(unused_ctx, unused_req):
+            return {'a': 1, 'b': 0}
+
+        app = Application()
+        app.add_request(my_action)
+
+        # Unselected invalid members are not validated
+        status, _, response = app.request('GET', '/my_action', query_string='fields=a')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"a":1}')
+
+        status, _, response = app.request('GET', '/my_action', query_string='fields=b')
+        self.assertEqual(status, '500 Internal Server Error')
+        self.assertEqual(
+            response.decode('utf-8'),
+            '{"error":"InvalidOutput","member":"b","message":"Invalid value 0 (type \\"int\\") for member \\"b\\", '
+            'expected type \\"int\\" [> 0.0]"}'
+        )
+
+    def test_fields_query_member(self):
+
+        @action(spec='''\
+action my_action
+    urls
+        GET
+    query
+        string fields
+    output
+        string fields
+        int a
+''')
+        def my_action(ctx, req):
+            self.assertIsNone(ctx.fields)
+            return {'fields': req['fields'], 'a': 1}
+
+        app = Application()
+        app.add_request(my_action)
+        status, _, response = app.request('GET', '/my_action', query_string='fields=a')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"a":1,"fields":"a"}')
+
+    def test_delta(self):
+
+        @action(delta_versions=2, spec='''\
+action my_action
+    urls
+        GET
+    query
+        int count
+    output
+        int[] values
+        string name
+''')
+        def my_action(unused_app, req):
+            return {'values': list(range(req['count'])), 'name': 'a long name that is repeated in each version'}
+
+        app = Application()
+        app.add_request(my_action)
+
+        # Initial version
+        status, headers, response = app.request('GET', '/my_action', query_string='count=3')
+        self.assertEqual(status, '200 OK')
+        headers = dict(headers)
+        self.assertEqual(headers['Content-Type'], 'application/json')
+        self.assertEqual(headers['Vary'], 'Accept, If-None-Match')
+        etag = headers['ETag']
+        self.assertRegex(etag, r'^"[0-9a-f]{32}"$')
+        version = json.loads(response.decode('utf-8'))
+        self.assertEqual(version, {'values': [0, 1, 2], 'name': 'a long name that is repeated in each version'})
+
+        # Not modified
+        environ = {'HTTP_IF_NONE_MATCH': f'W/{etag}', 'HTTP_ACCEPT': 'application/json-patch+json'}
+        status, headers, response = app.request('GET', '/my_action', query_string='count=3', environ=dict(environ))
+        self.assertEqual(status, '304 Not Modified')
+        self.assertEqual(dict(headers)['ETag'], etag)
+        self.assertEqual(response, b'')
+
+        # Patch response
+        status, headers, response = app.request('GET', '/my_action', query_string='count=4', environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        headers = dict(headers)
+        self.assertEqual(headers['Content-Type'], 'application/json-patch+json')
+        self.assertNotEqual(headers['ETag'], etag)
+        self.assertEqual(response.decode('utf-8'), '[{"op":"add","path":"/values/-","value":3}]')
+        self.assertEqual(
+            apply_json_patch(version, json.loads(response.decode('utf-8'))),
+            {'values': [0, 1, 2, 3], 'name': 'a long name that is repeated in each version'}
+        )
+
+        # Full response if the client does not accept patches
+        environ_no_patch = {'HTTP_IF_NONE_MATCH': etag}
+        status, headers, response = app.request('GET', '/my_action', query_string='count=4', environ=environ_no_patch)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(dict(headers)['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.decode('utf-8'))['values'], [0, 1, 2, 3])
+
+        # Full response if the patch is not smaller
+        status, headers, response = app.request('GET', '/my_action', query_string='count=0', environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(dict(headers)['Content-Type'], 'application/json')
+
+        # Full response for evicted versions
+        app.request('GET', '/my_action', query_string='count=5')
+        status, headers, response = app.request('GET', '/my_action', query_string='count=4', environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(dict(headers)['Content-Type'], 'application/json')
+        self.assertEqual(len(my_action.delta_versions), 2)
+
+    def test_delta_error(self):
+
+        @action(delta_versions=2, spec='''\
+action my_action
+    urls
+        GET
+    errors
+        MyError
+''')
+        def my_action(unused_app, unused_req):
+            raise ActionError('MyError')
+
+        app = Application()
+        app.add_request(my_action)
+        status, headers, response = app.request('GET', '/my_action')
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/json')])
+        self.assertEqual(response.decode('utf-8'), '{"error":"MyError"}')
+        self.assertEqual(len(my_action.delta_versions), 0)
+
+    def test_decompress(self):
+
+        @action(decompress=True, decompress_max_bytes=1000, spec='''\
+action my_action
+    input
+        int[] values
+    output
+        int sum
+''')
+        def my_action(unused_app, req):
+            return {'sum': sum(req['values'])}
+
+        app = Application()
+        app.add_request(my_action)
+
+        content = json.dumps({'values': [1] * 100}).encode('utf-8')
+        content_gzip = gzip.compress(content)
+        environ = {'HTTP_CONTENT_ENCODING': 'gzip'}
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=content_gzip, environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/json')])
+        self.assertEqual(response.decode('utf-8'), '{"sum":100}')
+        self.assertEqual(my_action.decompress_metrics.count, 1)
+        self.assertEqual(my_action.decompress_metrics.compressed_bytes, len(content_gzip))
+        self.assertEqual(my_action.decompress_metrics.uncompressed_bytes, len(content))
+
+        # Identity content encoding
+        environ = {'HTTP_CONTENT_ENCODING': 'identity'}
+        status, _, response = app.request('POST', '/my_action', wsgi_input=content, environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"sum":100}')
+        self.assertEqual(my_action.decompress_metrics.count, 1)
+
+        # Decompressed content too large
+        environ = {'HTTP_CONTENT_ENCODING': 'gzip'}
+        wsgi_input = gzip.compress(json.dumps({'values': [1] * 1000}).encode('utf-8'))
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=wsgi_input, environ=environ)
+        self.assertEqual(status, '413 Request Entity Too Large')
+        self.assertEqual(response.decode('utf-8'), '{"error":"InvalidInput","message":"Decompressed content exceeds 1000 bytes"}')
+
+        # Invalid compressed content
+        environ = {'HTTP_CONTENT_ENCODING': 'gzip'}
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=content_gzip[:-4], environ=environ)
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(response.decode('utf-8'), '{"error":"InvalidInput","message":"Invalid gzip content: truncated"}')
+
+        # Unsupported content encoding
+        environ = {'HTTP_CONTENT_ENCODING': 'br'}
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=content_gzip, environ=environ)
+        self.assertEqual(status, '415 Unsupported Media Type')
+        self.assertEqual(response.decode('utf-8'), '{"error":"InvalidInput","message":"Unsupported Content-Encoding \'br\'"}')
+
+    def test_decompress_io_error(self):
+
+        @action(decompress=True, spec='''\
+action my_action
+''')
+        def my_action(unused_app, unused_req):
+            return {}
+
+        class MyStream:
+            @staticmethod
+            def read(unused_size):
+                raise OSError('Read error')
+
+        app = Application()
+        app.add_request(my_action)
+        environ = {'HTTP_CONTENT_ENCODING': 'gzip', 'wsgi.input': MyStream()}
+        status, _, response = app.request('POST', '/my_action', environ=environ)
+        self.assertEqual(status, '408 Request Timeout')
+        self.assertEqual(response.decode('utf-8'), '{"error":"IOError","message":"Error reading request content"}')
+
+    def test_decompress_disabled(self):
+
+        @action(spec='''\
+action my_action
+''')
+        def my_action(unused_app, unused_req):
+            return {} # pragma: no cover
+
+        app = Application()
+        app.add_request(my_action)
+        self.assertIsNone(my_action.decompress_metrics)
+        environ = {'HTTP_CONTENT_ENCODING': 'gzip'}
+        status, _, _ = app.request('POST', '/my_action', wsgi_input=gzip.compress(b'{}'), environ=environ)
+        self.assertEqual(status, '400 Bad Request')
+
+    def test_response_samples(self):
+
+        @action(response_samples=2, delta_versions=1, spec='''\
+action my_action
+    urls
+        GET
+    query
+        int value
+    output
+        int value
+    errors
+        MyError
+''')
+        def my_action(unused_app, req):
+            if req['value'] < 0:
+                raise ActionError('MyError')
+            return {'value': req['value']}
+
+        app = Application()
+        app.add_request(my_action)
+        self.assertIsNone(my_action.zstd_dictionary)
+        self.assertEqual(my_action.response_samples.max_samples, 2)
+        for value in (1, 2, -1):
+            app.request('GET', '/my_action', query_string=f'value={value}')
+        self.assertEqual(my_action.response_samples.count, 2)
+        self.assertEqual(my_action.response_samples.samples, [b'{"value":1}', b'{"value":2}'])
+
+        # Not modified responses are sampled
+        status, headers, _ = app.request('GET', '/my_action', query_string='value=3')
+        environ = {'HTTP_IF_NONE_MATCH': dict(headers)['ETag']}
+        status, _, _ = app.request('GET', '/my_action', query_string='value=3', environ=environ)
+        self.assertEqual(status, '304 Not Modified')
+        self.assertEqual(my_action.response_samples.count, 4)
+
+    def test_response_samples_disabled(self):
+
+        @action(spec='''\
+action my_action
+''')
+        def my_action(unused_app, unused_req):
+            return {}
+
+        app = Application()
+        app.add_request(my_action)
+        self.assertIsNone(my_action.response_samples)
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=b'{}')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Content-Type', 'application/json')])
+        self.assertEqual(response, b'{}')
+
+    def test_stream(self):
+
+        @action(spec='''\
+action my_action
+    urls
+        GET
+    query
+        int count
+    output
+        Row[] rows
+        RowIds ids
+        string name
+
+struct Row
+    int id
+    optional string value
+
+typedef int[len > 0] RowIds
+''')
+        def my_action(ctx, req):
+            return {
+                'rows': ({'id': ix, 'value': f'value {ix}'} for ix in range(req['count'])),
+                'ids': ctx.stream(range(req['count'])),
+                'name': 'rows'
+            }
+
+        app = Application()
+        app.add_request(my_action)
+
+        status, headers, response = app.request('GET', '/my_action', query_string='count=2')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers, [('Content-Type', 'application/json')])
+        self.assertEqual(
+            response.decode('utf-8'),
+            '{"ids":[0,1],"name":"rows","rows":[{"id":0,"value":"value 0"},{"id":1,"value":"value 1"}]}'
+        )
+
+        # Empty streams
+        status, headers, response = app.request('GET', '/my_action', query_string='count=0')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"ids":[],"name":"rows","rows":[]}')
+
+        # Pretty output is identical to non-streamed pretty output
+        app.pretty_output = True
+        status, headers, response = app.request('GET', '/my_action', query_string='count=2')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), json.dumps({
+            'rows': [{'id': 0, 'value': 'value 0'}, {'id': 1, 'value': 'value 1'}],
+            'ids': [0, 1],
+            'name': 'rows'
+        }, sort_keys=True, indent=2))
+        status, headers, response = app.request('GET', '/my_action', query_string='count=0')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), json.dumps({'rows': [], 'ids': [], 'name': 'rows'}, sort_keys=True, indent=2))
+
+    def test_stream_chunks(self):
+        values_yielded = []
+
+        def values():
+            for ix in range(20000):
+                values_yielded.append(ix)
+                yield {'value': f'value {ix:05d}'}
+
+        @action(spec='''\
+action my_action
+    urls
+        GET
+    output
+        Value[] values
+
+struct Value
+    string value
+''')
+        def my_action(unused_ctx, unused_req):
+            return {'values': values()}
+
+        app = Application()
+        app.add_request(my_action)
+
+        # The response content is encoded as it is iterated
+        environ = Context.create_environ('GET', '/my_action')
+        start_response = StartResponse()
+        content = app(environ, start_response)
+        self.assertEqual(start_response.status, '200 OK')
+        self.assertEqual(values_yielded, [])
+        chunk = next(content)
+        self.assertGreaterEqual(len(chunk), STREAM_CHUNK_SIZE)
+        self.assertLess(len(values_yielded), 20000)
+        chunks = [chunk, *content]
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(len(values_yielded), 20000)
+        response = json.loads(b''.join(chunks).decode('utf-8'))
+        self.assertEqual(len(response['values']), 20000)
+        self.assertEqual(response['values'][-1], {'value': 'value 19999'})
+
+    def test_stream_close(self):
+        closed = []
+
+        def values():
+            try:
+                for ix in range(100000):
+                    yield ix
+            finally:
+                closed.append(True)
+
+        @action(spec='''\
+action my_action
+    urls
+        GET
+    output
+        int[] values
+''')
+        def my_action(unused_ctx, unused_req):
+            return {'values': values()}
+
+        app = Application()
+        app.add_request(my_action)
+
+        # Client disconnect - the WSGI server closes the content iterable
+        environ = Context.create_environ('GET', '/my_action')
+        content = app(environ, StartResponse())
+        next(content)
+        self.assertEqual(closed, [])
+        content.close()
+        self.assertEqual(closed, [True])
+
+    def test_stream_invalid_value(self):
+
+        @action(spec='''\
+action my_action
+    urls
+        GET
+    output
+        Row[] rows
+        int count
+
+struct Row
+    int(> 0) id
+''')
+        def my_action(unused_ctx, unused_req):
+            return {'rows': ({'id': row_id} for row_id in (1, 2, 0, 3)), 'count': 4}
+
+        app = Application()
+        app.add_request(my_action)
+
+        environ = {'wsgi.errors': StringIO()}
+        status, headers, response = app.request('GET', '/my_action', environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers, [('Content-Type', 'application/json')])
+        self.assertEqual(
+            response.decode('utf-8'),
+            '{"count":4,"rows":[{"id":1},{"id":2}],"error":"InvalidOutput",'
+            '"message":"Invalid value 0 (type \\"int\\") for member \\"rows.2.id\\", expected type \\"int\\" [> 0.0]","member":"rows.2.id"}'
+        )
+        self.assertRegex(
+            environ['wsgi.errors'].getvalue(),
+            r'^ERROR \[\d+ / \d+\] Invalid output returned from action "my_action": Invalid value 0 \(type "int"\) '
+            r'for member "rows.2.id", expected type "int" \[> 0.0\]\n$'
+        )
+
+        # Output validation disabled
+        app.validate_output = False
+        status, headers, response = app.request('GET', '/my_action')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"count":4,"rows":[{"id":1},{"id":2},{"id":0},{"id":3}]}')
+
+    def test_stream_error(self):
+
+        def values(error):
+            yield 1
+            if error == 'action':
+                raise ActionError('MyError', message='My message')
+            if error == 'action_no_message':
+                raise ActionError('MyError')
+            raise ValueError('BAD')
+
+        @action(spec='''\
+action my_action
+    urls
+        GET
+    query
+        string error
+    output
+        int[] values
+        int zvalue
+    errors
+        MyError
+''')
+        def my_action(unused_ctx, req):
+            return {'values': values(req['error']), 'zvalue': 1}
+
+        app = Application()
+        app.add_request(my_action)
+
+        app.pretty_output = True
+        status, _, response = app.request('GET', '/my_action', query_string='error=action')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '''\
+{
+  "values": [
+    1
+  ],
+  "error": "MyError",
+  "message": "My message"
+}''')
+        self.assertEqual(json.loads(response.decode('utf-8')), {'values': [1], 'error': 'MyError', 'message': 'My message'})
+
+        app.pretty_output = False
+        status, _, response = app.request('GET', '/my_action', query_string='error=action_no_message')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"values":[1],"error":"MyError"}')
+
+        environ = {'wsgi.errors': StringIO()}
+        status, _, response = app.request('GET', '/my_action', query_string='error=unexpected', environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"values":[1],"error":"UnexpectedError"}')
+        self.assertIn('Unexpected error in action "my_action"', environ['wsgi.errors'].getvalue())
+        self.assertIn('ValueError: BAD', environ['wsgi.errors'].getvalue())
+
+    def test_stream_invalid_output(self):
+
+        @action(spec='''\
+action my_action
+    urls
+        GET
+    output
+        int[] values
+        int count
+''')
+        def my_action(unused_ctx, unused_req):
+            return {'values': (value for value in range(3)), 'count': 'abc'}
+
+        app = Application()
+        app.add_request(my_action)
+
+        status, _, response = app.request('GET', '/my_action', environ={'wsgi.errors': StringIO()})
+        self.assertEqual(status, '500 Internal Server Error')
+        self.assertEqual(
+            response.decode('utf-8'),
+            '{"error":"InvalidOutput","member":"count","message":"Invalid value \\"abc\\" (type \\"str\\") for member \\"count\\", '
+            'expected type \\"int\\""}'
+        )
+
+    def test_stream_invalid_member(self):
+
+        @action(spec='''\
+action my_action
+    urls
+        GET
+    output
+        int value
+''')
+        def my_action(unused_ctx, unused_req):
+            return {'value': (value for value in range(3))}
+
+        app = Application()
+        app.add_request(my_action)
+
+        status, _, response = app.request('GET', '/my_action', environ={'wsgi.errors': StringIO()})
+        self.assertEqual(status, '500 Internal Server Error')
+        self.assertEqual(
+            response.decode('utf-8'),
+            '{"error":"InvalidOutput","member":"value","message":"Invalid streamed value for member \\"value\\", expected an array"}'
+        )
+
+    def test_stream_fields(self):
+
+        @action(spec='''\
+action my_action
+    urls
+        GET
+    output
+        Row[] rows
+
+struct Row
+    int a
+    int b
+''')
+        def my_action(unused_ctx, unused_req):
+            return {'rows': ({'a': ix, 'b': ix * 2} for ix in range(3))}
+
+        app = Application()
+        app.add_request(my_action)
+
+        status, _, response = app.request('GET', '/my_action', query_string='fields=rows.b')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"rows":[{"b":0},{"b":2},{"b":4}]}')
+
+    def test_stream_cbor(self):
+
+        @action(columnar=True, spec='''\
+action my_action
+    urls
+        GET
+    output
+        Row[] rows
+
+struct Row
+    int a
+''')
+        def my_action(unused_ctx, unused_req):
+            return {'rows': ({'a': ix} for ix in range(2))}
+
+        app = Application()
+        app.add_request(my_action)
+
+        # Streamed responses are always JSON
+        environ = {'HTTP_ACCEPT': 'application/cbor', 'HTTP_PREFER': 'columnar'}
+        status, headers, response = app.request('GET', '/my_action', environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers, [('Content-Type', 'application/json')])
+        self.assertEqual(response.decode('utf-8'), '{"rows":[{"a":0},{"a":1}]}')
+
+    def test_events(self):
+
+        @action(events=True, spec='''\
+action my_events
+    urls
+        GET
+    query
+        int count
+    output
+        int value
+''')
+        def my_events(unused_ctx, req):
+            return ({'value': value} for value in range(req['count']))
+
+        app = Application()
+        app.add_request(my_events)
+
+        status, headers, response = app.request('GET', '/my_events', query_string='count=2')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(sorted(headers), [('Cache-Control', 'no-cache'), ('Content-Type', 'text/event-stream'), ('Vary', 'Accept')])
+        self.assertEqual(response, b'data: {"value":0}\n\ndata: {"value":1}\n\n')
+
+        # Newline-delimited JSON
+        environ = {'HTTP_ACCEPT': 'application/x-ndjson'}
+        status, headers, response = app.request('GET', '/my_events', query_string='count=2', environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(dict(headers)['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(response, b'{"value":0}\n{"value":1}\n')
+
+        # Server-Sent Events preferred
+        environ = {'HTTP_ACCEPT': 'text/event-stream, application/x-ndjson'}
+        status, headers, response = app.request('GET', '/my_events', query_string='count=1', environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(dict(headers)['Content-Type'], 'text/event-stream')
+        self.assertEqual(response, b'data: {"value":0}\n\n')
+
+        # Pretty output is ignored
+        app.pretty_output = True
+        status, headers, response = app.request('GET', '/my_events', query_string='count=1')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'data: {"value":0}\n\n')
+
+        # Invalid query string
+        status, headers, response = app.request('GET', '/my_events', query_string='count=a', environ={'wsgi.errors': StringIO()})
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(dict(headers)['Content-Type'], 'application/json')
+
+    def test_events_error(self):
+
+        def events(error):
+            yield {'value': 1}
+            if error == 'invalid':
+                yield {'value': 'abc'}
+            elif error == 'action':
+                raise ActionError('MyError', message='My message')
+            else:
+                raise ValueError('BAD')
+            yield {'value': 2}
+
+        @action(events=True, events_heartbeat=None, spec='''\
+action my_events
+    urls
+        GET
+    query
+        string error
+    output
+        int value
+    errors
+        MyError
+''')
+        def my_events(unused_ctx, req):
+            if req['error'] == 'before':
+                raise ActionError('MyError')
+            return events(req['error'])
+
+        app = Application()
+        app.add_request(my_events)
+
+        environ = {'wsgi.errors': StringIO()}
+        status, _, response = app.request('GET', '/my_events', query_string='error=invalid', environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(
+            response.decode('utf-8'),
+            'data: {"value":1}\n\nevent: error\n'
+            'data: {"error":"InvalidOutput","member":"value","message":"Invalid value \\"abc\\" (type \\"str\\") for member \\"value\\", '
+            'expected type \\"int\\""}\n\n'
+        )
+        self.assertIn('Invalid output returned from action "my_events"', environ['wsgi.errors'].getvalue())
+
+        environ = {'HTTP_ACCEPT': 'application/x-ndjson'}
+        status, _, response = app.request('GET', '/my_events', query_string='error=action', environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'{"value":1}\n{"error":"MyError","message":"My message"}\n')
+
+        environ = {'wsgi.errors': StringIO()}
+        status, _, response = app.request('GET', '/my_events', query_string='error=unexpected', environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'data: {"value":1}\n\nevent: error\ndata: {"error":"UnexpectedError"}\n\n')
+        self.assertIn('ValueError: BAD', environ['wsgi.errors'].getvalue())
+
+        # Error raised before returning the events
+        status, headers, response = app.request('GET', '/my_events', query_string='error=before')
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(headers, [('Content-Type', 'application/json')])
+        self.assertEqual(response, b'{"error":"MyError"}')
+
+        # Output validation disabled
+        app.validate_output = False
+        status, _, response = app.request('GET', '/my_events', query_string='error=invalid', environ={'wsgi.errors': StringIO()})
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'data: {"value":1}\n\ndata: {"value":"abc"}\n\ndata: {"value":2}\n\n')
+
+    def test_events_heartbeat(self):
+        event_ready = threading.Event()
+        events_closed = threading.Event()
+
+        def events():
+            try:
+                yield {'value': 1}
+                event_ready.wait()
+                yield {'value': 2}
+                event_ready.wait()
+                yield {'value': 3} # pragma: no cover
+            finally:
+                events_closed.set()
+
+        @action(events=True, events_heartbeat=0.01, spec='''\
+action my_events
+    urls
+        GET
+    output
+        int value
+''')
+        def my_events(unused_ctx, unused_req):
+            return events()
+
+        app = Application()
+        app.add_request(my_events)
+
+        # Server-Sent Events heartbeats
+        content = app(Context.create_environ('GET', '/my_events'), StartResponse())
+        self.assertEqual(next(content), b'data: {"value":1}\n\n')
+        self.assertEqual(next(content), b': heartbeat\n\n')
+        event_ready.set()
+        chunk = next(content)
+        while chunk == b': heartbeat\n\n':
+            chunk = next(content) # pragma: no cover
+        self.assertEqual(chunk, b'data: {"value":2}\n\n')
+
+        # Client disconnect closes the events
+        content.close()
+        self.assertTrue(events_closed.wait(5))
+
+        # Newline-delimited JSON heartbeats
+        event_ready.clear()
+        events_closed.clear()
+        environ = Context.create_environ('GET', '/my_events', environ={'HTTP_ACCEPT': 'application/x-ndjson'})
+        content = app(environ, StartResponse())
+        self.assertEqual(next(content), b'{"value":1}\n')
+        self.assertEqual(next(content), b'\n')
+        content.close()
+        event_ready.set()
+        self.assertTrue(events_closed.wait(5))
+
+    def test_events_close(self):
+        events_closed = []
+
+        def events():
+            try:
+                yield {'value': 1}
+                yield {'value': 2} # pragma: no cover
+            finally:
+                events_closed.append(True)
+
+        @action(events=True, events_heartbeat=None, spec='''\
+action my_events
+    urls
+        GET
+    output
+        int value
+''')
+        def my_events(unused_ctx, unused_req):
+            return events()
+
+        app = Application()
+        app.add_request(my_events)
+        self.assertTrue(my_events.events)
+        self.assertIsNone(my_events.events_heartbeat)
+
+        content = app(Context.create_environ('GET', '/my_events'), StartResponse())
+        self.assertEqual(next(content), b'data: {"value":1}\n\n')
+        self.assertEqual(events_closed, [])
+        content.close()
+        self.assertEqual(events_closed, [True])
+
+    def test_ndjson_input(self):
+        records_read = []
+
+        @action(ndjson_input='records', spec='''\
+action my_ingest
+    query
+        optional string name
+    input
+        Record[] records
+        optional int other
+    output
+        int count
+        date[] dates
+        optional string name
+
+struct Record
+    int id
+    date date
+''')
+        def my_ingest(unused_ctx, req):
+            dates = []
+            for record in req['records']:
+                records_read.append(record['id'])
+                dates.append(record['date'])
+            response = {'count': len(dates), 'dates': dates}
+            if 'name' in req:
+                response['name'] = req['name']
+            return response
+
+        app = Application()
+        app.add_request(my_ingest)
+
+        environ = {'CONTENT_TYPE': 'application/x-ndjson'}
+        wsgi_input = b'{"id": 1, "date": "2024-01-01"}\n\n  \n{"id": 2, "date": "2024-01-02"}'
+        status, _, response = app.request('POST', '/my_ingest', query_string='name=abc', wsgi_input=wsgi_input, environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"count":2,"dates":["2024-01-01","2024-01-02"],"name":"abc"}')
+        self.assertEqual(records_read, [1, 2])
+
+        # Content type parameters
+        environ = {'CONTENT_TYPE': 'application/x-ndjson; charset=utf-8'}
+        status, _, response = app.request('POST', '/my_ingest', wsgi_input=b'{"id": 3, "date": "2024-01-03"}\n', environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"count":1,"dates":["2024-01-03"]}')
+
+        # Empty content
+        status, _, response = app.request('POST', '/my_ingest', environ={'CONTENT_TYPE': 'application/x-ndjson'})
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"count":0,"dates":[]}')
+
+        # JSON content
+        status, _, response = app.request('POST', '/my_ingest', wsgi_input=b'{"records": [{"id": 4, "date": "2024-01-04"}]}')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"count":1,"dates":["2024-01-04"]}')
+
+    def test_ndjson_input_lazy(self):
+        class MyStream:
+            def __init__(self, lines):
+                self.lines = list(lines)
+                self.reads = 0
+
+            def readline(self, unused_size):
+                self.reads += 1
+                return self.lines.pop(0) if self.lines else b''
+
+            # The ASGI test request receives the request content a line at a time
+            def read(self, size):
+                return self.readline(size)
+
+        @action(ndjson_input='values', spec='''\
+action my_ingest
+    input
+        int[] values
+    output
+        int first
+''')
+        def my_ingest(unused_ctx, req):
+            first = next(req['values'])
+            self.assertEqual(stream.reads, 1)
+            return {'first': first}
+
+        app = Application()
+        app.add_request(my_ingest)
+
+        stream = MyStream(f'{ix}\n'.encode() for ix in range(100))
+        environ = {'CONTENT_TYPE': 'application/x-ndjson', 'wsgi.input': stream}
+        status, _, response = app.request('POST', '/my_ingest', environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"first":0}')
+        self.assertEqual(stream.reads, 1)
+
+    def test_ndjson_input_async(self):
+        @action(ndjson_input='values', spec='''\
+action my_ingest
+    input
+        int[] values
+    output
+        int sum
+''')
+        async def my_ingest(unused_ctx, req):
+            await asyncio.sleep(0)
+            return {'sum': sum(req['values'])}
+
+        app = Application()
+        app.add_request(my_ingest)
+        wsgi_input = b''.join(f'{ix}\n'.encode() for ix in range(100))
+        self.assertEqual(
+            app.request('POST', '/my_ingest', wsgi_input=wsgi_input, environ={'CONTENT_TYPE': 'application/x-ndjson'}),
+            ('200 OK', [('Content-Type', 'application/json')], b'{"sum":4950}')
+        )
+        environ = {'CONTENT_TYPE': 'application/x-ndjson', 'wsgi.errors': StringIO()}
+        self.assertEqual(app.request('POST', '/my_ingest', wsgi_input=b'1\nx\n', environ=environ)[0], '400 Bad Request')
+
+    def test_ndjson_input_error(self):
+
+        @action(ndjson_input='records', ndjson_max_line_bytes=20, spec='''\
+action my_ingest
+    input
+        Record[] records
+    output
+        int count
+
+struct Record
+    int(> 0) id
+''')
+        def my_ingest(unused_ctx, req):
+            return {'count': sum(1 for _ in req['records'])}
+
+        app = Application()
+        app.add_request(my_ingest)
+
+        # Invalid JSON
+        environ = {'CONTENT_TYPE': 'application/x-ndjson', 'wsgi.errors': StringIO()}
+        status, _, response = app.request('POST', '/my_ingest', wsgi_input=b'{"id": 1}\n{"id": 2\n', environ=dict(environ))
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(
+            response.decode('utf-8'),
+            '{"error":"InvalidInput","message":"Invalid request JSON: Expecting \',\' delimiter: line 2 column 1 (char 9) (line 2)"}'
+        )
+
+        # Invalid record
+        status, _, response = app.request('POST', '/my_ingest', wsgi_input=b'{"id": 1}\n\n{"id": 0}\n', environ=dict(environ))
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(
+            response.decode('utf-8'),
+            '{"error":"InvalidInput","member":"id","message":"Invalid value 0 (type \\"int\\") for member \\"id\\", '
+            'expected type \\"int\\" [> 0.0] (line 3)"}'
+        )
+
+        # Line too large
+        status, _, response = app.request('POST', '/my_ingest', wsgi_input=b'{"id": 1}\n{"id":            1}\n', environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"count":2}')
+        status, _, response = app.request('POST', '/my_ingest', wsgi_input=b'{"id": 1}\n{"id":             1}\n', environ=dict(environ))
+        self.assertEqual(status, '413 Request Entity Too Large')
+        self.assertEqual(response.decode('utf-8'), '{"error":"InvalidInput","message":"Request content line exceeds 20 bytes (line 2)"}')
+
+        # IO error
+        class MyStream:
+            @staticmethod
+            def readline(unused_size):
+                raise IOError('FAIL')
+
+        status, _, response = app.request('POST', '/my_ingest', environ={**environ, 'wsgi.input': MyStream()})
+        self.assertEqual(status, '408 Request Timeout')
+        self.assertEqual(response.decode('utf-8'), '{"error":"IOError","message":"Error reading request content"}')
+
+    def test_ndjson_input_stream_output(self):
+
+        @action(ndjson_input='records', spec='''\
+action my_ingest
+    input
+        int[] records
+    output
+        int[] doubled
+''')
+        def my_ingest(unused_ctx, req):
+            return {'doubled': (record * 2 for record in req['records'])}
+
+        app = Application()
+        app.add_request(my_ingest)
+
+        environ = {'CONTENT_TYPE': 'application/x-ndjson'}
+        status, _, response = app.request('POST', '/my_ingest', wsgi_input=b'1\n2\nx\n', environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(
+            response.decode('utf-8'),
+            '{"doubled":[2,4],"error":"InvalidInput","message":"Invalid request JSON: Expecting value: line 1 column 1 (char 0) (line 3)"}'
+        )
+
+    def test_ndjson_input_decompress(self):
+
+        @action(ndjson_input='records', decompress=True, spec='''\
+action my_ingest
+    input
+        int[] records
+    output
+        int sum
+''')
+        def my_ingest(unused_ctx, req):
+            return {'sum': sum(req['records'])}
+
+        app = Application()
+        app.add_request(my_ingest)
+
+        environ = {'CONTENT_TYPE': 'application/x-ndjson', 'HTTP_CONTENT_ENCODING': 'gzip'}
+        status, _, response = app.request('POST', '/my_ingest', wsgi_input=gzip.compress(b'1\n2\n3\n'), environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"sum":6}')
+
+    def test_ndjson_input_invalid(self):
+        with self.assertRaises(AssertionError) as cm_exc:
+            Action(None, name='my_ingest', ndjson_input='value', spec='''\
+action my_ingest
+    input
+        int value
+''')
+        self.assertEqual(str(cm_exc.exception), 'Invalid ndjson_input member "value"')
+
+    def test_multipart(self):
+        files_received = []
+
+        @action(multipart=True, multipart_spool_bytes=10, spec='''\
+action my_upload
+    query
+        optional string tag
+    input
+        string title
+        int[] sizes
+        object doc
+        optional object other
+    output
+        string title
+        int[] sizes
+        string filename
+        string content
+        int size
+        optional string tag
+''')
+        def my_upload(unused_ctx, req):
+            doc = req['doc']
+            files_received.append(doc)
+            response = {
+                'title': req['title'],
+                'sizes': req['sizes'],
+                'filename': doc.filename,
+                'content': doc.read().decode('utf-8'),
+                'size': doc.size
+            }
+            if 'tag' in req:
+                response['tag'] = req['tag']
+            return response
+
+        app = Application()
+        app.add_request(my_upload)
+
+        content = (
+            b'--XYZ\r\nContent-Disposition: form-data; name="title"\r\n\r\nMy Title\r\n'
+            b'--XYZ\r\nContent-Disposition: form-data; name="sizes.0"\r\n\r\n1\r\n'
+            b'--XYZ\r\nContent-Disposition: form-data; name="sizes.1"\r\n\r\n2\r\n'
+            b'--XYZ\r\nContent-Disposition: form-data; name="doc"; filename="my doc.txt"\r\nContent-Type: text/plain\r\n\r\n'
+            b'Hello, multipart world!\r\n'
+            b'--XYZ--\r\n'
+        )
+        environ = {'CONTENT_TYPE': 'multipart/form-data; boundary=XYZ'}
+        status, _, response = app.request('POST', '/my_upload', query_string='tag=a', wsgi_input=content, environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(json.loads(response.decode('utf-8')), {
+            'title': 'My Title',
+            'sizes': [1, 2],
+            'filename': 'my doc.txt',
+            'content': 'Hello, multipart world!',
+            'size': 23,
+            'tag': 'a'
+        })
+
+        # The files are closed when the callback returns
+        self.assertEqual(len(files_received), 1)
+        self.assertTrue(files_received[0].file.closed)
+
+        # Invalid field name
+        status, _, response = app.request('POST', '/my_upload', wsgi_input=content.replace(b'name="sizes.1"', b'name="sizes.x"'),
+                                          environ=dict(environ))
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(
+            response.decode('utf-8'),
+            '{"error":"InvalidInput","message":"Invalid array index \'x\' in key \'sizes.x\' (content)"}'
+        )
+
+        # Invalid input
+        status, _, response = app.request('POST', '/my_upload', wsgi_input=content.replace(b'\r\n1\r\n', b'\r\na\r\n'),
+                                          environ=dict(environ))
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(
+            response.decode('utf-8'),
+            '{"error":"InvalidInput","member":"sizes.0","message":"Invalid value \\"a\\" (type \\"str\\") for member \\"sizes.0\\", '
+            'expected type \\"int\\" (content)"}'
+        )
+        self.assertEqual(len(files_received), 1)
+
+        # Duplicate field and file name
+        status, _, response = app.request('POST', '/my_upload', wsgi_input=content.replace(b'name="title"', b'name="doc"'),
+                                          environ=dict(environ))
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(response.decode('utf-8'), '{"error":"InvalidInput","message":"Duplicate key \'doc\' (content)"}')
+
+    def test_multipart_error(self):
+
+        @action(multipart=True, multipart_max_bytes=100, decompress=True, spec='''\
+action my_upload
+    input
+        optional object doc
+    output
+        int size
+''')
+        def my_upload(unused_ctx, req):
+            return {'size': req['doc'].size if 'doc' in req else -1}
+
+        app = Application()
+        app.add_request(my_upload)
+
+        environ = {'CONTENT_TYPE': 'multipart/form-data; boundary=XYZ', 'wsgi.errors': StringIO()}
+        content = b'--XYZ\r\nContent-Disposition: form-data; name="doc"; filename="doc.txt"\r\n\r\n12345\r\n--XYZ--\r\n'
+        status, _, response = app.request('POST', '/my_upload', wsgi_input=content, environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"size":5}')
+
+        # Compressed content
+        status, _, response = app.request('POST', '/my_upload', wsgi_input=gzip.compress(content),
+                                          environ={**environ, 'HTTP_CONTENT_ENCODING': 'gzip'})
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response.decode('utf-8'), '{"size":5}')
+
+        # Too large
+        status, _, response = app.request('POST', '/my_upload', wsgi_input=content.replace(b'12345', b'x' * 100), environ=dict(environ))
+        self.assertEqual(status, '413 Request Entity Too Large')
+        self.assertEqual(response.decode('utf-8'), '{"error":"InvalidInput","message":"Multipart content exceeds 100 bytes"}')
+
+        # Invalid content
+        status, _, response = app.request('POST', '/my_upload', wsgi_input=content[:-10], environ=dict(environ))
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(response.decode('utf-8'), '{"error":"InvalidInput","message":"Unexpected end of multipart content"}')
+
+        # Missing boundary
+        status, _, response = app.request('POST', '/my_upload', wsgi_input=content,
+                                          environ={**environ, 'CONTENT_TYPE': 'multipart/form-data'})
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(response.decode('utf-8'), '{"error":"InvalidInput","message":"Missing multipart boundary"}')
+
+        # IO error
+        class MyStream:
+            @staticmethod
+            def read(unused_size):
+                raise IOError('FAIL')
+
+        status, _, response = app.request('POST', '/my_upload', environ={**environ, 'wsgi.input': MyStream()})
+        self.assertEqual(status, '408 Request Timeout')
+        self.assertEqual(response.decode('utf-8'), '{"error":"IOError","message":"Error reading request content"}')
+
+    def test_multipart_disabled(self):
+
+        @action(spec='''\
+action my_upload
+    input
+        optional object doc
+''')
+        def my_upload(unused_ctx, unused_req):
+            return {} # pragma: no cover
+
+        app = Application()
+        app.add_request(my_upload)
+
+        environ = {'CONTENT_TYPE': 'multipart/form-data; boundary=XYZ', 'wsgi.errors': StringIO()}
+        content = b'--XYZ\r\nContent-Disposition: form-data; name="doc"; filename="doc.txt"\r\n\r\n12345\r\n--XYZ--\r\n'
+        status, _, _ = app.request('POST', '/my_upload', wsgi_input=content, environ=environ)
+        self.assertEqual(status, '400 Bad Request')
+
+    def test_content_budget(self):
+
+        @action(spec='''\
+action my_action
+    input
+        int value
+    output
+        int value
+''')
+        def my_action(unused_ctx, req):
+            return {'value': req['value'] * 2}
+
+        app = Application()
+        app.content_budget = ContentBudget(100)
+        app.add_request(my_action)
+
+        # Admitted
+        content = b'{"value": 1}'
+        status, _, response = app.request('POST', '/my_action', wsgi_input=content, environ={'CONTENT_LENGTH': str(len(content))})
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'{"value":2}')
+        self.assertEqual(app.content_budget.used_bytes, 0)
+        self.assertEqual(app.content_budget.peak_bytes, len(content))
+        self.assertEqual(app.content_budget.admitted, 1)
+
+        # No Content-Length
+        status, _, response = app.request('POST', '/my_action', wsgi_input=content)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(app.content_budget.admitted, 1)
+
+        # Invalid Content-Length
+        status, _, response = app.request('POST', '/my_action', wsgi_input=content, environ={'CONTENT_LENGTH': 'abc'})
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(app.content_budget.admitted, 1)
+
+        # Budget released on error
+        content = b'{"value": "abc"}'
+        status, _, response = app.request('POST', '/my_action', wsgi_input=content, environ={'CONTENT_LENGTH': str(len(content))})
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(app.content_budget.used_bytes, 0)
+        self.assertEqual(app.content_budget.admitted, 2)
+
+    def test_content_budget_wait(self):
+        callback_ready = threading.Event()
+        callback_release = threading.Event()
+
+        @action(content_budget_wait=10, spec='''\
+action my_action
+    input
+        int value
+    output
+        int value
+''')
+        def my_action(unused_ctx, req):
+            if req['value'] == 1:
+                callback_ready.set()
+                callback_release.wait()
+            return {'value': req['value']}
+
+        app = Application()
+        app.content_budget = ContentBudget(20)
+        app.add_request(my_action)
+
+        # Start a request that holds the budget
+        responses = []
+        content = b'{"value": 1}        '
+        environ = {'CONTENT_LENGTH': str(len(content))}
+        thread = threading.Thread(
+            target=lambda: responses.append(app.request('POST', '/my_action', wsgi_input=content, environ=dict(environ)))
+        )
+        thread.start()
+        callback_ready.wait()
+        self.assertEqual(app.content_budget.used_bytes, 20)
+
+        # The second request waits for the first request to complete
+        threading.Timer(0.1, callback_release.set).start()
+        content2 = b'{"value": 2}'
+        status, _, response = app.request('POST', '/my_action', wsgi_input=content2, environ={'CONTENT_LENGTH': str(len(content2))})
+        thread.join()
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'{"value":2}')
+        self.assertEqual(responses, [('200 OK', [('Content-Type', 'application/json')], b'{"value":1}')])
+        self.assertEqual(app.content_budget.used_bytes, 0)
+        self.assertEqual(app.content_budget.admitted, 2)
+        self.assertEqual(app.content_budget.waited, 1)
+
+    def test_content_budget_wait_timeout(self):
+
+        @action(content_budget_wait=0.01, spec='''\
+action my_action
+    input
+        int value
+''')
+        def my_action(unused_ctx, unused_req):
+            return {} # pragma: no cover
+
+        app = Application()
+        app.content_budget = ContentBudget(100, retry_after=5)
+        app.add_request(my_action)
+        app.content_budget.acquire(100)
+
+        content = b'{"value": 1}'
+        environ = {'CONTENT_LENGTH': str(len(content)), 'wsgi.errors': StringIO()}
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=content, environ=environ)
+        self.assertEqual(status, '503 Service Unavailable')
+        self.assertEqual(headers, [('Content-Type', 'application/json'), ('Retry-After', '5')])
+        self.assertEqual(response, b'{"error":"ServiceUnavailable","message":"Request content budget exhausted"}')
+        self.assertIn('Request content budget exhausted for action "my_action"', environ['wsgi.errors'].getvalue())
+        self.assertEqual(app.content_budget.used_bytes, 100)
+        self.assertEqual(app.content_budget.rejected, 1)
+
+    def test_content_budget_reject(self):
+
+        @action(content_budget_policy='reject', spec='''\
+action my_action
+    input
+        int value
+''')
+        def my_action(unused_ctx, unused_req):
+            return {} # pragma: no cover
+
+        app = Application()
+        app.content_budget = ContentBudget(100)
+        app.add_request(my_action)
+        app.content_budget.acquire(95)
+
+        content = b'{"value": 1}'
+        environ = {'CONTENT_LENGTH': str(len(content)), 'wsgi.errors': StringIO()}
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=content, environ=dict(environ))
+        self.assertEqual(status, '503 Service Unavailable')
+        self.assertEqual(headers, [('Content-Type', 'application/json'), ('Retry-After', '1')])
+        self.assertEqual(response, b'{"error":"ServiceUnavailable","message":"Request content budget exhausted"}')
+
+        # Larger than the budget
+        app.content_budget.release(95)
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=content, environ={**environ, 'CONTENT_LENGTH': '101'})
+        self.assertEqual(status, '413 Request Entity Too Large')
+        self.assertEqual(headers, [('Content-Type', 'application/json')])
+        self.assertEqual(response, b'{"error":"InvalidInput","message":"Request content exceeds 100 bytes"}')
+        self.assertEqual(app.content_budget.rejected, 2)
+        self.assertEqual(app.content_budget.used_bytes, 0)
+
+    def test_content_budget_spool(self):
+        budgets = []
+
+        @action(content_budget_policy='spool', content_budget_wait=5, decompress=True, spec='''\
+action my_action
+    input
+        int value
+    output
+        int value
+''')
+        def my_action(ctx, req):
+            budgets.append(ctx.app.content_budget.used_bytes)
+            return {'value': req['value']}
+
+        app = Application()
+        app.content_budget = ContentBudget(100)
+        app.add_request(my_action)
+
+        # Content that fits isn't spooled
+        content = b'{"value": 1}'
+        status, _, response = app.request('POST', '/my_action', wsgi_input=content, environ={'CONTENT_LENGTH': str(len(content))})
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'{"value":1}')
+        self.assertEqual((app.content_budget.spooled, app.content_budget.admitted), (0, 1))
+        self.assertEqual(budgets, [12])
+
+        # Content that doesn't fit is spooled and then waits for the budget
+        app.content_budget.acquire(95)
+        threading.Timer(0.1, app.content_budget.release, args=(95,)).start()
+        status, _, response = app.request('POST', '/my_action', wsgi_input=content, environ={'CONTENT_LENGTH': str(len(content))})
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'{"value":1}')
+        self.assertEqual((app.content_budget.spooled, app.content_budget.admitted, app.content_budget.waited), (1, 3, 1))
+        self.assertEqual(budgets, [12, 12])
+        self.assertEqual(app.content_budget.used_bytes, 0)
+
+        # Compressed content - the compressed size is charged
+        app.content_budget.acquire(95)
+        threading.Timer(0.1, app.content_budget.release, args=(95,)).start()
+        content_gzip = gzip.compress(b'{"value": 2}' + b' ' * 100)
+        status, _, response = app.request('POST', '/my_action', wsgi_input=content_gzip,
+                                          environ={'CONTENT_LENGTH': str(len(content_gzip)), 'HTTP_CONTENT_ENCODING': 'gzip'})
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'{"value":2}')
+        self.assertEqual(app.content_budget.spooled, 2)
+        self.assertEqual(budgets[-1], len(content_gzip))
+
+        # Short content - the received size is charged
+        app.content_budget.acquire(50)
+        status, _, response = app.request('POST', '/my_action', wsgi_input=content, environ={'CONTENT_LENGTH': '60'})
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'{"value":1}')
+        self.assertEqual(app.content_budget.spooled, 3)
+        self.assertEqual(budgets[-1], 62)
+        app.content_budget.release(50)
+
+        # Larger than the budget - rejected without spooling
+        environ = {'CONTENT_LENGTH': '101', 'wsgi.errors': StringIO()}
+        status, _, response = app.request('POST', '/my_action', wsgi_input=content, environ=environ)
+        self.assertEqual(status, '413 Request Entity Too Large')
+        self.assertEqual(response, b'{"error":"InvalidInput","message":"Request content exceeds 100 bytes"}')
+        self.assertEqual(app.content_budget.spooled, 3)
+
+        # IO error
+        class MyStream:
+            @staticmethod
+            def read(unused_size):
+                raise IOError('FAIL')
+
+        app.content_budget.acquire(95)
+        status, _, response = app.request('POST', '/my_action', environ={'CONTENT_LENGTH': '50', 'wsgi.input': MyStream()})
+        self.assertEqual(status, '408 Request Timeout')
+        self.assertEqual(response, b'{"error":"IOError","message":"Error reading request content"}')
+        self.assertEqual(app.content_budget.used_bytes, 95)
+        app.content_budget.release(95)
+        self.assertEqual(app.content_budget.used_bytes, 0)
+
+    def test_content_budget_spool_timeout(self):
+
+        @action(content_budget_policy='spool', content_budget_wait=0.01, spec='''\
+action my_action
+    input
+        int value
+''')
+        def my_action(unused_ctx, unused_req):
+            return {} # pragma: no cover
+
+        app = Application()
+        app.content_budget = ContentBudget(100)
+        app.add_request(my_action)
+        app.content_budget.acquire(95)
+
+        # The spooled content is rejected if the budget isn't available
+        content = b'{"value": 1}'
+        environ = {'CONTENT_LENGTH': str(len(content)), 'wsgi.errors': StringIO()}
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=content, environ=environ)
+        self.assertEqual(status, '503 Service Unavailable')
+        self.assertEqual(headers, [('Content-Type', 'application/json'), ('Retry-After', '1')])
+        self.assertEqual(response, b'{"error":"ServiceUnavailable","message":"Request content budget exhausted"}')
+        self.assertEqual((app.content_budget.spooled, app.content_budget.rejected, app.content_budget.used_bytes), (1, 1, 95))
+
+    def test_content_budget_exempt(self):
+
+        @action(ndjson_input='records', content_budget_policy='reject', spec='''\
+action my_action
+    input
+        int[] records
+    output
+        int sum
+''')
+        def my_action(unused_ctx, req):
+            return {'sum': sum(req['records'])}
+
+        app = Application()
+        app.content_budget = ContentBudget(1)
+        app.add_request(my_action)
+
+        content = b'1\n2\n'
+        environ = {'CONTENT_LENGTH': str(len(content)), 'CONTENT_TYPE': 'application/x-ndjson'}
+        status, _, response = app.request('POST', '/my_action', wsgi_input=content, environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'{"sum":3}')
+        self.assertEqual(app.content_budget.admitted, 0)
+        self.assertEqual(app.content_budget.rejected, 0)
+
+    def test_content_budget_policy_invalid(self):
+        with self.assertRaises(AssertionError) as cm_exc:
+            @action(content_budget_policy='unknown', spec='''\
+action my_action
+''')
+            def my_action(unused_ctx, unused_req):
+                pass # pragma: no cover
+        self.assertEqual(str(cm_exc.exception), 'Invalid content_budget_policy "unknown"')
+
+    def test_timeout(self):
+        finish = threading.Event()
+        finished = []
+
+        @action(timeout=0.01, spec='''\
+action my_action
+''')
+        def my_action(ctx, unused_req):
+            self.assertIsNotNone(ctx.deadline)
+            finish.wait(10)
+            finished.append(ctx.remaining_time())
+            return {}
+
+        self.assertEqual(my_action.timeout, 0.01)
+        app = Application()
+        app.add_request(my_action)
+
+        # Use a dedicated executor - the callback blocks its thread past the response
+        app.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(app.executor.shutdown)
+        self.addCleanup(finish.set)
+        start_time = time.monotonic()
+        status, headers, response = app.request('POST', '/my_action', environ={'wsgi.errors': StringIO()})
+        self.assertLess(time.monotonic() - start_time, 5)
+        self.assertEqual(status, '504 Gateway Timeout')
+        self.assertEqual(headers, [('Content-Type', 'application/json')])
+        self.assertEqual(response, b'{"error":"Timeout"}')
+
+        # The callback continues on the executor until it returns
+        finish.set()
+        while not finished:
+            time.sleep(0.01)
+        self.assertEqual(finished, [0.0])
+
+    def test_timeout_async(self):
+        cancelled = []
+
+        @action(timeout=0.01, spec='''\
+action my_action
+''')
+        async def my_action(unused_ctx, unused_req):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return {}
+
+        app = Application()
+        app.add_request(my_action)
+        environ = {'wsgi.errors': StringIO()}
+        self.assertEqual(app.request('POST', '/my_action', environ=environ), (
+            '504 Gateway Timeout', [('Content-Type', 'application/json')], b'{"error":"Timeout"}'
+        ))
+        self.assertIn('Deadline exceeded for action "my_action"', environ['wsgi.errors'].getvalue())
+        for _ in range(100):
+            if cancelled:
+                break
+            time.sleep(0.01)
+        self.assertEqual(cancelled, [True])
+
+    def test_timeout_header(self):
+        finish = threading.Event()
+
+        @action(spec='''\
+action my_action
+''')
+        def my_action(unused_ctx, unused_req):
+            finish.wait(10)
+            return {}
+
+        app = Application()
+        app.add_request(my_action)
+
+        # A client deadline responds promptly while the synchronous callback continues on the executor
+        app.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(app.executor.shutdown)
+        self.addCleanup(finish.set)
+        start_time = time.monotonic()
+        environ = {'HTTP_X_REQUEST_TIMEOUT': '0.05', 'wsgi.errors': StringIO()}
+        self.assertEqual(app.request('POST', '/my_action', environ=environ), (
+            '504 Gateway Timeout', [('Content-Type', 'application/json')], b'{"error":"Timeout"}'
+        ))
+        self.assertLess(time.monotonic() - start_time, 5)
+        self.assertFalse(finish.is_set())
+
+    def test_timeout_complete(self):
+        @action(timeout=10, spec='''\
+action my_action
+    output
+        float remaining
+''')
+        def my_action(ctx, unused_req):
+            return {'remaining': ctx.remaining_time()}
+
+        @action(timeout=10, spec='''\
+action my_action_async
+    output
+        bool remaining
+''')
+        async def my_action_async(ctx, unused_req):
+            await asyncio.sleep(0)
+            return {'remaining': 9 < ctx.remaining_time() <= 10}
+
+        app = Application()
+        app.add_request(my_action)
+        app.add_request(my_action_async)
+        status, _, response = app.request('POST', '/my_action')
+        self.assertEqual(status, '200 OK')
+        self.assertTrue(9 < json.loads(response)['remaining'] <= 10)
+        self.assertEqual(app.request('POST', '/my_action_async'), ('200 OK', [('Content-Type', 'application/json')], b'{"remaining":true}'))
+
+    def test_deadline_header(self):
+        calls = []
+
+        @action(spec='''\
+action my_action
+    output
+        optional float remaining
+''')
+        def my_action(ctx, unused_req):
+            calls.append(ctx.deadline)
+            return {'remaining': ctx.remaining_time()} if ctx.deadline is not None else {}
+
+        app = Application()
+        app.add_request(my_action)
+
+        # No deadline
+        self.assertEqual(app.request('POST', '/my_action'), ('200 OK', [('Content-Type', 'application/json')], b'{}'))
+        self.assertEqual(calls, [None])
+
+        # Client deadline
+        status, _, response = app.request('POST', '/my_action', environ={'HTTP_X_REQUEST_TIMEOUT': '5'})
+        self.assertEqual(status, '200 OK')
+        self.assertTrue(4 < json.loads(response)['remaining'] <= 5)
+
+        # Expired client deadline - the callback isn't called
+        environ = {'HTTP_X_REQUEST_TIMEOUT': '0', 'wsgi.errors': StringIO()}
+        self.assertEqual(app.request('POST', '/my_action', environ=environ), (
+            '504 Gateway Timeout', [('Content-Type', 'application/json')], b'{"error":"Timeout"}'
+        ))
+        self.assertEqual(len(calls), 2)
+
+    def test_deadline_exceeded(self):
+        @action(spec='''\
+action my_action
+''')
+        def my_action(ctx, unused_req):
+            ctx.deadline = time.monotonic()
+            ctx.check_deadline()
+            return {}
+
+        app = Application()
+        app.add_request(my_action)
+        self.assertEqual(app.request('POST', '/my_action', environ={'wsgi.errors': StringIO()}), (
+            '504 Gateway Timeout', [('Content-Type', 'application/json')], b'{"error":"Timeout"}'
+        ))
+
+    def test_deadline_in_process(self):
+        @action(spec='''\
+action my_inner
+    output
+        optional float deadline
+''')
+        def my_inner(ctx, unused_req):
+            return {'deadline': ctx.deadline} if ctx.deadline is not None else {}
+
+        @action(timeout=10, spec='''\
+action my_outer
+    output
+        bool inherited
+        bool not_inherited
+''')
+        def my_outer(ctx, unused_req):
+            _, _, inherited = ctx.request('POST', '/my_inner')
+            _, _, not_inherited = ctx.app.request('POST', '/my_inner')
+            return {
+                'inherited': json.loads(inherited) == {'deadline': ctx.deadline},
+                'not_inherited': json.loads(not_inherited) == {}
+            }
+
+        app = Application()
+        app.add_request(my_inner)
+        app.add_request(my_outer)
+        self.assertEqual(app.request('POST', '/my_outer'), (
+            '200 OK', [('Content-Type', 'application/json')], b'{"inherited":true,"not_inherited":true}'
+        ))
+
+    def test_bulkhead(self):
+        bulkhead = Bulkhead(0, max_queue=0)
+
+        @action(bulkhead=bulkhead, spec='''\
+action my_action
+''')
+        def my_action(unused_ctx, unused_req):
+            return {}
+
+        self.assertIs(my_action.bulkhead, bulkhead)
+        app = Application()
+        app.add_request(my_action)
+        status, headers, response = app.request('POST', '/my_action')
+        self.assertEqual(status, '503 Service Unavailable')
+        self.assertIn(('Retry-After', '1'), headers)
+        self.assertEqual(response, b'Service Unavailable')
+        self.assertEqual(bulkhead.request_metrics['my_action'].rejected, 1)
+
+    def test_idempotency(self):
+        calls = []
+
+        @action(idempotency_responses=10, spec='''\
+action my_action
+    input
+        int value
+    output
+        int value
+        int count
+    errors
+        MyError
+''')
+        def my_action(ctx, req):
+            calls.append(req['value'])
+            if req['value'] < 0:
+                raise ActionError('MyError')
+            if req['value'] == 0:
+                raise ActionError('MyError', status=HTTPStatus.SERVICE_UNAVAILABLE)
+            ctx.add_header('X-Count', str(len(calls)))
+            return {'value': req['value'], 'count': len(calls)}
+
+        app = Application()
+        app.add_request(my_action)
+
+        # First request
+        environ = {'HTTP_IDEMPOTENCY_KEY': 'key1', 'REMOTE_ADDR': '1.2.3.4'}
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=b'{"value": 1}', environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers, [('Content-Type', 'application/json'), ('X-Count', '1')])
+        self.assertEqual(response, b'{"count":1,"value":1}')
+        self.assertEqual(calls, [1])
+
+        # Retry - replayed
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=b'{"value": 1}', environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers, [('Content-Type', 'application/json'), ('X-Count', '1')])
+        self.assertEqual(response, b'{"count":1,"value":1}')
+        self.assertEqual(calls, [1])
+        self.assertEqual(app.requests['my_action'].idempotency.replayed, 1)
+
+        # Different client
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=b'{"value": 1}',
+                                                environ={**environ, 'REMOTE_ADDR': '5.6.7.8'})
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'{"count":2,"value":1}')
+        self.assertEqual(calls, [1, 1])
+
+        # No idempotency key
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=b'{"value": 1}')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'{"count":3,"value":1}')
+        self.assertEqual(calls, [1, 1, 1])
+
+        # Client errors are retained
+        environ_error = {**environ, 'HTTP_IDEMPOTENCY_KEY': 'key2'}
+        for _ in range(2):
+            status, headers, response = app.request('POST', '/my_action', wsgi_input=b'{"value": -1}', environ=dict(environ_error))
+            self.assertEqual(status, '400 Bad Request')
+            self.assertEqual(response, b'{"error":"MyError"}')
+        self.assertEqual(calls, [1, 1, 1, -1])
+
+        # Server errors are not retained
+        environ_error = {**environ, 'HTTP_IDEMPOTENCY_KEY': 'key3'}
+        for _ in range(2):
+            status, headers, response = app.request('POST', '/my_action', wsgi_input=b'{"value": 0}', environ=dict(environ_error))
+            self.assertEqual(status, '503 Service Unavailable')
+            self.assertEqual(response, b'{"error":"MyError"}')
+        self.assertEqual(calls, [1, 1, 1, -1, 0, 0])
+
+    def test_idempotency_key(self):
+        @action(idempotency_responses=10, spec='''\
+action my_action
+''')
+        def my_action(unused_ctx, unused_req):
+            return {}
+
+        app = Application()
+        app.add_request(my_action)
+        environ = {'HTTP_IDEMPOTENCY_KEY': 'key1', 'REMOTE_ADDR': '1.2.3.4'}
+        self.assertEqual(app.request('POST', '/my_action', environ=dict(environ))[0], '200 OK')
+
+        # The cache key is the action, client, and idempotency key
+        response, _ = my_action.idempotency.begin(('my_action', '1.2.3.4', 'key1'))
+        self.assertEqual(response, ('200 OK', [('Content-Type', 'application/json')], b'{}'))
+
+    def test_idempotency_mismatch(self):
+        calls = []
+
+        @action(idempotency_responses=10, spec='''\
+action my_action
+    input
+        int n
+    output
+        int n
+''')
+        def my_action(unused_ctx, req):
+            calls.append(req['n'])
+            return {'n': req['n']}
+
+        app = Application()
+        app.add_request(my_action)
+        environ = {'HTTP_IDEMPOTENCY_KEY': 'key1'}
+        self.assertEqual(app.request('POST', '/my_action', wsgi_input=b'{"n": 1}', environ=dict(environ))[2], b'{"n":1}')
+        self.assertEqual(app.request('POST', '/my_action', wsgi_input=b'{"n": 1}', environ=dict(environ))[2], b'{"n":1}')
+
+        # The key is reused with different content or query string
+        for wsgi_input, query_string in ((b'{"n": 999}', ''), (b'{"n": 1}', 'n=2')):
+            environ_mismatch = {**environ, 'wsgi.errors': StringIO()}
+            status, headers, response = app.request('POST', '/my_action', query_string, wsgi_input, environ=environ_mismatch)
+            self.assertEqual(status, '422 Unprocessable Entity')
+            self.assertEqual(headers, [('Content-Type', 'application/json')])
+            self.assertEqual(response, b'{"error":"InvalidInput","message":"Idempotency-Key reused with different request content"}')
+            self.assertIn('Idempotency-Key reused with different request content for action "my_action"',
+                          environ_mismatch['wsgi.errors'].getvalue())
+        self.assertEqual(calls, [1])
+
+    def test_idempotency_compression(self):
+        @action(idempotency_responses=10, spec='''\
+action my_action
+    output
+        string value
+''')
+        def my_action(unused_ctx, unused_req):
+            return {'value': 'a' * 100}
+
+        app = Application()
+        app.compression = ResponseCompression(min_bytes=10)
+        app.add_request(my_action)
+        content = b'{"value":"' + b'a' * 100 + b'"}'
+
+        # The retained response is uncompressed
+        environ = {'HTTP_IDEMPOTENCY_KEY': 'key1', 'HTTP_ACCEPT_ENCODING': 'gzip'}
+        status, headers, response = app.request('POST', '/my_action', environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers, [('Content-Encoding', 'gzip'), ('Content-Type', 'application/json'), ('Vary', 'Accept-Encoding')])
+        self.assertEqual(gzip.decompress(response), content)
+        (_, _, retained_content), _ = my_action.idempotency.begin(('my_action', None, 'key1'))
+        self.assertEqual(retained_content, content)
+
+        # Replays are compressed per the request
+        status, headers, response = app.request('POST', '/my_action', environ={'HTTP_IDEMPOTENCY_KEY': 'key1'})
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers, [('Content-Type', 'application/json'), ('Vary', 'Accept-Encoding')])
+        self.assertEqual(response, content)
+        status, headers, response = app.request('POST', '/my_action', environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers, [('Content-Encoding', 'gzip'), ('Content-Type', 'application/json'), ('Vary', 'Accept-Encoding')])
+        self.assertEqual(gzip.decompress(response), content)
+
+    def test_idempotency_client(self):
+        calls = []
+
+        @action(idempotency_responses=10, idempotency_client=lambda ctx: ctx.environ.get('HTTP_X_CLIENT'), spec='''\
+action my_action
+    output
+        int count
+''')
+        def my_action(unused_ctx, unused_req):
+            calls.append(1)
+            return {'count': len(calls)}
+
+        app = Application()
+        app.add_request(my_action)
+
+        environ = {'HTTP_IDEMPOTENCY_KEY': 'key1', 'HTTP_X_CLIENT': 'a', 'REMOTE_ADDR': '1.2.3.4'}
+        self.assertEqual(app.request('POST', '/my_action', environ=dict(environ))[2], b'{"count":1}')
+        self.assertEqual(app.request('POST', '/my_action', environ={**environ, 'REMOTE_ADDR': '5.6.7.8'})[2], b'{"count":1}')
+        self.assertEqual(app.request('POST', '/my_action', environ={**environ, 'HTTP_X_CLIENT': 'b'})[2], b'{"count":2}')
+
+    def test_idempotency_concurrent(self):
+        callback_ready = threading.Event()
+        callback_release = threading.Event()
+        calls = []
+
+        @action(idempotency_responses=10, spec='''\
+action my_action
+    output
+        int count
+''')
+        def my_action(unused_ctx, unused_req):
+            calls.append(1)
+            callback_ready.set()
+            callback_release.wait()
+            return {'count': len(calls)}
+
+        app = Application()
+        app.add_request(my_action)
+
+        # Start the first request
+        environ = {'HTTP_IDEMPOTENCY_KEY': 'key1'}
+        responses = []
+        thread = threading.Thread(target=lambda: responses.append(app.request('POST', '/my_action', environ=dict(environ))))
+        thread.start()
+        callback_ready.wait()
+
+        # The duplicate request waits for the first request
+        thread2 = threading.Thread(target=lambda: responses.append(app.request('POST', '/my_action', environ=dict(environ))))
+        thread2.start()
+        thread2.join(0.01)
+        self.assertTrue(thread2.is_alive())
+        callback_release.set()
+        thread.join()
+        thread2.join()
+        self.assertEqual(calls, [1])
+        self.assertEqual(responses, [('200 OK', [('Content-Type', 'application/json')], b'{"count":1}')] * 2)
+
+    def test_idempotency_unexpected_error(self):
+        calls = []
+
+        def content():
+            yield b'Hello'
+            raise ValueError('BAD')
+
+        @action(wsgi_response=True, idempotency_responses=10, spec='''\
+action my_action
+''')
+        def my_action(ctx, unused_req):
+            calls.append(1)
+            if len(calls) == 1:
+                return ctx.response(HTTPStatus.OK, 'text/plain', content())
+            return ctx.response_text(HTTPStatus.OK, 'Hello')
+
+        app = Application()
+        app.add_request(my_action)
+
+        # The content iterable raises - the response is not retained
+        environ = {'HTTP_IDEMPOTENCY_KEY': 'key1', 'wsgi.errors': StringIO()}
+        status, _, response = app.request('POST', '/my_action', environ=dict(environ))
+        self.assertEqual(status, '500 Internal Server Error')
+        self.assertEqual(response, b'Internal Server Error')
+        self.assertEqual(len(app.requests['my_action'].idempotency), 0)
+
+        # The next request executes
+        status, _, response = app.request('POST', '/my_action', environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'Hello')
+        self.assertEqual(len(app.requests['my_action'].idempotency), 1)
+        self.assertEqual(len(calls), 2)
+
+    def test_idempotency_key_invalid(self):
+
+        @action(idempotency_responses=10, spec='''\
+action my_action
+''')
+        def my_action(unused_ctx, unused_req):
+            return {} # pragma: no cover
+
+        app = Application()
+        app.add_request(my_action)
+
+        environ = {'HTTP_IDEMPOTENCY_KEY': 'a' * 256, 'wsgi.errors': StringIO()}
+        status, _, response = app.request('POST', '/my_action', environ=environ)
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(response, b'{"error":"InvalidInput","message":"Idempotency-Key exceeds 255 characters"}')
+
+    def test_idempotency_get(self):
+        calls = []
+
+        @action(idempotency_responses=10, spec='''\
+action my_action
+    urls
+        GET
+    output
+        int count
+''')
+        def my_action(unused_ctx, unused_req):
+            calls.append(1)
+            return {'count': len(calls)}
+
+        app = Application()
+        app.add_request(my_action)
+
+        environ = {'HTTP_IDEMPOTENCY_KEY': 'key1'}
+        self.assertEqual(app.request('GET', '/my_action', environ=dict(environ))[2], b'{"count":1}')
+        self.assertEqual(app.request('GET', '/my_action', environ=dict(environ))[2], b'{"count":2}')
+
+    def test_async(self):
+
+        @action(spec='''\
+action my_action
+    input
+        int value
+    output
+        int value
+    errors
+        MyError
+''')
+        async def my_action(ctx, req):
+            await asyncio.sleep(0)
+            if req['value'] < 0:
+                raise ActionError('MyError', message='Negative value')
+            if req['value'] == 0:
+                raise ValueError('BAD')
+            ctx.add_header('X-Value', str(req['value']))
+            return {'value': req['value']}
+
+        app = Application()
+        app.add_request(my_action)
+
+        status, headers, response = app.request('POST', '/my_action', wsgi_input=b'{"value": 1}')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers, [('Content-Type', 'application/json'), ('X-Value', '1')])
+        self.assertEqual(response, b'{"value":1}')
+
+        # Invalid input
+        status, _, response = app.request('POST', '/my_action', wsgi_input=b'{"value": "abc"}')
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(
+            response,
+            b'{"error":"InvalidInput","member":"value","message":"Invalid value \\"abc\\" (type \\"str\\") '
+            b'for member \\"value\\", expected type \\"int\\" (content)"}'
+        )
+
+        # Action error
+        status, _, response = app.request('POST', '/my_action', wsgi_input=b'{"value": -1}')
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(response, b'{"error":"MyError","message":"Negative value"}')
+
+        # Unexpected error
+        environ = {'wsgi.errors': StringIO()}
+        status, _, response = app.request('POST', '/my_action', wsgi_input=b'{"value": 0}', environ=environ)
+        self.assertEqual(status, '500 Internal Server Error')
+        self.assertEqual(response, b'{"error":"UnexpectedError"}')
+        self.assertIn('Unexpected error in action "my_action"', environ['wsgi.errors'].getvalue())
+        self.assertIn('ValueError: BAD', environ['wsgi.errors'].getvalue())
+
+        app.event_loop.close()
+
+    def test_async_thread(self):
+
+        @action(spec='''\
+action my_action
+    output
+        string thread_name
+''')
+        async def my_action(unused_ctx, unused_req):
+            return {'thread_name': threading.current_thread().name}
+
+        app = Application()
+        app.add_request(my_action)
+
+        # The async callback is run on the application's event loop thread
+        self.assertEqual(app.request('POST', '/my_action')[2], b'{"thread_name":"chisel-event-loop"}')
+        app.event_loop.close()
+
+    def test_async_wsgi_response(self):
+
+        @action(wsgi_response=True, spec='''\
+action my_action
+''')
+        async def my_action(ctx, unused_req):
+            await asyncio.sleep(0)
+            return ctx.response_text(HTTPStatus.OK, 'Hello')
+
+        app = Application()
+        app.add_request(my_action)
+        self.assertEqual(app.request('POST', '/my_action'), ('200 OK', [('Content-Type', 'text/plain; charset=utf-8')], b'Hello'))
+        app.event_loop.close()
+
+    def test_async_events(self):
+        closed = []
+
+        @action(events=True, events_heartbeat=None, spec='''\
+action my_events
+    urls
+        GET
+    query
+        int count
+    output
+        int value
+''')
+        async def my_events(unused_ctx, req):
+            try:
+                for value in range(req['count']):
+                    await asyncio.sleep(0)
+                    yield {'value': value}
+            finally:
+                closed.append(True)
+
+        app = Application()
+        app.add_request(my_events)
+
+        status, _, response = app.request('GET', '/my_events', query_string='count=2')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'data: {"value":0}\n\ndata: {"value":1}\n\n')
+        self.assertEqual(closed, [True])
+
+        # Client disconnect
+        content = app(Context.create_environ('GET', '/my_events', query_string='count=5'), StartResponse())
+        self.assertEqual(next(iter(content)), b'data: {"value":0}\n\n')
+        content.close()
+        self.assertEqual(closed, [True, True])
+        app.event_loop.close()
+
+    def test_async_events_loop_bound(self):
+
+        # The events await futures bound to the async callback's event loop
+        async def my_events_callback(unused_ctx, req):
+            loop = asyncio.get_running_loop()
+            values = [loop.create_future() for _ in range(req['count'])]
+
+            async def produce():
+                for value, future in enumerate(values):
+                    await asyncio.sleep(0.02 if req['delay'] else 0)
+                    future.set_result({'value': value})
+
+            async def events():
+                try:
+                    for future in values:
+                        yield await future
+                finally:
+                    producer.cancel()
+
+            producer = loop.create_task(produce())
+            return events()
+
+        spec = '''\
+action my_events
+    urls
+        GET
+    query
+        int count
+        bool delay
+    output
+        int value
+
+action my_events_heartbeat
+    urls
+        GET
+    query
+        int count
+        bool delay
+    output
+        int value
+'''
+        app = Application()
+        app.add_request(Action(my_events_callback, name='my_events', events=True, events_heartbeat=None, spec=spec))
+        app.add_request(Action(my_events_callback, name='my_events_heartbeat', events=True, events_heartbeat=0.005, spec=spec))
+
+        status, _, response = app.request('GET', '/my_events', query_string='count=2&delay=false')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'data: {"value":0}\n\ndata: {"value":1}\n\n')
+
+        status, _, response = app.request('GET', '/my_events_heartbeat', query_string='count=2&delay=true')
+        self.assertEqual(status, '200 OK')
+        self.assertIn(b': heartbeat\n\n', response)
+        self.assertEqual(response.replace(b': heartbeat\n\n', b''), b'data: {"value":0}\n\ndata: {"value":1}\n\n')
+        app.event_loop.close()
+
+    @skipIf(zstd is None, 'compression.zstd not available')
+    def test_zstd_dictionary(self): # pragma: no cover
+        samples = [f'{{"id":{ix},"name":"name{ix}","tags":["t{ix % 5}"]}}'.encode() for ix in range(500)]
+
+        @action(zstd_dictionary=train_zstd_dictionary(samples, 1024), spec='''\
+action my_action
+    urls
+        GET
+    query
+        int id
+    output
+        int id
+        string name
+        string[] tags
+''')
+        def my_action(unused_app, req):
+            return {'id': req['id'], 'name': f'name{req["id"]}', 'tags': ['t0']}
+
+        app = Application()
+        app.add_request(my_action)
+        dict_id = my_action.zstd_dictionary.dict_id
+
+        # Client without the dictionary
+        status, headers, response = app.request('GET', '/my_action', query_string='id=1000', environ={'HTTP_ACCEPT_ENCODING': 'zstd'})
+        self.assertEqual(status, '200 OK')
+        headers = dict(headers)
+        self.assertEqual(headers['Chisel-Zstd-Dictionary'], dict_id)
+        self.assertEqual(headers['Vary'], 'Accept-Encoding, Chisel-Zstd-Dictionary')
+        self.assertNotIn('Content-Encoding', headers)
+        content = b'{"id":1000,"name":"name1000","tags":["t0"]}'
+        self.assertEqual(response, content)
+
+        # Client with the dictionary
+        environ = {'HTTP_ACCEPT_ENCODING': 'zstd', 'HTTP_CHISEL_ZSTD_DICTIONARY': dict_id}
+        status, headers, response = app.request('GET', '/my_action', query_string='id=1000', environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(dict(headers)['Content-Encoding'], 'zstd')
+        self.assertEqual(decode_response_content(headers, response, {dict_id: my_action.zstd_dictionary}), content)
+
+        # Client with the dictionary that doesn't accept (or prefer) zstd
+        for accept_encoding in ('zstd;q=0', 'gzip, zstd;q=0.5', 'identity'):
+            environ = {'HTTP_ACCEPT_ENCODING': accept_encoding, 'HTTP_CHISEL_ZSTD_DICTIONARY': dict_id}
+            status, headers, response = app.request('GET', '/my_action', query_string='id=1000', environ=environ)
+            self.assertEqual(status, '200 OK')
+            self.assertNotIn('Content-Encoding', dict(headers))
+            self.assertEqual(response, content)
+
     def test_output_dict_subclass(self):
 
         @action(spec='''\
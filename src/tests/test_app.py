@@ -6,12 +6,22 @@
 from datetime import date, datetime, timezone
 from http import HTTPStatus
 from io import StringIO
+import gzip
 import logging
+import os
+import tempfile
+import threading
+import time
 from unittest import TestCase
 import unittest.mock
+import wsgiref.util
 
 from chisel import Application, Context, Request
 from chisel.app import StartResponse
+from chisel.asgi import FileWrapper
+from chisel.bulkhead import Bulkhead
+from chisel.compression import ResponseCompression
+from chisel.shedding import LoadShedder
 
 
 class TestApplication(TestCase):
@@ -282,13 +292,15 @@ class TestApplication(TestCase):
         self.assertEqual(status, '200 OK')
         self.assertEqual(response, b'the response')
         self.assertListEqual(headers, [('Content-Type', 'text/plain')])
-        self.assertFalse(response_content.closed)
+        self.assertTrue(response_content.closed)
 
-        # The discarded HEAD response content is closed
-        status, headers, response = app.request('HEAD', '/request')
-        self.assertEqual(status, '200 OK')
-        self.assertEqual(response, b'')
-        self.assertListEqual(headers, [('Content-Type', 'text/plain')])
+        # The discarded HEAD response content is closed by the application
+        response_content.closed = False
+        start_response = StartResponse()
+        response = app(Context.create_environ('HEAD', '/request'), start_response)
+        self.assertEqual(start_response.status, '200 OK')
+        self.assertEqual(response, [])
+        self.assertListEqual(start_response.headers, [('Content-Type', 'text/plain')])
         self.assertTrue(response_content.closed)
 
         # A close failure must not suppress the HEAD response
@@ -354,6 +366,237 @@ class TestApplication(TestCase):
         self.assertEqual(response, b'12')
 
 
+    def test_request_bulkhead(self):
+        started = threading.Event()
+        finish = threading.Event()
+
+        def request1(environ, unused_start_response):
+            ctx = environ[Context.ENVIRON_CTX]
+            started.set()
+            finish.wait()
+            return ctx.response_text(HTTPStatus.OK, 'request1')
+
+        bulkhead = Bulkhead(1, max_queue=1, queue_timeout=10, retry_after=5)
+        app = Application()
+        app.add_request(Request(request1, bulkhead=bulkhead))
+
+        # Start a request that holds the bulkhead and queue another
+        responses = []
+        threads = [threading.Thread(target=lambda: responses.append(app.request('GET', '/request1'))) for _ in range(2)]
+        threads[0].start()
+        started.wait()
+        threads[1].start()
+        while bulkhead.metrics.queued != 1:
+            time.sleep(0.01)
+
+        # The queue is full - rejected
+        status, headers, response = app.request('GET', '/request1')
+        self.assertEqual(status, '503 Service Unavailable')
+        self.assertEqual(headers, [('Content-Type', 'text/plain; charset=utf-8'), ('Retry-After', '5')])
+        self.assertEqual(response, b'Service Unavailable')
+
+        # The queued request is admitted when the first request completes
+        finish.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([status for status, _, _ in responses], ['200 OK', '200 OK'])
+        self.assertEqual(bulkhead.active, 0)
+        self.assertEqual(bulkhead.peak_active, 1)
+        metrics = bulkhead.request_metrics['request1']
+        self.assertEqual((metrics.admitted, metrics.waited, metrics.rejected, metrics.timed_out), (2, 1, 1, 0))
+        self.assertEqual((metrics.queued, metrics.peak_queued), (0, 1))
+        self.assertGreater(metrics.wait_seconds, 0)
+
+
+    def test_request_bulkhead_stream(self):
+        bulkhead = Bulkhead(1, max_queue=0)
+
+        def request1(unused_environ, start_response):
+            def content():
+                yield b'active '
+                yield str(bulkhead.active).encode('utf-8')
+
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return content()
+
+        def request2(environ, unused_start_response):
+            ctx = environ[Context.ENVIRON_CTX]
+            return ctx.response_text(HTTPStatus.OK, f'active {bulkhead.active}')
+
+        app = Application()
+        app.add_request(Request(request1, bulkhead=bulkhead))
+        app.add_request(Request(request2, bulkhead=bulkhead))
+
+        # A streamed response holds its bulkhead until the response content is closed
+        self.assertEqual(app.request('GET', '/request1'), ('200 OK', [('Content-Type', 'text/plain')], b'active 1'))
+        self.assertEqual(bulkhead.active, 0)
+        self.assertEqual(app.request('HEAD', '/request1'), ('200 OK', [('Content-Type', 'text/plain')], b''))
+        self.assertEqual(bulkhead.active, 0)
+
+        # A response content list releases its bulkhead when the request returns
+        self.assertEqual(app.request('GET', '/request2')[2], b'active 1')
+        self.assertEqual(bulkhead.active, 0)
+
+        # WSGI - a request is rejected while a streamed response is in progress
+        response = app(Context.create_environ('GET', '/request1'), StartResponse())
+        self.assertEqual(bulkhead.active, 1)
+        self.assertEqual(app.request('GET', '/request2')[0], '503 Service Unavailable')
+        self.assertEqual(b''.join(response), b'active 1')
+        response.close()
+        response.close()
+        self.assertEqual(bulkhead.active, 0)
+        self.assertEqual(app.request('GET', '/request2')[0], '200 OK')
+
+
+    def test_request_bulkhead_file_wrapper(self):
+        bulkhead = Bulkhead(1, max_queue=0)
+
+        def request1(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            file = tempfile.TemporaryFile() # pylint: disable=consider-using-with
+            file.write(b'Hello')
+            file.seek(0)
+            return environ['wsgi.file_wrapper'](file)
+
+        app = Application()
+        app.add_request(Request(request1, bulkhead=bulkhead))
+
+        # A file wrapper response keeps its type (so the server can use its file handling) and holds its bulkhead until
+        # it's closed
+        for file_wrapper in (wsgiref.util.FileWrapper, FileWrapper):
+            environ = Context.create_environ('GET', '/request1', environ={'wsgi.file_wrapper': file_wrapper})
+            response = app(environ, StartResponse())
+            self.assertIsInstance(response, file_wrapper)
+            self.assertEqual(bulkhead.active, 1)
+            self.assertEqual(os.read(response.filelike.fileno(), 100), b'Hello')
+            response.close()
+            response.close()
+            self.assertTrue(response.filelike.closed)
+            self.assertEqual(bulkhead.active, 0)
+
+        # A file wrapper without a close method
+        class MyFileWrapper:
+            def __init__(self, filelike):
+                self.filelike = filelike
+
+            def __iter__(self):
+                yield self.filelike.read()
+
+        environ = Context.create_environ('GET', '/request1', environ={'wsgi.file_wrapper': MyFileWrapper})
+        response = app(environ, StartResponse())
+        self.assertIsInstance(response, MyFileWrapper)
+        self.assertEqual(b''.join(response), b'Hello')
+        self.assertEqual(bulkhead.active, 1)
+        response.close()
+        self.assertTrue(response.filelike.closed)
+        self.assertEqual(bulkhead.active, 0)
+
+
+    def test_request_bulkhead_timeout(self):
+        started = threading.Event()
+        finish = threading.Event()
+
+        def request1(environ, unused_start_response):
+            ctx = environ[Context.ENVIRON_CTX]
+            started.set()
+            finish.wait()
+            return ctx.response_text(HTTPStatus.OK, 'request1')
+
+        bulkhead = Bulkhead(1, queue_timeout=0.01)
+        app = Application()
+        app.add_request(Request(request1, bulkhead=bulkhead))
+        thread = threading.Thread(target=app.request, args=('GET', '/request1'))
+        thread.start()
+        started.wait()
+        try:
+            status, headers, _ = app.request('GET', '/request1')
+            self.assertEqual(status, '503 Service Unavailable')
+            self.assertIn(('Retry-After', '1'), headers)
+        finally:
+            finish.set()
+            thread.join()
+        self.assertEqual(bulkhead.active, 0)
+        self.assertEqual((bulkhead.metrics.admitted, bulkhead.metrics.timed_out, bulkhead.metrics.queued), (1, 1, 0))
+
+
+    def test_request_bulkhead_application(self):
+        started = threading.Event()
+        finish = threading.Event()
+
+        def report1(environ, unused_start_response):
+            ctx = environ[Context.ENVIRON_CTX]
+            started.set()
+            finish.wait()
+            return ctx.response_text(HTTPStatus.OK, 'report1')
+
+        def report2(environ, unused_start_response):
+            ctx = environ[Context.ENVIRON_CTX]
+            return ctx.response_text(HTTPStatus.OK, 'report2')
+
+        def request1(environ, unused_start_response):
+            ctx = environ[Context.ENVIRON_CTX]
+            return ctx.response_text(HTTPStatus.OK, 'request1')
+
+        report2_bulkhead = Bulkhead(1)
+        group_bulkhead = Bulkhead(1, max_queue=0)
+        app = Application()
+        app.add_request(Request(report1, doc_group='Reports'))
+        app.add_request(Request(report2, doc_group='Reports', bulkhead=Bulkhead(0, max_queue=0)))
+        app.add_request(Request(request1))
+        app.request_bulkheads['report2'] = report2_bulkhead
+        app.doc_group_bulkheads['Reports'] = group_bulkhead
+
+        # Hold the group's bulkhead
+        thread = threading.Thread(target=app.request, args=('GET', '/report1'))
+        thread.start()
+        started.wait()
+        try:
+            # Another request in the group is rejected by the group bulkhead - its request bulkhead is released
+            status, _, _ = app.request('GET', '/report2')
+            self.assertEqual(status, '503 Service Unavailable')
+            self.assertEqual(report2_bulkhead.active, 0)
+            self.assertEqual(report2_bulkhead.metrics.admitted, 1)
+            self.assertEqual(group_bulkhead.request_metrics['report2'].rejected, 1)
+
+            # Requests outside the group are not limited
+            self.assertEqual(app.request('GET', '/request1')[0], '200 OK')
+        finally:
+            finish.set()
+            thread.join()
+
+        # The application's request bulkhead takes the place of the request's bulkhead
+        self.assertEqual(app.request('GET', '/report2')[0], '200 OK')
+        self.assertEqual(report2_bulkhead.metrics.admitted, 2)
+        self.assertEqual(group_bulkhead.active, 0)
+        self.assertEqual(group_bulkhead.metrics.admitted, 2)
+
+
+    def test_request_load_shedder(self):
+
+        def request1(environ, unused_start_response):
+            ctx = environ[Context.ENVIRON_CTX]
+            return ctx.response_text(HTTPStatus.OK, 'request1')
+
+        app = Application()
+        app.add_request(Request(request1))
+        app.add_request(Request(name='health', wsgi_callback=request1))
+        app.load_shedder = LoadShedder(target=0.1, interval=0, exempt=['health'], retry_after=3, trust_request_start=True)
+
+        # A standing queue - the second request is rejected
+        environ = {'HTTP_X_REQUEST_START': f't={time.time() - 1:.3f}'}
+        self.assertEqual(app.request('GET', '/request1', environ=dict(environ))[0], '200 OK')
+        status, headers, response = app.request('GET', '/request1', environ=dict(environ))
+        self.assertEqual(status, '503 Service Unavailable')
+        self.assertEqual(headers, [('Content-Type', 'text/plain; charset=utf-8'), ('Retry-After', '3')])
+        self.assertEqual(response, b'Service Unavailable')
+
+        # Exempt requests and requests within the target are admitted
+        self.assertEqual(app.request('GET', '/health', environ=dict(environ))[0], '200 OK')
+        self.assertEqual(app.request('GET', '/request1', environ={'HTTP_X_REQUEST_START': f't={time.time():.3f}'})[0], '200 OK')
+        self.assertEqual(app.request('GET', '/request1')[0], '200 OK')
+        self.assertEqual((app.load_shedder.admitted, app.load_shedder.rejected), (3, 1))
+
+
     def test_request_exception(self):
 
         def request1(unused_environ, unused_start_response):
@@ -446,6 +689,14 @@ class TestApplication(TestCase):
 
 class TestContext(TestCase):
 
+    def test_add_vary_header(self):
+        ctx = Context(Application())
+        ctx.add_vary_header('Accept')
+        ctx.add_vary_header('Prefer')
+        ctx.add_vary_header('accept')
+        self.assertEqual(ctx.headers['Vary'], 'Accept, Prefer')
+
+
     def test_add_cache_headers(self):
         app = Application()
         ctx = Context(app, environ={
@@ -638,6 +889,99 @@ class TestContext(TestCase):
         self.assertEqual(start_response.headers, [('Content-Type', 'application/schema+json')])
 
 
+    def test_response_cbor(self):
+        app = Application()
+        start_response = StartResponse()
+        ctx = Context(app, start_response=start_response)
+        response = ctx.response_cbor(HTTPStatus.OK, {'a': 7, 'c': date(2018, 2, 24)})
+        self.assertEqual(response, [b'\xa2aa\x07ac\xd9\x03\xecj2018-02-24'])
+        self.assertEqual(start_response.status, '200 OK')
+        self.assertEqual(start_response.headers, [('Content-Type', 'application/cbor')])
+
+
+    def test_response_compression(self):
+        app = Application()
+        app.compression = ResponseCompression(min_bytes=10)
+        start_response = StartResponse()
+        ctx = Context(app, environ={'HTTP_ACCEPT_ENCODING': 'gzip'}, start_response=start_response)
+        response = ctx.response_text(HTTPStatus.OK, 'Hello, World!')
+        self.assertEqual(gzip.decompress(b''.join(response)), b'Hello, World!')
+        self.assertEqual(start_response.status, '200 OK')
+        self.assertEqual(start_response.headers, [
+            ('Content-Encoding', 'gzip'),
+            ('Content-Type', 'text/plain; charset=utf-8'),
+            ('Vary', 'Accept-Encoding')
+        ])
+
+
+    def test_response_compression_etag(self):
+        def resource_a(environ, unused_start_response):
+            ctx = environ[Context.ENVIRON_CTX]
+            return ctx.response(HTTPStatus.OK, 'application/json', [b'{"s":"' + b'A' * 100 + b'"}'], headers=[('ETag', '"v1"')])
+
+        def resource_b(environ, unused_start_response):
+            ctx = environ[Context.ENVIRON_CTX]
+            return ctx.response(HTTPStatus.OK, 'application/json', [b'{"s":"' + b'B' * 100 + b'"}'], headers=[('ETag', '"v1"')])
+
+        app = Application()
+        app.compression = ResponseCompression(min_bytes=10)
+        app.add_request(Request(resource_a, name='a'))
+        app.add_request(Request(resource_b, name='b'))
+
+        # Resources with the same ETag don't share compressed content
+        for _ in range(2):
+            for name, char in (('a', b'A'), ('b', b'B')):
+                status, headers, content = app.request('GET', f'/{name}', environ={'HTTP_ACCEPT_ENCODING': 'gzip'})
+                self.assertEqual(status, '200 OK')
+                self.assertIn(('Content-Encoding', 'gzip'), headers)
+                self.assertEqual(gzip.decompress(content), b'{"s":"' + char * 100 + b'"}')
+        self.assertEqual(len(app.compression.cache), 2)
+
+
+    def test_response_compression_not_accepted(self):
+        app = Application()
+        app.compression = ResponseCompression(min_bytes=10)
+        start_response = StartResponse()
+        ctx = Context(app, start_response=start_response)
+        response = ctx.response_text(HTTPStatus.OK, 'Hello, World!')
+        self.assertEqual(response, [b'Hello, World!'])
+        self.assertEqual(start_response.headers, [('Content-Type', 'text/plain; charset=utf-8'), ('Vary', 'Accept-Encoding')])
+
+
+    def test_response_compression_small(self):
+        app = Application()
+        app.compression = ResponseCompression(min_bytes=14)
+        start_response = StartResponse()
+        ctx = Context(app, environ={'HTTP_ACCEPT_ENCODING': 'gzip'}, start_response=start_response)
+        response = ctx.response_text(HTTPStatus.OK, 'Hello, World!')
+        self.assertEqual(response, [b'Hello, World!'])
+        self.assertEqual(start_response.headers, [('Content-Type', 'text/plain; charset=utf-8')])
+
+
+    def test_response_compression_not_compressible(self):
+        app = Application()
+        app.compression = ResponseCompression(min_bytes=1)
+        start_response = StartResponse()
+        ctx = Context(app, environ={'HTTP_ACCEPT_ENCODING': 'gzip'}, start_response=start_response)
+        response = ctx.response(HTTPStatus.OK, 'image/png', [b'PNG'])
+        self.assertEqual(response, [b'PNG'])
+        self.assertEqual(start_response.headers, [('Content-Type', 'image/png')])
+
+        # Already encoded
+        start_response = StartResponse()
+        ctx = Context(app, environ={'HTTP_ACCEPT_ENCODING': 'gzip'}, start_response=start_response)
+        response = ctx.response(HTTPStatus.OK, 'text/plain', [b'abc'], headers=[('Content-Encoding', 'br')])
+        self.assertEqual(response, [b'abc'])
+        self.assertEqual(start_response.headers, [('Content-Encoding', 'br'), ('Content-Type', 'text/plain')])
+
+        # Streaming (non-list) content is not compressed
+        start_response = StartResponse()
+        ctx = Context(app, environ={'HTTP_ACCEPT_ENCODING': 'gzip'}, start_response=start_response)
+        content = iter([b'abc'])
+        self.assertIs(ctx.response(HTTPStatus.OK, 'text/plain', content), content)
+        self.assertEqual(start_response.headers, [('Content-Type', 'text/plain')])
+
+
     def test_response_headers(self):
         app = Application()
         start_response = StartResponse()
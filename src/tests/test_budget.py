@@ -0,0 +1,72 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+# pylint: disable=missing-class-docstring, missing-function-docstring, missing-module-docstring
+
+import threading
+from unittest import TestCase
+
+from chisel.budget import ContentBudget
+
+
+class TestContentBudget(TestCase):
+
+    def test_acquire_release(self):
+        budget = ContentBudget(1000)
+        self.assertEqual(budget.retry_after, 1)
+        self.assertTrue(budget.acquire(400))
+        self.assertTrue(budget.acquire(600))
+        self.assertFalse(budget.acquire(1))
+        self.assertEqual(budget.used_bytes, 1000)
+        self.assertEqual(budget.peak_bytes, 1000)
+        self.assertEqual(budget.admitted, 2)
+        self.assertEqual(budget.waited, 0)
+
+        budget.release(400)
+        self.assertEqual(budget.used_bytes, 600)
+        self.assertTrue(budget.acquire(1))
+        budget.release(600)
+        budget.release(1)
+        self.assertEqual(budget.used_bytes, 0)
+        self.assertEqual(budget.peak_bytes, 1000)
+        self.assertEqual(budget.admitted, 3)
+
+    def test_acquire_too_large(self):
+        budget = ContentBudget(1000)
+        self.assertFalse(budget.acquire(1001, 10))
+        self.assertEqual(budget.used_bytes, 0)
+        self.assertEqual(budget.admitted, 0)
+
+    def test_acquire_wait(self):
+        budget = ContentBudget(1000)
+        self.assertTrue(budget.acquire(1000))
+
+        # Timeout
+        self.assertFalse(budget.acquire(500, 0.01))
+
+        # Release on another thread
+        waiting = threading.Event()
+        results = []
+
+        def acquire():
+            waiting.set()
+            results.append(budget.acquire(500, 10))
+
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        waiting.wait()
+        budget.release(1000)
+        thread.join()
+        self.assertEqual(results, [True])
+        self.assertEqual(budget.used_bytes, 500)
+        self.assertEqual(budget.admitted, 2)
+        self.assertEqual(budget.waited, 1)
+
+    def test_counts(self):
+        budget = ContentBudget(1000, retry_after=5)
+        self.assertEqual(budget.retry_after, 5)
+        budget.add_spooled()
+        budget.add_rejected()
+        budget.add_rejected()
+        self.assertEqual(budget.spooled, 1)
+        self.assertEqual(budget.rejected, 2)
@@ -0,0 +1,147 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+# pylint: disable=missing-class-docstring, missing-function-docstring, missing-module-docstring
+
+import asyncio
+import threading
+import time
+from unittest import TestCase
+
+from chisel.bulkhead import BULKHEAD_QUEUE_SECONDS, Bulkhead
+
+
+class TestBulkhead(TestCase):
+
+    def test_acquire_release(self):
+        bulkhead = Bulkhead(2, max_queue=0)
+        self.assertEqual(bulkhead.queue_timeout, BULKHEAD_QUEUE_SECONDS)
+        self.assertEqual(bulkhead.retry_after, 1)
+        self.assertTrue(bulkhead.acquire('a'))
+        self.assertTrue(bulkhead.acquire('b'))
+        self.assertFalse(bulkhead.acquire('a'))
+        self.assertEqual((bulkhead.active, bulkhead.peak_active), (2, 2))
+        bulkhead.release()
+        self.assertTrue(bulkhead.acquire())
+        bulkhead.release()
+        bulkhead.release()
+        self.assertEqual((bulkhead.active, bulkhead.peak_active), (0, 2))
+        self.assertEqual((bulkhead.metrics.admitted, bulkhead.metrics.rejected), (3, 1))
+        self.assertEqual(list(bulkhead.request_metrics), ['a', 'b', None])
+        self.assertEqual((bulkhead.request_metrics['a'].admitted, bulkhead.request_metrics['a'].rejected), (1, 1))
+        self.assertEqual((bulkhead.request_metrics['b'].admitted, bulkhead.request_metrics['b'].rejected), (1, 0))
+
+    def test_default_max_queue(self):
+        self.assertEqual(Bulkhead(3).max_queue, 3)
+
+    def test_queue(self):
+        bulkhead = Bulkhead(1, max_queue=2, queue_timeout=10)
+        self.assertTrue(bulkhead.acquire())
+
+        # Queue two requests - they are admitted in order
+        admitted = []
+
+        def acquire(name):
+            self.assertTrue(bulkhead.acquire(name))
+            admitted.append(name)
+
+        threads = []
+        for name in ('a', 'b'):
+            threads.append(threading.Thread(target=acquire, args=(name,)))
+            threads[-1].start()
+            while bulkhead.request_metrics.get(name) is None or bulkhead.request_metrics[name].queued != 1:
+                time.sleep(0.01)
+        self.assertEqual((bulkhead.metrics.queued, bulkhead.metrics.peak_queued), (2, 2))
+
+        # The queue is full
+        self.assertFalse(bulkhead.acquire('c'))
+
+        # Each release admits the next queued request
+        bulkhead.release()
+        threads[0].join()
+        self.assertEqual(admitted, ['a'])
+        bulkhead.release()
+        threads[1].join()
+        self.assertEqual(admitted, ['a', 'b'])
+        bulkhead.release()
+        self.assertEqual((bulkhead.active, bulkhead.peak_active), (0, 1))
+        metrics = bulkhead.metrics
+        self.assertEqual((metrics.admitted, metrics.waited, metrics.rejected, metrics.timed_out, metrics.queued), (3, 2, 1, 0, 0))
+        self.assertGreater(metrics.wait_seconds, 0)
+        self.assertGreaterEqual(metrics.wait_seconds, metrics.max_wait_seconds)
+
+    def test_queue_timeout(self):
+        bulkhead = Bulkhead(1, queue_timeout=0.01)
+        self.assertTrue(bulkhead.acquire())
+        self.assertFalse(bulkhead.acquire('a'))
+        self.assertEqual((bulkhead.metrics.timed_out, bulkhead.metrics.queued, bulkhead.metrics.peak_queued), (1, 0, 1))
+        self.assertEqual(bulkhead.request_metrics['a'].timed_out, 1)
+
+        # The timed out request isn't admitted on release
+        bulkhead.release()
+        self.assertEqual(bulkhead.active, 0)
+
+    def test_acquire_async(self):
+        bulkhead = Bulkhead(1, queue_timeout=10)
+
+        async def run():
+            self.assertTrue(await bulkhead.acquire_async('a'))
+
+            # Queue a request and release from another thread
+            task = asyncio.create_task(bulkhead.acquire_async('b'))
+            while 'b' not in bulkhead.request_metrics:
+                await asyncio.sleep(0.01)
+            self.assertFalse(await bulkhead.acquire_async('c'))
+            thread = threading.Thread(target=bulkhead.release)
+            thread.start()
+            self.assertTrue(await task)
+            thread.join()
+            bulkhead.release()
+
+        asyncio.run(run())
+        self.assertEqual(bulkhead.active, 0)
+        metrics = bulkhead.metrics
+        self.assertEqual((metrics.admitted, metrics.waited, metrics.rejected, metrics.queued), (2, 1, 1, 0))
+
+    def test_acquire_async_timeout(self):
+        bulkhead = Bulkhead(1, queue_timeout=0.01)
+
+        async def run():
+            self.assertTrue(await bulkhead.acquire_async())
+            self.assertFalse(await bulkhead.acquire_async())
+            bulkhead.release()
+
+        asyncio.run(run())
+        self.assertEqual(bulkhead.active, 0)
+        self.assertEqual((bulkhead.metrics.admitted, bulkhead.metrics.timed_out, bulkhead.metrics.queued), (1, 1, 0))
+
+    def test_acquire_async_cancel(self):
+        bulkhead = Bulkhead(1, queue_timeout=10)
+
+        async def run():
+            self.assertTrue(await bulkhead.acquire_async())
+
+            # Cancel a queued request
+            task = asyncio.create_task(bulkhead.acquire_async())
+            while bulkhead.metrics.queued != 1:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            self.assertEqual((bulkhead.active, bulkhead.metrics.queued), (1, 0))
+
+            # Cancel a queued request after its admission - it's either admitted or it releases its admission
+            task = asyncio.create_task(bulkhead.acquire_async())
+            while bulkhead.metrics.queued != 1:
+                await asyncio.sleep(0.01)
+            bulkhead.release()
+            task.cancel()
+            try:
+                if await task:
+                    bulkhead.release()
+            except asyncio.CancelledError:
+                pass
+
+        asyncio.run(run())
+        self.assertEqual(bulkhead.active, 0)
+        self.assertEqual((bulkhead.metrics.admitted, bulkhead.metrics.timed_out, bulkhead.metrics.queued), (2, 1, 0))
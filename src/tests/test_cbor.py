@@ -0,0 +1,157 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+# pylint: disable=missing-class-docstring, missing-function-docstring, missing-module-docstring
+
+from array import array
+from datetime import date, datetime, timezone
+from decimal import Decimal
+import math
+from unittest import TestCase
+from uuid import UUID
+
+from chisel.cbor import decode_cbor, encode_cbor
+
+
+class TestCBOR(TestCase):
+
+    # RFC 8949 Appendix A examples
+    def test_rfc_examples(self):
+        examples = [
+            (0, '00'),
+            (23, '17'),
+            (24, '1818'),
+            (1000, '1903e8'),
+            (1000000, '1a000f4240'),
+            (1000000000000, '1b000000e8d4a51000'),
+            (18446744073709551615, '1bffffffffffffffff'),
+            (18446744073709551616, 'c249010000000000000000'),
+            (-18446744073709551616, '3bffffffffffffffff'),
+            (-18446744073709551617, 'c349010000000000000000'),
+            (-1, '20'),
+            (-1000, '3903e7'),
+            (0.0, 'f90000'),
+            (-0.0, 'f98000'),
+            (1.1, 'fb3ff199999999999a'),
+            (1.5, 'f93e00'),
+            (65504.0, 'f97bff'),
+            (100000.0, 'fa47c35000'),
+            (3.4028234663852886e+38, 'fa7f7fffff'),
+            (1.0e+300, 'fb7e37e43c8800759c'),
+            (-4.0, 'f9c400'),
+            (float('inf'), 'f97c00'),
+            (float('-inf'), 'f9fc00'),
+            (False, 'f4'),
+            (True, 'f5'),
+            (None, 'f6'),
+            (b'', '40'),
+            (b'\x01\x02\x03\x04', '4401020304'),
+            ('', '60'),
+            ('IETF', '6449455446'),
+            ('ü', '62c3bc'),
+            ('\U00010151', '64f0908591'),
+            ([], '80'),
+            ([1, [2, 3], [4, 5]], '8301820203820405'),
+            (list(range(1, 26)), '98190102030405060708090a0b0c0d0e0f101112131415161718181819'),
+            ({}, 'a0'),
+            ({1: 2, 3: 4}, 'a201020304'),
+            ({'a': 1, 'b': [2, 3]}, 'a26161016162820203'),
+            (['a', {'b': 'c'}], '826161a161626163')
+        ]
+        for value, value_hex in examples:
+            self.assertEqual(encode_cbor(value).hex(), value_hex)
+            value_decoded = decode_cbor(bytes.fromhex(value_hex))
+            self.assertEqual(value_decoded, value)
+            self.assertIs(type(value_decoded), type(value))
+
+    def test_nan(self):
+        self.assertEqual(encode_cbor(float('nan')).hex(), 'f97e00')
+        self.assertTrue(math.isnan(decode_cbor(bytes.fromhex('f97e00'))))
+        self.assertTrue(math.isnan(decode_cbor(bytes.fromhex('fa7fc00000'))))
+        self.assertTrue(math.isnan(decode_cbor(bytes.fromhex('fb7ff8000000000000'))))
+
+    def test_tags(self):
+        value = {
+            'datetime': datetime(2013, 3, 21, 20, 4, tzinfo=timezone.utc),
+            'date': date(2013, 3, 21),
+            'uuid': UUID('f2b2a2e1-6a56-4bbf-9b1b-b4c6a9d0b0a3')
+        }
+        value_cbor = encode_cbor(value)
+        self.assertEqual(
+            value_cbor.hex(),
+            'a3686461746574696d65c07819323031332d30332d32315432303a30343a30302b30303a30306464617465d903ec6a3230'
+            '31332d30332d32316475756964d82550f2b2a2e16a564bbf9b1bb4c6a9d0b0a3'
+        )
+        self.assertEqual(decode_cbor(value_cbor), value)
+
+        # Naive datetime is assumed to be UTC
+        self.assertEqual(
+            decode_cbor(encode_cbor(datetime(2013, 3, 21, 20, 4))),
+            datetime(2013, 3, 21, 20, 4, tzinfo=timezone.utc)
+        )
+
+        # RFC 8949 examples
+        self.assertEqual(
+            decode_cbor(bytes.fromhex('c074323031332d30332d32315432303a30343a30305a')),
+            datetime(2013, 3, 21, 20, 4, tzinfo=timezone.utc)
+        )
+        self.assertEqual(decode_cbor(bytes.fromhex('c11a514b67b0')), datetime(2013, 3, 21, 20, 4, tzinfo=timezone.utc))
+        self.assertEqual(decode_cbor(bytes.fromhex('c1fb41d452d9ec200000')), datetime(2013, 3, 21, 20, 4, 0, 500000, tzinfo=timezone.utc))
+        self.assertEqual(decode_cbor(bytes.fromhex('d818456449455446')), b'dIETF')
+
+        # RFC 8943 epoch date
+        self.assertEqual(decode_cbor(bytes.fromhex('d8641945da')), date(2018, 12, 17))
+
+        # Invalid tag value
+        with self.assertRaises(ValueError) as cm_exc:
+            decode_cbor(bytes.fromhex('d903ec63616263'))
+        self.assertEqual(str(cm_exc.exception), 'Invalid CBOR tag 1004 value')
+
+    def test_encode_other(self):
+        self.assertEqual(encode_cbor((1, 2)).hex(), '820102')
+        self.assertEqual(encode_cbor(bytearray(b'ab')).hex(), '426162')
+        self.assertEqual(encode_cbor(Decimal('1.5')).hex(), 'f93e00')
+        self.assertEqual(encode_cbor(array('i', [1, 2])).hex(), '820102')
+        self.assertEqual(encode_cbor(memoryview(array('d', [1.5]))).hex(), '81f93e00')
+
+    def test_encode_error(self):
+        with self.assertRaises(ValueError) as cm_exc:
+            encode_cbor({'a': object()})
+        self.assertEqual(str(cm_exc.exception), 'Object of type object is not CBOR serializable')
+
+        value = [1]
+        value.append(value)
+        with self.assertRaises(ValueError) as cm_exc:
+            encode_cbor(value)
+        self.assertEqual(str(cm_exc.exception), 'Circular reference detected')
+
+        # Repeated, non-circular references are OK
+        value = [1]
+        self.assertEqual(encode_cbor([value, value]).hex(), '8281018101')
+
+    def test_decode_indefinite(self):
+        self.assertEqual(decode_cbor(bytes.fromhex('5f42010243030405ff')), b'\x01\x02\x03\x04\x05')
+        self.assertEqual(decode_cbor(bytes.fromhex('7f657374726561646d696e67ff')), 'streaming')
+        self.assertEqual(decode_cbor(bytes.fromhex('9f018202039f0405ffff')), [1, [2, 3], [4, 5]])
+        self.assertEqual(decode_cbor(bytes.fromhex('bf61610161629f0203ffff')), {'a': 1, 'b': [2, 3]})
+        self.assertEqual(decode_cbor(bytes.fromhex('f7')), None)
+
+    def test_decode_error(self):
+        errors = [
+            ('', 'Unexpected end of CBOR data'),
+            ('18', 'Unexpected end of CBOR data'),
+            ('6261', 'Unexpected end of CBOR data'),
+            ('f9', 'Unexpected end of CBOR data'),
+            ('ff', 'Unexpected CBOR break'),
+            ('f820', 'Unsupported CBOR simple value 32'),
+            ('1c', 'Invalid CBOR additional information 28'),
+            ('5f6161ff', 'Invalid CBOR indefinite-length string chunk'),
+            ('62c328', 'Invalid CBOR text string'),
+            ('a1808001', 'Invalid CBOR map key'),
+            ('0101', 'Extra data after CBOR value'),
+            ('81' * 100000 + '01', 'CBOR data nested too deeply')
+        ]
+        for value_hex, message in errors:
+            with self.assertRaises(ValueError) as cm_exc:
+                decode_cbor(bytes.fromhex(value_hex))
+            self.assertEqual(str(cm_exc.exception), message)
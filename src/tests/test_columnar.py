@@ -0,0 +1,131 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+# pylint: disable=missing-class-docstring, missing-function-docstring, missing-module-docstring
+
+from unittest import TestCase
+
+from schema_markdown import parse_schema_markdown
+
+from chisel.columnar import decode_columnar, encode_columnar
+
+
+TEST_TYPES = parse_schema_markdown('''\
+struct Row
+    int a
+    optional string(nullable) b
+    optional Row[] children
+    optional Point{} points
+
+struct Point
+    float x
+    float y
+
+typedef Row[len > 0] Rows
+
+typedef Row(nullable) NullableRow
+
+union MyUnion
+    int a
+    string b
+
+struct Empty
+
+struct MyStruct
+    Row[] rows
+    optional Rows rows2
+    optional Row(nullable)[] rows3
+    optional NullableRow[] rows4
+    optional MyUnion[] unions
+    optional Empty[] empties
+    optional int[] ints
+    optional Point other
+''')
+
+
+class TestColumnar(TestCase):
+
+    def test_encode(self):
+        value = {'rows': [{'a': 1, 'b': 'x'}, {'a': 2, 'b': None}, {'a': 3}]}
+        value_columnar = encode_columnar(TEST_TYPES, 'MyStruct', value)
+        self.assertEqual(value_columnar, {
+            'rows': {
+                'columns': ['a', 'b', 'children', 'points'],
+                'data': {'a': [1, 2, 3], 'b': ['x', None, None], 'children': [None, None, None], 'points': [None, None, None]},
+                'absent': {'b': [2], 'children': [0, 1, 2], 'points': [0, 1, 2]}
+            }
+        })
+        self.assertEqual(decode_columnar(TEST_TYPES, 'MyStruct', value_columnar), value)
+
+        # The value is not modified
+        self.assertEqual(value, {'rows': [{'a': 1, 'b': 'x'}, {'a': 2, 'b': None}, {'a': 3}]})
+
+    def test_encode_no_absent(self):
+        value = {'rows': [{'a': 1, 'b': 'x', 'children': [], 'points': {}}]}
+        value_columnar = encode_columnar(TEST_TYPES, 'MyStruct', value)
+        self.assertEqual(value_columnar, {
+            'rows': {
+                'columns': ['a', 'b', 'children', 'points'],
+                'data': {'a': [1], 'b': ['x'], 'children': [{'columns': ['a', 'b', 'children', 'points'], 'data': {
+                    'a': [], 'b': [], 'children': [], 'points': []
+                }}], 'points': [{}]}
+            }
+        })
+        self.assertEqual(decode_columnar(TEST_TYPES, 'MyStruct', value_columnar), value)
+
+    def test_encode_nested(self):
+        value = {
+            'rows': [{'a': 1, 'children': [{'a': 2}, {'a': 3}], 'points': {'p': {'x': 1.5, 'y': 2.5}}}],
+            'rows2': [{'a': 4}],
+            'other': {'x': 1.0, 'y': 2.0}
+        }
+        value_columnar = encode_columnar(TEST_TYPES, 'MyStruct', value)
+        self.assertEqual(value_columnar['rows']['data']['children'], [{
+            'columns': ['a', 'b', 'children', 'points'],
+            'data': {'a': [2, 3], 'b': [None, None], 'children': [None, None], 'points': [None, None]},
+            'absent': {'b': [0, 1], 'children': [0, 1], 'points': [0, 1]}
+        }])
+        self.assertEqual(value_columnar['rows']['data']['points'], [{'p': {'x': 1.5, 'y': 2.5}}])
+        self.assertEqual(value_columnar['rows2']['data']['a'], [4])
+        self.assertEqual(value_columnar['other'], {'x': 1.0, 'y': 2.0})
+        self.assertEqual(decode_columnar(TEST_TYPES, 'MyStruct', value_columnar), value)
+
+    def test_encode_not_columnar(self):
+        value = {
+            'rows': [],
+            'rows3': [{'a': 1}],
+            'rows4': [{'a': 2}, None],
+            'unions': [{'a': 1}, {'b': 'x'}],
+            'empties': [{}],
+            'ints': [1, 2, 3]
+        }
+        value_columnar = encode_columnar(TEST_TYPES, 'MyStruct', value)
+        self.assertEqual(value_columnar, {
+            'rows': {
+                'columns': ['a', 'b', 'children', 'points'],
+                'data': {'a': [], 'b': [], 'children': [], 'points': []}
+            },
+            'rows3': [{'a': 1}],
+            'rows4': [{'a': 2}, None],
+            'unions': [{'a': 1}, {'b': 'x'}],
+            'empties': [{}],
+            'ints': [1, 2, 3]
+        })
+        self.assertEqual(decode_columnar(TEST_TYPES, 'MyStruct', value_columnar), value)
+
+    def test_encode_none(self):
+        self.assertIsNone(encode_columnar(TEST_TYPES, 'MyStruct', None))
+        self.assertIsNone(decode_columnar(TEST_TYPES, 'MyStruct', None))
+
+    def test_decode_invalid(self):
+        with self.assertRaises(ValueError) as cm_exc:
+            decode_columnar(TEST_TYPES, 'MyStruct', {'rows': [{'a': 1}]})
+        self.assertEqual(str(cm_exc.exception), 'Invalid columnar value')
+
+        with self.assertRaises(ValueError) as cm_exc:
+            decode_columnar(TEST_TYPES, 'MyStruct', {'rows': {'columns': ['a', 'c'], 'data': {'a': [1], 'c': [2]}}})
+        self.assertEqual(str(cm_exc.exception), "Invalid columnar column 'c'")
+
+        with self.assertRaises(ValueError) as cm_exc:
+            decode_columnar(TEST_TYPES, 'MyStruct', {'rows': {'columns': ['a', 'b'], 'data': {'a': [1], 'b': [2, 3]}}})
+        self.assertEqual(str(cm_exc.exception), "Invalid columnar column 'b'")
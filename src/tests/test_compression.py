@@ -0,0 +1,244 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+# pylint: disable=missing-class-docstring, missing-function-docstring, missing-module-docstring
+
+import gzip
+from io import BytesIO
+from unittest import TestCase, skipIf
+import unittest.mock
+
+from schema_markdown import parse_schema_markdown
+
+from chisel.compression import CompressionCache, CompressionMetrics, DecompressionLimitError, ResponseCompression, ResponseSamples, \
+    ZstdDictionary, _type_model_sample, decode_response_content, decompress_stream, get_content_encodings, get_encoded_etag, \
+    train_zstd_dictionary, zstd
+
+
+class TestDecompressStream(TestCase):
+
+    def test_gzip(self):
+        content = b'{"a": 1}' * 1000
+        content_gzip = gzip.compress(content)
+        self.assertEqual(decompress_stream(BytesIO(content_gzip), 'gzip', 8000), (content, len(content_gzip)))
+        self.assertEqual(decompress_stream(BytesIO(content_gzip), 'x-gzip', 8000, chunk_size=7), (content, len(content_gzip)))
+
+    def test_gzip_members(self):
+        content_gzip = gzip.compress(b'Hello, ') + gzip.compress(b'World!')
+        self.assertEqual(decompress_stream(BytesIO(content_gzip), 'gzip', 100), (b'Hello, World!', len(content_gzip)))
+        self.assertEqual(decompress_stream(BytesIO(content_gzip), 'gzip', 100, chunk_size=3), (b'Hello, World!', len(content_gzip)))
+
+    def test_empty(self):
+        self.assertEqual(decompress_stream(BytesIO(b''), 'gzip', 100), (b'', 0))
+
+    def test_limit(self):
+        content_gzip = gzip.compress(b'0' * 1000001)
+
+        # The limit is exceeded before the entire stream is read
+        stream = BytesIO(content_gzip)
+        with self.assertRaises(DecompressionLimitError) as cm_exc:
+            decompress_stream(stream, 'gzip', 1000000, chunk_size=10)
+        self.assertEqual(str(cm_exc.exception), 'Decompressed content exceeds 1000000 bytes')
+        self.assertLess(stream.tell(), len(content_gzip))
+
+        # Exactly the limit
+        self.assertEqual(len(decompress_stream(BytesIO(content_gzip), 'gzip', 1000001)[0]), 1000001)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError) as cm_exc:
+            decompress_stream(BytesIO(b'bogus'), 'gzip', 100)
+        self.assertTrue(str(cm_exc.exception).startswith('Invalid gzip content: '))
+
+        with self.assertRaises(ValueError) as cm_exc:
+            decompress_stream(BytesIO(gzip.compress(b'Hello')[:-4]), 'gzip', 100)
+        self.assertEqual(str(cm_exc.exception), 'Invalid gzip content: truncated')
+
+        with self.assertRaises(ValueError) as cm_exc:
+            decompress_stream(BytesIO(b'bogus'), 'br', 100)
+        self.assertEqual(str(cm_exc.exception), "Unsupported content encoding 'br'")
+
+    @skipIf(zstd is None, 'compression.zstd not available')
+    def test_zstd(self): # pragma: no cover
+        content = b'{"a": 1}' * 1000
+        content_zstd = zstd.compress(content)
+        self.assertIn('zstd', get_content_encodings())
+        self.assertEqual(decompress_stream(BytesIO(content_zstd), 'zstd', 8000, chunk_size=7), (content, len(content_zstd)))
+        with self.assertRaises(DecompressionLimitError):
+            decompress_stream(BytesIO(content_zstd), 'zstd', 7999)
+
+
+class TestCompressionMetrics(TestCase):
+
+    def test_metrics(self):
+        metrics = CompressionMetrics()
+        self.assertEqual(metrics.count, 0)
+        self.assertIsNone(metrics.ratio)
+        metrics.add(10, 100)
+        metrics.add(30, 100)
+        self.assertEqual(metrics.count, 2)
+        self.assertEqual(metrics.compressed_bytes, 40)
+        self.assertEqual(metrics.uncompressed_bytes, 200)
+        self.assertEqual(metrics.ratio, 5)
+
+
+class TestResponseCompression(TestCase):
+
+    def test_negotiate(self):
+        compression = ResponseCompression()
+        self.assertIsNone(compression.negotiate(None))
+        self.assertIsNone(compression.negotiate(''))
+        self.assertIsNone(compression.negotiate('br'))
+        self.assertIsNone(compression.negotiate('gzip;q=0'))
+        self.assertIsNone(compression.negotiate('gzip;q=bogus'))
+        self.assertIsNone(compression.negotiate('*;q=0'))
+        self.assertEqual(compression.negotiate('gzip'), 'gzip')
+        self.assertEqual(compression.negotiate('deflate, GZIP;q=0.5'), 'gzip')
+        self.assertEqual(compression.negotiate('zstd;q=0.5, gzip'), 'gzip')
+        self.assertEqual(compression.negotiate('*'), 'zstd' if zstd is not None else 'gzip')
+        self.assertEqual(compression.negotiate('gzip, zstd'), 'zstd' if zstd is not None else 'gzip')
+        self.assertIsNone(ResponseCompression.negotiate('zstd;q=0'))
+        self.assertEqual(ResponseCompression.negotiate('gzip'), 'gzip')
+
+    def test_is_compressible(self):
+        self.assertTrue(ResponseCompression.is_compressible('application/json'))
+        self.assertTrue(ResponseCompression.is_compressible('text/html; charset=utf-8'))
+        self.assertTrue(ResponseCompression.is_compressible('application/json-patch+json'))
+        self.assertTrue(ResponseCompression.is_compressible('text/javascript; charset=utf-8'))
+        self.assertTrue(ResponseCompression.is_compressible('image/svg+xml; charset=utf-8'))
+        self.assertTrue(ResponseCompression.is_compressible('application/cbor'))
+        self.assertFalse(ResponseCompression.is_compressible('image/png'))
+        self.assertFalse(ResponseCompression.is_compressible('application/gzip'))
+        self.assertFalse(ResponseCompression.is_compressible('application/octet-stream; name=json'))
+
+    def test_compress(self):
+        compression = ResponseCompression(gzip_level=9)
+        content = b'Hello, World! ' * 100
+        content_gzip = compression.compress(content, 'gzip')
+        self.assertEqual(gzip.decompress(content_gzip), content)
+        self.assertEqual(content_gzip, gzip.compress(content, compresslevel=9, mtime=0))
+        self.assertEqual(len(compression.cache), 0)
+        self.assertEqual(compression.metrics.count, 1)
+        self.assertEqual(compression.metrics.uncompressed_bytes, len(content))
+        self.assertEqual(compression.metrics.compressed_bytes, len(content_gzip))
+
+    def test_compress_cache(self):
+        compression = ResponseCompression()
+        content = b'Hello, World! ' * 100
+        content_gzip = compression.compress(content, 'gzip', '"1234"')
+        self.assertEqual(len(compression.cache), 1)
+        self.assertIs(compression.compress(content, 'gzip', '"1234"'), content_gzip)
+        self.assertEqual(compression.metrics.count, 1)
+
+        # Different content with the same ETag is cached separately
+        content2 = b'Goodbye, World! ' * 100
+        content2_gzip = compression.compress(content2, 'gzip', '"1234"')
+        self.assertEqual(gzip.decompress(content2_gzip), content2)
+        self.assertEqual(len(compression.cache), 2)
+        self.assertEqual(compression.metrics.count, 2)
+
+    def test_compress_backoff(self):
+        compression = ResponseCompression(backoff_load=0.5)
+        content = b'Hello, World! ' * 100
+        with unittest.mock.patch('os.getloadavg', return_value=(100.0, 0.0, 0.0)) as mock_getloadavg, \
+             unittest.mock.patch('time.monotonic', side_effect=[10.0, 10.5, 11.0]):
+            self.assertEqual(compression.compress(content, 'gzip'), gzip.compress(content, compresslevel=1, mtime=0))
+            mock_getloadavg.return_value = (0.0, 0.0, 0.0)
+            self.assertEqual(compression.compress(content, 'gzip'), gzip.compress(content, compresslevel=1, mtime=0))
+            self.assertEqual(compression.compress(content, 'gzip'), gzip.compress(content, compresslevel=6, mtime=0))
+        self.assertEqual(mock_getloadavg.call_count, 2)
+
+    def test_get_encoded_etag(self):
+        self.assertEqual(get_encoded_etag('"abc"', 'gzip'), '"abc-gzip"')
+        self.assertEqual(get_encoded_etag('W/"abc"', 'zstd'), 'W/"abc-zstd"')
+        self.assertEqual(get_encoded_etag('abc', 'gzip'), 'abc-gzip')
+
+
+class TestCompressionCache(TestCase):
+
+    def test_cache(self):
+        cache = CompressionCache(10)
+        cache.add('a', b'aaaa')
+        cache.add('b', b'bbbb')
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.size, 8)
+        self.assertEqual(cache.get('a'), b'aaaa')
+        cache.add('c', b'cccc')
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'aaaa')
+        self.assertEqual(cache.get('c'), b'cccc')
+
+        # Content larger than the size limit is not cached
+        cache.add('d', b'd' * 11)
+        self.assertIsNone(cache.get('d'))
+        self.assertEqual(cache.size, 8)
+
+
+class TestResponseSamples(TestCase):
+
+    def test_samples(self):
+        samples = ResponseSamples(3)
+        for ix_sample in range(3):
+            samples.add(f'{ix_sample}'.encode())
+        self.assertEqual(samples.count, 3)
+        self.assertEqual(samples.samples, [b'0', b'1', b'2'])
+
+        # Samples are replaced at random once full
+        with unittest.mock.patch('random.randrange', side_effect=[1, 5]):
+            samples.add(b'3')
+            samples.add(b'4')
+        self.assertEqual(samples.count, 5)
+        self.assertEqual(samples.samples, [b'0', b'3', b'2'])
+
+
+class TestZstdDictionary(TestCase):
+
+    def test_type_model_sample(self):
+        types = parse_schema_markdown('''\
+struct Row
+    int a
+    optional string b
+    Color color
+    Row[] children
+    date{} dates
+
+enum Color
+    Red
+    Blue
+
+enum Empty
+
+typedef Row[] Rows
+''')
+        self.assertEqual(_type_model_sample(types, {'user': 'Rows'}, set()), [
+            {'a': 0, 'b': '', 'color': 'Red', 'children': [None], 'dates': {'': '2000-01-01'}}
+        ])
+        self.assertIsNone(_type_model_sample(types, {'user': 'Empty'}, set()))
+        self.assertIsNone(_type_model_sample(types, {'user': 'Unknown'}, set()))
+
+    def test_decode_response_content(self):
+        content = b'{"a": 1}'
+        self.assertEqual(decode_response_content([], content), content)
+        self.assertEqual(decode_response_content([('Content-Encoding', 'identity')], content), content)
+        self.assertEqual(decode_response_content([('content-encoding', 'gzip')], gzip.compress(content)), content)
+        with self.assertRaises(ValueError) as cm_exc:
+            decode_response_content([('Content-Encoding', 'br')], content)
+        self.assertEqual(str(cm_exc.exception), "Unsupported content encoding 'br'")
+
+    @skipIf(zstd is None, 'compression.zstd not available')
+    def test_dictionary(self): # pragma: no cover
+        samples = [f'{{"id":{ix},"name":"name{ix}","value":{ix * 7},"tags":["t{ix % 5}"]}}'.encode() for ix in range(500)]
+        types = parse_schema_markdown('''\
+struct Item
+    int id
+    string name
+    int value
+    string[] tags
+''')
+        dictionary = ZstdDictionary(train_zstd_dictionary(samples, 1024, types, 'Item'))
+        content = b'{"id":1000,"name":"name1000","value":7000,"tags":["t0"]}'
+        content_zstd = dictionary.compress(content)
+        self.assertLess(len(content_zstd), len(zstd.compress(content)))
+        self.assertEqual(dictionary.decompress(content_zstd), content)
+        headers = [('Content-Encoding', 'zstd'), ('Chisel-Zstd-Dictionary', dictionary.dict_id)]
+        self.assertEqual(decode_response_content(headers, content_zstd, {dictionary.dict_id: dictionary}), content)
@@ -0,0 +1,104 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+# pylint: disable=missing-class-docstring, missing-function-docstring, missing-module-docstring
+
+import asyncio
+import time
+from unittest import TestCase
+
+from chisel.deadline import DEADLINE_ENVIRON, DeadlineExceeded, get_deadline, wait_deadline
+
+
+class TestDeadline(TestCase):
+
+    def test_get_deadline(self):
+        self.assertIsNone(get_deadline({}))
+        self.assertEqual(get_deadline({}, timeout=5, now=100), 105)
+        self.assertEqual(get_deadline({'HTTP_X_REQUEST_TIMEOUT': '2.5'}, now=100), 102.5)
+        self.assertEqual(get_deadline({'HTTP_X_REQUEST_TIMEOUT': ' 2.5 '}, timeout=5, now=100), 102.5)
+        self.assertEqual(get_deadline({'HTTP_X_REQUEST_TIMEOUT': '10'}, timeout=5, now=100), 105)
+        self.assertEqual(get_deadline({'HTTP_X_REQUEST_TIMEOUT': '-1'}, timeout=5, now=100), 100)
+
+        # Invalid and non-finite headers are ignored
+        for header in ('invalid', 'nan', 'inf', '-inf'):
+            with self.subTest(header=header):
+                self.assertIsNone(get_deadline({'HTTP_X_REQUEST_TIMEOUT': header}, now=100))
+                self.assertEqual(get_deadline({'HTTP_X_REQUEST_TIMEOUT': header}, timeout=5, now=100), 105)
+
+        # Inherited in-process deadline
+        self.assertEqual(get_deadline({DEADLINE_ENVIRON: 103}), 103)
+        self.assertEqual(get_deadline({DEADLINE_ENVIRON: 103}, timeout=5, now=100), 103)
+        self.assertEqual(get_deadline({DEADLINE_ENVIRON: 103}, timeout=1, now=100), 101)
+        self.assertEqual(get_deadline({DEADLINE_ENVIRON: 103, 'HTTP_X_REQUEST_TIMEOUT': '2'}, timeout=5, now=100), 102)
+
+        # Current time
+        deadline = get_deadline({}, timeout=5)
+        self.assertLessEqual(deadline, time.monotonic() + 5)
+        self.assertGreater(deadline, time.monotonic() + 4)
+
+    def test_wait_deadline(self):
+        async def add(a, b):
+            await asyncio.sleep(0)
+            return a + b
+
+        async def run():
+            return await wait_deadline(add(1, 2), time.monotonic() + 10)
+
+        self.assertEqual(asyncio.run(run()), 3)
+
+    def test_wait_deadline_exceeded(self):
+        cancelled = []
+
+        async def sleep():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def run():
+            start_time = time.monotonic()
+            with self.assertRaises(DeadlineExceeded):
+                await wait_deadline(sleep(), start_time + 0.01)
+            self.assertLess(time.monotonic() - start_time, 5)
+            await asyncio.sleep(0)
+
+            # Passed deadline
+            with self.assertRaises(DeadlineExceeded):
+                await wait_deadline(sleep(), start_time)
+            await asyncio.sleep(0)
+
+        asyncio.run(run())
+        self.assertEqual(cancelled, [True, True])
+
+    def test_wait_deadline_exception(self):
+        async def fail():
+            raise ValueError('BOOM')
+
+        async def run():
+            with self.assertRaises(ValueError):
+                await wait_deadline(fail(), time.monotonic() + 10)
+
+        asyncio.run(run())
+
+    def test_wait_deadline_cancelled(self):
+        cancelled = []
+
+        async def sleep():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def run():
+            task = asyncio.create_task(wait_deadline(sleep(), time.monotonic() + 10))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0)
+
+        asyncio.run(run())
+        self.assertEqual(cancelled, [True])
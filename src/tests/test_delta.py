@@ -0,0 +1,126 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+# pylint: disable=missing-class-docstring, missing-function-docstring, missing-module-docstring
+
+from unittest import TestCase
+
+from chisel.delta import DeltaVersions, apply_json_patch, json_patch
+
+
+class TestJSONPatch(TestCase):
+
+    def test_json_patch(self):
+        source = {'a': [1, 2, 3], 'b': {'c': 'x', 'd/e': 1, 'f~g': True}, 'h': 1}
+        target = {'a': [1, 5], 'b': {'c': 'y', 'd/e': 1, 'f~g': 1}, 'i': [{'j': None}]}
+        patch = json_patch(source, target)
+        self.assertEqual(patch, [
+            {'op': 'remove', 'path': '/h'},
+            {'op': 'replace', 'path': '/a/1', 'value': 5},
+            {'op': 'remove', 'path': '/a/2'},
+            {'op': 'replace', 'path': '/b/c', 'value': 'y'},
+            {'op': 'replace', 'path': '/b/f~0g', 'value': 1},
+            {'op': 'add', 'path': '/i', 'value': [{'j': None}]}
+        ])
+        self.assertEqual(apply_json_patch(source, patch), target)
+
+        # The source is not modified
+        self.assertEqual(source, {'a': [1, 2, 3], 'b': {'c': 'x', 'd/e': 1, 'f~g': True}, 'h': 1})
+
+    def test_json_patch_array_grow_shrink(self):
+        self.assertEqual(json_patch([1], [1, 2, 3]), [
+            {'op': 'add', 'path': '/-', 'value': 2},
+            {'op': 'add', 'path': '/-', 'value': 3}
+        ])
+        self.assertEqual(json_patch([1, 2, 3], [1]), [
+            {'op': 'remove', 'path': '/2'},
+            {'op': 'remove', 'path': '/1'}
+        ])
+        self.assertEqual(apply_json_patch([1, 2, 3], json_patch([1, 2, 3], [1])), [1])
+
+    def test_json_patch_equal(self):
+        self.assertEqual(json_patch({'a': [1, {'b': 2.5}]}, {'a': [1, {'b': 2.5}]}), [])
+
+    def test_json_patch_root(self):
+        self.assertEqual(json_patch({'a': 1}, [1]), [{'op': 'replace', 'path': '', 'value': [1]}])
+        self.assertEqual(json_patch(1, 1.0), [{'op': 'replace', 'path': '', 'value': 1.0}])
+        self.assertEqual(apply_json_patch({'a': 1}, [{'op': 'replace', 'path': '', 'value': [1]}]), [1])
+
+    def test_apply_json_patch(self):
+        # RFC 6902 appendix examples
+        self.assertEqual(
+            apply_json_patch({'foo': ['bar', 'baz']}, [{'op': 'add', 'path': '/foo/1', 'value': 'qux'}]),
+            {'foo': ['bar', 'qux', 'baz']}
+        )
+        self.assertEqual(
+            apply_json_patch({'foo': {'bar': 'baz', 'waldo': 'fred'}, 'qux': {'corge': 'grault'}},
+                             [{'op': 'move', 'from': '/foo/waldo', 'path': '/qux/thud'}]),
+            {'foo': {'bar': 'baz'}, 'qux': {'corge': 'grault', 'thud': 'fred'}}
+        )
+        self.assertEqual(
+            apply_json_patch({'foo': ['all', 'grass', 'cows', 'eat']}, [{'op': 'move', 'from': '/foo/1', 'path': '/foo/3'}]),
+            {'foo': ['all', 'cows', 'eat', 'grass']}
+        )
+        self.assertEqual(
+            apply_json_patch({'baz': 'qux', 'foo': 'bar'}, [{'op': 'copy', 'from': '/foo', 'path': '/qux'}]),
+            {'baz': 'qux', 'foo': 'bar', 'qux': 'bar'}
+        )
+        self.assertEqual(
+            apply_json_patch({'baz': 'qux'}, [{'op': 'test', 'path': '/baz', 'value': 'qux'}]),
+            {'baz': 'qux'}
+        )
+
+    def test_apply_json_patch_error(self):
+        errors = [
+            ({'baz': 'qux'}, {'op': 'test', 'path': '/baz', 'value': 'bar'}, "JSON Patch test failed for path '/baz'"),
+            ({}, {'op': 'bogus', 'path': ''}, "Unknown JSON Patch operation 'bogus'"),
+            ({}, {'op': 'remove', 'path': '/a'}, "Invalid JSON Patch operation {'op': 'remove', 'path': '/a'}"),
+            ({}, {'op': 'add', 'path': 'a', 'value': 1}, "Invalid JSON Pointer 'a'"),
+            ([], {'op': 'add', 'path': '/01', 'value': 1}, "Invalid JSON Pointer array index '01'"),
+            ([], {'op': 'add', 'path': '/1', 'value': 1}, 'JSON Pointer array index 1 out of range'),
+            ([1], {'op': 'remove', 'path': '/1'}, 'JSON Pointer array index 1 out of range'),
+            ({'a': 1}, {'op': 'add', 'path': '/a/b', 'value': 1}, "Invalid JSON Pointer token 'b'")
+        ]
+        for document, operation, message in errors:
+            with self.assertRaises(ValueError) as cm_exc:
+                apply_json_patch(document, [operation])
+            self.assertEqual(str(cm_exc.exception), message)
+
+
+class TestDeltaVersions(TestCase):
+
+    def test_add_get(self):
+        versions = DeltaVersions(2, 100)
+        versions.add('"a"', b'aaa')
+        versions.add('"b"', b'bbb')
+        self.assertEqual(len(versions), 2)
+        self.assertEqual(versions.size, 6)
+        self.assertEqual(versions.get('"a"'), b'aaa')
+
+        # Least recently used versions are evicted
+        versions.add('"c"', b'ccc')
+        self.assertEqual(len(versions), 2)
+        self.assertEqual(versions.size, 6)
+        self.assertIsNone(versions.get('"b"'))
+        self.assertEqual(versions.get('"a"'), b'aaa')
+        self.assertEqual(versions.get('"c"'), b'ccc')
+
+        # Re-adding a version refreshes it
+        versions.add('"a"', b'aaa')
+        versions.add('"d"', b'ddd')
+        self.assertEqual(versions.get('"a"'), b'aaa')
+        self.assertIsNone(versions.get('"c"'))
+
+    def test_max_bytes(self):
+        versions = DeltaVersions(10, 10)
+        versions.add('"a"', b'aaaa')
+        versions.add('"b"', b'bbbb')
+        versions.add('"c"', b'cccc')
+        self.assertEqual(len(versions), 2)
+        self.assertEqual(versions.size, 8)
+        self.assertIsNone(versions.get('"a"'))
+
+        # Content larger than the size limit is not retained
+        versions.add('"d"', b'd' * 11)
+        self.assertEqual(len(versions), 2)
+        self.assertIsNone(versions.get('"d"'))
@@ -0,0 +1,135 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+# pylint: disable=missing-class-docstring, missing-function-docstring, missing-module-docstring
+
+import asyncio
+import concurrent.futures
+import threading
+from unittest import TestCase
+
+from chisel.eventloop import BlockingCall, EventLoopThread, run_steps, run_steps_async
+
+
+class TestEventLoopThread(TestCase):
+
+    def test_run(self):
+        event_loop = EventLoopThread()
+        try:
+            async def get_thread_name():
+                await asyncio.sleep(0)
+                return threading.current_thread().name
+
+            self.assertEqual(event_loop.run(get_thread_name()), 'chisel-event-loop')
+
+            # Same loop
+            loop = event_loop.loop
+            self.assertEqual(event_loop.run(get_thread_name()), 'chisel-event-loop')
+            self.assertIs(event_loop.loop, loop)
+
+            # Future awaitable
+            future = asyncio.run_coroutine_threadsafe(get_thread_name(), loop)
+            self.assertEqual(event_loop.run(asyncio.wrap_future(future, loop=loop)), 'chisel-event-loop')
+        finally:
+            event_loop.close()
+
+    def test_run_error(self):
+        event_loop = EventLoopThread()
+        try:
+            async def raise_error():
+                raise ValueError('BAD')
+
+            with self.assertRaises(ValueError) as cm_exc:
+                event_loop.run(raise_error())
+            self.assertEqual(str(cm_exc.exception), 'BAD')
+        finally:
+            event_loop.close()
+
+    def test_iterate(self):
+        event_loop = EventLoopThread()
+        try:
+            async def values():
+                for value in range(3):
+                    await asyncio.sleep(0)
+                    yield value
+
+            self.assertEqual(list(event_loop.iterate(values())), [0, 1, 2])
+        finally:
+            event_loop.close()
+
+    def test_iterate_close(self):
+        event_loop = EventLoopThread()
+        try:
+            closed = []
+
+            async def values():
+                try:
+                    for value in range(3):
+                        yield value
+                finally:
+                    closed.append(True)
+
+            iterator = event_loop.iterate(values())
+            self.assertEqual(next(iterator), 0)
+            self.assertEqual(closed, [])
+            iterator.close()
+            self.assertEqual(closed, [True])
+        finally:
+            event_loop.close()
+
+    def test_close(self):
+        event_loop = EventLoopThread()
+
+        # Close before use
+        event_loop.close()
+
+        # Restart after close
+        loop = event_loop.loop
+        event_loop.close()
+        self.assertTrue(loop.is_closed())
+
+        async def get_value():
+            return 1
+
+        self.assertEqual(event_loop.run(get_value()), 1)
+        self.assertIsNot(event_loop.loop, loop)
+        event_loop.close()
+
+
+class TestRunSteps(TestCase):
+
+    @staticmethod
+    def steps(thread_names):
+        async def get_thread_name():
+            return threading.current_thread().name
+
+        def get_thread_name_blocking(suffix):
+            return threading.current_thread().name + suffix
+
+        thread_names.append(threading.current_thread().name)
+        thread_names.append((yield get_thread_name()))
+        thread_names.append((yield BlockingCall(get_thread_name_blocking, '!')))
+        try:
+            yield BlockingCall(int, 'invalid')
+        except ValueError:
+            thread_names.append('ValueError')
+        return len(thread_names)
+
+    def test_run_steps(self):
+        event_loop = EventLoopThread()
+        try:
+            thread_names = []
+            self.assertEqual(run_steps(self.steps(thread_names), event_loop.run), 4)
+            self.assertEqual(thread_names, ['MainThread', 'chisel-event-loop', 'MainThread!', 'ValueError'])
+        finally:
+            event_loop.close()
+
+    def test_run_steps_async(self):
+        async def run(thread_names):
+            with concurrent.futures.ThreadPoolExecutor(thread_name_prefix='my-executor') as executor:
+                return await run_steps_async(self.steps(thread_names), executor)
+
+        # The steps and awaitables are run on the event loop and the blocking calls are run on the executor
+        thread_names = []
+        self.assertEqual(asyncio.run(run(thread_names)), 4)
+        self.assertEqual(thread_names, ['MainThread', 'MainThread', 'my-executor_0!', 'ValueError'])
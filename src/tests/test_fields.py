@@ -0,0 +1,152 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+# pylint: disable=missing-class-docstring, missing-function-docstring, missing-module-docstring
+
+from unittest import TestCase
+
+from schema_markdown import ValidationError, parse_schema_markdown, validate_type
+
+from chisel.fields import get_fields_type, parse_fields, project_fields
+from chisel.stream import StreamArray, is_stream
+
+
+TEST_TYPES = parse_schema_markdown('''\
+struct Base
+    int id
+
+struct Row (Base)
+    string name
+    optional Point point
+    optional Point{} points
+
+struct Point
+    float x
+    float y
+
+typedef Row[len > 0] Rows
+
+union MyUnion
+    int a
+    Point b
+
+struct MyStruct
+    Rows rows
+    int count
+    optional MyUnion union
+    optional int[] ints
+''')
+
+
+class TestFields(TestCase):
+
+    def test_parse_fields(self):
+        self.assertEqual(parse_fields('a'), {'a': None})
+        self.assertEqual(parse_fields('a, b.c,b.d.e'), {'a': None, 'b': {'c': None, 'd': {'e': None}}})
+
+        # Whole member selections take precedence
+        self.assertEqual(parse_fields('b.c,b'), {'b': None})
+        self.assertEqual(parse_fields('b,b.c'), {'b': None})
+
+    def test_parse_fields_invalid(self):
+        for fields in ('', 'a,', 'a..b', '.a', 'a.'):
+            with self.assertRaises(ValueError) as cm_exc:
+                parse_fields(fields)
+            self.assertTrue(str(cm_exc.exception).startswith('Invalid fields path '))
+
+    def test_get_fields_type(self):
+        fields_types, fields_type = get_fields_type(TEST_TYPES, 'MyStruct', parse_fields('rows.name,rows.point.x,count'))
+        value = {'rows': [{'name': 'a', 'point': {'x': 1}}, {'name': 'b'}], 'count': 2}
+        self.assertEqual(
+            validate_type(fields_types, fields_type, value),
+            {'rows': [{'name': 'a', 'point': {'x': 1.0}}, {'name': 'b'}], 'count': 2}
+        )
+
+        # Unselected members are not allowed
+        with self.assertRaises(ValidationError) as cm_exc:
+            validate_type(fields_types, fields_type, {'rows': [{'id': 1, 'name': 'a'}], 'count': 1})
+        self.assertEqual(str(cm_exc.exception), 'Unknown member "rows.0.id"')
+
+        # Selected members are validated
+        with self.assertRaises(ValidationError) as cm_exc:
+            validate_type(fields_types, fields_type, {'rows': [{'name': 'a', 'point': {}}], 'count': 1})
+        self.assertEqual(str(cm_exc.exception), 'Required member "rows.0.point.x" missing')
+
+        # Typedef attributes are preserved
+        with self.assertRaises(ValidationError) as cm_exc:
+            validate_type(fields_types, fields_type, {'rows': [], 'count': 0})
+        self.assertEqual(cm_exc.exception.member_fqn, 'rows')
+
+        # The original type model is unchanged
+        self.assertNotIn(fields_type, TEST_TYPES)
+
+    def test_get_fields_type_union_dict(self):
+        fields_types, fields_type = get_fields_type(TEST_TYPES, 'MyStruct', parse_fields('union.b.y,rows.points.x'))
+        value = {'union': {'b': {'y': 1.0}}, 'rows': [{'points': {'p': {'x': 2.0}}}]}
+        self.assertEqual(validate_type(fields_types, fields_type, value), value)
+
+    def test_get_fields_type_unknown(self):
+        with self.assertRaises(ValueError) as cm_exc:
+            get_fields_type(TEST_TYPES, 'MyStruct', parse_fields('rows.point.z'))
+        self.assertEqual(str(cm_exc.exception), "Unknown fields member 'rows.point.z'")
+
+        with self.assertRaises(ValueError) as cm_exc:
+            get_fields_type(TEST_TYPES, 'MyStruct', parse_fields('count.a'))
+        self.assertEqual(str(cm_exc.exception), "Invalid fields member 'count', expected a struct")
+
+        with self.assertRaises(ValueError) as cm_exc:
+            get_fields_type(TEST_TYPES, 'MyStruct', parse_fields('ints.a'))
+        self.assertEqual(str(cm_exc.exception), "Invalid fields member 'ints', expected a struct")
+
+    def test_project_fields(self):
+        value = {
+            'rows': [
+                {'id': 1, 'name': 'a', 'point': {'x': 1.0, 'y': 2.0}, 'points': {'p': {'x': 3.0, 'y': 4.0}}},
+                {'id': 2, 'name': 'b'}
+            ],
+            'count': 2,
+            'union': {'b': {'x': 5.0, 'y': 6.0}},
+            'ints': [1, 2]
+        }
+        self.assertEqual(
+            project_fields(TEST_TYPES, 'MyStruct', parse_fields('rows.id,rows.point.y,rows.points.x,union.b.y,ints'), value),
+            {
+                'rows': [{'id': 1, 'point': {'y': 2.0}, 'points': {'p': {'x': 3.0}}}, {'id': 2}],
+                'union': {'b': {'y': 6.0}},
+                'ints': [1, 2]
+            }
+        )
+
+        # Whole member values are not copied
+        self.assertIs(project_fields(TEST_TYPES, 'MyStruct', parse_fields('ints'), value)['ints'], value['ints'])
+
+    def test_project_fields_invalid_value(self):
+        self.assertIsNone(project_fields(TEST_TYPES, 'MyStruct', parse_fields('rows.id'), None))
+        self.assertEqual(project_fields(TEST_TYPES, 'MyStruct', parse_fields('rows.id'), {'rows': 1}), {'rows': 1})
+        self.assertEqual(project_fields(TEST_TYPES, 'MyStruct', parse_fields('rows.points.x'), {'rows': [{'points': 1}]}),
+                         {'rows': [{'points': 1}]})
+        self.assertEqual(project_fields(TEST_TYPES, 'MyStruct', parse_fields('rows.id,bogus'), {'rows': [{'id': 1}], 'bogus': 2}),
+                         {'rows': [{'id': 1}]})
+
+    def test_project_fields_stream(self):
+        closed = []
+
+        def rows():
+            try:
+                yield {'id': 1, 'point': {'x': 1.0, 'y': 2.0}}
+                yield {'id': 2}
+            finally:
+                closed.append(True)
+
+        value = project_fields(TEST_TYPES, 'MyStruct', parse_fields('rows.point.y'), {'rows': rows(), 'ints': [1]})
+        self.assertEqual(list(value), ['rows'])
+        self.assertTrue(is_stream(value['rows']))
+        self.assertEqual(list(value['rows']), [{'point': {'y': 2.0}}, {}])
+        self.assertEqual(closed, [True])
+
+        # Closing the projected stream closes the stream
+        closed.clear()
+        value = project_fields(TEST_TYPES, 'MyStruct', parse_fields('rows.id'), {'rows': StreamArray(rows())})
+        self.assertEqual(next(value['rows']), {'id': 1})
+        value['rows'].close()
+        self.assertEqual(closed, [True])
@@ -0,0 +1,214 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+# pylint: disable=missing-class-docstring, missing-function-docstring, missing-module-docstring
+
+import asyncio
+import gc
+import threading
+from unittest import TestCase
+
+import chisel
+from chisel.gcmanager import GC_COLLECT_THRESHOLDS, GC_IDLE_SECONDS, GC_THRESHOLDS, GCManager
+
+
+# Helper to create garbage reference cycles
+def _create_cycles(count):
+    for _ in range(count):
+        cycle = []
+        cycle.append(cycle)
+
+
+class TestGCManager(TestCase):
+
+    def test_start_stop(self):
+        thresholds = gc.get_threshold()
+        gc_manager = GCManager()
+        self.assertEqual(gc_manager.thresholds, GC_THRESHOLDS)
+        self.assertEqual(gc_manager.collect_thresholds, GC_COLLECT_THRESHOLDS)
+        self.assertEqual(gc_manager.idle_seconds, GC_IDLE_SECONDS)
+        self.assertFalse(gc_manager.started)
+        try:
+            gc_manager.start()
+            self.assertTrue(gc_manager.started)
+            self.assertEqual(gc.get_threshold(), GC_THRESHOLDS)
+            self.assertGreater(gc_manager.frozen_objects, 0)
+            self.assertGreater(gc.get_freeze_count(), 0)
+
+            # Starting again does nothing
+            gc_manager.start()
+            self.assertEqual(gc.callbacks.count(gc_manager._gc_callback), 1) # pylint: disable=protected-access
+        finally:
+            gc_manager.stop()
+        self.assertFalse(gc_manager.started)
+        self.assertEqual(gc.get_threshold(), thresholds)
+        self.assertEqual(gc.get_freeze_count(), 0)
+        self.assertNotIn(gc_manager._gc_callback, gc.callbacks) # pylint: disable=protected-access
+
+        # Stopping again does nothing
+        gc_manager.stop()
+
+    def test_no_freeze(self):
+        gc_manager = GCManager(thresholds=(1000, 10, 10), freeze=False)
+        try:
+            gc_manager.start()
+            self.assertEqual(gc.get_threshold(), (1000, 10, 10))
+            self.assertEqual(gc_manager.frozen_objects, 0)
+            self.assertEqual(gc.get_freeze_count(), 0)
+        finally:
+            gc_manager.stop()
+
+    def test_metrics(self):
+        gc_manager = GCManager()
+        try:
+            gc_manager.start()
+            gc.collect(1)
+            gc.collect(1)
+            gc.collect(2)
+            self.assertEqual(gc_manager.collections[1:], [2, 1])
+            self.assertGreater(gc_manager.pause_seconds[1], 0)
+            self.assertGreater(gc_manager.pause_seconds[2], 0)
+            self.assertGreaterEqual(gc_manager.max_pause_seconds, max(gc_manager.pause_seconds[1] / 2, gc_manager.pause_seconds[2]))
+            self.assertEqual(gc_manager.request_collections, 0)
+            self.assertEqual(gc_manager.deferred_collections, 0)
+
+            # A collection during a request
+            gc_manager.request_started()
+            gc.collect()
+            gc_manager.request_finished()
+            self.assertEqual(gc_manager.request_collections, 1)
+        finally:
+            gc_manager.stop()
+
+    def test_request_finished(self):
+        gc_manager = GCManager()
+        try:
+            gc_manager.request_started()
+            self.assertTrue(gc_manager.started)
+            gc_manager.request_started()
+
+            # No collection while a request is in progress
+            _create_cycles(GC_COLLECT_THRESHOLDS[0] * 2)
+            self.assertFalse(gc_manager.request_finished())
+            self.assertEqual(gc_manager.deferred_collections, 0)
+
+            # Collection after the last request
+            self.assertTrue(gc_manager.request_finished())
+            self.assertEqual(gc_manager.deferred_collections, 1)
+            self.assertGreaterEqual(sum(gc_manager.collections), 1)
+            self.assertEqual(gc_manager.request_collections, 0)
+
+            # Not due
+            gc_manager.request_started()
+            gc_manager.request_finished()
+            self.assertEqual(gc_manager.deferred_collections, 1)
+        finally:
+            gc_manager.stop()
+
+    def test_collect_due(self):
+        gc_manager = GCManager()
+        try:
+            gc_manager.request_started()
+            _create_cycles(GC_COLLECT_THRESHOLDS[0] * 2)
+
+            # The last request's collection is deferred
+            self.assertTrue(gc_manager.request_finished(collect=False))
+            self.assertEqual(gc_manager.deferred_collections, 0)
+
+            # No collection while a request is in progress
+            gc_manager.request_started()
+            gc_manager.collect_due()
+            self.assertEqual(gc_manager.deferred_collections, 0)
+            self.assertTrue(gc_manager.request_finished(collect=False))
+
+            # The deferred collection
+            gc_manager.collect_due()
+            self.assertEqual(gc_manager.deferred_collections, 1)
+
+            # Not due
+            gc_manager.collect_due()
+            self.assertEqual(gc_manager.deferred_collections, 1)
+        finally:
+            gc_manager.stop()
+
+    def test_collect_idle(self):
+        gc_manager = GCManager()
+        try:
+            gc_manager.start()
+            gc_manager.request_started()
+            _create_cycles(10)
+            gc_manager.collect_idle()
+            self.assertEqual(gc_manager.deferred_collections, 0)
+            gc_manager.request_finished()
+            self.assertEqual(gc_manager.deferred_collections, 0)
+            gc_manager.collect_idle()
+            self.assertEqual(gc_manager.deferred_collections, 1)
+        finally:
+            gc_manager.stop()
+
+    def test_collect_generation(self):
+        gc_manager = GCManager(collect_thresholds=(0, -1, 1000000))
+        try:
+            gc_manager.start()
+            _create_cycles(10)
+            gc_manager.collect_idle()
+            self.assertEqual(gc_manager.collections, [0, 1, 0])
+        finally:
+            gc_manager.stop()
+
+    def test_application(self):
+        @chisel.action(spec='''\
+action my_action
+    output
+        int count
+''')
+        def my_action(unused_ctx, unused_req):
+            _create_cycles(GC_COLLECT_THRESHOLDS[0] * 2)
+            return {'count': 1}
+
+        application = chisel.Application()
+        application.add_request(my_action)
+        application.gc_manager = GCManager()
+        try:
+            self.assertEqual(application.request('POST', '/my_action'), ('200 OK', [('Content-Type', 'application/json')], b'{"count":1}'))
+            self.assertTrue(application.gc_manager.started)
+            self.assertEqual(application.gc_manager.deferred_collections, 1)
+
+            # WSGI - the collection runs when the response content is closed
+            environ = chisel.Context.create_environ('POST', '/my_action')
+            response = application(environ, chisel.app.StartResponse())
+            self.assertEqual(b''.join(response), b'{"count":1}')
+            self.assertEqual(application.gc_manager.deferred_collections, 1)
+            response.close()
+            self.assertEqual(application.gc_manager.deferred_collections, 2)
+
+            # ASGI
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                messages.append(message)
+
+            scope = {'type': 'http', 'method': 'POST', 'path': '/my_action', 'query_string': b'', 'headers': []}
+            asyncio.run(application.asgi(scope, receive, send))
+            self.assertEqual(messages[0]['status'], 200)
+            self.assertEqual(application.gc_manager.deferred_collections, 3)
+
+            # ASGI - the collection runs on the executor after the response is sent
+            collect_threads = []
+
+            def collect_thread(*unused_args):
+                collect_threads.append(threading.current_thread())
+
+            gc.callbacks.append(collect_thread)
+            try:
+                asyncio.run(application.asgi(scope, receive, send))
+            finally:
+                gc.callbacks.remove(collect_thread)
+            self.assertEqual(application.gc_manager.deferred_collections, 4)
+            self.assertTrue(collect_threads)
+            self.assertNotIn(threading.main_thread(), collect_threads)
+        finally:
+            application.gc_manager.stop()
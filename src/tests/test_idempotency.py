@@ -0,0 +1,141 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+# pylint: disable=missing-class-docstring, missing-function-docstring, missing-module-docstring
+
+from io import BytesIO
+import threading
+from unittest import TestCase
+import unittest.mock
+
+from chisel.idempotency import IdempotencyCache, RequestDigestReader
+
+
+class TestIdempotencyCache(TestCase):
+
+    def test_begin_complete(self):
+        cache = IdempotencyCache(10)
+        self.assertIsNone(cache.begin(('a', 'key1')))
+        cache.complete(('a', 'key1'), ('200 OK', [], b'abc'), 'abc123')
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.size, 3)
+        self.assertEqual(cache.begin(('a', 'key1')), (('200 OK', [], b'abc'), 'abc123'))
+        self.assertEqual(cache.begin(('a', 'key1')), (('200 OK', [], b'abc'), 'abc123'))
+        self.assertEqual(cache.replayed, 2)
+
+        # Different client
+        self.assertIsNone(cache.begin(('b', 'key1')))
+        cache.complete(('b', 'key1'), None)
+        self.assertEqual(len(cache), 1)
+
+        # Not retained
+        self.assertIsNone(cache.begin(('b', 'key1')))
+        cache.complete(('b', 'key1'), None)
+
+    def test_lru(self):
+        cache = IdempotencyCache(2)
+        for key in ('key1', 'key2'):
+            self.assertIsNone(cache.begin(key))
+            cache.complete(key, ('200 OK', [], key.encode('utf-8')))
+        self.assertEqual(cache.begin('key1'), (('200 OK', [], b'key1'), None))
+        self.assertIsNone(cache.begin('key3'))
+        cache.complete('key3', ('200 OK', [], b'key3'))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.size, 8)
+        self.assertEqual(cache.begin('key1'), (('200 OK', [], b'key1'), None))
+        self.assertIsNone(cache.begin('key2'))
+        cache.complete('key2', None)
+
+    def test_max_bytes(self):
+        cache = IdempotencyCache(10, max_bytes=5)
+        self.assertIsNone(cache.begin('key1'))
+        cache.complete('key1', ('200 OK', [], b'abc'))
+        self.assertIsNone(cache.begin('key2'))
+        cache.complete('key2', ('200 OK', [], b'def'))
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.size, 3)
+
+        # Too large to retain
+        self.assertIsNone(cache.begin('key3'))
+        cache.complete('key3', ('200 OK', [], b'abcdef'))
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.begin('key2'), (('200 OK', [], b'def'), None))
+
+    def test_ttl(self):
+        cache = IdempotencyCache(10, ttl_seconds=60)
+        with unittest.mock.patch('time.monotonic', return_value=1000):
+            for key in ('key1', 'key2'):
+                self.assertIsNone(cache.begin(key))
+                cache.complete(key, ('200 OK', [], b'abc'))
+        with unittest.mock.patch('time.monotonic', return_value=1030):
+            self.assertIsNone(cache.begin('key3'))
+            cache.complete('key3', ('200 OK', [], b'abc'))
+            self.assertEqual(cache.begin('key2'), (('200 OK', [], b'abc'), None))
+
+        # Expired - the least recently used responses are evicted on any lookup
+        with unittest.mock.patch('time.monotonic', return_value=1060):
+            self.assertIsNone(cache.begin('key4'))
+            self.assertEqual(len(cache), 2)
+            self.assertEqual(cache.size, 6)
+
+            # Expired - a more recently used response is evicted on lookup
+            self.assertIsNone(cache.begin('key2'))
+            self.assertEqual(len(cache), 1)
+            self.assertEqual(cache.size, 3)
+            cache.complete('key2', None)
+            cache.complete('key4', None)
+
+    def test_concurrent(self):
+        cache = IdempotencyCache(10)
+        self.assertIsNone(cache.begin('key1'))
+
+        # The waiting request gets the owner's response
+        results = []
+        thread = threading.Thread(target=lambda: results.append(cache.begin('key1')))
+        thread.start()
+        thread.join(0.01)
+        self.assertTrue(thread.is_alive())
+        cache.complete('key1', ('200 OK', [], b'abc'), 'abc123')
+        thread.join()
+        self.assertEqual(results, [(('200 OK', [], b'abc'), 'abc123')])
+
+    def test_concurrent_not_retained(self):
+        cache = IdempotencyCache(10)
+        self.assertIsNone(cache.begin('key1'))
+
+        # The waiting request becomes the owner
+        results = []
+        thread = threading.Thread(target=lambda: results.append(cache.begin('key1')))
+        thread.start()
+        thread.join(0.01)
+        self.assertTrue(thread.is_alive())
+        cache.complete('key1', None)
+        thread.join()
+        self.assertEqual(results, [None])
+        cache.complete('key1', None)
+
+
+class TestRequestDigestReader(TestCase):
+
+    def test_digest(self):
+        environ = {'QUERY_STRING': 'a=1', 'CONTENT_LENGTH': '7'}
+        digest = RequestDigestReader({**environ, 'wsgi.input': BytesIO(b'{"b":2}')}).digest()
+        self.assertEqual(len(digest), 32)
+
+        # Partially-read content
+        reader = RequestDigestReader({**environ, 'wsgi.input': BytesIO(b'{"b":2}\n')})
+        self.assertEqual(reader.readline(), b'{"b":2}\n')
+        self.assertNotEqual(reader.digest(), digest)
+        reader = RequestDigestReader({**environ, 'wsgi.input': BytesIO(b'{"b":2}extra')})
+        self.assertEqual(reader.read(2), b'{"')
+        self.assertEqual(reader.digest(), digest)
+
+        # Unknown content length
+        self.assertEqual(RequestDigestReader({'QUERY_STRING': 'a=1', 'wsgi.input': BytesIO(b'{"b":2}')}).digest(), digest)
+
+        # Different query string or content
+        self.assertNotEqual(RequestDigestReader({**environ, 'QUERY_STRING': 'a=2', 'wsgi.input': BytesIO(b'{"b":2}')}).digest(), digest)
+        self.assertNotEqual(RequestDigestReader({**environ, 'wsgi.input': BytesIO(b'{"b":3}')}).digest(), digest)
+
+        # No content
+        self.assertEqual(RequestDigestReader({}).digest(), RequestDigestReader({'wsgi.input': BytesIO()}).digest())
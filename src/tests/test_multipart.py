@@ -0,0 +1,124 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+# pylint: disable=missing-class-docstring, missing-function-docstring, missing-module-docstring
+
+from io import BytesIO
+from unittest import TestCase
+
+from chisel.multipart import MultipartFile, MultipartLimitError, get_multipart_boundary, parse_multipart
+
+
+def create_multipart(parts, boundary=b'BOUNDARY'):
+    content = [b'preamble\r\n']
+    for headers, value in parts:
+        content.append(b'--' + boundary + b'\r\n')
+        for header in headers:
+            content.append(header.encode('utf-8') + b'\r\n')
+        content.append(b'\r\n' + value + b'\r\n')
+    content.append(b'--' + boundary + b'--\r\nepilogue')
+    return b''.join(content)
+
+
+class TestMultipart(TestCase):
+
+    def test_get_multipart_boundary(self):
+        self.assertEqual(get_multipart_boundary('multipart/form-data; boundary=abc'), b'abc')
+        self.assertEqual(get_multipart_boundary('multipart/form-data;boundary="a b;c"'), b'a b;c')
+        self.assertEqual(get_multipart_boundary('multipart/form-data; charset=utf-8; BOUNDARY=abc'), b'abc')
+        self.assertIsNone(get_multipart_boundary('multipart/form-data'))
+        self.assertIsNone(get_multipart_boundary('multipart/form-data; myboundary=abc'))
+
+    def test_parse_multipart(self):
+        file_content = bytes(range(256)) * 100 + b'\r\n--BOUNDAR'
+        content = create_multipart([
+            (['Content-Disposition: form-data; name="title"'], b'Hello'),
+            (['Content-Disposition: form-data; name="items.0"', 'Content-Type: text/plain; charset=latin-1'], 'caf\xe9'.encode('latin-1')),
+            (['Content-Disposition: form-data; name="empty"'], b''),
+            (['Content-Disposition: form-data; name="doc"; filename="doc.bin"', 'Content-Type: application/octet-stream'], file_content),
+            (['Content-Disposition: form-data; name="doc2"; filename="doc2.txt"'], b'')
+        ])
+
+        # Parse with small reads to exercise delimiters split across reads
+        for chunk_size in (1, 7, 64, 64 * 1024):
+            fields, files = parse_multipart(BytesIO(content), b'BOUNDARY', len(content), spool_bytes=1000, chunk_size=chunk_size)
+            self.assertEqual(fields, [('title', 'Hello'), ('items.0', 'caf\xe9'), ('empty', '')])
+            self.assertEqual(sorted(files), ['doc', 'doc2'])
+            doc = files['doc']
+            self.assertEqual(doc.name, 'doc')
+            self.assertEqual(doc.filename, 'doc.bin')
+            self.assertEqual(doc.content_type, 'application/octet-stream')
+            self.assertEqual(doc.size, len(file_content))
+            self.assertTrue(doc.file._rolled) # pylint: disable=protected-access
+            self.assertEqual(doc.read(), file_content)
+            doc2 = files['doc2']
+            self.assertEqual(doc2.content_type, 'text/plain')
+            self.assertEqual(doc2.size, 0)
+            self.assertFalse(doc2.file._rolled) # pylint: disable=protected-access
+            self.assertEqual(doc2.read(), b'')
+            for file in files.values():
+                file.close()
+
+    def test_parse_multipart_empty(self):
+        self.assertEqual(parse_multipart(BytesIO(b'--BOUNDARY--\r\n'), b'BOUNDARY', 100), ([], {}))
+
+    def test_parse_multipart_limit(self):
+        content = create_multipart([(['Content-Disposition: form-data; name="doc"; filename="doc.txt"'], b'x' * 1000)])
+        with self.assertRaises(MultipartLimitError) as cm_exc:
+            parse_multipart(BytesIO(content), b'BOUNDARY', len(content) - 1, chunk_size=100)
+        self.assertEqual(str(cm_exc.exception), f'Multipart content exceeds {len(content) - 1} bytes')
+
+        # Field size limit
+        content = create_multipart([(['Content-Disposition: form-data; name="title"'], b'x' * 11)])
+        self.assertEqual(parse_multipart(BytesIO(content), b'BOUNDARY', 1000, max_field_bytes=11)[0], [('title', 'x' * 11)])
+        with self.assertRaises(MultipartLimitError) as cm_exc:
+            parse_multipart(BytesIO(content), b'BOUNDARY', 1000, max_field_bytes=10, chunk_size=1)
+        self.assertEqual(str(cm_exc.exception), "Multipart field 'title' exceeds 10 bytes")
+
+        # Headers size limit
+        content = create_multipart([([f'Content-Disposition: form-data; name="{"x" * 20000}"'], b'')])
+        with self.assertRaises(MultipartLimitError) as cm_exc:
+            parse_multipart(BytesIO(content), b'BOUNDARY', len(content))
+        self.assertEqual(str(cm_exc.exception), 'Multipart part headers exceeds 16384 bytes')
+
+    def test_parse_multipart_invalid(self):
+        def assert_invalid(content, message):
+            with self.assertRaises(ValueError) as cm_exc:
+                parse_multipart(BytesIO(content), b'BOUNDARY', 1000)
+            self.assertEqual(str(cm_exc.exception), message)
+
+        assert_invalid(b'', 'Unexpected end of multipart content')
+        assert_invalid(b'--BOUNDARYxx', 'Invalid multipart delimiter')
+        assert_invalid(b'--BOUNDARY\r\nContent-Disposition: form-data; name="a"\r\n\r\nabc', 'Unexpected end of multipart content')
+        assert_invalid(
+            create_multipart([(['Content-Disposition: attachment; name="a"'], b'')]),
+            'Invalid multipart part Content-Disposition'
+        )
+        assert_invalid(create_multipart([(['Content-Disposition: form-data'], b'')]), 'Invalid multipart part Content-Disposition')
+        assert_invalid(
+            create_multipart([(['Content-Disposition: form-data; name="a"'], b'\xff')]),
+            "Invalid multipart field 'a': 'utf-8' codec can't decode byte 0xff in position 0: invalid start byte"
+        )
+        assert_invalid(
+            create_multipart([(['Content-Disposition: form-data; name="a"', 'Content-Type: text/plain; charset=bogus'], b'x')]),
+            "Invalid multipart field 'a': unknown encoding: bogus"
+        )
+        assert_invalid(
+            create_multipart([
+                (['Content-Disposition: form-data; name="a"; filename="a.txt"'], b''),
+                (['Content-Disposition: form-data; name="a"; filename="b.txt"'], b'')
+            ]),
+            "Duplicate multipart file 'a'"
+        )
+
+    def test_multipart_file(self):
+        with MultipartFile('doc', 'doc.txt', 'text/plain', spool_bytes=4) as file:
+            file.write(b'abc')
+            self.assertFalse(file.file._rolled) # pylint: disable=protected-access
+            file.write(b'de')
+            self.assertTrue(file.file._rolled) # pylint: disable=protected-access
+            self.assertEqual(file.size, 5)
+            self.assertEqual(file.seek(1), 1)
+            self.assertEqual(file.read(2), b'bc')
+            self.assertEqual(file.read(), b'de')
+        self.assertTrue(file.file.closed)
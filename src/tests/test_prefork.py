@@ -0,0 +1,339 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+# pylint: disable=missing-class-docstring, missing-function-docstring, missing-module-docstring
+
+import http.client
+import json
+import os
+import queue
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest import TestCase, skipIf
+
+import chisel
+from chisel.prefork import PreforkServer, get_rss
+
+
+# Test application
+@chisel.action(spec='''\
+action my_worker
+    urls
+        GET
+    output
+        int pid
+        int cpus
+''')
+def my_worker(unused_ctx, unused_req):
+    return {'pid': os.getpid(), 'cpus': len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else 0}
+
+
+application = chisel.Application()
+application.add_request(my_worker)
+
+
+# Reload test application source
+RELOAD_APP = '''\
+import os
+import time
+
+import chisel
+
+
+WARM = []
+
+
+@chisel.action(spec=\'\'\'\\
+action my_version
+    urls
+        GET
+    query
+        optional float sleep
+    output
+        int version
+        int pid
+        bool warm
+\'\'\')
+def my_version(unused_ctx, req):
+    warm = bool(WARM)
+    WARM.append(True)
+    if 'sleep' in req:
+        time.sleep(req['sleep'])
+    return {'version': VERSION, 'pid': os.getpid(), 'warm': warm}
+
+
+application = chisel.Application()
+application.add_request(my_version)
+'''
+
+
+class PreforkProcess:
+    # A "python -m chisel serve" prefork server process
+
+    def __init__(self, *args, app_spec='tests.test_prefork:application', python_path=()):
+        self.process = subprocess.Popen( # pylint: disable=consider-using-with
+            [sys.executable, '-m', 'chisel', 'serve', app_spec, '-p', '0', *args],
+            env={
+                **os.environ,
+                'PYTHONPATH': os.pathsep.join([*python_path, os.path.dirname(os.path.dirname(chisel.__file__))]),
+                'PYTHONDONTWRITEBYTECODE': '1'
+            },
+            stderr=subprocess.PIPE, text=True
+        )
+        self.lines = queue.Queue()
+        self.thread = threading.Thread(target=self._read_lines, daemon=True)
+        self.thread.start()
+        self.port = int(self.wait_for_line(r"listening on \('[^']+', (\d+)\)").group(1))
+        self.master_pid = self.process.pid
+
+    def _read_lines(self):
+        for line in self.process.stderr:
+            self.lines.put(line)
+
+    def wait_for_line(self, pattern, timeout=10):
+        end_time = time.monotonic() + timeout
+        while True:
+            line = self.lines.get(timeout=max(0, end_time - time.monotonic()))
+            match = re.search(pattern, line)
+            if match is not None:
+                return match
+
+    def request(self, path='/my_worker'):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=10)
+        try:
+            connection.request('GET', path)
+            return json.loads(connection.getresponse().read())
+        finally:
+            connection.close()
+
+    def wait_for_reload(self):
+        self.master_pid = int(self.wait_for_line(r'reloaded - new master \(pid (\d+)\)').group(1))
+
+    def stop(self):
+        # A reloaded master isn't a child process - the previous master exits and the server's output closes
+        if self.master_pid != self.process.pid:
+            status = self.process.wait(timeout=10)
+            os.kill(self.master_pid, signal.SIGTERM)
+        else:
+            if self.process.poll() is None:
+                self.process.send_signal(signal.SIGTERM)
+            status = self.process.wait(timeout=10)
+        self.thread.join(timeout=10)
+        self.process.stderr.close()
+        return status
+
+
+@skipIf(not hasattr(os, 'fork'), 'os.fork not available')
+class TestPrefork(TestCase):
+
+    def test_workers(self):
+        server = PreforkProcess('-w', '2')
+        try:
+            # Each connection is accepted by one of the workers
+            pids = {server.request()['pid'] for _ in range(50)}
+            self.assertEqual(len(pids), 2)
+            self.assertNotIn(server.process.pid, pids)
+
+            # A killed worker is restarted
+            killed_pid = pids.pop()
+            os.kill(killed_pid, signal.SIGKILL)
+            server.wait_for_line(rf'chisel worker \d \(pid {killed_pid}\) exited with status -9')
+            for _ in range(100):
+                worker_pids = {server.request()['pid'] for _ in range(20)}
+                if len(worker_pids) == 2:
+                    break
+                time.sleep(0.1)
+            self.assertEqual(len(worker_pids), 2)
+            self.assertIn(pids.pop(), worker_pids)
+            self.assertNotIn(killed_pid, worker_pids)
+        finally:
+            self.assertEqual(server.stop(), 0)
+        server.wait_for_line('chisel prefork server stopping')
+
+    def test_max_requests(self):
+        server = PreforkProcess('-w', '1', '--max-requests', '3', '--cpu-affinity')
+        try:
+            responses = [server.request() for _ in range(3)]
+            self.assertEqual(len({response['pid'] for response in responses}), 1)
+            if hasattr(os, 'sched_getaffinity'):
+                self.assertEqual(responses[0]['cpus'], 1)
+
+            # The worker is recycled - queued connections are accepted by its replacement
+            pid = responses[0]['pid']
+            server.wait_for_line(rf'chisel worker 0 \(pid {pid}\) recycled after 3 requests')
+            self.assertNotEqual(server.request()['pid'], pid)
+            server.wait_for_line(rf'chisel worker 0 \(pid {pid}\) exited with status 0')
+        finally:
+            self.assertEqual(server.stop(), 0)
+
+    def test_max_requests_draining(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with open(os.path.join(temp_dir, 'reload_app.py'), 'w', encoding='utf-8') as app_file:
+                app_file.write(RELOAD_APP.replace('VERSION', '1'))
+            server = PreforkProcess('-w', '1', '--max-requests', '2', app_spec='reload_app:application', python_path=[temp_dir])
+            try:
+                pid = server.request('/my_version')['pid']
+
+                # The worker is recycled with a request in progress
+                slow_responses = []
+                slow_thread = threading.Thread(target=lambda: slow_responses.append(server.request('/my_version?sleep=4')))
+                slow_thread.start()
+                server.wait_for_line(rf'chisel worker 0 \(pid {pid}\) recycled after 2 requests')
+
+                # Connections made while the recycling worker drains are accepted by its replacement
+                start_time = time.monotonic()
+                for _ in range(5):
+                    self.assertNotEqual(server.request('/my_version')['pid'], pid)
+                self.assertLess(time.monotonic() - start_time, 2)
+                self.assertTrue(slow_thread.is_alive())
+
+                # The in-progress request completes on the recycled worker
+                slow_thread.join()
+                self.assertEqual(slow_responses[0]['pid'], pid)
+                server.wait_for_line(rf'chisel worker 0 \(pid {pid}\) exited with status 0')
+            finally:
+                self.assertEqual(server.stop(), 0)
+
+    def test_reload(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            app_path = os.path.join(temp_dir, 'reload_app.py')
+            with open(app_path, 'w', encoding='utf-8') as app_file:
+                app_file.write(RELOAD_APP.replace('VERSION', '1'))
+            server = PreforkProcess(
+                '-w', '2', '--warmup', '/my_version', app_spec='reload_app:application', python_path=[temp_dir]
+            )
+            try:
+                responses = [server.request('/my_version') for _ in range(20)]
+                self.assertEqual({response['version'] for response in responses}, {1})
+                previous_pids = {response['pid'] for response in responses}
+
+                # Start a slow request, then reload with new code
+                slow_responses = []
+                slow_thread = threading.Thread(target=lambda: slow_responses.append(server.request('/my_version?sleep=1')))
+                slow_thread.start()
+                time.sleep(0.2)
+                with open(app_path, 'w', encoding='utf-8') as app_file:
+                    app_file.write(RELOAD_APP.replace('VERSION', '2'))
+                server.process.send_signal(signal.SIGHUP)
+
+                # Requests succeed throughout the reload
+                versions = set()
+                for _ in range(200):
+                    versions.add(server.request('/my_version')['version'])
+                    if versions == {1, 2} or versions == {2}:
+                        break
+                    time.sleep(0.01)
+                # The previous master stops its workers and exits when the new master's workers are accepting connections
+                server.wait_for_reload()
+                self.assertNotEqual(server.master_pid, server.process.pid)
+                for _ in range(2):
+                    server.wait_for_line(r'chisel worker \d \(pid \d+\) exited with status 0')
+                self.assertEqual(server.process.wait(timeout=10), 0)
+                responses = [server.request('/my_version') for _ in range(20)]
+                self.assertEqual({response['version'] for response in responses}, {2})
+                self.assertTrue(previous_pids.isdisjoint(response['pid'] for response in responses))
+
+                # The in-flight request completed on a previous worker
+                slow_thread.join()
+                self.assertEqual(slow_responses[0]['version'], 1)
+                self.assertIn(slow_responses[0]['pid'], previous_pids)
+
+                # The new workers were warmed up before accepting connections
+                self.assertTrue(all(response['warm'] for response in responses))
+            finally:
+                self.assertEqual(server.stop(), 0)
+            server.wait_for_line('chisel prefork server stopping')
+
+    def test_reload_failure(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            app_path = os.path.join(temp_dir, 'reload_app.py')
+            with open(app_path, 'w', encoding='utf-8') as app_file:
+                app_file.write(RELOAD_APP.replace('VERSION', '1'))
+            server = PreforkProcess('-w', '2', app_spec='reload_app:application', python_path=[temp_dir])
+            try:
+                previous_pids = {server.request('/my_version')['pid'] for _ in range(20)}
+
+                # Reload with broken code - the new master exits and the current master continues with its workers
+                with open(app_path, 'w', encoding='utf-8') as app_file:
+                    app_file.write("raise Exception('broken')\n")
+                server.process.send_signal(signal.SIGHUP)
+                server.wait_for_line(r'chisel prefork server reload failed - new master \(pid \d+\) exited with status 1')
+                responses = [server.request('/my_version') for _ in range(20)]
+                self.assertEqual({response['version'] for response in responses}, {1})
+                self.assertTrue({response['pid'] for response in responses} <= previous_pids)
+                self.assertIsNone(server.process.poll())
+
+                # Reload with fixed code
+                with open(app_path, 'w', encoding='utf-8') as app_file:
+                    app_file.write(RELOAD_APP.replace('VERSION', '2'))
+                server.process.send_signal(signal.SIGHUP)
+                server.wait_for_reload()
+                self.assertEqual(server.process.wait(timeout=10), 0)
+                self.assertEqual({server.request('/my_version')['version'] for _ in range(20)}, {2})
+            finally:
+                self.assertEqual(server.stop(), 0)
+
+    def test_drain_timeout(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with open(os.path.join(temp_dir, 'reload_app.py'), 'w', encoding='utf-8') as app_file:
+                app_file.write(RELOAD_APP.replace('VERSION', '1'))
+            server = PreforkProcess('-w', '1', '--drain-timeout', '0.2', app_spec='reload_app:application', python_path=[temp_dir])
+            try:
+                slow_errors = []
+
+                def slow_request():
+                    try:
+                        server.request('/my_version?sleep=10')
+                    except http.client.HTTPException as exc:
+                        slow_errors.append(exc)
+
+                slow_thread = threading.Thread(target=slow_request)
+                slow_thread.start()
+                time.sleep(0.2)
+                start_time = time.monotonic()
+            finally:
+                self.assertEqual(server.stop(), 0)
+            self.assertLess(time.monotonic() - start_time, 5)
+            slow_thread.join()
+            self.assertEqual(len(slow_errors), 1)
+            server.wait_for_line('chisel server stopped with requests in progress after 0.2 seconds')
+
+    def test_bind(self):
+        prefork_server = PreforkServer(application, workers=3)
+        sockets = prefork_server.bind('127.0.0.1', 0)
+        try:
+            self.assertEqual(len(sockets), 3 if hasattr(socket, 'SO_REUSEPORT') else 1)
+            self.assertEqual(len({sock.getsockname() for sock in sockets}), 1)
+        finally:
+            for sock in sockets:
+                sock.close()
+
+    @skipIf(not hasattr(socket, 'AF_UNIX'), 'Unix domain sockets not available')
+    def test_bind_unix(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'chisel.sock')
+            with open(path, 'wb'):
+                pass
+            prefork_server = PreforkServer(application, workers=3)
+            sockets = prefork_server.bind(unix_path=path)
+            try:
+                self.assertEqual(len(sockets), 1)
+                self.assertEqual(sockets[0].getsockname(), path)
+            finally:
+                sockets[0].close()
+
+    def test_defaults(self):
+        prefork_server = PreforkServer(application, header_timeout=5)
+        self.assertEqual(prefork_server.workers, os.cpu_count())
+        self.assertEqual(prefork_server.server_kwargs, {'header_timeout': 5})
+
+    def test_get_rss(self):
+        rss = get_rss()
+        data = b'x' * (64 * 1024 * 1024)
+        self.assertGreater(get_rss(), rss + len(data) // 2)
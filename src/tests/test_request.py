@@ -3,10 +3,12 @@
 
 # pylint: disable=missing-class-docstring, missing-function-docstring, missing-module-docstring
 
+import gzip
 from http import HTTPStatus
 from unittest import TestCase
 
 from chisel import request, Application, Request, RedirectRequest, StaticRequest
+from chisel.compression import ResponseCompression
 
 
 class TestRequest(TestCase):
@@ -259,6 +261,42 @@ class TestRedirect(TestCase):
         self.assertEqual(response, b'/new')
 
 
+    def test_compression(self):
+        app = Application()
+        app.compression = ResponseCompression(min_bytes=10)
+        static = StaticRequest('test.txt', b'Hello, World!')
+        app.add_request(static)
+
+        environ = {'HTTP_ACCEPT_ENCODING': 'gzip'}
+        status, headers, response = app.request('GET', '/test.txt', environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        self.assertListEqual(headers, [
+            ('Content-Encoding', 'gzip'),
+            ('Content-Type', 'text/plain; charset=utf-8'),
+            ('ETag', '"65a8e27d8879283831b664bd8b7f0ad4-gzip"'),
+            ('Vary', 'Accept-Encoding')
+        ])
+        self.assertEqual(gzip.decompress(response), b'Hello, World!')
+
+        # The compressed content is cached
+        self.assertEqual(app.compression.metrics.count, 1)
+        status, headers, response2 = app.request('GET', '/test.txt', environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response2, response)
+        self.assertEqual(app.compression.metrics.count, 1)
+        self.assertEqual(len(app.compression.cache), 1)
+
+        # Not accepted
+        status, headers, response = app.request('GET', '/test.txt')
+        self.assertEqual(status, '200 OK')
+        self.assertListEqual(headers, [
+            ('Content-Type', 'text/plain; charset=utf-8'),
+            ('ETag', '"65a8e27d8879283831b664bd8b7f0ad4"'),
+            ('Vary', 'Accept-Encoding')
+        ])
+        self.assertEqual(response, b'Hello, World!')
+
+
     def test_raw_wsgi(self):
         redirect = RedirectRequest((('GET', '/old'),), '/new', permanent=False)
 
@@ -346,6 +384,76 @@ class TestStatic(TestCase):
         self.assertEqual(response, b'')
 
 
+    def test_compression(self):
+        app = Application()
+        app.compression = ResponseCompression(min_bytes=10)
+        static = StaticRequest('test.txt', b'Hello, World!')
+        app.add_request(static)
+
+        environ = {'HTTP_ACCEPT_ENCODING': 'gzip'}
+        status, headers, response = app.request('GET', '/test.txt', environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        self.assertListEqual(headers, [
+            ('Content-Encoding', 'gzip'),
+            ('Content-Type', 'text/plain; charset=utf-8'),
+            ('ETag', '"65a8e27d8879283831b664bd8b7f0ad4-gzip"'),
+            ('Vary', 'Accept-Encoding')
+        ])
+        self.assertEqual(gzip.decompress(response), b'Hello, World!')
+
+        # The compressed content is cached
+        self.assertEqual(app.compression.metrics.count, 1)
+        status, headers, response2 = app.request('GET', '/test.txt', environ=dict(environ))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response2, response)
+        self.assertEqual(app.compression.metrics.count, 1)
+        self.assertEqual(len(app.compression.cache), 1)
+
+        # Not accepted
+        status, headers, response = app.request('GET', '/test.txt')
+        self.assertEqual(status, '200 OK')
+        self.assertListEqual(headers, [
+            ('Content-Type', 'text/plain; charset=utf-8'),
+            ('ETag', '"65a8e27d8879283831b664bd8b7f0ad4"'),
+            ('Vary', 'Accept-Encoding')
+        ])
+        self.assertEqual(response, b'Hello, World!')
+
+
+    def test_compression_not_modified(self):
+        app = Application()
+        app.compression = ResponseCompression(min_bytes=10)
+        static = StaticRequest('test.txt', b'Hello, World!')
+        app.add_request(static)
+
+        # The compressed representation's ETag
+        environ = {'HTTP_ACCEPT_ENCODING': 'gzip', 'HTTP_IF_NONE_MATCH': '"65a8e27d8879283831b664bd8b7f0ad4-gzip"'}
+        status, headers, response = app.request('GET', '/test.txt', environ=environ)
+        self.assertEqual(status, '304 Not Modified')
+        self.assertListEqual(headers, [('ETag', '"65a8e27d8879283831b664bd8b7f0ad4-gzip"'), ('Vary', 'Accept-Encoding')])
+        self.assertEqual(response, b'')
+
+        # The uncompressed representation's ETag doesn't match the compressed representation
+        environ = {'HTTP_ACCEPT_ENCODING': 'gzip', 'HTTP_IF_NONE_MATCH': '"65a8e27d8879283831b664bd8b7f0ad4"'}
+        status, headers, response = app.request('GET', '/test.txt', environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertIn(('ETag', '"65a8e27d8879283831b664bd8b7f0ad4-gzip"'), headers)
+        self.assertEqual(gzip.decompress(response), b'Hello, World!')
+
+        # The uncompressed representation's ETag
+        environ = {'HTTP_IF_NONE_MATCH': '"65a8e27d8879283831b664bd8b7f0ad4"'}
+        status, headers, response = app.request('GET', '/test.txt', environ=environ)
+        self.assertEqual(status, '304 Not Modified')
+        self.assertListEqual(headers, [('ETag', '"65a8e27d8879283831b664bd8b7f0ad4"'), ('Vary', 'Accept-Encoding')])
+        self.assertEqual(response, b'')
+
+        # The compressed representation's ETag doesn't match the uncompressed representation
+        environ = {'HTTP_IF_NONE_MATCH': '"65a8e27d8879283831b664bd8b7f0ad4-gzip"'}
+        status, headers, response = app.request('GET', '/test.txt', environ=environ)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(response, b'Hello, World!')
+
+
     def test_raw_wsgi(self):
         static = StaticRequest('test.txt', b'Hello!')
 
@@ -0,0 +1,577 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+# pylint: disable=missing-class-docstring, missing-function-docstring, missing-module-docstring
+
+import asyncio
+from io import StringIO
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from unittest import TestCase, skipIf
+import unittest.mock
+
+from chisel import Application, Context, action, request
+from chisel.__main__ import main
+from chisel.gcmanager import GCManager
+from chisel.server import Server, load_application, serve
+from chisel.shedding import REQUEST_START_EXTENSION
+
+
+# Test application
+@action(spec='''\
+action my_action
+    input
+        int value
+    output
+        int result
+''')
+def my_action(unused_ctx, req):
+    return {'result': req['value'] * 2}
+
+
+@action(spec='''\
+action my_query
+    urls
+        GET
+    query
+        int value
+    output
+        int result
+''')
+def my_query(unused_ctx, req):
+    return {'result': req['value'] * 2}
+
+
+@request(urls=(('GET', None),))
+def my_stream(unused_environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    yield b'Hello'
+    yield b', World'
+
+
+@request(urls=(('GET', None),))
+def my_file(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    file = open(environ['QUERY_STRING'], 'rb') # pylint: disable=consider-using-with
+    file.seek(2)
+    return environ['wsgi.file_wrapper'](file)
+
+
+def create_application():
+    application = Application()
+    application.add_requests([my_action, my_query, my_stream, my_file])
+    return application
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head[:-4].decode('latin-1').split('\r\n')
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name] = value.strip()
+    headers.pop('date')
+    if 'content-length' in headers:
+        content = await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        chunks = []
+        while True:
+            chunk_size = int(await reader.readuntil(b'\r\n'), 16)
+            chunks.append(await reader.readexactly(chunk_size + 2))
+            if chunk_size == 0:
+                break
+        content = b''.join(chunk[:-2] for chunk in chunks)
+    else:
+        content = await reader.read()
+    return lines[0], headers, content
+
+
+class TestServer(TestCase):
+
+    def run_server(self, client, app=None, **kwargs):
+        async def run():
+            server = Server(app if app is not None else create_application().asgi, **kwargs)
+            asyncio_server = await server.start('127.0.0.1', 0)
+            try:
+                reader, writer = await asyncio.open_connection(*asyncio_server.sockets[0].getsockname())
+                try:
+                    return await client(reader, writer)
+                finally:
+                    writer.close()
+            finally:
+                server.close()
+                await server.wait_closed()
+
+        return asyncio.run(run())
+
+    def test_keep_alive(self):
+        async def client(reader, writer):
+            responses = []
+            for value in (1, 2):
+                writer.write(b'POST /my_action HTTP/1.1\r\nHost: localhost\r\nContent-Length: 11\r\n\r\n{"value":%d}' % value)
+                responses.append(await read_response(reader))
+            return responses
+
+        self.assertEqual(self.run_server(client), [
+            ('HTTP/1.1 200 OK', {'content-type': 'application/json', 'content-length': '12'}, b'{"result":2}'),
+            ('HTTP/1.1 200 OK', {'content-type': 'application/json', 'content-length': '12'}, b'{"result":4}')
+        ])
+
+    def test_pipelining(self):
+        async def client(reader, writer):
+            writer.write(
+                b'POST /my_action HTTP/1.1\r\nContent-Length: 11\r\n\r\n{"value":1}'
+                b'GET /my_stream HTTP/1.1\r\n\r\n'
+                b'GET /my_query?value=3 HTTP/1.1\r\nConnection: close\r\n\r\n'
+            )
+            return [await read_response(reader), await read_response(reader), await read_response(reader), await reader.read()]
+
+        self.assertEqual(self.run_server(client), [
+            ('HTTP/1.1 200 OK', {'content-type': 'application/json', 'content-length': '12'}, b'{"result":2}'),
+            ('HTTP/1.1 200 OK', {'content-type': 'text/plain', 'transfer-encoding': 'chunked'}, b'Hello, World'),
+            (
+                'HTTP/1.1 200 OK',
+                {'content-type': 'application/json', 'content-length': '12', 'connection': 'close'},
+                b'{"result":6}'
+            ),
+            b''
+        ])
+
+    def test_chunked_request(self):
+        async def client(reader, writer):
+            writer.write(
+                b'POST /my_action HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n'
+                b'4\r\n{"va\r\n7;ext=1\r\nlue":5}\r\n0\r\nTrailer: value\r\n\r\n'
+            )
+            return await read_response(reader)
+
+        self.assertEqual(
+            self.run_server(client),
+            ('HTTP/1.1 200 OK', {'content-type': 'application/json', 'content-length': '13'}, b'{"result":10}')
+        )
+
+    def test_chunked_request_invalid(self):
+        async def client(reader, writer):
+            writer.write(b'POST /my_action HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\nxyz\r\n')
+            return await read_response(reader), await reader.read()
+
+        status, headers, content = self.run_server(client)[0]
+        self.assertEqual(status, 'HTTP/1.1 408 Request Timeout')
+        self.assertEqual(headers['connection'], 'close')
+        self.assertIn(b'"error":"IOError"', content)
+
+    def test_expect_continue(self):
+        async def client(reader, writer):
+            writer.write(b'POST /my_action HTTP/1.1\r\nContent-Length: 11\r\nExpect: 100-continue\r\n\r\n')
+            interim = await reader.readuntil(b'\r\n\r\n')
+            writer.write(b'{"value":1}')
+            return interim, await read_response(reader)
+
+        self.assertEqual(self.run_server(client), (
+            b'HTTP/1.1 100 Continue\r\n\r\n',
+            ('HTTP/1.1 200 OK', {'content-type': 'application/json', 'content-length': '12'}, b'{"result":2}')
+        ))
+
+    def test_http_1_0(self):
+        async def client(reader, writer):
+            writer.write(b'GET /my_stream HTTP/1.0\r\n\r\n')
+            return await read_response(reader), await reader.read()
+
+        self.assertEqual(self.run_server(client), (
+            ('HTTP/1.1 200 OK', {'content-type': 'text/plain', 'connection': 'close'}, b'Hello, World'),
+            b''
+        ))
+
+    def test_http_1_0_keep_alive(self):
+        async def client(reader, writer):
+            writer.write(b'GET /my_query?value=1 HTTP/1.0\r\nConnection: keep-alive\r\n\r\n')
+            response = await read_response(reader)
+            writer.write(b'GET /my_query?value=2 HTTP/1.0\r\n\r\n')
+            return response, await read_response(reader)
+
+        self.assertEqual(self.run_server(client), (
+            (
+                'HTTP/1.1 200 OK',
+                {'content-type': 'application/json', 'content-length': '12', 'connection': 'keep-alive'},
+                b'{"result":2}'
+            ),
+            (
+                'HTTP/1.1 200 OK',
+                {'content-type': 'application/json', 'content-length': '12', 'connection': 'close'},
+                b'{"result":4}'
+            )
+        ))
+
+    def test_head(self):
+        async def client(reader, writer):
+            writer.write(b'HEAD /my_query?value=1 HTTP/1.1\r\n\r\nGET /my_stream HTTP/1.1\r\n\r\n')
+            head = await reader.readuntil(b'\r\n\r\n')
+            return head.split(b'\r\n')[:2], await read_response(reader)
+
+        self.assertEqual(self.run_server(client), (
+            [b'HTTP/1.1 200 OK', b'content-type: application/json'],
+            ('HTTP/1.1 200 OK', {'content-type': 'text/plain', 'transfer-encoding': 'chunked'}, b'Hello, World')
+        ))
+
+    def test_absolute_target(self):
+        async def client(reader, writer):
+            writer.write(b'GET http://localhost/my_query?value=4 HTTP/1.1\r\n\r\n')
+            return await read_response(reader)
+
+        self.assertEqual(
+            self.run_server(client),
+            ('HTTP/1.1 200 OK', {'content-type': 'application/json', 'content-length': '12'}, b'{"result":8}')
+        )
+
+    def test_sendfile(self):
+        with tempfile.NamedTemporaryFile() as file:
+            file.write(b'Hello, World' * 10000)
+            file.flush()
+
+            async def client(reader, writer):
+                responses = []
+                for _ in range(2):
+                    writer.write(f'GET /my_file?{file.name} HTTP/1.1\r\n\r\n'.encode('utf-8'))
+                    responses.append(await read_response(reader))
+                return responses
+
+            with unittest.mock.patch('asyncio.base_events.BaseEventLoop.sendfile', autospec=True,
+                                     side_effect=asyncio.base_events.BaseEventLoop.sendfile) as mock_sendfile:
+                responses = self.run_server(client)
+            self.assertEqual(mock_sendfile.call_count, 2)
+            self.assertEqual(mock_sendfile.call_args[0][3:], (2, 119998))
+            for response in responses:
+                self.assertEqual(
+                    response,
+                    ('HTTP/1.1 200 OK', {'content-type': 'text/plain', 'content-length': '119998'}, b'llo, World' + b'Hello, World' * 9999)
+                )
+
+    def test_zerocopysend_chunked(self):
+        with tempfile.TemporaryFile() as file:
+            file.write(b'Hello, World')
+            file.flush()
+
+            async def app(unused_scope, unused_receive, send):
+                await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', b'text/plain')]})
+                await send({'type': 'http.response.zerocopysend', 'file': file, 'offset': 0, 'count': 5, 'more_body': True})
+                await send({'type': 'http.response.zerocopysend', 'file': file, 'offset': 7, 'more_body': True})
+                await send({'type': 'http.response.body', 'body': b'!'})
+
+            async def client(reader, writer):
+                writer.write(b'GET / HTTP/1.1\r\n\r\n')
+                return await read_response(reader)
+
+            self.assertEqual(
+                self.run_server(client, app=app),
+                ('HTTP/1.1 200 OK', {'content-type': 'text/plain', 'transfer-encoding': 'chunked'}, b'HelloWorld!')
+            )
+
+    def test_bad_requests(self):
+        for request_bytes, status in (
+            (b'GET\r\n\r\n', 'HTTP/1.1 400 Bad Request'),
+            (b'GET /my_stream HTTP/2.0\r\n\r\n', 'HTTP/1.1 505 HTTP Version Not Supported'),
+            (b'GET my_stream HTTP/1.1\r\n\r\n', 'HTTP/1.1 400 Bad Request'),
+            (b'GET /my_stream HTTP/1.1\r\nBad Header: value\r\n\r\n', 'HTTP/1.1 400 Bad Request'),
+            (b'GET /my_stream HTTP/1.1\r\nNoColon\r\n\r\n', 'HTTP/1.1 400 Bad Request'),
+            (b'POST /my_action HTTP/1.1\r\nContent-Length: 2\r\nTransfer-Encoding: chunked\r\n\r\n', 'HTTP/1.1 400 Bad Request'),
+            (b'POST /my_action HTTP/1.1\r\nTransfer-Encoding: gzip, chunked\r\n\r\n', 'HTTP/1.1 501 Not Implemented'),
+            (b'POST /my_action HTTP/1.0\r\nTransfer-Encoding: chunked\r\n\r\n', 'HTTP/1.1 400 Bad Request'),
+            (b'POST /my_action HTTP/1.1\r\nContent-Length: 2\r\nContent-Length: 3\r\n\r\n', 'HTTP/1.1 400 Bad Request'),
+            (b'POST /my_action HTTP/1.1\r\nContent-Length: -2\r\n\r\n', 'HTTP/1.1 400 Bad Request'),
+            (b'GET /my_stream HTTP/1.1\r\nX-Big: ' + b'x' * 1000 + b'\r\n\r\n', 'HTTP/1.1 431 Request Header Fields Too Large')
+        ):
+            async def client(reader, writer, request_bytes=request_bytes):
+                writer.write(request_bytes)
+                return await read_response(reader), await reader.read()
+
+            with self.subTest(request_bytes=request_bytes):
+                (response_status, headers, content), rest = self.run_server(client, max_header_bytes=500)
+                self.assertEqual(response_status, status)
+                self.assertEqual(headers['connection'], 'close')
+                self.assertEqual(content, status.split(' ', 2)[2].encode('utf-8'))
+                self.assertEqual(rest, b'')
+
+    def test_header_timeout(self):
+        async def client(reader, writer):
+            writer.write(b'GET /my_stream HTTP/1.1\r\n')
+            return await read_response(reader), await reader.read()
+
+        self.assertEqual(self.run_server(client, header_timeout=0.05), (
+            (
+                'HTTP/1.1 408 Request Timeout',
+                {'content-type': 'text/plain; charset=utf-8', 'content-length': '15', 'connection': 'close'},
+                b'Request Timeout'
+            ),
+            b''
+        ))
+
+    def test_keepalive_timeout(self):
+        async def client(reader, writer):
+            writer.write(b'GET /my_stream HTTP/1.1\r\n\r\n')
+            return await read_response(reader), await reader.read()
+
+        self.assertEqual(self.run_server(client, keepalive_timeout=0.05), (
+            ('HTTP/1.1 200 OK', {'content-type': 'text/plain', 'transfer-encoding': 'chunked'}, b'Hello, World'),
+            b''
+        ))
+
+    def test_body_timeout(self):
+        async def client(reader, writer):
+            writer.write(b'POST /my_action HTTP/1.1\r\nContent-Length: 11\r\n\r\n{"val')
+            return await read_response(reader), await reader.read()
+
+        (status, headers, _), rest = self.run_server(client, body_timeout=0.05)
+        self.assertEqual(status, 'HTTP/1.1 408 Request Timeout')
+        self.assertEqual(headers['connection'], 'close')
+        self.assertEqual(rest, b'')
+
+    def test_drain(self):
+        async def client(reader, writer):
+            writer.write(b'GET /my_stream HTTP/1.1\r\nContent-Length: 5\r\n\r\nabcdeGET /my_stream HTTP/1.1\r\nContent-Length: 20\r\n\r\n')
+            writer.write(b'x' * 20)
+            return await read_response(reader), await read_response(reader), await reader.read()
+
+        self.assertEqual(self.run_server(client, max_drain_bytes=10), (
+            ('HTTP/1.1 200 OK', {'content-type': 'text/plain', 'transfer-encoding': 'chunked'}, b'Hello, World'),
+            ('HTTP/1.1 200 OK', {'content-type': 'text/plain', 'transfer-encoding': 'chunked'}, b'Hello, World'),
+            b''
+        ))
+
+    def test_app_exception(self):
+        async def app(unused_scope, unused_receive, unused_send):
+            raise ValueError('BAD')
+
+        async def client(reader, writer):
+            writer.write(b'GET / HTTP/1.1\r\n\r\n')
+            return await read_response(reader)
+
+        with self.assertLogs('chisel.server') as cm_logs:
+            self.assertEqual(self.run_server(client, app=app), (
+                'HTTP/1.1 500 Internal Server Error',
+                {'content-type': 'text/plain; charset=utf-8', 'content-length': '21', 'connection': 'close'},
+                b'Internal Server Error'
+            ))
+        self.assertIn('exception raised by ASGI application', cm_logs.output[0])
+
+    def test_app_incomplete(self):
+        async def app(unused_scope, unused_receive, send):
+            await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b'Hello', 'more_body': True})
+
+        async def client(reader, writer):
+            writer.write(b'GET / HTTP/1.1\r\n\r\n')
+            return await reader.read()
+
+        response = self.run_server(client, app=app)
+        self.assertTrue(response.startswith(b'HTTP/1.1 200 OK\r\ntransfer-encoding: chunked\r\n'))
+        self.assertTrue(response.endswith(b'\r\n\r\n5\r\nHello\r\n'))
+
+    def test_app_messages(self):
+        errors = []
+
+        async def app(unused_scope, receive, send):
+            for message in (
+                {'type': 'http.response.body', 'body': b'Hello'},
+                {'type': 'http.response.start', 'status': 204, 'headers': [(b'connection', b'close')]},
+                {'type': 'http.response.start', 'status': 204, 'headers': []},
+                {'type': 'http.response.unknown'},
+                {'type': 'http.response.body'},
+                {'type': 'http.response.body'}
+            ):
+                try:
+                    await send(message)
+                except RuntimeError as exc:
+                    errors.append(str(exc))
+            self.assertEqual(await receive(), {'type': 'http.request', 'body': b'', 'more_body': False})
+            self.assertEqual(await receive(), {'type': 'http.disconnect'})
+
+        async def client(reader, writer):
+            writer.write(b'GET / HTTP/1.1\r\n\r\n')
+            return await reader.read()
+
+        response = self.run_server(client, app=app)
+        self.assertTrue(response.startswith(b'HTTP/1.1 204 No Content\r\nconnection: close\r\ndate: '))
+        self.assertTrue(response.endswith(b'\r\n\r\n'))
+        self.assertEqual(errors, [
+            'Response not started',
+            'Response already started',
+            "Unexpected ASGI message 'http.response.unknown'",
+            "Unexpected ASGI message 'http.response.body' after response completed"
+        ])
+
+    def test_request_start(self):
+        scopes = []
+
+        async def app(scope, unused_receive, send):
+            scopes.append(scope)
+            await send({'type': 'http.response.start', 'status': 204, 'headers': [(b'connection', b'close')]})
+            await send({'type': 'http.response.body'})
+
+        async def client(reader, writer):
+            writer.write(b'GET / HTTP/1.1\r\n\r\n')
+            return await reader.read()
+
+        start_time = time.time()
+        self.run_server(client, app=app)
+        request_start = scopes[0]['extensions'][REQUEST_START_EXTENSION]['time']
+        self.assertGreaterEqual(request_start, start_time)
+        self.assertLessEqual(request_start, time.time())
+
+    def test_close(self):
+        async def run():
+            server = Server(create_application().asgi)
+            asyncio_server = await server.start('127.0.0.1', 0)
+            reader, writer = await asyncio.open_connection(*asyncio_server.sockets[0].getsockname())
+            writer.write(b'GET /my_stream HTTP/1.1\r\n\r\n')
+            response = await read_response(reader)
+
+            # The idle connection is closed
+            server.close()
+            await server.wait_closed()
+            rest = await reader.read()
+            writer.close()
+            return response, rest
+
+        self.assertEqual(asyncio.run(run()), (
+            ('HTTP/1.1 200 OK', {'content-type': 'text/plain', 'transfer-encoding': 'chunked'}, b'Hello, World'),
+            b''
+        ))
+
+    @skipIf(not hasattr(socket, 'AF_UNIX'), 'Unix domain sockets not available')
+    def test_unix_socket(self):
+        async def run(path):
+            server = Server(create_application().asgi)
+            await server.start(unix_path=path)
+            try:
+                reader, writer = await asyncio.open_unix_connection(path)
+                writer.write(b'GET /my_query?value=7 HTTP/1.1\r\nConnection: close\r\n\r\n')
+                response = await read_response(reader)
+                writer.close()
+                return response
+            finally:
+                server.close()
+                await server.wait_closed()
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.assertEqual(asyncio.run(run(os.path.join(temp_dir, 'chisel.sock'))), (
+                'HTTP/1.1 200 OK',
+                {'content-type': 'application/json', 'content-length': '13', 'connection': 'close'},
+                b'{"result":14}'
+            ))
+
+    def test_serve(self):
+        application = create_application()
+        thread_names = []
+
+        @action(spec='''\
+action my_thread
+''')
+        def my_thread(unused_ctx, unused_req):
+            thread_names.append(threading.current_thread().name)
+            return {}
+
+        application.add_request(my_thread)
+
+        async def run():
+            sockets = []
+
+            async def stop(server):
+                while not sockets:
+                    await asyncio.sleep(0.01)
+                reader, writer = await asyncio.open_connection(*sockets[0])
+                writer.write(b'POST /my_thread HTTP/1.1\r\nConnection: close\r\n\r\n')
+                response = await read_response(reader)
+                writer.close()
+                sockets.append(response)
+                self.assertEqual(server.requests, 1)
+
+            with unittest.mock.patch('chisel.server._LOG') as mock_log:
+                mock_log.info.side_effect = lambda message, sockname: sockets.append(sockname)
+                await serve(application, '127.0.0.1', 0, threads=2, stop=stop)
+            return sockets[1]
+
+        self.assertEqual(
+            asyncio.run(run()),
+            ('HTTP/1.1 200 OK', {'content-type': 'application/json', 'content-length': '2', 'connection': 'close'}, b'{}')
+        )
+        self.assertTrue(thread_names[0].startswith('chisel-request'))
+        self.assertIsNone(application.executor)
+
+    def test_serve_gc_manager(self):
+        application = create_application()
+        application.gc_manager = GCManager(idle_seconds=0.01)
+
+        async def stop(unused_server):
+            self.assertTrue(application.gc_manager.started)
+            while not application.gc_manager.deferred_collections:
+                await asyncio.sleep(0.01)
+
+        try:
+            with unittest.mock.patch('chisel.server._LOG'):
+                asyncio.run(serve(application, '127.0.0.1', 0, stop=stop))
+            self.assertGreaterEqual(application.gc_manager.deferred_collections, 1)
+        finally:
+            application.gc_manager.stop()
+
+    def test_load_application(self):
+        self.assertIs(load_application('chisel:Application'), Application)
+        self.assertIs(load_application('chisel.app:Context.create_environ'), Context.create_environ)
+
+        for app_spec in ('chisel', ':Application', 'chisel:'):
+            with self.subTest(app_spec=app_spec):
+                with self.assertRaises(ValueError) as cm_exc:
+                    load_application(app_spec)
+                self.assertEqual(str(cm_exc.exception), f'Invalid application {app_spec!r} - expected "module:attribute"')
+
+    def test_main(self):
+        with unittest.mock.patch('chisel.__main__.serve', unittest.mock.Mock()) as mock_serve, \
+             unittest.mock.patch('asyncio.run') as mock_run, \
+             unittest.mock.patch('logging.basicConfig'):
+            main(['serve', 'chisel:Application', '-p', '8081', '-t', '4', '--header-timeout', '5'])
+        mock_run.assert_called_once_with(mock_serve.return_value)
+        mock_serve.assert_called_once_with(
+            Application, host='127.0.0.1', port=8081, unix_path=None, threads=4, drain_timeout=30,
+            header_timeout=5.0, body_timeout=30, keepalive_timeout=5
+        )
+
+    def test_main_prefork(self):
+        with unittest.mock.patch('chisel.__main__.PreforkServer') as mock_prefork_server, \
+             unittest.mock.patch('logging.basicConfig'):
+            main([
+                'serve', 'chisel:Application', '-w', '3', '--max-requests', '1000', '--max-rss', '200', '--cpu-affinity',
+                '--drain-timeout', '5'
+            ])
+        mock_prefork_server.assert_called_once_with(
+            Application, workers=3, cpu_affinity=True, max_requests=1000, max_rss=200 * 1024 * 1024, threads=None,
+            drain_timeout=5, warmup=None, reload_args=sys.orig_argv[1:], header_timeout=10, body_timeout=30, keepalive_timeout=5
+        )
+        mock_prefork_server.return_value.bind.assert_called_once_with('127.0.0.1', 8080, unix_path=None)
+        mock_prefork_server.return_value.run.assert_called_once_with()
+
+    def test_main_warmup(self):
+        with unittest.mock.patch('chisel.__main__.PreforkServer') as mock_prefork_server, \
+             unittest.mock.patch('logging.basicConfig'):
+            main(['serve', 'chisel:Application', '--warmup', '/my_query?value=1', '--warmup', '/my_stream'])
+        warmup = mock_prefork_server.call_args.kwargs['warmup']
+
+        # The warm-up requests are made to chisel applications only
+        application = create_application()
+        with unittest.mock.patch.object(Application, 'request', wraps=application.request) as mock_request:
+            warmup(application)
+            warmup(application.asgi)
+        self.assertEqual(mock_request.call_args_list, [
+            unittest.mock.call('GET', '/my_query', query_string='value=1'),
+            unittest.mock.call('GET', '/my_stream', query_string='')
+        ])
+
+    def test_main_error(self):
+        with unittest.mock.patch('sys.stderr', StringIO()) as stderr, \
+             unittest.mock.patch('logging.basicConfig'):
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['serve', 'chisel:Unknown'])
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertIn("error: module 'chisel' has no attribute 'Unknown'", stderr.getvalue())
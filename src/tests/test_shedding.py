@@ -0,0 +1,150 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+# pylint: disable=missing-class-docstring, missing-function-docstring, missing-module-docstring
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+from unittest import TestCase
+
+from chisel import Request
+from chisel.shedding import LOAD_SHED_INTERVAL_SECONDS, LOAD_SHED_TARGET_SECONDS, REQUEST_START_EXTENSION, \
+    LoadShedder, get_queue_delay
+
+
+class TestLoadShedder(TestCase):
+
+    def test_defaults(self):
+        load_shedder = LoadShedder()
+        self.assertEqual(load_shedder.target, LOAD_SHED_TARGET_SECONDS)
+        self.assertEqual(load_shedder.interval, LOAD_SHED_INTERVAL_SECONDS)
+        self.assertEqual(load_shedder.exempt, set())
+        self.assertEqual(load_shedder.exempt_doc_groups, set())
+        self.assertEqual(load_shedder.retry_after, 1)
+        self.assertFalse(load_shedder.trust_request_start)
+        self.assertFalse(load_shedder.overloaded)
+        self.assertIsNone(load_shedder.min_delay)
+
+    def test_admit(self):
+        load_shedder = LoadShedder(target=0.1, interval=1)
+
+        # Large delays within the first interval are admitted
+        self.assertTrue(load_shedder.admit(0.5, now=10))
+        self.assertTrue(load_shedder.admit(0.2, now=10.5))
+        self.assertFalse(load_shedder.overloaded)
+        self.assertIsNone(load_shedder.min_delay)
+
+        # The first interval's minimum delay exceeds the target - overloaded
+        self.assertFalse(load_shedder.admit(0.3, now=11))
+        self.assertTrue(load_shedder.overloaded)
+        self.assertEqual(load_shedder.min_delay, 0.2)
+
+        # Requests within the target and exempt requests are admitted
+        self.assertTrue(load_shedder.admit(0.05, now=11.5))
+        self.assertTrue(load_shedder.admit(0.3, exempt=True, now=11.6))
+        self.assertFalse(load_shedder.admit(0.3, now=11.7))
+
+        # The second interval's minimum delay is within the target - not overloaded
+        self.assertTrue(load_shedder.admit(0.3, now=12))
+        self.assertFalse(load_shedder.overloaded)
+        self.assertEqual(load_shedder.min_delay, 0.05)
+        self.assertEqual(
+            (load_shedder.admitted, load_shedder.rejected, load_shedder.overloaded_intervals, load_shedder.max_delay),
+            (5, 2, 1, 0.5)
+        )
+
+    def test_is_exempt(self):
+        load_shedder = LoadShedder(exempt=['health'], exempt_doc_groups=['Status'])
+        self.assertTrue(load_shedder.is_exempt(Request(name='health')))
+        self.assertTrue(load_shedder.is_exempt(Request(name='version', doc_group='Status')))
+        self.assertFalse(load_shedder.is_exempt(Request(name='report', doc_group='Reports')))
+        self.assertFalse(load_shedder.is_exempt(Request(name='report')))
+
+    def test_admit_request(self):
+        load_shedder = LoadShedder(target=0.1, interval=0, exempt=['health'], trust_request_start=True)
+        environ = {'HTTP_X_REQUEST_START': f't={time.time() - 10:.3f}'}
+        self.assertTrue(load_shedder.admit_request(environ, Request(name='report')))
+        self.assertFalse(load_shedder.admit_request(environ, Request(name='report')))
+        self.assertTrue(load_shedder.admit_request(environ, Request(name='health')))
+
+        # Requests without an arrival time are always admitted and are not recorded
+        self.assertTrue(load_shedder.admit_request({}, Request(name='report')))
+        self.assertEqual((load_shedder.admitted, load_shedder.rejected), (2, 1))
+
+    def test_admit_request_untrusted(self):
+        load_shedder = LoadShedder(target=0.1, interval=0)
+
+        # The client's request start header is ignored
+        environ = {'HTTP_X_REQUEST_START': f't={time.time() - 10:.3f}'}
+        for _ in range(3):
+            self.assertTrue(load_shedder.admit_request(environ, Request(name='report')))
+        self.assertEqual((load_shedder.admitted, load_shedder.rejected), (0, 0))
+
+        # The server arrival time is used
+        scope = {'extensions': {REQUEST_START_EXTENSION: {'time': time.time() - 10}}}
+        self.assertTrue(load_shedder.admit_request({**environ, 'asgi.scope': scope}, Request(name='report')))
+        self.assertFalse(load_shedder.admit_request({**environ, 'asgi.scope': scope}, Request(name='report')))
+        self.assertEqual((load_shedder.admitted, load_shedder.rejected), (1, 1))
+
+    def test_run_in_executor(self):
+        load_shedder = LoadShedder(target=0.01, interval=0)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        finish = threading.Event()
+        self.addCleanup(finish.set)
+
+        async def run():
+            # No queue
+            self.assertEqual(load_shedder.executor_delay(), 0.0)
+            self.assertTrue(load_shedder.admit_request({}, Request(name='report')))
+            self.assertEqual(load_shedder.admitted, 0)
+
+            # The first function blocks the executor - the second waits in its queue
+            future_block = load_shedder.run_in_executor(executor, finish.wait, 10)
+            future_queued = load_shedder.run_in_executor(executor, sum, (1, 2))
+            await asyncio.sleep(0.05)
+            self.assertGreaterEqual(load_shedder.executor_delay(), 0.05)
+
+            # Requests without an arrival time are shed by the executor's queueing delay
+            self.assertTrue(load_shedder.admit_request({}, Request(name='report')))
+            self.assertFalse(load_shedder.admit_request({}, Request(name='report')))
+
+            # The queue drains
+            finish.set()
+            self.assertTrue(await future_block)
+            self.assertEqual(await future_queued, 3)
+            self.assertEqual(load_shedder.executor_delay(), 0.0)
+
+        asyncio.run(run())
+
+    def test_get_queue_delay(self):
+        now = 1700000000.5
+        self.assertEqual(get_queue_delay({'HTTP_X_REQUEST_START': 't=1700000000.25'}, now=now, trust_request_start=True), 0.25)
+        self.assertEqual(get_queue_delay({'HTTP_X_REQUEST_START': ' 1700000000.25 '}, now=now, trust_request_start=True), 0.25)
+        self.assertEqual(get_queue_delay({'HTTP_X_REQUEST_START': 't=1700000000250'}, now=now, trust_request_start=True), 0.25)
+        self.assertEqual(get_queue_delay({'HTTP_X_REQUEST_START': 't=1700000000250000'}, now=now, trust_request_start=True), 0.25)
+
+        # Clock skew
+        self.assertEqual(get_queue_delay({'HTTP_X_REQUEST_START': 't=1700000001'}, now=now, trust_request_start=True), 0.0)
+
+        # Server arrival time
+        scope = {'extensions': {REQUEST_START_EXTENSION: {'time': 1700000000.0}}}
+        self.assertEqual(get_queue_delay({'asgi.scope': scope}, now=now), 0.5)
+        self.assertEqual(get_queue_delay({'asgi.scope': scope, 'HTTP_X_REQUEST_START': 'invalid'}, now=now, trust_request_start=True), 0.5)
+        self.assertEqual(
+            get_queue_delay({'asgi.scope': scope, 'HTTP_X_REQUEST_START': 't=1700000000.25'}, now=now, trust_request_start=True), 0.25
+        )
+
+        # The untrusted request start header is ignored
+        self.assertEqual(get_queue_delay({'asgi.scope': scope, 'HTTP_X_REQUEST_START': 't=1700000000.25'}, now=now), 0.5)
+        self.assertIsNone(get_queue_delay({'HTTP_X_REQUEST_START': 't=1700000000.25'}, now=now))
+
+        # Unknown arrival time
+        self.assertIsNone(get_queue_delay({}))
+        self.assertIsNone(get_queue_delay({'HTTP_X_REQUEST_START': 'invalid'}, trust_request_start=True))
+        self.assertIsNone(get_queue_delay({'asgi.scope': {}}))
+
+        # Current time
+        self.assertGreaterEqual(get_queue_delay({'HTTP_X_REQUEST_START': f't={time.time() - 10}'}, trust_request_start=True), 10)
@@ -0,0 +1,181 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+# pylint: disable=missing-class-docstring, missing-function-docstring, missing-module-docstring
+
+import asyncio
+import threading
+import time
+from unittest import TestCase
+
+from chisel import Context
+from chisel.stream import HEARTBEAT, StreamArray, aiter_heartbeat, is_stream, iter_heartbeat
+
+
+class TestStreamArray(TestCase):
+
+    def test_stream_array(self):
+        stream = Context.stream(range(3))
+        self.assertIsInstance(stream, StreamArray)
+        self.assertEqual(list(stream), [0, 1, 2])
+        self.assertEqual(list(stream), [0, 1, 2])
+
+        # Iterables without a close method
+        stream.close()
+
+    def test_close(self):
+        closed = []
+
+        def values():
+            try:
+                yield 1
+                yield 2
+            finally:
+                closed.append(True)
+
+        stream = StreamArray(values())
+        self.assertEqual(next(iter(stream)), 1)
+        stream.close()
+        self.assertEqual(closed, [True])
+
+    def test_is_stream(self):
+        self.assertTrue(is_stream(StreamArray([])))
+        self.assertTrue(is_stream(value for value in range(3)))
+        self.assertFalse(is_stream([]))
+        self.assertFalse(is_stream(()))
+        self.assertFalse(is_stream(range(3)))
+        self.assertFalse(is_stream(None))
+
+
+class TestIterHeartbeat(TestCase):
+
+    def test_values(self):
+        self.assertEqual(list(iter_heartbeat(range(5), 5)), [0, 1, 2, 3, 4])
+        self.assertEqual(list(iter_heartbeat(StreamArray([]), 5)), [])
+
+    def test_heartbeat(self):
+        value_ready = threading.Event()
+
+        def values():
+            yield 1
+            value_ready.wait()
+            yield 2
+
+        iterator = iter_heartbeat(values(), 0.01)
+        self.assertEqual(next(iterator), 1)
+        self.assertIs(next(iterator), HEARTBEAT)
+        value_ready.set()
+        self.assertEqual([value for value in iterator if value is not HEARTBEAT], [2])
+
+    def test_error(self):
+
+        def values():
+            yield 1
+            raise ValueError('BAD')
+
+        iterator = iter_heartbeat(values(), 5)
+        self.assertEqual(next(iterator), 1)
+        with self.assertRaises(ValueError) as cm_exc:
+            next(iterator)
+        self.assertEqual(str(cm_exc.exception), 'BAD')
+
+        # Error getting the iterator
+        with self.assertRaises(TypeError):
+            list(iter_heartbeat(None, 5))
+
+    def test_backpressure(self):
+        produced = []
+        closed = threading.Event()
+
+        def values():
+            try:
+                for value in range(100):
+                    produced.append(value)
+                    yield value
+            finally:
+                closed.set()
+
+        # The producer pauses once the queue is full
+        iterator = iter_heartbeat(values(), 5, queue_size=2)
+        self.assertEqual(next(iterator), 0)
+        time.sleep(0.1)
+        self.assertLessEqual(len(produced), 4)
+
+        # Closing the iterator closes the values iterable
+        iterator.close()
+        self.assertTrue(closed.wait(5))
+        self.assertLess(len(produced), 100)
+
+
+class TestAiterHeartbeat(TestCase):
+
+    @staticmethod
+    async def _values(count):
+        for value in range(count):
+            await asyncio.sleep(0)
+            yield value
+
+    def test_values(self):
+
+        async def run():
+            return [value async for value in aiter_heartbeat(self._values(5), 5)]
+
+        self.assertEqual(asyncio.run(run()), [0, 1, 2, 3, 4])
+
+    def test_heartbeat(self):
+
+        async def run():
+            value_ready = asyncio.Event()
+
+            async def values():
+                yield 1
+                await value_ready.wait()
+                yield 2
+
+            iterator = aiter_heartbeat(values(), 0.01)
+            result = [await anext(iterator), await anext(iterator)]
+            value_ready.set()
+            result.extend([value async for value in iterator if value is not HEARTBEAT])
+            return result
+
+        self.assertEqual(asyncio.run(run()), [1, HEARTBEAT, 2])
+
+    def test_error(self):
+
+        async def run():
+            async def values():
+                yield 1
+                raise ValueError('BAD')
+
+            iterator = aiter_heartbeat(values(), 5)
+            self.assertEqual(await anext(iterator), 1)
+            with self.assertRaises(ValueError) as cm_exc:
+                await anext(iterator)
+            self.assertEqual(str(cm_exc.exception), 'BAD')
+
+        asyncio.run(run())
+
+    def test_close(self):
+
+        async def run():
+            events = []
+
+            async def values():
+                try:
+                    yield 1
+                    await asyncio.sleep(60)
+                    yield 2
+                except asyncio.CancelledError:
+                    events.append('cancelled')
+                    raise
+                finally:
+                    events.append('closed')
+
+            # Closing the iterator cancels the pending value and closes the values iterable
+            iterator = aiter_heartbeat(values(), 0.01)
+            self.assertEqual(await anext(iterator), 1)
+            self.assertIs(await anext(iterator), HEARTBEAT)
+            await iterator.aclose()
+            return events
+
+        self.assertEqual(asyncio.run(run()), ['cancelled', 'closed'])
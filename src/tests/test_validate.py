@@ -0,0 +1,511 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/chisel/blob/main/LICENSE
+
+# pylint: disable=missing-class-docstring, missing-function-docstring, missing-module-docstring
+
+from array import array
+from datetime import date, datetime, timezone
+from unittest import TestCase, skipIf
+import unittest.mock
+from uuid import UUID
+
+from schema_markdown import ValidationError, parse_schema_markdown, validate_type
+
+from chisel.validate import NUMPY_MIN_LENGTH, check_type, numpy, validate_type_inplace
+
+
+TEST_TYPES = parse_schema_markdown('''\
+struct MyStruct
+    int a
+    optional float b
+    optional string(nullable) c
+    optional date d
+    optional datetime e
+    optional uuid f
+    optional bool g
+    optional MyEnum h
+    optional MyStruct[] i
+    optional int(> 0){} j
+    optional PositiveInt[len > 0] k
+    optional any l
+    optional MyUnion m
+    optional MyEnum{} n
+    optional int(nullable)[] o
+
+typedef int(> 0, nullable) PositiveInt
+
+enum MyEnum
+    A
+    B
+
+union MyUnion
+    int x
+    string y
+
+struct MyNumbers
+    optional float[] a
+    optional int[] b
+    optional float(> 0, <= 100)[] c
+    optional PositiveInt2[] d
+    optional FloatArray[] e
+    optional int(nullable)[] f
+    optional float(== 1)[] g
+    optional int(< 1.5)[] h
+    optional int(>= 0, < 10)[len > 0] i
+
+typedef int(> 0) PositiveInt2
+
+typedef float[] FloatArray
+
+action my_action
+''')
+
+
+class TestValidateTypeInplace(TestCase):
+
+    def assert_validate(self, value_fn, type_name='MyStruct'):
+
+        # Validate a value copy with schema-markdown
+        try:
+            expected = validate_type(TEST_TYPES, type_name, value_fn())
+            expected_error = None
+        except ValidationError as exc:
+            expected = None
+            expected_error = (str(exc), exc.member_fqn)
+
+        # Validate in place
+        value = value_fn()
+        try:
+            actual = validate_type_inplace(TEST_TYPES, type_name, value)
+            actual_error = None
+        except ValidationError as exc:
+            actual = None
+            actual_error = (str(exc), exc.member_fqn)
+
+        self.assertEqual(actual_error, expected_error)
+        self.assertEqual(actual, expected)
+        return value, actual
+
+
+    def test_no_copy(self):
+        value, actual = self.assert_validate(lambda: {'a': 1, 'i': [{'a': 2}, {'a': 3, 'b': 1.5}], 'j': {'x': 1}})
+        self.assertIs(actual, value)
+        self.assertIs(actual['i'], value['i'])
+        self.assertIs(actual['i'][1], value['i'][1])
+        self.assertIs(actual['j'], value['j'])
+
+
+    def test_transform(self):
+        value, actual = self.assert_validate(lambda: {
+            'a': '5',
+            'b': 7,
+            'c': 'null',
+            'd': '2020-06-01',
+            'e': '2020-06-01T12:30:00Z',
+            'f': 'B7A9BEE1-0C7D-4B3D-B1D6-3B0F5D0C7A11',
+            'g': 'true',
+            'i': [{'a': 1.0, 'd': '2021-01-01'}],
+            'k': ['1', 'null', 3]
+        })
+        self.assertIs(actual, value)
+        self.assertEqual(actual, {
+            'a': 5,
+            'b': 7.0,
+            'c': None,
+            'd': date(2020, 6, 1),
+            'e': datetime(2020, 6, 1, 12, 30, tzinfo=timezone.utc),
+            'f': 'B7A9BEE1-0C7D-4B3D-B1D6-3B0F5D0C7A11',
+            'g': True,
+            'i': [{'a': 1, 'd': date(2021, 1, 1)}],
+            'k': [1, None, 3]
+        })
+
+
+    def test_transform_tuple(self):
+        value, actual = self.assert_validate(lambda: {'a': 1, 'k': (1, '2')})
+        self.assertIs(actual, value)
+        self.assertEqual(actual['k'], [1, 2])
+
+        # Untransformed tuples are not copied
+        value = {'a': 1, 'k': (1, 2)}
+        actual = validate_type_inplace(TEST_TYPES, 'MyStruct', value)
+        self.assertIs(actual['k'], value['k'])
+
+
+    def test_transform_objects(self):
+        uuid = UUID('b7a9bee1-0c7d-4b3d-b1d6-3b0f5d0c7a11')
+        self.assert_validate(lambda: {
+            'a': 1,
+            'd': date(2020, 6, 1),
+            'e': datetime(2020, 6, 1, tzinfo=timezone.utc),
+            'f': uuid
+        })
+
+
+    def test_empty_string_containers(self):
+        value, actual = self.assert_validate(lambda: '')
+        self.assertIsNot(actual, value)
+        self.assert_validate(lambda: {'a': 1, 'i': ''})
+        self.assert_validate(lambda: {'a': 1, 'j': ''})
+
+
+    def test_union(self):
+        self.assert_validate(lambda: {'a': 1, 'm': {'x': '1'}})
+        self.assert_validate(lambda: {'a': 1, 'm': {'y': 'abc'}})
+        self.assert_validate(lambda: {'a': 1, 'm': {}})
+        self.assert_validate(lambda: {'a': 1, 'm': {'x': 1, 'y': 'abc'}})
+        self.assert_validate(lambda: {'a': 1, 'm': {'z': 1}})
+
+
+    def test_any(self):
+        value, actual = self.assert_validate(lambda: {'a': 1, 'l': {'x': [1, '2']}})
+        self.assertIs(actual['l'], value['l'])
+
+
+    def test_enum(self):
+        self.assert_validate(lambda: {'a': 1, 'h': 'A', 'n': {'x': 'B'}})
+        self.assert_validate(lambda: {'a': 1, 'h': 'C'})
+
+
+    def test_nullable(self):
+        self.assert_validate(lambda: {'a': 1, 'c': None, 'o': [None, 'null', '1']})
+        self.assert_validate(lambda: {'a': 1, 'k': [None]})
+
+
+    def test_errors(self):
+        self.assert_validate(lambda: [])
+        self.assert_validate(lambda: {})
+        self.assert_validate(lambda: {'a': 'abc'})
+        self.assert_validate(lambda: {'a': 1.5})
+        self.assert_validate(lambda: {'a': True})
+        self.assert_validate(lambda: {'a': 1, 'b': 'nan'})
+        self.assert_validate(lambda: {'a': 1, 'b': True})
+        self.assert_validate(lambda: {'a': 1, 'c': 5})
+        self.assert_validate(lambda: {'a': 1, 'd': '2020-13-01'})
+        self.assert_validate(lambda: {'a': 1, 'd': datetime(2020, 1, 1)})
+        self.assert_validate(lambda: {'a': 1, 'e': '2020-01-01'})
+        self.assert_validate(lambda: {'a': 1, 'f': 'abc'})
+        self.assert_validate(lambda: {'a': 1, 'f': 5})
+        self.assert_validate(lambda: {'a': 1, 'g': 'yes'})
+        self.assert_validate(lambda: {'a': 1, 'i': [{'a': 1}, {'a': 'x'}]})
+        self.assert_validate(lambda: {'a': 1, 'i': {}})
+        self.assert_validate(lambda: {'a': 1, 'j': {'x': 0}})
+        self.assert_validate(lambda: {'a': 1, 'j': []})
+        self.assert_validate(lambda: {'a': 1, 'k': []})
+        self.assert_validate(lambda: {'a': 1, 'k': [1, 0]})
+        self.assert_validate(lambda: {'a': 1, 'z': 1})
+
+
+    def test_error_partial_transform(self):
+
+        # Values transformed before the error are re-validated with the same result
+        value = {'a': '1', 'd': '2020-06-01', 'i': [{'a': '2'}, {'a': 'x'}]}
+        with self.assertRaises(ValidationError) as cm_exc:
+            validate_type_inplace(TEST_TYPES, 'MyStruct', value)
+        self.assertEqual(str(cm_exc.exception), 'Invalid value "x" (type "str") for member "i.1.a", expected type "int"')
+        self.assertEqual(cm_exc.exception.member_fqn, 'i.1.a')
+
+
+    def test_unknown_type(self):
+        self.assert_validate(lambda: {}, 'Unknown')
+        self.assert_validate(lambda: {}, 'my_action')
+
+
+@skipIf(numpy is None, 'NumPy is not installed')
+class TestValidateTypeInplaceNumpy(TestCase):
+
+    def assert_validate(self, value, ndarray=False):
+        value_list = {key: list(array) for key, array in value.items()}
+
+        # Validate a value copy with schema-markdown
+        try:
+            expected = validate_type(TEST_TYPES, 'MyNumbers', value_list)
+            expected_error = None
+        except ValidationError as exc:
+            expected = None
+            expected_error = (str(exc), exc.member_fqn)
+
+        # Validate in place (vectorized)
+        try:
+            actual = validate_type_inplace(TEST_TYPES, 'MyNumbers', value, ndarray)
+            actual_error = None
+        except ValidationError as exc:
+            actual = None
+            actual_error = (str(exc), exc.member_fqn)
+
+        self.assertEqual(actual_error, expected_error)
+        if actual is not None:
+            actual_list = {key: array.tolist() if isinstance(array, numpy.ndarray) else array for key, array in actual.items()}
+            self.assertEqual(actual_list, expected)
+            self.assertEqual([type(item) for array in actual_list.values() for item in array],
+                             [type(item) for array in expected.values() for item in array])
+        return actual
+
+
+    def test_float(self):
+        value = {'a': [float(ix) for ix in range(NUMPY_MIN_LENGTH)]}
+        a_list = value['a']
+        actual = self.assert_validate(value)
+        self.assertIs(actual['a'], a_list)
+
+        # Integer values are converted to float
+        value = {'a': [ix for ix in range(NUMPY_MIN_LENGTH)]}
+        a_list = value['a']
+        actual = self.assert_validate(value)
+        self.assertIs(actual['a'], a_list)
+        self.assertTrue(all(isinstance(item, float) for item in a_list))
+
+        # NaN floats are valid floats
+        self.assert_validate({'a': [float('nan')] * NUMPY_MIN_LENGTH})
+
+        # Tuples are copied on transform
+        value = {'a': tuple(ix for ix in range(NUMPY_MIN_LENGTH))}
+        actual = validate_type_inplace(TEST_TYPES, 'MyNumbers', value)
+        self.assertIsInstance(actual['a'], list)
+
+
+    def test_float_invalid(self):
+        self.assert_validate({'a': [1.5] * NUMPY_MIN_LENGTH + [True]})
+        self.assert_validate({'a': [1.5] * NUMPY_MIN_LENGTH + ['abc']})
+        self.assert_validate({'a': [1.5] * NUMPY_MIN_LENGTH + [None]})
+        self.assert_validate({'a': [1.5] * NUMPY_MIN_LENGTH + ['2.5']})
+
+
+    def test_float_attr(self):
+        self.assert_validate({'c': [50.0] * NUMPY_MIN_LENGTH})
+        self.assert_validate({'c': [50.0] * NUMPY_MIN_LENGTH + [0, 100.5]})
+        self.assert_validate({'c': [50.0] * NUMPY_MIN_LENGTH + [100, 0.0]})
+        self.assert_validate({'c': [50.0] * NUMPY_MIN_LENGTH + [float('nan')]})
+        self.assert_validate({'g': [1.0] * NUMPY_MIN_LENGTH})
+        self.assert_validate({'g': [1.0] * NUMPY_MIN_LENGTH + [2.0]})
+
+
+    def test_int(self):
+        value = {'b': list(range(NUMPY_MIN_LENGTH))}
+        b_list = value['b']
+        actual = self.assert_validate(value)
+        self.assertIs(actual['b'], b_list)
+
+        # Integer-valued floats are converted to int
+        value = {'b': [float(ix) for ix in range(NUMPY_MIN_LENGTH)]}
+        b_list = value['b']
+        actual = self.assert_validate(value)
+        self.assertIs(actual['b'], b_list)
+        self.assertTrue(all(isinstance(item, int) for item in b_list))
+
+
+    def test_int_invalid(self):
+        self.assert_validate({'b': list(range(NUMPY_MIN_LENGTH)) + [1.5]})
+        self.assert_validate({'b': [1.0] * NUMPY_MIN_LENGTH + [1.5, 2.5]})
+        self.assert_validate({'b': [1.0] * NUMPY_MIN_LENGTH + [float('nan')]})
+        self.assert_validate({'b': [1.0] * NUMPY_MIN_LENGTH + [float('inf')]})
+        self.assert_validate({'b': list(range(NUMPY_MIN_LENGTH)) + [False]})
+        self.assert_validate({'b': list(range(NUMPY_MIN_LENGTH)) + ['5']})
+
+
+    def test_int_large(self):
+
+        # Values outside of the int64 range fall back to element validation
+        self.assert_validate({'b': list(range(NUMPY_MIN_LENGTH)) + [2 ** 64]})
+        self.assert_validate({'b': [1.0] * NUMPY_MIN_LENGTH + [1e20]})
+        self.assert_validate({'h': [0] * NUMPY_MIN_LENGTH + [2 ** 60]})
+        self.assert_validate({'b': [2 ** 64] * NUMPY_MIN_LENGTH}, ndarray=True)
+
+
+    def test_int_attr(self):
+        self.assert_validate({'d': list(range(1, NUMPY_MIN_LENGTH + 1))})
+        self.assert_validate({'d': list(range(NUMPY_MIN_LENGTH))})
+        self.assert_validate({'h': [1] * NUMPY_MIN_LENGTH + [2]})
+        self.assert_validate({'i': [5] * NUMPY_MIN_LENGTH + [10]})
+        self.assert_validate({'i': []})
+
+
+    def test_nested(self):
+        value = {'e': [[1.5] * NUMPY_MIN_LENGTH, [2.5] * NUMPY_MIN_LENGTH]}
+        actual = validate_type_inplace(TEST_TYPES, 'MyNumbers', value, True)
+        self.assertIsInstance(actual['e'], list)
+        self.assertTrue(all(isinstance(array, numpy.ndarray) for array in actual['e']))
+
+        # Validation error with ndarray values
+        value = {'e': [[1.5] * NUMPY_MIN_LENGTH, [2.5] * NUMPY_MIN_LENGTH, [True]]}
+        with self.assertRaises(ValidationError) as cm_exc:
+            validate_type_inplace(TEST_TYPES, 'MyNumbers', value, True)
+        self.assertEqual(str(cm_exc.exception), 'Invalid value true (type "bool") for member "e.2.0", expected type "float"')
+
+
+    def test_nullable(self):
+
+        # Nullable numeric arrays are validated element-by-element
+        value = {'f': [1, None] * NUMPY_MIN_LENGTH}
+        actual = self.assert_validate(value, ndarray=True)
+        self.assertIsInstance(actual['f'], list)
+
+
+    def test_ndarray(self):
+        actual = self.assert_validate({'a': [1.5, 2], 'b': [1, 2.0], 'c': [1], 'd': [1, 2]}, ndarray=True)
+        self.assertEqual(actual['a'].dtype, numpy.float64)
+        self.assertEqual(actual['b'].dtype, numpy.int64)
+        self.assertEqual(actual['c'].dtype, numpy.float64)
+        self.assertEqual(actual['d'].dtype, numpy.int64)
+
+        # Element-by-element validation (e.g. query string values) also returns ndarray
+        actual = self.assert_validate({'a': ['1.5', '2'], 'b': ['1']}, ndarray=True)
+        self.assertEqual(actual['a'].tolist(), [1.5, 2.0])
+        self.assertEqual(actual['b'].tolist(), [1])
+
+        # Empty arrays
+        actual = self.assert_validate({'a': [], 'b': []}, ndarray=True)
+        self.assertEqual(actual['a'].dtype, numpy.float64)
+        self.assertEqual(actual['b'].dtype, numpy.int64)
+
+
+    def test_ndarray_error(self):
+        value = {'a': [1.5] * 100, 'b': list(range(100)) + [-1.5]}
+        with self.assertRaises(ValidationError) as cm_exc:
+            validate_type_inplace(TEST_TYPES, 'MyNumbers', value, True)
+        self.assertEqual(str(cm_exc.exception), 'Invalid value -1.5 (type "float") for member "b.100", expected type "int"')
+        self.assertEqual(cm_exc.exception.member_fqn, 'b.100')
+
+
+    def test_no_numpy(self):
+        with unittest.mock.patch('chisel.validate.numpy', None):
+            actual = validate_type_inplace(TEST_TYPES, 'MyNumbers', {'a': [1.5] * 100, 'b': [1] * 100}, True)
+        self.assertIsInstance(actual['a'], list)
+        self.assertIsInstance(actual['b'], list)
+
+
+class TestCheckType(TestCase):
+
+    def assert_check(self, value_fn, type_name='MyStruct'):
+
+        # Validate a value copy with schema-markdown
+        try:
+            validate_type(TEST_TYPES, type_name, value_fn())
+            expected_error = None
+        except ValidationError as exc:
+            expected_error = (str(exc), exc.member_fqn)
+
+        # Check the value - it must not be modified
+        value = value_fn()
+        try:
+            self.assertIsNone(check_type(TEST_TYPES, type_name, value))
+            actual_error = None
+        except ValidationError as exc:
+            actual_error = (str(exc), exc.member_fqn)
+
+        self.assertEqual(actual_error, expected_error)
+        self.assertEqual(value, value_fn())
+
+
+    def test_check(self):
+        self.assert_check(lambda: {'a': 1, 'i': [{'a': 2}, {'a': 3, 'b': 1.5}], 'j': {'x': 1}})
+        self.assert_check(lambda: {
+            'a': '5',
+            'b': 7,
+            'c': 'null',
+            'd': '2020-06-01',
+            'e': '2020-06-01T12:30:00Z',
+            'f': 'B7A9BEE1-0C7D-4B3D-B1D6-3B0F5D0C7A11',
+            'g': 'true',
+            'i': [{'a': 1.0, 'd': '2021-01-01'}],
+            'k': ('1', 'null', 3)
+        })
+        self.assert_check(lambda: '')
+
+
+    def test_check_errors(self):
+        self.assert_check(lambda: [])
+        self.assert_check(lambda: {'a': '1', 'z': 1})
+        self.assert_check(lambda: {'a': 1, 'd': '2020-06-01', 'i': [{'a': '2'}, {'a': 'x'}]})
+        self.assert_check(lambda: {'a': 1, 'k': ['1', 0]})
+        self.assert_check(lambda: {'a': 1, 'j': {'x': '0'}})
+        self.assert_check(lambda: {'a': 1, 'k': {}})
+
+
+    def test_check_numbers(self):
+        self.assert_check(lambda: {'a': [1.5, 2] * NUMPY_MIN_LENGTH, 'b': [1, 2.0] * NUMPY_MIN_LENGTH}, 'MyNumbers')
+        self.assert_check(lambda: {'c': [50] * NUMPY_MIN_LENGTH + [0]}, 'MyNumbers')
+        self.assert_check(lambda: {'b': [1.0] * NUMPY_MIN_LENGTH + [1.5]}, 'MyNumbers')
+
+
+    def test_check_array_array(self):
+        check_type(TEST_TYPES, 'MyNumbers', {
+            'a': array('d', [1.5, 2.5]),
+            'b': array('q', [1, 2]),
+            'c': array('f', [1.5, 100]),
+            'd': array('i', [1, 2]),
+            'e': [array('d', [1.5])]
+        })
+
+        # Memoryview values
+        check_type(TEST_TYPES, 'MyNumbers', {'a': memoryview(array('d', [1.5])), 'b': memoryview(b'abc')})
+
+        # Array errors
+        with self.assertRaises(ValidationError) as cm_exc:
+            check_type(TEST_TYPES, 'MyNumbers', {'c': array('d', [1.5, 0])})
+        self.assertEqual(str(cm_exc.exception), 'Invalid value 0.0 (type "float") for member "c.1", expected type "float" [> 0.0]')
+        self.assertEqual(cm_exc.exception.member_fqn, 'c.1')
+        with self.assertRaises(ValidationError) as cm_exc:
+            check_type(TEST_TYPES, 'MyNumbers', {'b': array('d', [1, 1.5])})
+        self.assertEqual(str(cm_exc.exception), 'Invalid value 1.5 (type "float") for member "b.1", expected type "int"')
+        with self.assertRaises(ValidationError) as cm_exc:
+            check_type(TEST_TYPES, 'MyNumbers', {'a': array('u', 'ab')})
+        self.assertEqual(str(cm_exc.exception), 'Invalid value "a" (type "str") for member "a.0", expected type "float"')
+
+        # Buffer values are not accepted for non-array members
+        with self.assertRaises(ValidationError) as cm_exc:
+            check_type(TEST_TYPES, 'MyStruct', {'a': array('q', [1])})
+        self.assertEqual(str(cm_exc.exception), 'Invalid value [1] (type "list") for member "a", expected type "int"')
+
+        # Multi-dimensional memoryview values
+        with self.assertRaises(ValidationError) as cm_exc:
+            check_type(TEST_TYPES, 'MyNumbers', {'a': memoryview(b'abcd').cast('B', shape=[2, 2])})
+        self.assertEqual(cm_exc.exception.member_fqn, 'a.0')
+
+
+    def test_check_no_numpy(self):
+        with unittest.mock.patch('chisel.validate.numpy', None):
+            check_type(TEST_TYPES, 'MyNumbers', {'a': array('d', [1.5] * 100), 'b': array('q', [1] * 100)})
+            with self.assertRaises(ValidationError) as cm_exc:
+                check_type(TEST_TYPES, 'MyNumbers', {'d': array('q', [1, 2, 0])})
+            self.assertEqual(str(cm_exc.exception), 'Invalid value 0 (type "int") for member "d.2", expected type "PositiveInt2" [> 0.0]')
+
+
+    @skipIf(numpy is None, 'NumPy is not installed')
+    def test_check_ndarray(self):
+        value = {
+            'a': numpy.array([1.5, numpy.nan]),
+            'b': numpy.arange(100, dtype=numpy.int32),
+            'c': numpy.array([1, 100], dtype=numpy.uint8),
+            'd': numpy.array([1.0, 2.0]),
+            'e': [numpy.array([1.5]), numpy.array([], dtype=numpy.float32)],
+            'g': numpy.ones(3),
+            'i': numpy.array([0, 9])
+        }
+        check_type(TEST_TYPES, 'MyNumbers', value)
+
+        # Object arrays and multi-dimensional arrays are validated element-by-element
+        check_type(TEST_TYPES, 'MyNumbers', {'a': numpy.array([1.5, 2], dtype=object), 'e': numpy.ones((2, 2))})
+
+        # Errors
+        with self.assertRaises(ValidationError) as cm_exc:
+            check_type(TEST_TYPES, 'MyNumbers', {'a': numpy.array([1.5]), 'c': numpy.linspace(1, 101, 101)})
+        self.assertEqual(str(cm_exc.exception), 'Invalid value 101.0 (type "float") for member "c.100", expected type "float" [<= 100.0]')
+        self.assertEqual(cm_exc.exception.member_fqn, 'c.100')
+        with self.assertRaises(ValidationError) as cm_exc:
+            check_type(TEST_TYPES, 'MyNumbers', {'b': numpy.array([1, numpy.inf])})
+        self.assertEqual(str(cm_exc.exception), 'Invalid value Infinity (type "float") for member "b.1", expected type "int"')
+        with self.assertRaises(ValidationError) as cm_exc:
+            check_type(TEST_TYPES, 'MyNumbers', {'b': numpy.array([True])})
+        self.assertEqual(str(cm_exc.exception), 'Invalid value true (type "bool") for member "b.0", expected type "int"')
+        with self.assertRaises(ValidationError) as cm_exc:
+            check_type(TEST_TYPES, 'MyNumbers', {'i': numpy.array([], dtype=numpy.int64)})
+        self.assertEqual(str(cm_exc.exception), 'Invalid value [] (type "list") for member "i", expected type "array" [len > 0]')
+        with self.assertRaises(ValidationError) as cm_exc:
+            check_type(TEST_TYPES, 'MyNumbers', {'e': numpy.ones((2, 2)), 'f': numpy.ones((2, 2))})
+        self.assertEqual(str(cm_exc.exception), 'Invalid value [1.0,1.0] (type "list") for member "f.0", expected type "int"')
+
+        # Float attribute comparisons with large integers are validated element-by-element
+        with self.assertRaises(ValidationError) as cm_exc:
+            check_type(TEST_TYPES, 'MyNumbers', {'h': numpy.array([1, 2 ** 60])})
+        self.assertEqual(cm_exc.exception.member_fqn, 'h.1')